@@ -12,6 +12,8 @@ waterfront audit fills waterfront_evidence later. Leads are saved to the leads f
 keyed by new id for the audit stage."""
 import json, sys, os, re, argparse
 
+from geoindex import GeoIndex
+
 # repo root = this script's directory; resolves correctly on any machine/clone
 _REPO = os.path.dirname(os.path.abspath(__file__))
 CG = os.path.join(_REPO, 'campgrounds.json')
@@ -87,6 +89,13 @@ def main():
             if n:
                 st_names.setdefault(n, []).append((p, e['id'], e.get('name', '')))
 
+    # Existing entries are looked up through a spatial index (a state can hold
+    # a couple of thousand); the ones this run adds are appended to st_coords
+    # past n_existing and checked by a scan, being only the batch's few.
+    n_existing = len(st_coords)
+    st_index = GeoIndex([c for c, _, _ in st_coords])
+    D = 0.0015
+
     leads = json.load(open(LEADS)) if os.path.exists(LEADS) else {}
 
     entries = []
@@ -95,8 +104,9 @@ def main():
         p = parse(r['location'])
         if p:
             dup = None
-            for (q, eid, enm) in st_coords:
-                if abs(p[0] - q[0]) < 0.0015 and abs(p[1] - q[1]) < 0.0015:
+            near = sorted(st_index.bbox(p[0] - D, p[1] - D, p[0] + D, p[1] + D).tolist())
+            for (q, eid, enm) in [st_coords[i] for i in near] + st_coords[n_existing:]:
+                if abs(p[0] - q[0]) < D and abs(p[1] - q[1]) < D:
                     dup = (eid, enm); break
             if dup:
                 skipped_dups.append((r['name'], dup)); continue
@@ -8,6 +8,12 @@
 #   + trip_data/access_log.jsonl
 #   + trip_data/track_cache/.
 #
+# With the optional SQLite trip store active (trip_data/trips.db — see
+# trip_store.py), trips.json is refreshed from it first, so the bundle keeps
+# carrying trips in the plain JSON format restore.sh expects either way. The
+# optional photo-metadata store (trip_data/photo_meta.db — see photo_meta.py)
+# is exported back to captions/order/uploaders/favorites/people the same way.
+#
 # trip_data/family.json is in that list for a privacy reason, not just a
 # regenerability one: family locations are relatives' names + driveway pins, so
 # they are deliberately kept OUT of the public repo. This bundle (and
@@ -19,6 +25,7 @@
 #   - trip_data/secret_key,
 #     trip_data/dev_cert.{crt,key} (machine-local session key / dev TLS cert)
 #   - .thumbs/, .views/, .trash/ (regenerable derivatives / pending-purge deletes)
+#   - trip_data/track_responses/ (regenerable built track-endpoint bodies)
 #   - .env                      (secrets — each host has its own)
 #
 # Usage:
@@ -54,6 +61,15 @@ if [[ -z "$OUT" ]]; then
   OUT="$REPO/backup/ekko-backup-${TS}.tar.gz"
 fi
 
+# The SQLite store is authoritative when present; export it so the bundle's
+# trips.json is current rather than whatever was there before the migration.
+if [[ -f trip_data/trips.db ]]; then
+  python3 trips.py export-json
+fi
+if [[ -f trip_data/photo_meta.db ]]; then
+  python3 photo_meta.py export-json
+fi
+
 # Candidate members (relative to repo root). Only existing ones are archived,
 # so a fresh install missing e.g. share_tokens.json still backs up cleanly.
 CANDIDATES=(
@@ -87,8 +103,10 @@ if [[ "${#MEMBERS[@]}" -eq 0 ]]; then
 fi
 
 # Regenerable/local paths never belong in the bundle even when a parent dir
-# (track_cache, photo_uploads) is included.
+# (track_cache, photo_uploads) is included. *.lock are json_store's
+# empty write-lock sidecars.
 tar -czf "$OUT" \
+  --exclude='*.lock' \
   --exclude='*/.thumbs' --exclude='*/.thumbs/*' \
   --exclude='*/.views'  --exclude='*/.views/*' \
   --exclude='*/.trash'  --exclude='*/.trash/*' \
@@ -0,0 +1,153 @@
+"""Resized derivatives of uploaded photos (the .thumbs/ and .views/
+caches beside the originals).
+
+Kept out of ekko_trips_app.py so the app's upload-time render pool can run
+`render` in spawned worker processes that unpickle it by importing just this
+module and Pillow. The request-time path (/thumb/, /view/) calls the same
+function, so a derivative is the same whichever side rendered it.
+
+A spec is `(dirname, max_px, quality)`, rendered in one or more of FORMATS.
+`render` decodes the original once for all the specs and formats it's given,
+and a JPEG only at the reduced scale the largest of them needs (see
+`_draft`): the largest size is cut from that and each smaller one from the
+size before it. `python -m tests.bench_derivatives` measures the
+difference.
+"""
+
+import math
+import os
+import threading
+
+
+# Encodings a derivative can be cached in: name -> (cache suffix, Pillow
+# format, MIME type). JPEG is always rendered and is what any client that
+# doesn't advertise the others gets; WebP and AVIF are only written where
+# this Pillow build can encode them (see `available`).
+FORMATS = {
+    "jpeg": (".jpg", "JPEG", "image/jpeg"),
+    "webp": (".webp", "WEBP", "image/webp"),
+    "avif": (".avif", "AVIF", "image/avif"),
+}
+
+_available = {}
+
+
+def available(fmt):
+    """True if this Pillow can encode `fmt`. WebP has been in the wheels for
+    years; AVIF only since Pillow 11.2, and not in every distro build."""
+    if fmt not in _available:
+        try:
+            from PIL import features
+            _available[fmt] = fmt == "jpeg" or bool(features.check(fmt))
+        except Exception:
+            _available[fmt] = False
+    return _available[fmt]
+
+
+def path(orig_path, dirname, fmt="jpeg"):
+    """Cache location for a derivative of orig_path. Keeps the full original
+    filename (plus the format's suffix) so same-stem files with different
+    extensions can't collide on one cache entry."""
+    photo_dir, fname = os.path.split(orig_path)
+    return os.path.join(photo_dir, dirname, fname + FORMATS[fmt][0])
+
+
+def is_fresh(orig_path, dirname, fmt="jpeg"):
+    tpath = path(orig_path, dirname, fmt)
+    try:
+        return os.path.getmtime(tpath) >= os.path.getmtime(orig_path)
+    except OSError:
+        return False
+
+
+def _save_kwargs(fmt, quality):
+    """Encoder settings for a spec's (JPEG-scale) quality. The modern codecs
+    hold the same visual quality at lower settings: WebP at about the same
+    number, AVIF's scale well below it. AVIF's speed is raised from the
+    encoder default because it runs at upload time on small hosts."""
+    if fmt == "webp":
+        return {"quality": quality, "method": 4}
+    if fmt == "avif":
+        return {"quality": max(30, quality - 25), "speed": 7}
+    return {"quality": quality, "optimize": True}
+
+
+def _draft(img, max_px):
+    """Have a JPEG decode straight to a reduced scale (1/2, 1/4 or 1/8) that
+    still covers the largest size wanted, instead of decoding every pixel of
+    a 12 MP original to throw most of them away. libjpeg does the reduction
+    in the DCT, so it's both faster and far smaller in memory than a
+    full-size decode; Pillow's resize then finishes the job from there. No-op
+    for other formats, and for originals already near the bound.
+
+    Must run before anything loads the pixels — which is why thumbnail()'s
+    own draft call never fired here: exif_transpose() had loaded them first.
+    The box is the bound fitted to the stored aspect ratio (draft picks the
+    largest scale keeping BOTH sides at or above the request), and EXIF
+    rotation can't matter since the bound is square.
+    """
+    w, h = img.size
+    scale = max_px / max(w, h)
+    if scale < 1:
+        img.draft(None, (math.ceil(w * scale), math.ceil(h * scale)))
+
+
+def render(orig_path, specs, formats=("jpeg",)):
+    """Bring every derivative in `specs` up to date for orig_path, in each of
+    `formats` this Pillow can encode, decoding the original at most once.
+    Returns {(dirname, fmt): cache path, or None if it couldn't be made}.
+    Fresh derivatives are left alone — if all of them are, the original
+    isn't even opened."""
+    formats = [f for f in formats if available(f)]
+    out = {}
+    stale = []
+    for spec in specs:
+        todo = []
+        for fmt in formats:
+            if is_fresh(orig_path, spec[0], fmt):
+                out[spec[0], fmt] = path(orig_path, spec[0], fmt)
+            else:
+                todo.append(fmt)
+        if todo:
+            stale.append((spec, todo))
+    if not stale:
+        return out
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(orig_path) as src:
+            _draft(src, max(spec[1] for spec, _ in stale))
+            # Bake EXIF rotation in: browsers honor orientation on originals,
+            # but re-encoding strips the tag, so the pixels must be upright.
+            img = ImageOps.exif_transpose(src)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+    except Exception:
+        img = None
+    for (dirname, max_px, quality), todo in sorted(stale,
+                                                   key=lambda s: -s[0][1]):
+        if img is not None:
+            # thumbnail() resizes in place and never upscales, so each pass
+            # shrinks the previous (larger) size rather than the original.
+            img.thumbnail((max_px, max_px))
+        for fmt in todo:
+            out[dirname, fmt] = (None if img is None else
+                                 _save(img, path(orig_path, dirname, fmt),
+                                       fmt, quality))
+    return out
+
+
+def _save(img, tpath, fmt, quality):
+    try:
+        os.makedirs(os.path.dirname(tpath), exist_ok=True)
+        # pid + thread: the request path and the render pool may both be
+        # writing the same entry, so each needs its own temp name.
+        tmp = f"{tpath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            img.save(tmp, FORMATS[fmt][1], **_save_kwargs(fmt, quality))
+            os.replace(tmp, tpath)  # atomic — concurrent writers can't clobber
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return tpath
+    except Exception:
+        return None
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Scan the photo library for photos with people in them.
 
-Writes trip_data/photo_people.json — {photo_key: face_count} with one entry
+Writes the people records (trip_data/photo_people.json, or its rows in
+photo_meta.db when that store is active) — {photo_key: face_count}, one entry
 per SCANNED photo (0 means "looked, found nobody"), keyed exactly like
 captions/favorites ("{trip_id}/{idx}/{file}" or "{trip_id}/events/{idx}/{file}").
 The app reads it in _collect_photo_pool() as a boolean `people` flag, which the
@@ -41,7 +42,6 @@ Optional: pillow-heif, only if the library contains .heic uploads.
 """
 import argparse
 import hashlib
-import json
 import os
 import sys
 import urllib.request
@@ -49,6 +49,8 @@ import urllib.request
 import numpy as np
 from PIL import Image, ImageOps
 
+import photo_meta
+
 try:  # .heic support if available; otherwise those files are skipped
     import pillow_heif
     pillow_heif.register_heif_opener()
@@ -57,7 +59,6 @@ except ImportError:
 
 _DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(_DIR, "photo_uploads")
-OUT_FILE = os.path.join(_DIR, "trip_data", "photo_people.json")
 
 # Same set as the app's _allowed_file — keep in step with ekko_trips_app.py.
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp", "heic"}
@@ -132,25 +133,15 @@ def _path_for_key(key):
 
 
 def _merge_and_write(updates, removed=()):
-    """Apply this run's deltas to the file on disk and return the result.
+    """Apply this run's deltas to the stored records and return the result.
 
     Re-reads at write time rather than dumping the dict loaded at startup:
-    the web app edits the same file (scrubbing a deleted photo's record,
-    renaming a moved photo's key), and since it now also *triggers* this
-    script on upload, the two really can overlap.
+    the web app edits the same records (scrubbing a deleted photo's, renaming
+    a moved photo's key), and since it now also *triggers* this script on
+    upload, the two really can overlap — photo_meta applies just these keys
+    under the app's own write lock (or in one SQLite transaction).
     """
-    current = {}
-    if os.path.exists(OUT_FILE):
-        with open(OUT_FILE) as f:
-            current = json.load(f)
-    for key in removed:
-        current.pop(key, None)
-    current.update(updates)
-    tmp = OUT_FILE + f".{os.getpid()}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(current, f, indent=2, ensure_ascii=False)
-    os.replace(tmp, OUT_FILE)
-    return current
+    return photo_meta.merge_people(updates, removed)
 
 
 def _count_faces(detector, path):
@@ -194,10 +185,7 @@ def main():
     detector = cv2.FaceDetectorYN.create(
         MODEL_FILE, "", (320, 320), score_threshold=SCORE_THRESHOLD)
 
-    data = {}
-    if os.path.exists(OUT_FILE):
-        with open(OUT_FILE) as f:
-            data = json.load(f)
+    data = photo_meta.load_all()["people"]
 
     gone = []
     if args.only:
@@ -241,7 +229,7 @@ def main():
 
     total_people = sum(1 for v in data.values() if v)
     print(f"Done: scanned {scanned} new photo(s), {with_people} with people. "
-          f"{OUT_FILE} now records {len(data)} photos, "
+          f"People records now cover {len(data)} photos, "
           f"{total_people} with people.")
 
 
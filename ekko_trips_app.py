@@ -11,17 +11,38 @@ import sqlite3
 import sys
 import threading
 import time
+from collections import OrderedDict
 from datetime import date, datetime, time as dt_time, timedelta, timezone
 
+import numpy as np
 from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file, Response, abort
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from werkzeug.utils import secure_filename
 
+try:
+    import brotli
+except ImportError:  # pragma: no cover - the page cache stores gzip only
+    brotli = None
+
 from ridb.fetch_facility import (search_facilities, fetch_facility,
                                  availability_matrix, DEFAULT_FIT_FT)
+import derivatives
+import exif_index
+import geodist
+import geoindex
+import json_store
+import localdates
+import maptiles
+import markerpack
+import photo_meta
+import timeline_client
+import timewindows
+import track_store
+import tzcells
+import tzraster
 import weather_finder
-from trips import (parse_trips, enrich_trip_locations,
+from trips import (parse_trips, get_trip, trip_order, enrich_trip_locations,
                    create_trip, update_trip, delete_trip,
                    add_stay, update_stay, delete_stay,
                    add_event, update_event, delete_event,
@@ -30,8 +51,10 @@ from trips import (parse_trips, enrich_trip_locations,
                    get_relocated_pings, add_relocated_pings,
                    remove_relocated_pings,
                    get_tid_overrides, set_tid_override, raw_trip_records,
+                   raw_trip_record,
                    campground_references, camping_nights, is_day_trip,
-                   is_home_stay, visit_runs, TRIPS_JSON)
+                   is_home_stay, visit_runs, trips_data_path,
+                   TRIPS_JSON, TRIPS_DB)
 
 app = Flask(__name__)
 app.url_map.strict_slashes = False
@@ -105,6 +128,8 @@ _COMPRESS_MIN_BYTES = 4096
 _COMPRESSIBLE_MIMETYPES = frozenset({
     'text/html', 'text/css', 'text/plain',
     'application/json', 'application/javascript', 'text/javascript',
+    # Binary, but a third of it is the name table.
+    markerpack.MIMETYPE,
 })
 
 
@@ -146,6 +171,7 @@ def _compress_response(resp):
         pass
     return resp
 
+
 _STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
 _static_v_cache = {}
 
@@ -280,23 +306,26 @@ TRIP_DATA_DIR = os.path.join(os.path.dirname(__file__), "trip_data")
 # optional --delete, and photos are synced separately (--photos), so nesting
 # them there would let a data-only sync wipe the library.
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "photo_uploads")
-CAPTIONS_FILE = os.path.join(TRIP_DATA_DIR, "captions.json")
-PHOTO_ORDER_FILE = os.path.join(TRIP_DATA_DIR, "photo_order.json")
+# Per-photo metadata (captions, grid order and the uploader/favorite/people
+# records below) is read and written through photo_meta, which owns these
+# paths and the optional SQLite store that can replace them.
+CAPTIONS_FILE = photo_meta.CAPTIONS_JSON
+PHOTO_ORDER_FILE = photo_meta.ORDER_JSON
 USERS_FILE = os.path.join(os.path.dirname(__file__), "users.json")
 # Per-photo uploader record. Keyed identically to captions:
 #   "{trip_id}/{stay_idx}/{filename}" or "{trip_id}/events/{event_idx}/{filename}".
 # Used to gate non-admin (uploader-role) caption edits to their own contributions.
-PHOTO_UPLOADERS_FILE = os.path.join(TRIP_DATA_DIR, "photo_uploaders.json")
+PHOTO_UPLOADERS_FILE = photo_meta.UPLOADERS_JSON
 # Per-photo "hero" mark, keyed identically to captions. There is no heuristic
 # for "is this a good photo" — resolution, aspect and EXIF camera model are all
 # proxies for "taken with the nice camera" — so the poster's two 2x2 hero cells
 # deal from a hand-marked set instead, and the marking IS the feature. Cheap to
 # curate because the sheet only needs a couple of dozen good photos, not a
 # rating on every one. A dict {key: True} rather than a list, because
-# _remap_json_keys (trips.py) rewrites these keys by iterating .items() when a
+# photo_meta.remap_indices rewrites these keys by iterating .items() when a
 # stay/event sort shifts indices. Unstarring deletes the key rather than
 # storing False, so the file stays the size of the marked set.
-PHOTO_FAVORITES_FILE = os.path.join(TRIP_DATA_DIR, "photo_favorites.json")
+PHOTO_FAVORITES_FILE = photo_meta.FAVORITES_JSON
 # Per-photo face count from the OFFLINE detect_people.py scan (the app never
 # runs detection itself), keyed identically to captions: {key: int}, one entry
 # per scanned photo — 0 means "scanned, nobody in it", absent means "not yet
@@ -304,7 +333,7 @@ PHOTO_FAVORITES_FILE = os.path.join(TRIP_DATA_DIR, "photo_favorites.json")
 # it to a boolean `people` flag that the poster's hero deck ranks just below
 # hand-starred favorites: unlike "is this photo GOOD" (favorites' comment
 # above), "is somebody IN it" is a fact a detector can answer.
-PHOTO_PEOPLE_FILE = os.path.join(TRIP_DATA_DIR, "photo_people.json")
+PHOTO_PEOPLE_FILE = photo_meta.PEOPLE_JSON
 # Read-only share links (magic links). Maps an unguessable token to
 #   {label, next, created}. A token authenticates a synthetic read-only viewer
 # (see SHARE_ID_PREFIX / load_user), so a leaked link exposes only viewing.
@@ -519,12 +548,73 @@ def _allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# EXIF timestamps are immutable for a given file, but trip detail re-read
-# every photo's EXIF on every render (one file open per photo). Cache per
-# (path, mtime_ns, size) — a replaced file gets a fresh read; entries for
-# deleted files are a few stale dict slots, not worth evicting.
-_EXIF_DATE_CACHE = {}
-_EXIF_DT_CACHE = {}
+# EXIF timestamps are immutable for a given file, but trip detail needs one per
+# photo, and reading it means a Pillow open of the original. The answers live
+# in exif_index.db (see exif_index.py), shared by every worker and surviving
+# restarts, with a per-process dict in front keyed (path, mtime_ns, size) — a
+# replaced file gets a fresh read; entries for deleted files are a few stale
+# dict slots, not worth evicting. Both _photo_date_taken and
+# _photo_datetime_taken derive from the one raw string, so a photo's EXIF is
+# parsed once, not once per caller.
+EXIF_INDEX_DB = os.path.join(TRIP_DATA_DIR, "exif_index.db")
+_EXIF_RAW_CACHE = {}
+
+
+def _exif_stamp(filepath):
+    """(index key, mtime_ns, size) for a photo, or None if it's gone. Keys are
+    library-relative so an index synced from another host still matches."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    rel = os.path.relpath(filepath, UPLOAD_DIR)
+    key = os.path.abspath(filepath) if rel.startswith("..") else rel
+    return key, st.st_mtime_ns, st.st_size
+
+
+def _exif_prefetch(filepaths):
+    """Resolve many photos' EXIF timestamps at once: one index query for the
+    lot, then a file read (and an index write) only for the misses. Trip
+    detail calls this for every photo on the page before rendering."""
+    stamps = {}
+    for fp in filepaths:
+        stamp = _exif_stamp(fp)
+        if stamp is not None and (fp,) + stamp[1:] not in _EXIF_RAW_CACHE:
+            stamps[fp] = stamp
+    if not stamps:
+        return
+    try:
+        found = exif_index.lookup(EXIF_INDEX_DB, list(stamps.values()))
+    except sqlite3.Error as e:
+        app.logger.warning("exif index unreadable: %s", e)
+        found = {}
+    fresh = []
+    for fp, (key, mtime_ns, size) in stamps.items():
+        raw = found.get(key)
+        if raw is None:
+            raw = exif_index.read_raw(fp)
+            fresh.append((key, mtime_ns, size, raw))
+        _EXIF_RAW_CACHE[(fp, mtime_ns, size)] = raw
+    if fresh:
+        try:
+            exif_index.record(EXIF_INDEX_DB, fresh)
+        except sqlite3.Error as e:
+            app.logger.warning("exif index not updated: %s", e)
+        # Misses on a page view mean the index is behind (first visit after a
+        # deploy onto a fresh trip_data/, or photos copied in by hand).
+        _start_exif_backfill()
+
+
+def _exif_raw(filepath):
+    """The photo's raw EXIF timestamp ("YYYY:MM:DD HH:MM:SS"), "" when it has
+    none, or None if the file is gone."""
+    stamp = _exif_stamp(filepath)
+    if stamp is None:
+        return None
+    ck = (filepath,) + stamp[1:]
+    if ck not in _EXIF_RAW_CACHE:
+        _exif_prefetch([filepath])
+    return _EXIF_RAW_CACHE.get(ck, "")
 
 
 def _photo_date_taken(filepath):
@@ -533,33 +623,14 @@ def _photo_date_taken(filepath):
     Returns 'YYYY-MM-DD HH:MM:SS' when a time is present, 'YYYY-MM-DD' when
     only a date is available, or '' if there's no EXIF timestamp.
     """
-    try:
-        st = os.stat(filepath)
-        key = (filepath, st.st_mtime_ns, st.st_size)
-    except OSError:
+    val = _exif_raw(filepath)
+    if not val:
         return ""
-    if key in _EXIF_DATE_CACHE:
-        return _EXIF_DATE_CACHE[key]
-    result = ""
-    try:
-        from PIL import Image
-        from PIL.ExifTags import Base as ExifBase
-        img = Image.open(filepath)
-        exif = img.getexif()
-        # Try DateTimeOriginal first, then DateTimeDigitized, then DateTime
-        for tag in (ExifBase.DateTimeOriginal, ExifBase.DateTimeDigitized, ExifBase.DateTime):
-            val = exif.get(tag)
-            if val:
-                # EXIF timestamps are "YYYY:MM:DD HH:MM:SS"
-                date_part, _, time_part = val.partition(" ")
-                date_str = date_part.replace(":", "-")
-                time_part = time_part.strip()
-                result = f"{date_str} {time_part}" if time_part else date_str
-                break
-    except Exception:
-        pass
-    _EXIF_DATE_CACHE[key] = result
-    return result
+    # EXIF timestamps are "YYYY:MM:DD HH:MM:SS"
+    date_part, _, time_part = val.partition(" ")
+    date_str = date_part.replace(":", "-")
+    time_part = time_part.strip()
+    return f"{date_str} {time_part}" if time_part else date_str
 
 
 def _photo_datetime_taken(filepath):
@@ -567,32 +638,42 @@ def _photo_datetime_taken(filepath):
 
     Used for bucketing photos across multi-copy stay cards.
     """
+    val = _exif_raw(filepath)
+    if not val:
+        return None
     try:
-        st = os.stat(filepath)
-        key = (filepath, st.st_mtime_ns, st.st_size)
-    except OSError:
+        return datetime.strptime(val, "%Y:%m:%d %H:%M:%S")
+    except ValueError:
         return None
-    if key in _EXIF_DT_CACHE:
-        return _EXIF_DT_CACHE[key]
-    result = None
+
+
+# Background backfill: one walk of the library per process lifetime, started
+# by the first page view that missed the index. The cross-process lock means
+# only one worker walks at a time; the others find it held and skip.
+_exif_backfill_thread = None
+_exif_backfill_lock = threading.Lock()
+
+
+def _run_exif_backfill():
     try:
-        from PIL import Image
-        from PIL.ExifTags import Base as ExifBase
-        img = Image.open(filepath)
-        exif = img.getexif()
-        for tag in (ExifBase.DateTimeOriginal, ExifBase.DateTimeDigitized, ExifBase.DateTime):
-            val = exif.get(tag)
-            if not val:
-                continue
-            try:
-                result = datetime.strptime(val, "%Y:%m:%d %H:%M:%S")
-            except ValueError:
-                result = None
-            break
-    except Exception:
-        pass
-    _EXIF_DT_CACHE[key] = result
-    return result
+        with json_store.lock(EXIF_INDEX_DB, blocking=False) as held:
+            if not held:
+                return
+            n = exif_index.backfill(EXIF_INDEX_DB, UPLOAD_DIR, _allowed_file)
+            if n:
+                app.logger.info("exif backfill indexed %d photo(s)", n)
+    except Exception as e:
+        app.logger.warning("exif backfill failed: %s", e)
+
+
+def _start_exif_backfill():
+    global _exif_backfill_thread
+    with _exif_backfill_lock:
+        if _exif_backfill_thread is not None:
+            return
+        _exif_backfill_thread = threading.Thread(
+            target=_run_exif_backfill, name="exif-backfill", daemon=True)
+        _exif_backfill_thread.start()
 
 
 def _save_photo(file_storage, photo_dir):
@@ -609,6 +690,10 @@ def _save_photo(file_storage, photo_dir):
         dest = os.path.join(photo_dir, filename)
     file_storage.save(dest)
     _invalidate_photo_pool()
+    # Index its EXIF time now, while the file is in the page cache, so no
+    # later page view has to open it for that.
+    _exif_prefetch([dest])
+    _queue_derivatives([dest])
     return filename
 
 
@@ -642,6 +727,9 @@ def _extract_zip_photos(file_storage, photo_dir):
             saved.append(filename)
     if saved:
         _invalidate_photo_pool()
+        paths = [os.path.join(photo_dir, f) for f in saved]
+        _exif_prefetch(paths)
+        _queue_derivatives(paths)
     return saved
 
 
@@ -674,53 +762,216 @@ VIEW_QUALITY = 82
 # dot-prefixed path component) and out of photo listings.
 DERIVATIVE_DIRNAMES = (THUMB_DIRNAME, VIEW_DIRNAME)
 
-
-def _derivative_path(orig_path, dirname):
-    """Cache location for a derivative of orig_path. Keeps the full original
-    filename (plus .jpg) so same-stem files with different extensions
-    can't collide on one cache entry."""
-    photo_dir, fname = os.path.split(orig_path)
-    return os.path.join(photo_dir, dirname, fname + ".jpg")
-
-
-def _ensure_derivative(orig_path, dirname, max_px, quality):
-    """Return the path of a fresh cached resize of orig_path, generating it if
-    missing or older than the original. Returns None when generation fails
-    (corrupt/unsupported image) — caller falls back to serving the original.
+# Each derivative is also cached as WebP and AVIF, and /thumb/ and /view/
+# hand out the smallest one the browser's Accept header admits. On a
+# campsite's cell signal the lightbox's 1600px view is most of the bytes a
+# trip page moves, and against a q82 JPEG WebP is roughly half the size and
+# AVIF a third. Listed in preference order; JPEG is the universal fallback
+# and is always rendered, so it isn't listed. EKKO_DERIVATIVE_FORMATS narrows
+# this on a host where AVIF's slower encode is unwelcome (e.g. "webp"), and
+# anything this Pillow can't encode is dropped.
+MODERN_DERIVATIVE_FORMATS = tuple(
+    f for f in (f.strip() for f in os.environ.get(
+        "EKKO_DERIVATIVE_FORMATS", "avif,webp").split(","))
+    if f in ("avif", "webp") and derivatives.available(f))
+DERIVATIVE_FORMATS = MODERN_DERIVATIVE_FORMATS + ("jpeg",)
+
+
+def _derivative_path(orig_path, dirname, fmt="jpeg"):
+    return derivatives.path(orig_path, dirname, fmt)
+
+
+def _negotiate_derivative_format():
+    """The first of MODERN_DERIVATIVE_FORMATS this request's Accept names
+    outright, else "jpeg". Explicit mentions only: every browser sends
+    image/* (or */*), and that's no promise it can decode AVIF."""
+    accepted = {mt for mt, q in request.accept_mimetypes if q > 0}
+    for fmt in MODERN_DERIVATIVE_FORMATS:
+        if derivatives.FORMATS[fmt][2] in accepted:
+            return fmt
+    return "jpeg"
+
+
+def _ensure_derivative(orig_path, dirname, max_px, quality, fmt="jpeg"):
+    """Return (path, fmt) of a fresh cached resize of orig_path, generating it
+    if missing or older than the original. A format that fails to encode
+    falls back to JPEG; (None, None) when even that fails (corrupt/
+    unsupported image) — caller falls back to serving the original.
 
     Shared by the 480px thumbnail and the 1600px lightbox view; they differ
-    only in cache directory, bound and quality.
+    only in cache directory, bound and quality. Usually a cache hit: uploads
+    queue both sizes, in every format, for the render pool below. A miss
+    renders only the format asked for — the rest wait for their own
+    requests rather than slowing this one down.
     """
-    tpath = _derivative_path(orig_path, dirname)
-    try:
-        if os.path.exists(tpath) and os.path.getmtime(tpath) >= os.path.getmtime(orig_path):
-            return tpath
-        from PIL import Image, ImageOps
-        img = Image.open(orig_path)
-        # Bake EXIF rotation in: browsers honor orientation on originals,
-        # but re-encoding strips the tag, so the pixels must be upright.
-        img = ImageOps.exif_transpose(img)
-        img.thumbnail((max_px, max_px))
-        if img.mode not in ("RGB", "L"):
-            img = img.convert("RGB")
-        os.makedirs(os.path.dirname(tpath), exist_ok=True)
-        tmp = f"{tpath}.{os.getpid()}.tmp"
-        img.save(tmp, "JPEG", quality=quality, optimize=True)
-        os.replace(tmp, tpath)  # atomic — concurrent requests can't clobber
-        return tpath
-    except Exception:
-        return None
+    for f in dict.fromkeys((fmt, "jpeg")):
+        path = derivatives.render(orig_path, [(dirname, max_px, quality)],
+                                  (f,)).get((dirname, f))
+        if path:
+            return path, f
+    return None, None
 
 
-def _ensure_thumb(orig_path):
-    return _ensure_derivative(orig_path, THUMB_DIRNAME, THUMB_MAX_PX, THUMB_QUALITY)
+def _ensure_thumb(orig_path, fmt="jpeg"):
+    return _ensure_derivative(orig_path, THUMB_DIRNAME, THUMB_MAX_PX,
+                              THUMB_QUALITY, fmt)
 
 
-def _ensure_view(orig_path):
+def _ensure_view(orig_path, fmt="jpeg"):
     """1600px lightbox derivative. Never upscales — Pillow's thumbnail() is a
     no-op on an image already within the bound, so a small original just gets
     re-encoded at its own size rather than blown up."""
-    return _ensure_derivative(orig_path, VIEW_DIRNAME, VIEW_MAX_PX, VIEW_QUALITY)
+    return _ensure_derivative(orig_path, VIEW_DIRNAME, VIEW_MAX_PX,
+                              VIEW_QUALITY, fmt)
+
+
+def _send_derivative(orig, ensure):
+    """Serve the negotiated derivative of `orig` (or the original, if none
+    could be made). Vary: Accept on every answer, since the same URL now
+    means different bytes to different browsers — without it a cache could
+    hand an AVIF to one that can't decode it."""
+    path, fmt = ensure(orig, _negotiate_derivative_format())
+    if path:
+        resp = send_file(path, mimetype=derivatives.FORMATS[fmt][2],
+                         max_age=30 * 86400, conditional=True)
+    else:
+        resp = send_file(orig, max_age=30 * 86400, conditional=True)
+    resp.vary.add("Accept")
+    return resp
+
+
+# ── Eager derivative rendering ───────────────────────────────────────────────
+# Left to the lazy path above, the first person to open a freshly-uploaded
+# 40-photo stay paid for 80 decode/resize/encode cycles inside their own page
+# load. Uploads instead queue their photos here; a daemon thread (started on
+# the first upload, like the people scan) feeds them to a small process pool
+# that renders both sizes, in every DERIVATIVE_FORMATS encoding, from one
+# decode of each original, so the grid and lightbox are warm by the time
+# anyone looks. Processes rather than threads because the work is CPU-bound
+# Pillow code, and bounded at DERIVATIVE_WORKERS so an upload burst can't
+# starve the request workers.
+#
+# Best-effort throughout: a photo that's viewed before its turn comes is
+# simply rendered by the request (render() skips whatever's already fresh),
+# and if the pool can't start the thread renders inline instead.
+
+DERIVATIVE_SPECS = ((VIEW_DIRNAME, VIEW_MAX_PX, VIEW_QUALITY),
+                    (THUMB_DIRNAME, THUMB_MAX_PX, THUMB_QUALITY))
+DERIVATIVE_WORKERS = max(1, min(2, (os.cpu_count() or 1) // 2))
+# Escape hatch for a host where background rendering isn't wanted (a tiny
+# box, or one whose derivatives are synced in from elsewhere).
+DERIVATIVE_QUEUE_ENABLED = os.environ.get("EKKO_EAGER_DERIVATIVES", "1") != "0"
+
+_derivative_pending = set()      # original paths waiting for the pool
+_derivative_in_flight = 0        # submitted, not yet finished
+_derivative_lock = threading.Lock()
+_derivative_wake = threading.Event()
+_derivative_thread = None
+_derivative_pool = None
+
+
+def _derivative_executor():
+    """The render pool, created on first use, or None if this host can't run
+    one (no working multiprocessing semaphores on some sandboxes). Spawned,
+    not forked: this process has request threads holding locks that a fork
+    would copy mid-flight."""
+    global _derivative_pool
+    if _derivative_pool is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        try:
+            _derivative_pool = ProcessPoolExecutor(
+                max_workers=DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"))
+        except Exception as e:
+            app.logger.warning("derivative pool unavailable, rendering "
+                               "inline: %s", e)
+            _derivative_pool = False
+    return _derivative_pool or None
+
+
+def _derivative_done(n=1):
+    global _derivative_in_flight
+    with _derivative_lock:
+        _derivative_in_flight -= n
+
+
+def _render_derivative_batch(paths):
+    """Render `paths` through the pool, falling back to this thread for
+    anything the pool couldn't take. Never raises."""
+    global _derivative_pool
+    pool = _derivative_executor()
+    if pool is not None:
+        from concurrent.futures import as_completed
+        from concurrent.futures.process import BrokenProcessPool
+        broken = None
+        try:
+            futures = {pool.submit(derivatives.render, p, DERIVATIVE_SPECS,
+                                   DERIVATIVE_FORMATS): p
+                       for p in paths}
+            for fut in as_completed(futures):
+                exc = fut.exception()
+                if isinstance(exc, BrokenProcessPool):
+                    # Left in `paths` for the inline loop below.
+                    broken = exc
+                    continue
+                paths.remove(futures[fut])
+                _derivative_done()
+                if exc is not None:
+                    app.logger.warning("derivative render failed for %s: %s",
+                                       futures[fut], exc)
+        except Exception as e:
+            broken = e
+        if broken is not None:
+            # A worker died (OOM on a huge panorama, say): the executor sets
+            # BrokenProcessPool on every outstanding future, and it's broken
+            # for good, so drop it and let the next batch build a fresh one.
+            app.logger.warning("derivative pool failed: %s", broken)
+            pool.shutdown(wait=False)
+            _derivative_pool = None
+    for p in paths:
+        derivatives.render(p, DERIVATIVE_SPECS, DERIVATIVE_FORMATS)
+        _derivative_done()
+
+
+def _derivative_worker():
+    global _derivative_in_flight
+    while True:
+        _derivative_wake.wait()
+        # Cleared before the batch is taken, as in _people_scan_worker: a
+        # photo queued from here on re-sets the event.
+        _derivative_wake.clear()
+        with _derivative_lock:
+            batch = sorted(_derivative_pending)
+            _derivative_pending.clear()
+            _derivative_in_flight += len(batch)
+        if batch:
+            try:
+                _render_derivative_batch(batch)
+            except Exception as e:
+                app.logger.warning("derivative batch failed: %s", e)
+                _derivative_done(len(batch))
+
+
+def _queue_derivatives(orig_paths):
+    """Ask the background renderer to warm the thumb and view of these
+    just-uploaded (or restored) originals."""
+    if not DERIVATIVE_QUEUE_ENABLED or not orig_paths:
+        return
+    global _derivative_thread
+    with _derivative_lock:
+        _derivative_pending.update(orig_paths)
+        if _derivative_thread is None or not _derivative_thread.is_alive():
+            _derivative_thread = threading.Thread(
+                target=_derivative_worker, name="derivatives", daemon=True)
+            _derivative_thread.start()
+    _derivative_wake.set()
+
+
+def _derivative_queue_depth():
+    """(waiting, rendering) photo counts — both zero once uploads are warm."""
+    with _derivative_lock:
+        return len(_derivative_pending), _derivative_in_flight
 
 
 # ── Photo trash (toast-Undo for single-photo deletes) ────────────────────────
@@ -757,10 +1008,11 @@ def _restore_from_trash(photo_dir, filename):
         return jsonify({"error": "A newer photo with that name exists"}), 409
     os.replace(src, dst)
     _invalidate_photo_pool()
+    _queue_derivatives([dst])  # the delete dropped its thumb and view
     return None
 
 
-def _purge_old_trash(photo_dir, meta_prefix, order_key):
+def _purge_old_trash(photo_dir, order_key):
     """Drop trash entries older than TRASH_TTL_S and scrub their caption/
     order/uploader/favorite/people metadata. Called opportunistically on
     each delete."""
@@ -779,19 +1031,8 @@ def _purge_old_trash(photo_dir, meta_prefix, order_key):
             pass
     if not purged:
         return
-    captions = _load_json(CAPTIONS_FILE)
-    if any(captions.pop(meta_prefix + f, None) is not None for f in purged):
-        _save_json(CAPTIONS_FILE, captions)
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-    if order_key in photo_order:
-        kept = [f for f in photo_order[order_key] if f not in set(purged)]
-        if kept != photo_order[order_key]:
-            photo_order[order_key] = kept
-            _save_json(PHOTO_ORDER_FILE, photo_order)
-    for fname in purged:
-        _remove_uploader(meta_prefix + fname)
-        _remove_favorite(meta_prefix + fname)
-        _remove_people_record(meta_prefix + fname)
+    if photo_meta.remove_photos(order_key, purged):
+        _invalidate_photo_pool()
 
 
 def _remove_thumb(orig_path):
@@ -799,10 +1040,11 @@ def _remove_thumb(orig_path):
     a missed orphan is harmless (mtime staleness covers regeneration) and
     delete-all's rmtree sweeps the whole cache dir anyway."""
     for dirname in DERIVATIVE_DIRNAMES:
-        try:
-            os.remove(_derivative_path(orig_path, dirname))
-        except OSError:
-            pass
+        for fmt in derivatives.FORMATS:
+            try:
+                os.remove(_derivative_path(orig_path, dirname, fmt))
+            except OSError:
+                pass
 
 
 def _resolve_photo_request(subpath):
@@ -834,8 +1076,7 @@ def photo_thumb(subpath):
     orig = _resolve_photo_request(subpath)
     if not orig:
         return jsonify({"error": "not found"}), 404
-    tpath = _ensure_thumb(orig)
-    return send_file(tpath or orig, max_age=30 * 86400, conditional=True)
+    return _send_derivative(orig, _ensure_thumb)
 
 
 @app.route('/view/<path:subpath>')
@@ -850,8 +1091,7 @@ def photo_view(subpath):
     orig = _resolve_photo_request(subpath)
     if not orig:
         return jsonify({"error": "not found"}), 404
-    vpath = _ensure_view(orig)
-    return send_file(vpath or orig, max_age=30 * 86400, conditional=True)
+    return _send_derivative(orig, _ensure_view)
 
 
 @app.route('/photo/<path:subpath>')
@@ -876,17 +1116,73 @@ def photo_original(subpath):
 # ── Slideshow photo pool ─────────────────────────────────────────────────────
 # The trips-map slideshow and the poster border want every uploaded photo.
 # Walking ~500 photo directories per request cost ~280ms of every map-page
-# render, so the pool is cached: a short TTL bounds staleness from anything
-# missed (stay re-sorts renaming dirs, trip deletion), and the photo
-# upload/delete/move paths invalidate explicitly so fresh uploads show up
-# on the very next render.
+# render, so the pool is built incrementally instead of being thrown away on a
+# timer. Three things feed it, each with its own cheap change signal:
+#
+#   the grid layout    which photo directories exist and what trip/card they
+#                      belong to — from parse_trips(), rebuilt only when the
+#                      trip store, campgrounds/family or home.json change;
+#   the listings       one os.listdir() per directory, redone only when that
+#                      directory's (inode, mtime) moves — a stat per directory
+#                      per call, against a listdir + filter per directory;
+#   the metadata       captions/favorites/people/order from photo_meta, reread
+#                      when one of its files' signatures moves.
+#
+# Per-grid entry lists are rebuilt only for the grids whose listing or context
+# changed, and when nothing did, the same pool object comes back — which is
+# what _photo_index() keys its own cache on. Because every signal is on disk,
+# an upload in one worker shows up in the others on their next call, with no
+# TTL to wait out; the in-process writers still call _invalidate_photo_pool()
+# so a same-tick edit can't be missed.
+#
+# The inode is in the directory signature because a stay re-sort RENAMES
+# photo directories: path 1/0 can become a different directory whose own
+# mtime is old. Directories modified within the last couple of seconds are
+# never trusted ("racy", as git calls it): on a coarse-timestamp filesystem a
+# second upload in the same tick wouldn't move the mtime.
 
-_PHOTO_POOL_CACHE = {"ts": 0.0, "pool": None}
-_PHOTO_POOL_TTL_S = 60
+_PHOTO_POOL_CACHE = {"pool": None, "layout_key": None, "layout": None,
+                     "meta_sig": None, "meta": None, "grids": {},
+                     "generation": 0}
+_PHOTO_DIR_RACY_NS = 2_000_000_000
 
 
 def _invalidate_photo_pool():
     _PHOTO_POOL_CACHE["pool"] = None
+    _PHOTO_POOL_CACHE["meta_sig"] = None
+
+
+def _file_sig(path):
+    """(inode, mtime_ns, size) of `path`, or None if it's missing. Moves on
+    in-place writes (mtime) and atomic replaces (inode) alike."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _photo_pool_layout():
+    """[(photo_dir, key_base, card, trip_id, home_only)] for every stay and
+    event grid, rebuilt only when the trip inputs change."""
+    key = (_file_mtime_ns(trips_data_path()), _file_mtime_ns(CAMPGROUNDS_JSON),
+           _file_mtime_ns(FAMILY_JSON), _file_mtime_ns(HOME_FILE))
+    if _PHOTO_POOL_CACHE["layout_key"] == key:
+        return _PHOTO_POOL_CACHE["layout"]
+    layout = []
+    for trip in parse_trips():
+        tid = trip["id"]
+        home_only = bool(trip.get("home_only"))
+        # Stays and events differ only in the path/key segment between the
+        # trip id and the index, so walk them with one body.
+        layout += [(os.path.join(UPLOAD_DIR, str(tid), str(i)), f"{tid}/{i}",
+                    f"stay-{i}", tid, home_only)
+                   for i, _stay in enumerate(trip["stays"])]
+        layout += [(os.path.join(UPLOAD_DIR, str(tid), "events", str(i)),
+                    f"{tid}/events/{i}", f"event-{i}", tid, home_only)
+                   for i, _event in enumerate(trip.get("events", []))]
+    _PHOTO_POOL_CACHE.update(layout_key=key, layout=layout)
+    return layout
 
 
 def _display_order(photo_order, order_key, filenames):
@@ -921,69 +1217,93 @@ def _collect_photo_pool():
     shuffling/mutating (the list and its items are shared across requests).
 
     `caption` is the same text the trip page shows under the photo (the
-    trips-map lightbox displays it). It comes from one captions.json read
+    trips-map lightbox displays it). It comes from one photo_meta read
     per pool build — cheap, unlike the EXIF date, which would need a Pillow
     open per file and so is deliberately not carried here.
 
     `favorite` is the hand-set poster mark; `curated` means the photo leads
     its grid (see _curated_first); `people` means detect_people.py found at
     least one face in it. Together they rank the poster's hero candidates.
-    All are whole-file reads like captions, and every in-app writer
-    invalidates this cache, so an edit shows up without waiting out the TTL
-    (photo_people.json is written offline, so it waits out the TTL at worst).
+    All come from that same read, which is redone whenever photo_meta's
+    files change on disk — so an offline detect_people.py run shows up on the
+    next call too.
 
     Deliberately NOT carried: image dimensions. Those need a Pillow open per
     file, same as the EXIF date — the poster probes the aspect of the handful
     of photos it actually considers for a hero cell, client-side, instead."""
-    now = time.time()
-    if _PHOTO_POOL_CACHE["pool"] is not None and now - _PHOTO_POOL_CACHE["ts"] < _PHOTO_POOL_TTL_S:
-        return _PHOTO_POOL_CACHE["pool"]
-    captions = _load_json(CAPTIONS_FILE)
-    favorites = _load_json(PHOTO_FAVORITES_FILE)
-    people = _load_json(PHOTO_PEOPLE_FILE)
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-    pool = []
-    for trip in parse_trips():
-        tid = trip["id"]
-        home_only = bool(trip.get("home_only"))
-        # Stays and events differ only in the path/key segment between the
-        # trip id and the index, so walk them with one body.
-        cards = [(f"{tid}/{i}", f"stay-{i}", os.path.join(UPLOAD_DIR, str(tid), str(i)))
-                 for i, _stay in enumerate(trip["stays"])]
-        cards += [(f"{tid}/events/{i}", f"event-{i}",
-                   os.path.join(UPLOAD_DIR, str(tid), "events", str(i)))
-                  for i, _event in enumerate(trip.get("events", []))]
-        for key_base, card, photo_dir in cards:
-            if not os.path.isdir(photo_dir):
-                continue
+    cache = _PHOTO_POOL_CACHE
+    layout = _photo_pool_layout()
+    meta_sig = tuple(_file_sig(p) for p in photo_meta.data_paths())
+    meta_changed = meta_sig != cache["meta_sig"]
+    if meta_changed:
+        cache["meta"] = photo_meta.load_all()
+    meta = cache["meta"]
+    now_ns = time.time_ns()
+    grids = cache["grids"]
+    fresh = {}
+    changed = meta_changed or cache["pool"] is None \
+        or len(grids) != len(layout)
+    for photo_dir, key_base, card, tid, home_only in layout:
+        ctx = (key_base, card, tid, home_only)
+        sig = _file_sig(photo_dir)
+        prev = grids.get(photo_dir)
+        if prev is not None and prev["sig"] == sig and prev["ctx"] == ctx \
+                and not meta_changed:
+            fresh[photo_dir] = prev
+            continue
+        changed = True
+        if sig is None:
+            fnames = []
+        elif prev is not None and prev["sig"] == sig:
+            fnames = prev["fnames"]
+        else:
             fnames = [f for f in os.listdir(photo_dir) if _allowed_file(f)]
-            display, first = _display_order(photo_order, key_base, fnames)
-            for pos, fname in enumerate(display):
-                key = f"{key_base}/{fname}"
-                pool.append({
-                    # The storage subpath, which is both the metadata key and
-                    # the tail of every URL below — templates hand it to the
-                    # favorites API rather than re-deriving it from a src.
-                    "key": key,
-                    "url": f"/photo/{key}",
-                    "thumb": f"/thumb/{key}",
-                    "view": f"/view/{key}",
-                    "trip_id": tid,
-                    "card": card,
-                    "caption": captions.get(key, ""),
-                    "favorite": bool(favorites.get(key)),
-                    "people": bool(people.get(key)),
-                    "curated": fname == first,
-                    # Position within its own grid, in the order the trip page
-                    # shows them — what the gallery sorts photos by inside a
-                    # campspot or event.
-                    "photo_seq": pos,
-                    "home_only": home_only,
-                })
-    _PHOTO_POOL_CACHE.update(ts=now, pool=pool)
+        if sig is not None and now_ns - sig[1] < _PHOTO_DIR_RACY_NS:
+            sig = ("racy",) + sig
+        fresh[photo_dir] = {"sig": sig, "ctx": ctx, "fnames": fnames,
+                            "entries": _photo_pool_entries(meta, ctx, fnames)}
+    cache["grids"] = fresh
+    if not changed and cache["pool"] is not None:
+        return cache["pool"]
+    pool = [e for g in fresh.values() for e in g["entries"]]
+    # `generation` counts rebuilds: a cheap "has the pool changed" for keys
+    # that outlive the pool object itself (the page cache's).
+    cache.update(pool=pool, meta_sig=meta_sig,
+                 generation=cache["generation"] + 1)
     return pool
 
 
+def _photo_pool_entries(meta, ctx, fnames):
+    """The pool entries for one grid, in its display order."""
+    key_base, card, tid, home_only = ctx
+    display, first = _display_order(meta["order"], key_base, fnames)
+    captions, favorites, people = meta["captions"], meta["favorites"], meta["people"]
+    entries = []
+    for pos, fname in enumerate(display):
+        key = f"{key_base}/{fname}"
+        entries.append({
+            # The storage subpath, which is both the metadata key and the
+            # tail of every URL below — templates hand it to the favorites
+            # API rather than re-deriving it from a src.
+            "key": key,
+            "url": f"/photo/{key}",
+            "thumb": f"/thumb/{key}",
+            "view": f"/view/{key}",
+            "trip_id": tid,
+            "card": card,
+            "caption": captions.get(key, ""),
+            "favorite": bool(favorites.get(key)),
+            "people": bool(people.get(key)),
+            "curated": fname == first,
+            # Position within its own grid, in the order the trip page
+            # shows them — what the gallery sorts photos by inside a
+            # campspot or event.
+            "photo_seq": pos,
+            "home_only": home_only,
+        })
+    return entries
+
+
 def _load_json(path):
     if os.path.exists(path):
         with open(path) as f:
@@ -991,13 +1311,30 @@ def _load_json(path):
     return {}
 
 
+# ensure_ascii=False keeps em-dashes/accents/unicode in notes literal (— not
+# —) so a UI edit to one campground doesn't rewrite every other entry's
+# note into escaped form — that churn made git diffs/merges noisy. json_store
+# writes utf-8 explicitly, so the literal bytes land regardless of host locale.
+_JSON_DUMP_KWARGS = {"indent": 2, "ensure_ascii": False}
+
+
 def _save_json(path, data):
-    # ensure_ascii=False keeps em-dashes/accents/unicode in notes literal (— not
-    # —) so a UI edit to one campground doesn't rewrite every other entry's
-    # note into escaped form — that churn made git diffs/merges noisy. Explicit
-    # utf-8 so the literal bytes are written regardless of host locale.
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Atomically replace one of our JSON files (temp file + os.replace; see
+    json_store). For an edit of what's already on disk use `_update_json`
+    instead — a bare load-then-save can lose a concurrent worker's write."""
+    json_store.write(path, data, **_JSON_DUMP_KWARGS)
+
+
+def _update_json(path):
+    """Locked read-modify-write of one of our JSON files:
+
+        with _update_json(SHARE_TOKENS_FILE) as links:
+            links[token] = {...}
+
+    Holds the file's cross-process lock from load to write, so two workers
+    editing users.json (or any sidecar) at once both land. Per-photo
+    metadata has its own layer, photo_meta."""
+    return json_store.update(path, **_JSON_DUMP_KWARGS)
 
 
 # Keys the app reads out of home.json (gitignored per-machine config).
@@ -1057,14 +1394,13 @@ def _load_users():
 
 def _save_user(username, password, is_admin=False, can_upload=False,
                can_view_campgrounds=True):
-    data = _load_json(USERS_FILE)
-    data[username] = {
-        "password_hash": generate_password_hash(password),
-        "is_admin": is_admin,
-        "can_upload": can_upload,
-        "can_view_campgrounds": can_view_campgrounds,
-    }
-    _save_json(USERS_FILE, data)
+    with _update_json(USERS_FILE) as data:
+        data[username] = {
+            "password_hash": generate_password_hash(password),
+            "is_admin": is_admin,
+            "can_upload": can_upload,
+            "can_view_campgrounds": can_view_campgrounds,
+        }
 
 
 # Share-link (read-only magic-link) sessions carry a synthetic user id
@@ -1398,112 +1734,27 @@ def _require_campground_view_api():
 # can edit captions on photos they own; only admins can delete or reorder.
 
 def _record_uploader(photo_key, username):
-    data = _load_json(PHOTO_UPLOADERS_FILE)
-    data[photo_key] = username
-    _save_json(PHOTO_UPLOADERS_FILE, data)
+    photo_meta.set_value("uploaders", photo_key, username)
 
 
 def _record_uploaders(photo_keys, username):
-    if not photo_keys:
-        return
-    data = _load_json(PHOTO_UPLOADERS_FILE)
-    for k in photo_keys:
-        data[k] = username
-    _save_json(PHOTO_UPLOADERS_FILE, data)
-
-
-def _remove_uploader(photo_key):
-    data = _load_json(PHOTO_UPLOADERS_FILE)
-    if photo_key in data:
-        del data[photo_key]
-        _save_json(PHOTO_UPLOADERS_FILE, data)
-
-
-def _remove_uploaders_by_prefix(prefix):
-    data = _load_json(PHOTO_UPLOADERS_FILE)
-    pruned = {k: v for k, v in data.items() if not k.startswith(prefix)}
-    if len(pruned) != len(data):
-        _save_json(PHOTO_UPLOADERS_FILE, pruned)
-
-
-def _rename_uploader_key(old_key, new_key):
-    data = _load_json(PHOTO_UPLOADERS_FILE)
-    if old_key in data:
-        data[new_key] = data.pop(old_key)
-        _save_json(PHOTO_UPLOADERS_FILE, data)
+    photo_meta.set_many("uploaders", {k: username for k in photo_keys})
 
 
 # ── Photo favorites (poster heroes) ───────────────────────────────────────
 # Admin-only curation, keyed like captions. Read by the poster (its hero cells
 # deal from the marked set first) and by the Photos page's Favorites filter.
-# Every writer invalidates the photo pool, which carries the flag — otherwise a
-# star wouldn't show up until the pool's TTL expired.
+# Every writer invalidates the photo pool, which carries the flag — the
+# metadata file's new signature would catch it anyway, but not within one
+# mtime tick.
 
 def _set_favorite(photo_key, on):
     """Star/unstar one photo. Returns the resulting state."""
-    data = _load_json(PHOTO_FAVORITES_FILE)
-    if bool(data.get(photo_key)) != bool(on):
-        if on:
-            data[photo_key] = True
-        else:
-            data.pop(photo_key, None)
-        _save_json(PHOTO_FAVORITES_FILE, data)
+    if photo_meta.set_value("favorites", photo_key, True if on else None):
         _invalidate_photo_pool()
     return bool(on)
 
 
-def _remove_favorite(photo_key):
-    data = _load_json(PHOTO_FAVORITES_FILE)
-    if data.pop(photo_key, None) is not None:
-        _save_json(PHOTO_FAVORITES_FILE, data)
-        _invalidate_photo_pool()
-
-
-def _remove_favorites_by_prefix(prefix):
-    data = _load_json(PHOTO_FAVORITES_FILE)
-    pruned = {k: v for k, v in data.items() if not k.startswith(prefix)}
-    if len(pruned) != len(data):
-        _save_json(PHOTO_FAVORITES_FILE, pruned)
-        _invalidate_photo_pool()
-
-
-def _rename_favorite_key(old_key, new_key):
-    data = _load_json(PHOTO_FAVORITES_FILE)
-    if old_key in data:
-        data[new_key] = data.pop(old_key)
-        _save_json(PHOTO_FAVORITES_FILE, data)
-        _invalidate_photo_pool()
-
-
-# ── Photo people records (detect_people.py output) ────────────────────────
-# Written only by the offline scanner; the app just keeps the keys following
-# their photos through delete/move/reorder, mirroring favorites above. A
-# deleted photo's record is scrubbed (not kept inert like captions) because
-# rescanning a restored photo is cheap and automatic on the next run.
-
-def _remove_people_record(photo_key):
-    data = _load_json(PHOTO_PEOPLE_FILE)
-    if data.pop(photo_key, None) is not None:
-        _save_json(PHOTO_PEOPLE_FILE, data)
-        _invalidate_photo_pool()
-
-
-def _remove_people_by_prefix(prefix):
-    data = _load_json(PHOTO_PEOPLE_FILE)
-    pruned = {k: v for k, v in data.items() if not k.startswith(prefix)}
-    if len(pruned) != len(data):
-        _save_json(PHOTO_PEOPLE_FILE, pruned)
-        _invalidate_photo_pool()
-
-
-def _rename_people_key(old_key, new_key):
-    data = _load_json(PHOTO_PEOPLE_FILE)
-    if old_key in data:
-        data[new_key] = data.pop(old_key)
-        _save_json(PHOTO_PEOPLE_FILE, data)
-        _invalidate_photo_pool()
-
-
 # ── Automatic people scan on upload ───────────────────────────────────────
 # A photo only gets its `people` flag once detect_people.py has looked at it,
 # and until then it's invisible to the poster's hero deck and the People-only
@@ -1663,7 +1914,7 @@ def _can_edit_photo(photo_key):
         return True
     if not getattr(current_user, "can_upload", False):
         return False
-    return _load_json(PHOTO_UPLOADERS_FILE).get(photo_key) == current_user.username
+    return photo_meta.get("uploaders", photo_key) == current_user.username
 
 
 @app.errorhandler(404)
@@ -1921,6 +2172,124 @@ def _file_mtime_ns(path):
         return 0
 
 
+# ── Compressed page cache ─────────────────────────────────────────────────
+# The big pages — the trips map, the poster, the campground map — and the
+# manage page's /api/campgrounds/all are re-rendered (or re-serialized) and
+# re-gzipped by `_compress_response` on every hit, although they change only
+# when their data files, the code or the viewer's role do. `_cached_response`
+# keeps the finished, compressed bytes instead: gzip always, brotli too when
+# the `brotli` package is installed, each paid for once per entry rather than
+# per request, which is why they can afford higher levels than the hook's.
+#
+# A key is the endpoint, whatever the route says its output depends on (input
+# mtimes, the ETag it already computes...), the viewer's role and the query
+# string. Entries live in an LRU bounded by their compressed bytes; a client
+# that accepts no compression at all gets the gzip copy inflated on the way
+# out.
+_PAGE_CACHE_BUDGET = 64 * 1024 * 1024
+_PAGE_CACHE_GZIP_LEVEL = 9
+_PAGE_CACHE_BROTLI_QUALITY = 9
+_page_cache = OrderedDict()
+_page_cache_state = {"bytes": 0}
+_page_cache_lock = threading.Lock()
+
+
+def _viewer_role():
+    """What about the viewer can change a rendered page: the nav's role flags,
+    and — for a share guest only — who they are, since their page carries
+    their own magic link."""
+    if not current_user.is_authenticated:
+        return ("anon",)
+    name = getattr(current_user, "id", "") or ""
+    return (bool(current_user.is_admin),
+            bool(getattr(current_user, "can_upload", False)),
+            bool(getattr(current_user, "can_view_campgrounds", True)),
+            name if name.startswith(SHARE_ID_PREFIX) else "")
+
+
+# Data files every trips-side page renders from — the pages themselves and the
+# header's trip stats.
+_PAGE_DATA_INPUTS = (CAMPGROUNDS_JSON, FAMILY_JSON, HOME_FILE, TRIPS_JSON,
+                     TRIPS_DB)
+_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+
+def _page_inputs(template):
+    """Page-cache key part for a page rendered from `template`: the data
+    files', the templates' and the code's mtimes, and the tile config every
+    page embeds."""
+    paths = _PAGE_DATA_INPUTS + (
+        os.path.join(_TEMPLATE_DIR, template),
+        os.path.join(_TEMPLATE_DIR, "base.html"),
+        os.path.abspath(__file__),
+        os.path.join(os.path.dirname(__file__), "trips.py"))
+    return (tuple(_file_mtime_ns(p) for p in paths),
+            json.dumps(_tile_config(), sort_keys=True))
+
+
+def _page_cache_put(key, entry):
+    size = len(entry["gzip"]) + len(entry["br"] or b"")
+    # One entry that would crowd out most of the rest isn't worth keeping.
+    if size > _PAGE_CACHE_BUDGET // 4:
+        return
+    with _page_cache_lock:
+        old = _page_cache.pop(key, None)
+        if old is not None:
+            _page_cache_state["bytes"] -= old["size"]
+        entry["size"] = size
+        _page_cache[key] = entry
+        _page_cache_state["bytes"] += size
+        while _page_cache_state["bytes"] > _PAGE_CACHE_BUDGET:
+            _, evicted = _page_cache.popitem(last=False)
+            _page_cache_state["bytes"] -= evicted["size"]
+
+
+def _cached_response(depends_on, build):
+    """Serve this request from the page cache, calling `build()` (which
+    returns a response) only on a miss.
+
+    `depends_on` is a tuple of everything besides the endpoint, viewer role
+    and query string that the output varies with. Only a plain 200 is
+    stored; anything else from `build` (a redirect, an error) passes through
+    untouched. Headers `build` set — an ETag, say — are kept with the entry."""
+    key = (request.endpoint, depends_on, _viewer_role(),
+           tuple(sorted(request.args.items(multi=True))))
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is not None:
+            _page_cache.move_to_end(key)
+    if entry is None:
+        resp = app.make_response(build())
+        if (resp.status_code != 200 or resp.direct_passthrough
+                or 'Content-Encoding' in resp.headers):
+            return resp
+        body = resp.get_data()
+        entry = {
+            "mimetype": resp.mimetype,
+            "headers": [(k, v) for k, v in resp.headers.items()
+                        if k not in ('Content-Type', 'Content-Length',
+                                     'Set-Cookie')],
+            "gzip": gzip.compress(body, _PAGE_CACHE_GZIP_LEVEL),
+            "br": (brotli.compress(body, quality=_PAGE_CACHE_BROTLI_QUALITY)
+                   if brotli is not None else None),
+        }
+        _page_cache_put(key, entry)
+    accepts = request.headers.get('Accept-Encoding', '')
+    if entry["br"] is not None and 'br' in accepts:
+        encoding, body = 'br', entry["br"]
+    elif 'gzip' in accepts:
+        encoding, body = 'gzip', entry["gzip"]
+    else:
+        encoding, body = None, gzip.decompress(entry["gzip"])
+    resp = app.response_class(body, mimetype=entry["mimetype"])
+    for k, v in entry["headers"]:
+        resp.headers.add(k, v)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers.add('Vary', 'Accept-Encoding')
+    return resp
+
+
 # campgrounds.json is ~9.5 MB / 10k entries and used to be re-read + full-parsed
 # on every map/picker/stats request. These two caches skip the re-parse while the
 # file is unchanged, keyed on its mtime so any edit (API save, git pull, manual)
@@ -2024,7 +2393,7 @@ def _load_campgrounds():
     """
     key = (_file_mtime_ns(CAMPGROUNDS_JSON),
            _file_mtime_ns(HOME_FILE),
-           _file_mtime_ns(TRIPS_JSON))
+           _file_mtime_ns(trips_data_path()))
     if _campgrounds_derived_cache["key"] == key:
         return _campgrounds_derived_cache["rows"]
 
@@ -2071,6 +2440,34 @@ def _load_campgrounds():
     return rows
 
 
+_campground_index_cache = {"rows": None, "locations": None, "index": None}
+
+
+def _campground_index(rows=None):
+    """`(rows, index)`: `rows` (default `_load_campgrounds()`) and a
+    geoindex.GeoIndex over their locations, whose query positions index
+    `rows`.
+
+    Built for the rows object handed out, never looked up by a separately
+    read mtime, so a campgrounds.json rewrite mid-call can't pair an index
+    with the wrong rows. The derived rows also rebuild when home.json or the
+    trips change, but only their derived fields move — the entries and
+    their order come straight from campgrounds.json (family.json entries are
+    filtered out) — so a new rows object whose locations match the cached
+    ones reuses the index, and a trip edit doesn't cost a ~0.1 s rebuild."""
+    if rows is None:
+        rows = _load_campgrounds()
+    cache = _campground_index_cache
+    if cache["rows"] is not rows:
+        locations = [r.get("location") for r in rows]
+        if cache["locations"] != locations:
+            cache["index"] = geoindex.GeoIndex(
+                [_parse_latlng(loc) for loc in locations])
+            cache["locations"] = locations
+        cache["rows"] = rows
+    return rows, cache["index"]
+
+
 def _map_config():
     """Return home coords and family locations for map rendering.
 
@@ -2189,6 +2586,21 @@ def _map_marker_rows(rows):
     return [{k: r[k] for k in _MAP_MARKER_FIELDS if k in r} for r in rows]
 
 
+_campground_markers_cache = {"rows": None, "markers": None}
+
+
+def _campground_markers():
+    """`(rows, markers)`: `_load_campgrounds()` and its `_map_marker_rows`,
+    position for position. Projected once per rows build rather than per
+    request: the map tiles and /api/campgrounds/near each hand out hundreds of
+    these at a time, and re-projecting them cost more than the lookups."""
+    rows = _load_campgrounds()
+    if _campground_markers_cache["rows"] is not rows:
+        _campground_markers_cache.update(rows=rows,
+                                         markers=_map_marker_rows(rows))
+    return rows, _campground_markers_cache["markers"]
+
+
 def _parse_latlng(loc):
     """Parse a 'lat,lng' string into (lat, lng) floats, or None if invalid."""
     try:
@@ -2230,10 +2642,31 @@ def _finished_trip(trip):
         return True
 
 
+# Pages whose photos are shuffled per render keep this many shuffles apiece in
+# the page cache, so a repeat visit still usually opens on a different set.
+_SHUFFLED_PAGE_VARIANTS = 4
+
+
+def _shuffled_page_inputs(template):
+    """Page-cache key part for a page built around a shuffled photo pool: its
+    inputs, the pool's generation, and which of the cached shuffles to use."""
+    import random
+    _collect_photo_pool()
+    return (_page_inputs(template), _PHOTO_POOL_CACHE["generation"],
+            random.randrange(_SHUFFLED_PAGE_VARIANTS))
+
+
 @app.route('/')
 @app.route('/trips')
 @app.route('/trips/map')
 def trips_map():
+    # Today is in the key for the banner's "finished trip" test.
+    return _cached_response(
+        (_shuffled_page_inputs('trips_map.html'), date.today().isoformat()),
+        _render_trips_map)
+
+
+def _render_trips_map():
     trips = parse_trips()
     is_admin = current_user.is_authenticated and current_user.is_admin
     if not is_admin:
@@ -2301,8 +2734,8 @@ def _photo_gallery_index():
     page shows is decided only after filtering.
 
     Cached against the pool OBJECT it was built from, so it rebuilds exactly
-    when `_collect_photo_pool()` does — on that pool's 60 s TTL or on any
-    explicit invalidation — and inherits the same freshness contract as the
+    when `_collect_photo_pool()` does — whenever a photo directory, the
+    photo metadata or the trips change — and inherits the same freshness contract as the
     landing slideshow and the poster. That also covers a trip or campground
     rename, since those reach this page only through `parse_trips()`. Worth
     caching: it costs ~50 us per photo (238 ms for 5,000, measured), which is
@@ -2567,6 +3000,11 @@ def trips_poster():
     trip pointing to one of its stays or events. Callouts are placed by JS
     along the map perimeter after `fitBounds` settles so they never overlap.
     """
+    return _cached_response(_shuffled_page_inputs('trips_poster.html'),
+                            _render_trips_poster)
+
+
+def _render_trips_poster():
     trips = parse_trips()
     is_admin = current_user.is_authenticated and current_user.is_admin
     if not is_admin:
@@ -2646,11 +3084,10 @@ def trips_stats():
     Cached on the mtimes of its three inputs. The photo count is deliberately
     NOT part of that cache: photos are files on disk, and uploading one changes
     no JSON, so a cached count would go stale. It comes from
-    `_collect_photo_pool()` instead, which walks the same directories, has its
-    own short TTL, and is invalidated explicitly by the upload/delete/move
-    paths — so a fresh upload shows up on the next render.
+    `_collect_photo_pool()` instead, which notices a changed photo directory
+    by its mtime — so a fresh upload shows up on the next render.
     """
-    key = (_file_mtime_ns(TRIPS_JSON), _file_mtime_ns(CAMPGROUNDS_JSON),
+    key = (_file_mtime_ns(trips_data_path()), _file_mtime_ns(CAMPGROUNDS_JSON),
            _file_mtime_ns(HOME_FILE))
     if _stats_cache["key"] == key:
         return render_template('trips_stats.html',
@@ -2820,8 +3257,7 @@ def _stats_photo_count():
 
 @app.route('/trips/<int:trip_id>')
 def trip_detail(trip_id):
-    trips = parse_trips()
-    trip = next((t for t in trips if t["id"] == trip_id), None)
+    trip = get_trip(trip_id)
     if not trip:
         # abort(), not a bare text response: a stale link (a deleted trip, a
         # share guest following an old text message) is the most likely 404 in
@@ -2831,16 +3267,13 @@ def trip_detail(trip_id):
 
     enrich_trip_locations(trip)
 
-    captions = _load_json(CAPTIONS_FILE)
-
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-
-    # Per-photo uploader record so the template can show editable captions on
-    # an uploader-role user's own contributions while leaving others read-only.
-    photo_uploaders = _load_json(PHOTO_UPLOADERS_FILE)
-
-    # Poster-hero marks, so the lightbox's star opens in the right state.
-    favorites = _load_json(PHOTO_FAVORITES_FILE)
+    # Only this trip's metadata (a key-range read under photo_meta's SQLite
+    # engine). Uploader records let the template show editable captions on an
+    # uploader-role user's own contributions while leaving others read-only;
+    # favorites open the lightbox's star in the right state.
+    meta = photo_meta.load_all(prefix=f"{trip_id}/")
+    captions, photo_order = meta["captions"], meta["order"]
+    photo_uploaders, favorites = meta["uploaders"], meta["favorites"]
 
     stay_photos = {}
     for i, stay in enumerate(trip["stays"]):
@@ -2856,6 +3289,8 @@ def trip_detail(trip_id):
                 fnames += sorted(f for f in all_files if f not in ordered_set)
             else:
                 fnames = sorted(all_files)
+            # One exif-index query for the grid rather than one per photo.
+            _exif_prefetch([os.path.join(photo_dir, f) for f in fnames])
             for fname in fnames:
                 photo_key = f"{trip_id}/{i}/{fname}"
                 photos.append({
@@ -2885,6 +3320,7 @@ def trip_detail(trip_id):
                 fnames += sorted(f for f in all_files if f not in ordered_set)
             else:
                 fnames = sorted(all_files)
+            _exif_prefetch([os.path.join(photo_dir, f) for f in fnames])
             for fname in fnames:
                 photo_key = f"{trip_id}/events/{i}/{fname}"
                 photos.append({
@@ -2961,13 +3397,16 @@ def trip_detail(trip_id):
 
     # Find prev/next trips (non-admins skip home-only trips in navigation).
     # Summaries ride along so the chevrons' tooltips can say where they go.
+    # Walks the start-date ordering index and builds just the two neighbours
+    # for their summaries, rather than every trip in the library.
+    trips = trip_order()
     nav_trips = trips if is_admin else [t for t in trips if not t.get("home_only") or t["id"] == trip_id]
     nav_ids = [t["id"] for t in nav_trips]
     nav_idx = nav_ids.index(trip_id)
-    prev_trip = nav_trips[nav_idx - 1] if nav_idx > 0 else None
-    next_trip = nav_trips[nav_idx + 1] if nav_idx < len(nav_ids) - 1 else None
-    prev_trip_id = prev_trip["id"] if prev_trip else None
-    next_trip_id = next_trip["id"] if next_trip else None
+    prev_trip_id = nav_ids[nav_idx - 1] if nav_idx > 0 else None
+    next_trip_id = nav_ids[nav_idx + 1] if nav_idx < len(nav_ids) - 1 else None
+    prev_trip = get_trip(prev_trip_id) if prev_trip_id is not None else None
+    next_trip = get_trip(next_trip_id) if next_trip_id is not None else None
     prev_trip_summary = prev_trip["summary"] if prev_trip else ""
     next_trip_summary = next_trip["summary"] if next_trip else ""
 
@@ -3078,10 +3517,8 @@ def save_caption(trip_id, stay_idx):
     photo_key = f"{trip_id}/{stay_idx}/{filename}"
     if not _can_edit_photo(photo_key):
         return jsonify({"error": "You can only edit captions on photos you uploaded"}), 403
-    captions = _load_json(CAPTIONS_FILE)
-    captions[photo_key] = caption
-    _save_json(CAPTIONS_FILE, captions)
-    # The slideshow pool carries captions, so an edit must not wait out the TTL.
+    photo_meta.set_value("captions", photo_key, caption)
+    # The slideshow pool carries captions; don't leave the edit to mtimes alone.
     _invalidate_photo_pool()
 
     return jsonify({"ok": True})
@@ -3101,7 +3538,7 @@ def delete_photo(trip_id, stay_idx, filename):
     _invalidate_photo_pool()
     # Caption/order/uploader metadata is kept so Undo restores the photo
     # intact; _purge_old_trash scrubs it when the trash entry ages out.
-    _purge_old_trash(photo_dir, f"{trip_id}/{stay_idx}/", f"{trip_id}/{stay_idx}")
+    _purge_old_trash(photo_dir, f"{trip_id}/{stay_idx}")
     return jsonify({"ok": True})
 
 
@@ -3125,19 +3562,9 @@ def delete_all_stay_photos(trip_id, stay_idx):
         shutil.rmtree(photo_dir)
     _invalidate_photo_pool()
 
-    prefix = f"{trip_id}/{stay_idx}/"
-    captions = _load_json(CAPTIONS_FILE)
-    captions = {k: v for k, v in captions.items() if not k.startswith(prefix)}
-    _save_json(CAPTIONS_FILE, captions)
-
-    order_key = f"{trip_id}/{stay_idx}"
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-    photo_order.pop(order_key, None)
-    _save_json(PHOTO_ORDER_FILE, photo_order)
-
-    _remove_uploaders_by_prefix(prefix)
-    _remove_favorites_by_prefix(prefix)
-    _remove_people_by_prefix(prefix)
+    # Captions, order, uploader, favorite and people records for the whole
+    # grid (the pool was already invalidated above).
+    photo_meta.remove_grid(f"{trip_id}/{stay_idx}")
 
     return jsonify({"ok": True})
 
@@ -3150,9 +3577,7 @@ def reorder_stay_photos(trip_id, stay_idx):
     data = request.get_json()
     filenames = data.get("filenames", [])
     order_key = f"{trip_id}/{stay_idx}"
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-    photo_order[order_key] = filenames
-    _save_json(PHOTO_ORDER_FILE, photo_order)
+    photo_meta.set_order(order_key, filenames)
     return jsonify({"ok": True})
 
 
@@ -3216,10 +3641,8 @@ def save_event_caption(trip_id, event_idx):
     photo_key = f"{trip_id}/events/{event_idx}/{filename}"
     if not _can_edit_photo(photo_key):
         return jsonify({"error": "You can only edit captions on photos you uploaded"}), 403
-    captions = _load_json(CAPTIONS_FILE)
-    captions[photo_key] = caption
-    _save_json(CAPTIONS_FILE, captions)
-    # The slideshow pool carries captions, so an edit must not wait out the TTL.
+    photo_meta.set_value("captions", photo_key, caption)
+    # The slideshow pool carries captions; don't leave the edit to mtimes alone.
     _invalidate_photo_pool()
 
     return jsonify({"ok": True})
@@ -3238,7 +3661,7 @@ def delete_event_photo(trip_id, event_idx, filename):
     _remove_thumb(photo_path)
     _invalidate_photo_pool()
     # Metadata kept for Undo; scrubbed at purge time (see delete_photo).
-    _purge_old_trash(photo_dir, f"{trip_id}/events/{event_idx}/", f"{trip_id}/events/{event_idx}")
+    _purge_old_trash(photo_dir, f"{trip_id}/events/{event_idx}")
     return jsonify({"ok": True})
 
 
@@ -3262,19 +3685,9 @@ def delete_all_event_photos(trip_id, event_idx):
         shutil.rmtree(photo_dir)
     _invalidate_photo_pool()
 
-    prefix = f"{trip_id}/events/{event_idx}/"
-    captions = _load_json(CAPTIONS_FILE)
-    captions = {k: v for k, v in captions.items() if not k.startswith(prefix)}
-    _save_json(CAPTIONS_FILE, captions)
-
-    order_key = f"{trip_id}/events/{event_idx}"
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-    photo_order.pop(order_key, None)
-    _save_json(PHOTO_ORDER_FILE, photo_order)
-
-    _remove_uploaders_by_prefix(prefix)
-    _remove_favorites_by_prefix(prefix)
-    _remove_people_by_prefix(prefix)
+    # Captions, order, uploader, favorite and people records for the whole
+    # grid (the pool was already invalidated above).
+    photo_meta.remove_grid(f"{trip_id}/events/{event_idx}")
 
     return jsonify({"ok": True})
 
@@ -3287,9 +3700,7 @@ def reorder_event_photos(trip_id, event_idx):
     data = request.get_json()
     filenames = data.get("filenames", [])
     order_key = f"{trip_id}/events/{event_idx}"
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-    photo_order[order_key] = filenames
-    _save_json(PHOTO_ORDER_FILE, photo_order)
+    photo_meta.set_order(order_key, filenames)
     return jsonify({"ok": True})
 
 
@@ -3459,7 +3870,8 @@ OWNERSHIP_LABELS = {
 # exactly the bug `_revalidate_html` exists to prevent, and an ETag that ignored
 # code would reintroduce it.
 _MAP_ETAG_INPUTS = (
-    CAMPGROUNDS_JSON, FAMILY_JSON, HOME_FILE, TRIPS_JSON, ROADSIDE_JSON,
+    CAMPGROUNDS_JSON, FAMILY_JSON, HOME_FILE, TRIPS_JSON, TRIPS_DB,
+    ROADSIDE_JSON,
     os.path.join(os.path.dirname(__file__), "templates", "campground_map.html"),
     os.path.join(os.path.dirname(__file__), "templates", "base.html"),
     os.path.abspath(__file__),
@@ -3484,21 +3896,42 @@ def campgrounds_map():
     denied = _require_campground_view_page()
     if denied:
         return denied
-    home, family = _map_config()
     is_admin = current_user.is_authenticated and current_user.is_admin
     mode = request.args.get('color')
     if mode not in {m["key"] for m in COLOR_MODES}:
         mode = COLOR_MODES[0]["key"]
 
-    # `mode` and `is_admin` both change the rendered output, so both vary the tag.
-    etag = _map_etag(mode, is_admin)
+    focus_id = request.args.get('focus', type=int)
+
+    # `mode`, `is_admin` and `focus` all change the rendered output, so all
+    # vary the tag.
+    etag = _map_etag(mode, is_admin, focus_id)
     if request.if_none_match.contains(etag.strip('"')):
         return Response(status=304, headers={"ETag": etag})
+    # The tag covers every input but the tile config (and the viewer's role,
+    # which the page cache adds itself).
+    return _cached_response(
+        (etag, json.dumps(_tile_config(), sort_keys=True)),
+        lambda: _render_campgrounds_map(etag, mode, is_admin, focus_id))
+
 
+def _render_campgrounds_map(etag, mode, is_admin, focus_id):
+    home, family = _map_config()
+    # No marker rows in the page: the map fetches them by tile (see "Campground
+    # map tiles" below). It gets the legend's counts and the initial fit
+    # instead, plus the one row a ?focus= deep link opens on.
+    tiles = _campground_tiles()
+    focus = next((m for m in tiles["markers"] if m.get("id") == focus_id),
+                 None) if focus_id is not None else None
     resp = app.make_response(render_template(
         'campground_map.html',
         title='Map',
-        campgrounds=_map_marker_rows(_load_campgrounds()),
+        campground_facets=tiles["facets"],
+        campground_fit=tiles["fit"],
+        campground_fit_trimmed=tiles["fit_trimmed"],
+        focus_campground=focus,
+        tile_cluster_max_zoom=CAMPGROUND_TILE_CLUSTER_MAX_ZOOM,
+        tile_marker_zoom=CAMPGROUND_TILE_MARKER_ZOOM,
         roadside=_load_roadside(),
         color_modes=COLOR_MODES,
         default_mode=mode,
@@ -3533,6 +3966,271 @@ def api_campground_popup(cg_id):
     return resp
 
 
+# /api/campgrounds/near defaults and ceilings. Miles, like the Weather Finder's
+# radius. The limit cap keeps one request from turning into the whole-database
+# payload the map page already is.
+CAMPGROUNDS_NEAR_DEFAULT_MI = 25.0
+CAMPGROUNDS_NEAR_MAX_MI = 500.0
+CAMPGROUNDS_NEAR_DEFAULT_LIMIT = 50
+CAMPGROUNDS_NEAR_MAX_LIMIT = 500
+
+
+def _campgrounds_near(lat, lng, radius_mi, limit):
+    """Slim marker rows (`_MAP_MARKER_FIELDS`) for the `limit` campgrounds
+    nearest (lat, lng) within `radius_mi`, nearest first, each with its
+    `dist_mi`. Straight off `_campground_index()`, so it never measures the
+    campgrounds far from the point."""
+    # One rows snapshot for both, so the index's positions are the markers'.
+    rows, markers = _campground_markers()
+    _, index = _campground_index(rows)
+    pos, dist = index.nearest(lat, lng, limit, max_m=radius_mi * 1609.344)
+    return [dict(markers[i], dist_mi=round(d / 1609.344, 2))
+            for i, d in zip(pos.tolist(), dist.tolist())]
+
+
+@app.route('/api/campgrounds/near')
+def api_campgrounds_near():
+    """Campgrounds near a point: `?lat=&lng=[&radius=<miles>][&limit=]`.
+
+    The map ships every marker inline and filters in the browser, which is
+    fine for the map and useless for anything asking about one spot — a
+    detected stop, a pin. This answers from the in-process spatial index,
+    nearest first, in the map's slim marker shape (popup detail stays behind
+    /api/campgrounds/<id>/popup). `python -m tests.bench_campgrounds_near`
+    times it."""
+    denied = _require_campground_view_api()
+    if denied:
+        return denied
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90
+                                          and -180 <= lng <= 180):
+        return jsonify({"error": "lat and lng required"}), 400
+    radius = request.args.get('radius', CAMPGROUNDS_NEAR_DEFAULT_MI, type=float)
+    if radius is None or not radius > 0:
+        radius = CAMPGROUNDS_NEAR_DEFAULT_MI
+    radius = min(radius, CAMPGROUNDS_NEAR_MAX_MI)
+    limit = request.args.get('limit', CAMPGROUNDS_NEAR_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit or CAMPGROUNDS_NEAR_DEFAULT_LIMIT,
+                       CAMPGROUNDS_NEAR_MAX_LIMIT))
+    return jsonify(_campgrounds_near(lat, lng, radius, limit))
+
+
+# ── Campground map tiles ──────────────────────────────────────────────────
+# The map page used to inline every marker row — ~12.9k of them, ~1.9 MB even
+# gzipped — and couldn't draw a dot until the browser had downloaded and
+# parsed the lot. It now ships empty and fetches slippy-map tiles (the z/x/y
+# scheme its base layers use) for whatever is in view:
+#
+#   z <= CAMPGROUND_TILE_CLUSTER_MAX_ZOOM
+#       clusters off a maptiles.ClusterIndex — a supercluster-style hierarchy
+#       with one level per zoom, built once per rows build — counted under
+#       the legend's category and ownership choices so the numbers match what
+#       the map says it shows; a cluster down to one campground comes back as
+#       its marker row
+#   deeper
+#       the tile's marker rows, unfiltered — the legend filters those in the
+#       browser, as it always has, so a toggle costs no round trip
+#
+# The page asks for marker tiles at CAMPGROUND_TILE_MARKER_ZOOM however far in
+# it zooms: a zoom-8 tile holds a few hundred campgrounds at most, and one tile
+# per area caches better than a fresh set per zoom level.
+CAMPGROUND_TILE_CLUSTER_MAX_ZOOM = 7
+CAMPGROUND_TILE_MARKER_ZOOM = 8
+# Encoded tile bodies kept per data version. A browsing session touches a few
+# dozen; the cap only bounds something walking every tile.
+_CAMPGROUND_TILE_BODY_CAP = 4096
+# Cluster keep-masks (one bool per campground) kept per data version, by
+# filter. The legend makes a handful; the cap bounds a client inventing more.
+_CAMPGROUND_TILE_MASK_CAP = 64
+# Extreme fraction of campgrounds per axis the phone's first view leaves out.
+_CAMPGROUND_FIT_TRIM = 0.01
+_campground_tiles_cache = {"rows": None, "state": None}
+
+
+def _fit_bounds(lats, lngs, frac=0.0):
+    """[[south, west], [north, east]] over all but the extreme `frac` of
+    points on each axis (per-axis nearest-rank percentiles), or None."""
+    if not lats:
+        return None
+
+    def q(arr, p):
+        return arr[min(len(arr) - 1, max(0, round(p * (len(arr) - 1))))]
+    lats, lngs = sorted(lats), sorted(lngs)
+    return [[q(lats, frac), q(lngs, frac)], [q(lats, 1 - frac), q(lngs, 1 - frac)]]
+
+
+def _campground_tiles():
+    """Everything the tile endpoints serve from, rebuilt with the rows.
+
+    `index` is a maptiles.TileIndex over the campgrounds' locations and
+    `clusters` the maptiles.ClusterIndex for the zoomed-out levels; `cats` and
+    `owners` hold each row's legend category per color-mode field and its
+    ownership key, exactly as the map's `colorCat` / `ownerKey` read them, for
+    masking cluster counts. `facets` counts rows per (category, ownership)
+    for each mode — the legend's numbers, and the "Showing N of M" total for
+    any filter choice, without the rows. `masks` caches cluster keep-masks
+    by filter and `bodies` encoded tiles by ETag."""
+    rows, markers = _campground_markers()
+    if _campground_tiles_cache["rows"] is rows:
+        return _campground_tiles_cache["state"]
+    coords = [_parse_latlng(r.get("location")) for r in rows]
+    fields = [m["field"] for m in COLOR_MODES]
+    cats = {f: [r.get(f) or "not waterfront" for r in rows] for f in fields}
+    owners = [r.get("ownership") or "" for r in rows]
+    modes = {}
+    for f in fields:
+        joint = modes[f] = {}
+        for cat, own in zip(cats[f], owners):
+            by_owner = joint.setdefault(cat, {})
+            by_owner[own] = by_owner.get(own, 0) + 1
+    lats = [c[0] for c in coords if c]
+    lngs = [c[1] for c in coords if c]
+    state = {
+        "rows": rows,
+        "markers": markers,
+        "index": maptiles.TileIndex(coords),
+        "clusters": maptiles.ClusterIndex(coords,
+                                          CAMPGROUND_TILE_CLUSTER_MAX_ZOOM),
+        "cats": {f: np.array(v, dtype=object) for f, v in cats.items()},
+        "owners": np.array(owners, dtype=object),
+        "facets": {"total": len(rows), "modes": modes},
+        "fit": _fit_bounds(lats, lngs),
+        "fit_trimmed": _fit_bounds(lats, lngs, _CAMPGROUND_FIT_TRIM),
+        "masks": {},
+        "bodies": {},
+    }
+    _campground_tiles_cache["state"] = state
+    _campground_tiles_cache["rows"] = rows
+    return state
+
+
+def _campground_tile_filter(state):
+    """The cluster filter a tile request carries, normalized into a hashable
+    key: `(field, hidden categories, hidden ownerships)`.
+
+    `?mode=` is a COLOR_MODES key (default the first); `hide=` and
+    `hide_own=` repeat once per hidden legend row. An unspecified ownership is
+    the empty string, so `hide_own=` on its own hides exactly that row.
+    Values no legend row has are dropped: they hide nothing, and kept they'd
+    make a distinct key — and mask and ETag — out of any string sent."""
+    modes = {m["key"]: m["field"] for m in COLOR_MODES}
+    field = modes.get(request.args.get('mode'), COLOR_MODES[0]["field"])
+    joint = state["facets"]["modes"][field]
+    owners = {own for by_owner in joint.values() for own in by_owner}
+    return (field,
+            tuple(sorted(set(request.args.getlist('hide')) & joint.keys())),
+            tuple(sorted(set(request.args.getlist('hide_own')) & owners)))
+
+
+def _campground_tile_body(state, z, x, y, filt):
+    markers = state["markers"]
+    if z > CAMPGROUND_TILE_CLUSTER_MAX_ZOOM:
+        pos = state["index"].tile(z, x, y)
+        return {"markers": [markers[i] for i in pos.tolist()], "clusters": []}
+    field, hide, hide_own = filt
+    keep = None
+    if hide or hide_own:
+        keep = state["masks"].get(filt)
+        if keep is None:
+            if len(state["masks"]) >= _CAMPGROUND_TILE_MASK_CAP:
+                state["masks"].clear()
+            keep = state["masks"][filt] = (
+                ~np.isin(state["cats"][field], list(hide))
+                & ~np.isin(state["owners"], list(hide_own)))
+    singles, lat, lng, count, expand = state["clusters"].tile(z, x, y,
+                                                             keep=keep)
+    return {
+        "markers": [markers[i] for i in singles.tolist()],
+        "clusters": [[round(a, 5), round(b, 5), n, e] for a, b, n, e
+                     in zip(lat.tolist(), lng.tolist(), count.tolist(),
+                            expand.tolist())],
+    }
+
+
+@app.route('/api/campgrounds/tile/<int:z>/<int:x>/<int:y>')
+def api_campground_tile(z, x, y):
+    """Campground markers — or, zoomed out, clustered counts — in one slippy
+    map tile: `{"markers": [...], "clusters": [[lat, lng, count, zoom], ...]}`,
+    `zoom` being where the cluster splits up.
+
+    Marker rows are the map's slim shape (popup detail stays behind
+    /api/campgrounds/<id>/popup). Cluster tiles take the legend's filter as
+    `?mode=&hide=&hide_own=` (see `_campground_tile_filter`); marker tiles
+    ignore it. ETag'd on the map's inputs, so a revisit or a pan back over
+    old ground revalidates to a 304."""
+    denied = _require_campground_view_api()
+    if denied:
+        return denied
+    if not (0 <= z <= maptiles.MAX_ZOOM and 0 <= x < 1 << z and 0 <= y < 1 << z):
+        return jsonify({"error": "No such tile"}), 404
+    state = _campground_tiles()
+    filt = (_campground_tile_filter(state)
+            if z <= CAMPGROUND_TILE_CLUSTER_MAX_ZOOM else ())
+    etag = _map_etag("tile", z, x, y, *filt)
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers={"ETag": etag})
+    body = state["bodies"].get(etag)
+    if body is None:
+        if len(state["bodies"]) >= _CAMPGROUND_TILE_BODY_CAP:
+            state["bodies"].clear()
+        body = state["bodies"][etag] = json.dumps(
+            _campground_tile_body(state, z, x, y, filt),
+            separators=(",", ":")).encode("utf-8")
+    resp = app.response_class(body, mimetype="application/json")
+    resp.headers["ETag"] = etag
+    return resp
+
+
+@app.route('/api/campgrounds/markers')
+def api_campground_markers():
+    """Every campground's slim marker row, in database order.
+
+    The tiled map never needs this to draw; its name search and the route
+    tool's "campgrounds near route" list do, since both look across the whole
+    database. The page fetches them once, the first time either is used —
+    in the packed form below; this JSON one stays for scripts."""
+    denied = _require_campground_view_api()
+    if denied:
+        return denied
+    etag = _map_etag("markers")
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers={"ETag": etag})
+    state = _campground_tiles()
+    body = state["bodies"].get(etag)
+    if body is None:
+        body = state["bodies"][etag] = json.dumps(
+            state["markers"], separators=(",", ":")).encode("utf-8")
+    resp = app.response_class(body, mimetype="application/json")
+    resp.headers["ETag"] = etag
+    return resp
+
+
+@app.route('/api/campgrounds/markers/packed')
+def api_campground_markers_packed():
+    """/api/campgrounds/markers's rows in markerpack's columnar binary form —
+    what the map page actually fetches.
+
+    The JSON list repeats every key and enum string ~12.9k times and the
+    browser has to parse all of it; packed, the same rows are a fraction of
+    the bytes and decode as typed-array views plus one small JSON header.
+    Encoded once per data version, like the tiles."""
+    denied = _require_campground_view_api()
+    if denied:
+        return denied
+    etag = _map_etag("markers", "packed")
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers={"ETag": etag})
+    state = _campground_tiles()
+    body = state["bodies"].get(etag)
+    if body is None:
+        body = state["bodies"][etag] = markerpack.pack(
+            state["markers"], _MAP_MARKER_FIELDS, coords="location")
+    resp = app.response_class(body, mimetype=markerpack.MIMETYPE)
+    resp.headers["ETag"] = etag
+    return resp
+
+
 # Legacy split-map URLs now redirect to the combined map with the matching mode.
 # Both gate first: redirecting a Trips-only user to /campgrounds/map only to have
 # that page bounce them again is a pointless double hop.
@@ -3752,8 +4450,9 @@ def api_weather_finder_search():
                          if data.get("dry_only") and data.get("use_precip_chance") else None)
 
     try:
+        rows, index = _campground_index()
         result = weather_finder.find_matching_days(
-            _load_campgrounds(), (float(origin_lat), float(origin_lng)),
+            rows, (float(origin_lat), float(origin_lng)), index=index,
             mode=mode, min_high=min_high, max_high=max_high, delta_f=delta_f,
             max_miles=max_miles, weekends_only=bool(data.get("weekends_only", True)),
             start_date=start_date, end_date=end_date,
@@ -3868,11 +4567,6 @@ def move_photo(trip_id):
             return f"{trip_id}/events/{idx}"
         return f"{trip_id}/{idx}"
 
-    def caption_key(ptype, idx, fname):
-        if ptype == "event":
-            return f"{trip_id}/events/{idx}/{fname}"
-        return f"{trip_id}/{idx}/{fname}"
-
     src_dir = photo_dir(src_type, src_idx)
     dst_dir = photo_dir(dst_type, dst_idx)
     src_path = os.path.join(src_dir, secure_filename(filename))
@@ -3891,36 +4585,14 @@ def move_photo(trip_id):
         dst_path = os.path.join(dst_dir, dst_filename)
 
     os.rename(src_path, dst_path)
-    _remove_thumb(src_path)  # dest thumb regenerates lazily on next view
+    _remove_thumb(src_path)
     _invalidate_photo_pool()
+    _queue_derivatives([dst_path])
 
-    # Update captions
-    captions = _load_json(CAPTIONS_FILE)
-    old_cap_key = caption_key(src_type, src_idx, filename)
-    new_cap_key = caption_key(dst_type, dst_idx, dst_filename)
-    cap = captions.pop(old_cap_key, None)
-    if cap:
-        captions[new_cap_key] = cap
-    _save_json(CAPTIONS_FILE, captions)
-
-    # Update uploader + favorite + people records (same key shape as captions).
-    _rename_uploader_key(old_cap_key, new_cap_key)
-    _rename_favorite_key(old_cap_key, new_cap_key)
-    _rename_people_key(old_cap_key, new_cap_key)
-
-    # Update photo order — remove from source
-    photo_order = _load_json(PHOTO_ORDER_FILE)
-    src_ok = order_key(src_type, src_idx)
-    if src_ok in photo_order:
-        photo_order[src_ok] = [f for f in photo_order[src_ok] if f != filename]
-
-    # Add to destination order
-    dst_ok = order_key(dst_type, dst_idx)
-    if dst_ok not in photo_order:
-        photo_order[dst_ok] = []
-    photo_order[dst_ok].append(dst_filename)
-
-    _save_json(PHOTO_ORDER_FILE, photo_order)
+    # Caption, uploader, favorite and people records follow the photo; it
+    # leaves the source grid's order and joins the end of the destination's.
+    photo_meta.move_photo(order_key(src_type, src_idx), filename,
+                          order_key(dst_type, dst_idx), dst_filename)
 
     return jsonify({"ok": True, "filename": dst_filename})
 
@@ -3976,6 +4648,20 @@ def access_log_page():
                            retention_days=ACCESS_LOG_RETENTION_DAYS)
 
 
+@app.route('/api/derivative-queue')
+def api_derivative_queue():
+    """Upload-time render backlog for this worker process: photos waiting for
+    the pool and photos it's rendering now. Per process, since each WSGI
+    worker runs its own queue — poll a few times to see them all drain."""
+    denied = _require_admin()
+    if denied:
+        return denied
+    pending, in_flight = _derivative_queue_depth()
+    return jsonify({"pending": pending, "in_flight": in_flight,
+                    "workers": DERIVATIVE_WORKERS,
+                    "enabled": DERIVATIVE_QUEUE_ENABLED})
+
+
 @app.route('/api/access-log')
 def api_access_log():
     """Recent entries plus a per-visitor summary. Pruning runs here rather than
@@ -4045,16 +4731,15 @@ def api_user_create():
         return jsonify({"error": "Username cannot start with 'share:'"}), 400
     if not password:
         return jsonify({"error": "Password required"}), 400
-    data = _load_json(USERS_FILE)
-    if username in data:
-        return jsonify({"error": "User already exists"}), 400
-    data[username] = {
-        "password_hash": generate_password_hash(password),
-        "is_admin": is_admin,
-        "can_upload": can_upload,
-        "can_view_campgrounds": can_view_campgrounds,
-    }
-    _save_json(USERS_FILE, data)
+    with _update_json(USERS_FILE) as data:
+        if username in data:
+            return jsonify({"error": "User already exists"}), 400
+        data[username] = {
+            "password_hash": generate_password_hash(password),
+            "is_admin": is_admin,
+            "can_upload": can_upload,
+            "can_view_campgrounds": can_view_campgrounds,
+        }
     return jsonify({"ok": True})
 
 
@@ -4063,25 +4748,23 @@ def api_user_update(username):
     denied = _require_admin()
     if denied:
         return denied
-    data = _load_json(USERS_FILE)
-    if username not in data:
-        return jsonify({"error": "User not found"}), 404
     body = request.get_json() or {}
-    if 'password' in body:
-        password = body.get('password') or ''
-        if not password:
-            return jsonify({"error": "Password cannot be empty"}), 400
-        data[username]['password_hash'] = generate_password_hash(password)
-    if 'is_admin' in body:
-        new_admin = bool(body.get('is_admin'))
-        if username == current_user.username and not new_admin:
-            return jsonify({"error": "Cannot remove admin from your own account"}), 400
-        data[username]['is_admin'] = new_admin
-    if 'can_upload' in body:
-        data[username]['can_upload'] = bool(body.get('can_upload'))
-    if 'can_view_campgrounds' in body:
-        data[username]['can_view_campgrounds'] = bool(body.get('can_view_campgrounds'))
-    _save_json(USERS_FILE, data)
+    if 'password' in body and not body.get('password'):
+        return jsonify({"error": "Password cannot be empty"}), 400
+    if ('is_admin' in body and username == current_user.username
+            and not bool(body.get('is_admin'))):
+        return jsonify({"error": "Cannot remove admin from your own account"}), 400
+    with _update_json(USERS_FILE) as data:
+        if username not in data:
+            return jsonify({"error": "User not found"}), 404
+        if 'password' in body:
+            data[username]['password_hash'] = generate_password_hash(body['password'])
+        if 'is_admin' in body:
+            data[username]['is_admin'] = bool(body.get('is_admin'))
+        if 'can_upload' in body:
+            data[username]['can_upload'] = bool(body.get('can_upload'))
+        if 'can_view_campgrounds' in body:
+            data[username]['can_view_campgrounds'] = bool(body.get('can_view_campgrounds'))
     return jsonify({"ok": True})
 
 
@@ -4092,11 +4775,9 @@ def api_user_delete(username):
         return denied
     if username == current_user.username:
         return jsonify({"error": "Cannot delete your own account"}), 400
-    data = _load_json(USERS_FILE)
-    if username not in data:
-        return jsonify({"error": "User not found"}), 404
-    del data[username]
-    _save_json(USERS_FILE, data)
+    with _update_json(USERS_FILE) as data:
+        if data.pop(username, None) is None:
+            return jsonify({"error": "User not found"}), 404
     return jsonify({"ok": True})
 
 
@@ -4126,10 +4807,9 @@ def api_share_link_create():
     nxt = _safe_next(body.get('next'), default="/")
     trips_only = bool(body.get('trips_only'))
     token = secrets.token_urlsafe(24)
-    links = _load_json(SHARE_TOKENS_FILE)
-    links[token] = {"label": label, "next": nxt, "trips_only": trips_only,
-                    "created": datetime.now().isoformat(timespec='seconds')}
-    _save_json(SHARE_TOKENS_FILE, links)
+    with _update_json(SHARE_TOKENS_FILE) as links:
+        links[token] = {"label": label, "next": nxt, "trips_only": trips_only,
+                        "created": datetime.now().isoformat(timespec='seconds')}
     return jsonify({"ok": True, "token": token, "label": label, "next": nxt,
                     "trips_only": trips_only})
 
@@ -4142,14 +4822,14 @@ def api_share_link_update(token):
     denied = _require_admin()
     if denied:
         return denied
-    links = _load_json(SHARE_TOKENS_FILE)
-    if token not in links:
-        return jsonify({"error": "Share link not found"}), 404
     body = request.get_json() or {}
-    if 'trips_only' in body:
-        links[token]['trips_only'] = bool(body.get('trips_only'))
-    _save_json(SHARE_TOKENS_FILE, links)
-    return jsonify({"ok": True, "trips_only": links[token].get("trips_only", False)})
+    with _update_json(SHARE_TOKENS_FILE) as links:
+        if token not in links:
+            return jsonify({"error": "Share link not found"}), 404
+        if 'trips_only' in body:
+            links[token]['trips_only'] = bool(body.get('trips_only'))
+        trips_only = links[token].get("trips_only", False)
+    return jsonify({"ok": True, "trips_only": trips_only})
 
 
 @app.route('/api/share-links/<token>', methods=['DELETE'])
@@ -4159,10 +4839,8 @@ def api_share_link_delete(token):
     denied = _require_admin()
     if denied:
         return denied
-    links = _load_json(SHARE_TOKENS_FILE)
-    if token in links:
-        del links[token]
-        _save_json(SHARE_TOKENS_FILE, links)
+    with _update_json(SHARE_TOKENS_FILE) as links:
+        links.pop(token, None)
     return jsonify({"ok": True})
 
 
@@ -4211,14 +4889,20 @@ def api_campground_all():
     denied = _require_admin()
     if denied:
         return denied
+    # Serialized and gzipped once per edit of either file: the page cache
+    # holds the compressed body (see "Compressed page cache").
+    return _cached_response(
+        (_file_mtime_ns(CAMPGROUNDS_JSON), _file_mtime_ns(FAMILY_JSON)),
+        _campground_all_body)
+
+
+def _campground_all_body():
     with open(CAMPGROUNDS_JSON) as f:
         entries = json.load(f)
     entries += _read_family_raw()
     for e in entries:
         for field in _AUDIT_EVIDENCE_FIELDS:
             e.pop(field, None)
-    # The gzip itself is handled by the _compress_response after_request hook,
-    # which covers every large text response rather than just this one.
     return app.response_class(json.dumps(entries).encode("utf-8"),
                               mimetype="application/json")
 
@@ -4835,75 +5519,142 @@ TRACK_CACHE_DIR = os.path.join(TRIP_DATA_DIR, "track_cache")
 os.makedirs(TRACK_CACHE_DIR, exist_ok=True)
 
 
-# --- Track cache I/O (gzip-at-rest) ---------------------------------------
-# Track caches are stored gzipped as `<id>.json.gz`. These 4-field pings
-# (lat/lon/tst/tid) compress ~6x, and a busy dual-tid trip's raw cache can
-# top 2 MB. The `.json.gz` extension keeps restore.sh's `*.json` parse-check
-# from choking on gzip bytes (its `\.json$` filter excludes `.json.gz`), and
-# backup.sh bundles the whole dir content-agnostically. A legacy plain
-# `<id>.json` (pre-gzip) is still read transparently and rewritten as
-# `.json.gz` on the next persist, so the migration is automatic. Read is
-# gzip-magic sniffed so it doesn't matter which extension a file landed under.
+# --- Track cache I/O (columnar, gzip JSON fallback) -----------------------
+# A trip's pings are cached as `<id>.track`: packed lat/lon/tst/tid/tz columns
+# that track_store memory-maps into NumPy arrays (see its docstring for the
+# layout). Reading one is a header parse plus a page-cache-shared mapping
+# rather than a gunzip and a json.loads of up to ~100k dicts. It's about twice
+# the size of the gzipped JSON on disk (26 uncompressed bytes a ping) — the
+# price of being mappable, and still well under 1 MB per 30k pings.
+#
+# The older formats are still read transparently. `<id>.json.gz` is the
+# gzip-at-rest JSON (these 4-field pings compress ~6x; the `.json.gz` extension
+# keeps restore.sh's `*.json` parse-check from choking on gzip bytes), and a
+# plain `<id>.json` predates that; either is gzip-magic sniffed, so a file's
+# actual encoding — not its extension — decides how it's read. Reading one
+# converts it to `.track` on the spot, so the migration is automatic. A trip
+# whose pings don't fit the columnar schema (track_store.write refuses it),
+# or a host without NumPy, keeps writing `.json.gz`. backup.sh bundles the
+# whole dir content-agnostically, so it carries whichever format is there.
 def _track_cache_paths(trip_id):
-    """Return (gz_path, legacy_plain_path) for a trip's track cache."""
-    return (os.path.join(TRACK_CACHE_DIR, f"{trip_id}.json.gz"),
+    """Return (columnar_path, gz_path, legacy_plain_path) for a trip's track
+    cache — at most one of which exists."""
+    return (os.path.join(TRACK_CACHE_DIR, f"{trip_id}.track"),
+            os.path.join(TRACK_CACHE_DIR, f"{trip_id}.json.gz"),
             os.path.join(TRACK_CACHE_DIR, f"{trip_id}.json"))
 
 
 def _track_cache_exists(trip_id):
-    gz, plain = _track_cache_paths(trip_id)
-    return os.path.isfile(gz) or os.path.isfile(plain)
+    return any(os.path.isfile(p) for p in _track_cache_paths(trip_id))
 
 
-def _read_track_cache(trip_id):
-    """Return the cached track points list, or None if no cache exists or
-    it can't be parsed. Prefers the gzipped `.json.gz`, falls back to a
-    legacy plain `.json`; either way the bytes are gzip-magic sniffed so a
-    file's actual encoding — not its extension — decides how it's read."""
-    gz, plain = _track_cache_paths(trip_id)
+def _read_json_track_cache(gz, plain):
+    """(path, points) from whichever JSON cache exists, or (None, None)."""
     path = gz if os.path.isfile(gz) else (plain if os.path.isfile(plain) else None)
     if path is None:
-        return None
+        return None, None
     try:
         with open(path, "rb") as f:
             raw = f.read()
         if raw[:2] == b"\x1f\x8b":
             raw = gzip.decompress(raw)
-        return json.loads(raw)
+        return path, json.loads(raw)
     except Exception:
-        return None
+        return None, None
 
 
-def _write_track_cache(trip_id, points):
-    """Persist track points gzipped to `<id>.json.gz`, removing any legacy
-    plain `<id>.json` so each trip has exactly one cache file."""
-    gz, plain = _track_cache_paths(trip_id)
-    with open(gz, "wb") as f:
-        f.write(gzip.compress(json.dumps(points).encode("utf-8")))
-    if os.path.isfile(plain):
-        try:
-            os.remove(plain)
-        except OSError:
-            pass
+def _migrate_json_track_cache(trip_id, path, points):
+    """Rewrite a JSON track cache just read from `path` as `.track`, unless
+    something newer got there first. Best-effort: the read has already
+    succeeded, and a failed conversion is simply retried on the next one."""
+    col = _track_cache_paths(trip_id)[0]
+    try:
+        st = os.stat(path)
+        with json_store.lock(col):
+            # A worker that fetched fresh pings meanwhile has written them
+            # (and removed `path`); the pings read here are the older ones.
+            if os.path.exists(col) or os.stat(path) != st:
+                return
+            if track_store.write(col, points):
+                os.remove(path)
+    except OSError:
+        pass
+
+
+def _read_track_columns(trip_id):
+    """The trip's pings as a memory-mapped `track_store.Track`, or None if
+    there's no cache (or it can't be parsed, or NumPy is missing). A JSON
+    cache is converted first, so this is the one read path for code that
+    wants the columns rather than dicts."""
+    col, gz, plain = _track_cache_paths(trip_id)
+    track = track_store.load(col)
+    if track is None and track_store.available():
+        path, points = _read_json_track_cache(gz, plain)
+        if points is not None:
+            _migrate_json_track_cache(trip_id, path, points)
+            track = track_store.load(col)
+    return track
+
+
+def _read_track_cache(trip_id):
+    """Return the cached track points list, or None if no cache exists or
+    it can't be parsed. Callers get fresh dicts they're free to mutate,
+    whichever format the cache is in."""
+    col, gz, plain = _track_cache_paths(trip_id)
+    track = track_store.load(col)
+    if track is not None:
+        return track.to_points()
+    path, points = _read_json_track_cache(gz, plain)
+    if points is not None and track_store.available():
+        _migrate_json_track_cache(trip_id, path, points)
+    return points
+
+
+def _write_track_cache(trip_id, points, sync=None):
+    """Persist track points as `<id>.track` (or `<id>.json.gz` when they
+    don't fit it), removing the other formats so each trip has exactly one
+    cache file. `sync` is the timeline sync state to keep in the `.track`
+    header (see `_sync_trip_points`); None carries over the file's own, for
+    the rewrites that only migrate or tz-stamp the same pings."""
+    col, gz, plain = _track_cache_paths(trip_id)
+    with json_store.lock(col):
+        if sync is None:
+            old = track_store.load(col)
+            sync = old.meta if old is not None else None
+        if track_store.write(col, points, meta=sync):
+            stale = (gz, plain)
+        else:
+            json_store.write_bytes(
+                gz, gzip.compress(json.dumps(points).encode("utf-8")))
+            stale = (col, plain)
+        for path in stale:
+            if os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
 
 
 def _delete_track_cache(trip_id):
-    """Remove both the gzipped and any legacy plain cache file for a trip."""
+    """Remove every format of cache file for a trip, and the responses
+    built from it."""
     for path in _track_cache_paths(trip_id):
         if os.path.isfile(path):
             try:
                 os.remove(path)
             except OSError:
                 pass
+    _delete_track_responses(trip_id)
 
 
 def _sweep_legacy_track_caches():
     """One-time, idempotent migration of any pre-gzip plain `<id>.json`
-    track caches to `<id>.json.gz`. Runs once at import so every host
+    track caches to the current format. Runs once at import so every host
     self-heals — notably PythonAnywhere, whose gitignored cache dir doesn't
     ride along with a `git pull`, and long-settled trips there that only
     ever serve from cache would otherwise never trigger a rewrite. Reads
-    each legacy file through `_read_track_cache` and rewrites it via
+    each legacy file through `_read_track_cache`, which converts it to
+    `.track` where it can; anything left is rewritten via
     `_write_track_cache` (which writes the `.gz` and removes the plain).
 
     Best-effort: any failure is swallowed so a bad cache file can never
@@ -4924,12 +5675,13 @@ def _sweep_legacy_track_caches():
             pts = _read_track_cache(int(stem))
             if pts is None:
                 continue
-            _write_track_cache(int(stem), pts)
+            if os.path.isfile(path):
+                _write_track_cache(int(stem), pts)
             converted += 1
         except Exception:
             continue
     if converted:
-        print(f"[track_cache] migrated {converted} legacy plain cache(s) to gzip")
+        print(f"[track_cache] migrated {converted} legacy plain cache(s)")
 
 
 _sweep_legacy_track_caches()
@@ -4945,7 +5697,10 @@ TRACK_NEAR_STAY_KM = 5
 # library carries ~50 MB of polygon data; first import is slow, but the
 # instance is reused. Optional dependency: if `timezonefinder` is missing
 # (or fails to import on a constrained host), we silently skip enrichment
-# and the frontend falls back to the browser's timezone.
+# and the frontend falls back to the browser's timezone. Most lookups never
+# get here: `_tz_at` and `_enrich_with_timezone` try the prebuilt raster
+# (TZ_RASTER_FILE, below) first, so a worker only loads the library for a
+# point near a zone line or outside the regions the raster covers.
 _tz_finder = None
 def _tz_for_coord(lat, lng):
     """Return an IANA timezone name for the given coords, or None if the
@@ -4967,18 +5722,136 @@ def _tz_for_coord(lat, lng):
         return None
 
 
+# The zone raster (tzraster.py): the cell grid below, sampled offline over
+# every region a trip has touched and memory-mapped read-only, so all the
+# workers share one copy of it in the page cache and none of them loads
+# TimezoneFinder for a point it answers. Built — and rebuilt after a trip to
+# somewhere new; until then pings there just fall through to the library —
+# with `python ekko_trips_app.py build-tz-raster`. Re-mapped when the file
+# changes, so a rebuild needs no restart. A raster sampled from another
+# timezonefinder version than the installed one is ignored, as tzcells
+# ignores such cells: after an upgrade with new polygons every lookup goes
+# to the library until the raster is rebuilt. With no library installed
+# there's nothing to compare against, and the raster is trusted.
+TZ_RASTER_FILE = os.path.join(TRIP_DATA_DIR, "tz_raster.bin")
+_tz_raster_cache = {"mtime": None, "raster": None}
+_tz_raster_lock = threading.Lock()
+
+
+def _tz_raster():
+    """The mapped TZ_RASTER_FILE, or None if there isn't one or it was
+    sampled from another timezonefinder version than the installed one."""
+    mtime = _file_mtime_ns(TZ_RASTER_FILE)
+    with _tz_raster_lock:
+        if _tz_raster_cache["mtime"] != mtime:
+            raster = tzraster.load(TZ_RASTER_FILE) if mtime else None
+            installed = _tz_finder_version()
+            # No library ("unknown"): nothing to compare against, and the
+            # raster is then the only source of zones at all.
+            if (raster is not None and installed != "unknown"
+                    and raster.version != installed):
+                app.logger.warning(
+                    "ignoring %s: sampled from timezonefinder %s, %s installed;"
+                    " rebuild it with build-tz-raster", TZ_RASTER_FILE,
+                    raster.version, installed)
+                raster = None
+            _tz_raster_cache["raster"] = raster
+            _tz_raster_cache["mtime"] = mtime
+        return _tz_raster_cache["raster"]
+
+
+def _tz_at(lat, lng):
+    """`_tz_for_coord`, answered from the raster when it can."""
+    raster = _tz_raster()
+    tz = raster.tz(lat, lng) if raster is not None else None
+    return tz if tz is not None else _tz_for_coord(lat, lng)
+
+
+def _tz_raster_coords():
+    """(lat, lng) of everywhere the raster should cover: home, every trip's
+    stays and events, and every cached track's pings (one per 1° tile)."""
+    home, _ = _map_config()
+    coords = [tuple(home)] if home else []
+    for trip in parse_trips():
+        enrich_trip_locations(trip)
+        coords += _anchors_for_trip(trip)
+        track = _read_track_columns(trip["id"])
+        if track is not None and track.n:
+            tiles = np.unique(np.stack([np.floor(track.lat),
+                                        np.floor(track.lon)], axis=1), axis=0)
+            coords += [(float(a) + 0.5, float(b) + 0.5) for a, b in tiles]
+    return coords
+
+
+# Per-ping stamping goes through a grid of coarse cells (tzcells.py): a
+# cell the finder says lies wholly in one zone answers its pings from a
+# dict, and only cells a border runs through still ask `_tz_for_coord` per
+# ping. Sampled cells are saved here, keyed by the timezonefinder version,
+# so a restart (or another worker) doesn't sample them again.
+TZ_CELLS_FILE = os.path.join(TRIP_DATA_DIR, "tz_cells.json")
+_tz_cells = {"resolver": None, "version": None}
+_tz_cells_lock = threading.Lock()
+
+
+def _tz_finder_version():
+    """The installed timezonefinder's version: which polygon data a cell or
+    raster was sampled from."""
+    try:
+        from importlib.metadata import version
+        return version("timezonefinder")
+    except Exception:
+        return "unknown"
+
+
+def _tz_cell_resolver():
+    """The process's tzcells.CellResolver, loaded from TZ_CELLS_FILE on
+    first use; None when timezonefinder is unavailable (so no cell is ever
+    sampled from a finder that can't answer)."""
+    with _tz_cells_lock:
+        if _tz_cells["resolver"] is None:
+            _tz_for_coord(None, None)  # loads the finder
+            if not _tz_finder:
+                return None
+            ver = _tz_finder_version()
+            _tz_cells["version"] = ver
+            _tz_cells["resolver"] = tzcells.CellResolver(
+                _tz_for_coord, tzcells.load(TZ_CELLS_FILE, ver))
+        return _tz_cells["resolver"]
+
+
 def _enrich_with_timezone(points):
     """Add an IANA `tz` field to each ping that lacks one. Returns True if
     any ping was updated (so callers can re-write the cache file)."""
+    todo = [p for p in points if not p.get("tz")]
     changed = False
-    for p in points:
-        if p.get("tz"):
-            continue
-        tz = _tz_for_coord(p.get("lat"), p.get("lon"))
-        if tz is None and _tz_finder is False:
-            return False  # library unavailable; nothing to stamp
+    raster = _tz_raster() if todo else None
+    if raster is not None:
+        ids = raster.zone_ids([p.get("lat") for p in todo],
+                              [p.get("lon") for p in todo])
+        rest = []
+        for p, k in zip(todo, ids.tolist()):
+            if k >= 0:
+                p["tz"] = raster.zones[k]
+            else:
+                rest.append(p)
+        changed = len(rest) < len(todo)
+        todo = rest
+    resolver = None
+    for p in todo:
+        if resolver is None:
+            resolver = _tz_cell_resolver()
+            if resolver is None:
+                return changed  # library unavailable; stamp no more
+        tz = resolver.tz(p.get("lat"), p.get("lon"))
         p["tz"] = tz or "UTC"
         changed = True
+    if resolver is not None:
+        new_cells = resolver.take_new()
+        if new_cells:
+            try:
+                tzcells.save(TZ_CELLS_FILE, _tz_cells["version"], new_cells)
+            except (OSError, ValueError):
+                pass  # they'll be resampled after a restart; no harm
     return changed
 
 
@@ -5023,41 +5896,144 @@ def _relocation_lookup(items):
     return lookup
 
 
-def _fetch_timeline_points(tid, token, from_ts, to_ts):
-    """Page through the timeline API for a single tid across a UTC range."""
-    import urllib.request
-    from urllib.parse import urlencode
-    points = []
-    cursor = from_ts
-    for _ in range(20):  # hard ceiling to avoid runaway loops
-        qs = urlencode({"tid": tid, "from": cursor, "to": to_ts, "limit": 10000})
-        url = f"https://timeline-shadetreesoftware.pythonanywhere.com/api/v1/locations?{qs}"
-        req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            page = json.loads(resp.read())
-        if not page:
-            break
-        points.extend(page)
-        if len(page) < 10000:
-            break
-        cursor = page[-1]["tst"] + 1
+TIMELINE_API_URL = ("https://timeline-shadetreesoftware.pythonanywhere.com"
+                    "/api/v1/locations")
+# One TimelineClient (keep-alive pool + fetch threads) per bearer token, for
+# the life of the worker; see timeline_client.py.
+_timeline_clients = {}
+_timeline_clients_lock = threading.Lock()
+
+
+def _timeline_client(token):
+    with _timeline_clients_lock:
+        client = _timeline_clients.get(token)
+        if client is None:
+            client = _timeline_clients[token] = timeline_client.TimelineClient(
+                TIMELINE_API_URL, token)
+        return client
+
+
+def _fetch_timeline_points(jobs, token):
+    """Fetch [(tid, from_ts, to_ts), ...] from the timeline API, all at once
+    over the pooled client; a list of pings per job, in `jobs` order."""
+    return _timeline_client(token).fetch_many(jobs)
+
+
+# ── Incremental timeline sync ──────────────────────────────────────────────
+# A trip that hasn't ended (or ended within a day) used to be re-fetched
+# whole on every track request — the ±1-day-padded window, both tids, tens
+# of thousands of pings — re-stamped with timezones and rewritten, to pick
+# up the few hundred logged since the last look.
+#
+# Now the `.track` header carries the sync state next to the pings: the
+# window and tids they were fetched for and the last `tst` seen per tid. A
+# request for the same window asks the API only for what's after each
+# tid's last ping, tz-stamps just those, and appends them; with nothing new
+# it doesn't write at all.
+#
+# The timeline API files a ping under the time it was logged, not the time
+# it arrived, and a phone out of signal at a campsite uploads its backlog
+# hours later — all of it before the last `tst` the other uploads already
+# advanced past. So every TRACK_FULL_SYNC_SECS the fetch is a full one
+# again, which picks those up; an edited trip window, a changed tid, or a
+# cache without sync state (the JSON fallback, a legacy file) also means a
+# full fetch.
+TRACK_FULL_SYNC_SECS = 30 * 60
+TRACK_SYNC_VERSION = 1
+# Merge order for pings sharing a tst: the full fetch lists primary's first.
+_TID_FETCH_ORDER = {"primary": 0, "alt": 1}
+
+
+def _ping_fetch_order(p):
+    return (p["tst"], _TID_FETCH_ORDER.get(p.get("tid"), 0))
+
+
+def _trip_fetch_window(trip):
+    """(from_ts, to_ts) the timeline is fetched over: the trip's local
+    dates widened by ~1 day on each side to absorb timezone offsets (the
+    trip is stored in local dates, the API speaks UTC)."""
+    start_dt = datetime.fromisoformat(trip["start"]) - timedelta(days=1)
+    end_dt = datetime.fromisoformat(trip["end"]) + timedelta(days=2)
+    return (start_dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            end_dt.strftime("%Y-%m-%dT%H:%M:%SZ"))
+
+
+def _sync_trip_points(trip_id, trip, token, tids):
+    """Bring the trip's track cache up to date with the timeline API and
+    return its pings (tid-tagged, tz-stamped, in fetch order). `tids` maps
+    "primary"/"alt" to the timeline tid to fetch for each (None: none).
+    Fetches only what's new when the cache's sync state allows it (see
+    above), everything otherwise. Raises what the fetch raises."""
+    from_ts, to_ts = _trip_fetch_window(trip)
+    now = time.time()
+    col = _track_cache_paths(trip_id)[0]
+    track = track_store.load(col)
+    sync = track.meta if track is not None else None
+    # The tids are fetched concurrently, in one _fetch_timeline_points call.
+    labels = [label for label, tid in tids.items() if tid]
+    if (isinstance(sync, dict) and sync.get("v") == TRACK_SYNC_VERSION
+            and sync.get("from") == from_ts and sync.get("to") == to_ts
+            and sync.get("tids") == tids
+            and 0 <= now - sync.get("full_at", 0) < TRACK_FULL_SYNC_SECS):
+        last = dict(sync.get("last") or {})
+        fetched = _fetch_timeline_points(
+            [(tids[label], from_ts if last.get(label) is None
+              else last[label] + 1, to_ts) for label in labels], token)
+        new = []
+        for label, pts in zip(labels, fetched):
+            for p in pts:
+                p["tid"] = label
+            if pts:
+                last[label] = max(p["tst"] for p in pts)
+            new += pts
+        points = track.to_points()
+        if not new:
+            return points
+        _enrich_with_timezone(new)
+        points += new
+        points.sort(key=_ping_fetch_order)
+        _write_track_cache(trip_id, points, {**sync, "last": last})
+        return points
+
+    fetched = _fetch_timeline_points(
+        [(tids[label], from_ts, to_ts) for label in labels], token)
+    points, last = [], {}
+    for label, pts in zip(labels, fetched):
+        for p in pts:
+            p["tid"] = label
+        last[label] = max((p["tst"] for p in pts), default=None)
+        points += pts
+    points.sort(key=_ping_fetch_order)
+    _enrich_with_timezone(points)
+    _write_track_cache(trip_id, points, {
+        "v": TRACK_SYNC_VERSION, "from": from_ts, "to": to_ts, "tids": tids,
+        "last": last, "full_at": now})
     return points
 
 
+def _timeline_tids():
+    """{"primary": tid, "alt": tid or None} from the environment."""
+    return {"primary": os.environ.get("TIMELINE_TID"),
+            "alt": os.environ.get("TIMELINE_TID_ALT") or None}
+
+
 def _track_override_context(trip):
     """Return `(suppressed, bad_windows, relocate)` — the three admin-override
-    lookups every consumer of a trip's track needs.
+    lookups every consumer of a trip's track needs. `bad_windows` is a
+    timewindows.WindowIndex; a consumer resolves it against its points once
+    (`bad_windows.covered(...)`) and hands the resulting tst set — which,
+    like `suppressed`, answers `tst in` — to every pass.
 
     Shared so the track endpoint and the overview-map route builder resolve
     overrides identically; a consumer that assembled its own set would drift
     the moment a new override kind is added."""
     trip_id = trip["id"]
     return (set(get_suppressed_pings(trip_id)),
-            _bad_track_window_tsts(trip),
+            timewindows.WindowIndex(_bad_track_window_tsts(trip)),
             _relocation_lookup(get_relocated_pings(trip_id)))
 
 
-def _select_chosen_track(trip, all_points, suppressed, bad_windows, relocate):
+def _select_chosen_track(trip, all_points, suppressed, bad_tsts, relocate):
     """Run per-day tid selection on the cached/fetched raw points
     (tid-tagged) and return only the chosen tid's pings.
 
@@ -5082,9 +6058,7 @@ def _select_chosen_track(trip, all_points, suppressed, bad_windows, relocate):
             if p.get("tid") != want_tid:
                 continue
             tst = p.get("tst")
-            if tst is None or tst in suppressed:
-                continue
-            if _in_bad_track_window(tst, bad_windows):
+            if tst is None or tst in suppressed or tst in bad_tsts:
                 continue
             ov = relocate(p)
             if ov is not None:
@@ -5108,7 +6082,7 @@ def _select_chosen_track(trip, all_points, suppressed, bad_windows, relocate):
                              drop_pad_days=False)
 
 
-def _clean_track_points(trip, chosen, suppressed, bad_windows, relocate):
+def _clean_track_points(trip, chosen, suppressed, bad_tsts, relocate):
     """The canonical "what the line actually shows" view of a trip's track:
     chosen-tid pings with relocations applied, suppressed + bad-window pings
     dropped, trimmed to the trip's local-date range.
@@ -5119,9 +6093,7 @@ def _clean_track_points(trip, chosen, suppressed, bad_windows, relocate):
     cleaned = []
     for p in chosen:
         tst = p.get("tst")
-        if tst is None or tst in suppressed:
-            continue
-        if _in_bad_track_window(tst, bad_windows):
+        if tst is None or tst in suppressed or tst in bad_tsts:
             continue
         ov = relocate(p)
         if ov is not None:
@@ -5130,16 +6102,145 @@ def _clean_track_points(trip, chosen, suppressed, bad_windows, relocate):
     return _filter_points_to_trip_window(cleaned, trip["start"], trip["end"])
 
 
+# ── Persisted track responses ───────────────────────────────────────────────
+# A finished trip's track never changes on its own, yet every open of its
+# detail page re-ran the whole derivation on the cached pings — tid
+# selection, cleaning, home-boundary detection — and re-serialized every
+# ping, for the same answer each time. So for finished trips the final
+# response body is kept on disk, pre-gzipped, under a signature of
+# everything it's derived from:
+#
+#   - the raw trip record: dates, stays/events (the anchors) and every admin
+#     override, hashed wholesale for the same reason `_trip_route_signature`
+#     does — a new override kind can't be forgotten here
+#   - the track cache file's stat, so a re-fetch or tz/tid migration shows
+#   - campgrounds.json / family.json / home.json, which the anchors and the
+#     home-boundary detector read coordinates from
+#   - the mtimes of the code that does the deriving — this module and the
+#     ones it calls into for it — so a deploy that changes any of them can't
+#     keep serving the old body
+#   - the `?admin=1` flag, which changes the body
+#
+# The signature is the file name and the ETag, so a hit is a stat, a hash
+# and a file send, and a revisit with the tag is a 304 with no body at all.
+# Entries for superseded signatures are removed when their replacement is
+# written; `_delete_track_cache` removes a deleted trip's.
+TRACK_RESPONSE_DIR = os.path.join(TRIP_DATA_DIR, "track_responses")
+os.makedirs(TRACK_RESPONSE_DIR, exist_ok=True)
+TRACK_RESPONSE_CACHE_VERSION = 1
+_TRACK_RESPONSE_CODE = (
+    os.path.abspath(__file__), geodist.__file__, localdates.__file__,
+    timewindows.__file__, os.path.join(os.path.dirname(__file__), "trips.py"))
+
+
+def _track_response_signature(trip_id, include_admin):
+    """Signature of a finished trip's track response, or None when there's
+    no raw record or track cache to derive it from."""
+    raw = raw_trip_record(trip_id)
+    if raw is None:
+        return None
+    track_stat = None
+    for path in _track_cache_paths(trip_id):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        track_stat = [st.st_mtime_ns, st.st_size]
+        break
+    if track_stat is None:
+        return None
+    payload = {
+        "v": TRACK_RESPONSE_CACHE_VERSION,
+        "admin": bool(include_admin),
+        "track": track_stat,
+        "inputs": [_file_mtime_ns(p) for p in (
+            CAMPGROUNDS_JSON, FAMILY_JSON, HOME_FILE) + _TRACK_RESPONSE_CODE],
+        "trip": raw,
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _track_response_path(trip_id, include_admin, sig):
+    variant = "admin" if include_admin else "public"
+    return os.path.join(TRACK_RESPONSE_DIR,
+                        f"{trip_id}.{variant}.{sig}.json.gz")
+
+
+def _store_track_response(trip_id, include_admin, body):
+    """Persist a freshly built response body and drop the entries it
+    supersedes. Returns its signature (the ETag), or None if the inputs
+    can't be fingerprinted. Best-effort: a failed write costs a rebuild on
+    the next hit, never the response in hand."""
+    sig = _track_response_signature(trip_id, include_admin)
+    if sig is None:
+        return None
+    path = _track_response_path(trip_id, include_admin, sig)
+    try:
+        json_store.write_bytes(path, gzip.compress(body, 6))
+    except OSError:
+        return sig
+    prefix = os.path.basename(path).rsplit(".", 3)[0] + "."
+    for name in os.listdir(TRACK_RESPONSE_DIR):
+        if name.startswith(prefix) and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(TRACK_RESPONSE_DIR, name))
+            except OSError:
+                pass
+    return sig
+
+
+def _delete_track_responses(trip_id):
+    prefix = f"{trip_id}."
+    try:
+        names = os.listdir(TRACK_RESPONSE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(TRACK_RESPONSE_DIR, name))
+            except OSError:
+                pass
+
+
+def _track_response_headers(resp, sig):
+    # `no-cache` = store it, but revalidate before reuse: the tag makes that
+    # a 304, and an override edit still shows on the next load.
+    resp.headers["ETag"] = f'"{sig}"'
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+def _send_track_response(path, sig):
+    """Serve a persisted response: 304 on a matching If-None-Match, the
+    stored gzip bytes as-is to a client that takes gzip, inflated for one
+    that doesn't."""
+    if request.if_none_match.contains(sig):
+        return _track_response_headers(Response(status=304), sig)
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        resp = send_file(path, mimetype="application/json",
+                         conditional=False, etag=False)
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        with open(path, "rb") as f:
+            resp = app.response_class(gzip.decompress(f.read()),
+                                      mimetype="application/json")
+    return _track_response_headers(resp, sig)
+
+
 @app.route('/api/trips/<int:trip_id>/track')
 @login_required
 def api_trip_track(trip_id):
     """Return the GPS track for a trip from the timeline API.
 
     Caches results on disk. For trips that ended >1 day ago, the cache is
-    served permanently; recent trips re-fetch every call so newly logged
-    points show up.
+    served permanently — and so is the response built from it (see
+    "Persisted track responses" above); recent trips re-fetch every call so
+    newly logged points show up.
     """
-    trip = next((t for t in parse_trips() if t["id"] == trip_id), None)
+    trip = get_trip(trip_id)
     if not trip:
         return jsonify({"error": "trip not found"}), 404
     if not trip.get("start") or not trip.get("end"):
@@ -5162,7 +6263,7 @@ def api_trip_track(trip_id):
     relocation_items = get_relocated_pings(trip_id)
     suppressed, bad_windows, _relocate = _track_override_context(trip)
 
-    def _apply_overrides(points):
+    def _apply_overrides(points, bad_tsts):
         # Relocations rewrite lat/lon in place. Always applied (the polyline
         # should follow the override). Original coords are preserved only for
         # admin clients so the undo UI can draw the provenance line.
@@ -5187,10 +6288,9 @@ def api_trip_track(trip_id):
         if bad_windows:
             if include_admin:
                 for p in points:
-                    p["bad_window"] = _in_bad_track_window(p.get("tst"), bad_windows)
+                    p["bad_window"] = p.get("tst") in bad_tsts
             else:
-                points = [p for p in points
-                          if not _in_bad_track_window(p.get("tst"), bad_windows)]
+                points = [p for p in points if p.get("tst") not in bad_tsts]
         # Suppressions filter the polyline / regular markers entirely; admin
         # clients still see them tagged so the suppressed-pings ghost layer
         # has data to render.
@@ -5215,20 +6315,23 @@ def api_trip_track(trip_id):
         local-date range, then the shared `_find_home_boundary_tsts`
         with the trip's anchors. Independent of `?admin=1` so every
         viewer sees the same window."""
+        # One pass over the pings resolves the bad windows; every later
+        # pass is a set lookup.
+        bad_tsts = bad_windows.covered(p.get("tst") for p in all_points)
         chosen = _select_chosen_track(trip, all_points, suppressed,
-                                      bad_windows, _relocate)
+                                      bad_tsts, _relocate)
         cleaned = _clean_track_points(trip, chosen, suppressed,
-                                      bad_windows, _relocate)
+                                      bad_tsts, _relocate)
         home, _fam = _map_config()
         hs, he = _find_home_boundary_tsts(
             cleaned, home, anchors=_anchors_for_trip(trip))
         return jsonify({
-            "points": _apply_overrides(chosen),
+            "points": _apply_overrides(chosen, bad_tsts),
             "home_auto_start_tst": hs,
             "home_auto_end_tst": he,
         })
 
-    def _serve_cache():
+    def _serve_cache(persist=False):
         cached = _read_track_cache(trip_id)
         if cached is None:
             return jsonify([])
@@ -5236,50 +6339,42 @@ def api_trip_track(trip_id):
         tz_changed = _enrich_with_timezone(cached)
         if migrated or tz_changed:
             _write_track_cache(trip_id, cached)
-        return _build_response(cached)
+        resp = _build_response(cached)
+        if persist:
+            # Signed after any rewrite above, so the stored entry is keyed
+            # to the cache file the next request will stat.
+            sig = _store_track_response(trip_id, include_admin,
+                                        resp.get_data())
+            if sig is not None:
+                _track_response_headers(resp, sig)
+        return resp
 
     if is_old and _track_cache_exists(trip_id):
-        return _serve_cache()
+        sig = _track_response_signature(trip_id, include_admin)
+        if sig is not None:
+            path = _track_response_path(trip_id, include_admin, sig)
+            if os.path.isfile(path):
+                return _send_track_response(path, sig)
+        return _serve_cache(persist=True)
 
     token = os.environ.get("TIMELINE_API_TOKEN")
-    tid = os.environ.get("TIMELINE_TID")
-    alt_tid = os.environ.get("TIMELINE_TID_ALT")
-    if not token or not tid:
+    tids = _timeline_tids()
+    if not token or not tids["primary"]:
         # Fall back to cache if we have one, else empty (frontend handles this).
         if _track_cache_exists(trip_id):
             return _serve_cache()
         return jsonify([])
 
     try:
-        # Date-only trip range; widen by ~1 day on each side to absorb timezone
-        # offsets (the trip is stored in local dates, the API speaks UTC).
-        start_dt = datetime.fromisoformat(trip["start"]) - timedelta(days=1)
-        end_dt = datetime.fromisoformat(trip["end"]) + timedelta(days=2)
-        from_ts = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        to_ts = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        primary_pts = _fetch_timeline_points(tid, token, from_ts, to_ts)
-        for p in primary_pts:
-            p["tid"] = "primary"
-
-        alt_pts = []
-        if alt_tid:
-            # Always fetch the full alt range now (was: only gap days),
-            # since the per-day selector wants to weigh both phones on
-            # every day to pick the trip phone, not just to fill holes.
-            alt_pts = _fetch_timeline_points(alt_tid, token, from_ts, to_ts)
-            for p in alt_pts:
-                p["tid"] = "alt"
-
-        all_points = primary_pts + alt_pts
-        all_points.sort(key=lambda p: p["tst"])
+        # Both tids over the whole range (alt too, not just gap days): the
+        # per-day selector weighs both phones on every day to pick the trip
+        # phone, not just to fill holes.
+        all_points = _sync_trip_points(trip_id, trip, token, tids)
     except Exception as e:
         if _track_cache_exists(trip_id):
             return _serve_cache()
         return jsonify({"error": str(e)}), 502
 
-    _enrich_with_timezone(all_points)
-    _write_track_cache(trip_id, all_points)
     return _build_response(all_points)
 
 
@@ -5430,7 +6525,7 @@ def _trip_window_cuts(trip, cleaned, home):
     to the full local days `_clean_track_points()` already trimmed to."""
     hs, he = _find_home_boundary_tsts(
         cleaned, home, anchors=_anchors_for_trip(trip))
-    tz_name = (_tz_for_coord(home[0], home[1])
+    tz_name = (_tz_at(home[0], home[1])
                if home and home[0] is not None and home[1] is not None
                else None)
     lower = _trip_local_to_tst(
@@ -5575,14 +6670,13 @@ def _drive_days(kept, default_tz):
     a day at camp, however much local running-around it logs — and is
     dropped rather than reported with a nonsensical span.
 
-    Days are bucketed by each ping's OWN timezone via `_local_date_of_ping` —
-    the same rule `_select_track_per_day` buckets by, so a trip that crosses
-    zones splits its days where the driver's clock did. That helper falls
-    back to UTC for a ping with no `tz` stamp, which would put an evening's
-    driving on the next day, so the trip's home zone is substituted instead."""
+    Days are bucketed by each ping's OWN timezone via `localdates` — the
+    same rule `_select_track_per_day` buckets by, so a trip that crosses
+    zones splits its days where the driver's clock did. It falls back to
+    UTC for a ping with no `tz` stamp, which would put an evening's driving
+    on the next day, so the trip's home zone is passed as the default."""
     by_day = {}
-    for p in kept:
-        d = _local_date_of_ping(p if p.get("tz") else dict(p, tz=default_tz))
+    for p, d in zip(kept, localdates.local_dates(kept, default_tz)):
         if d:
             by_day.setdefault(d, []).append(p)
 
@@ -5651,9 +6745,10 @@ def _build_trip_derived(trip):
     _migrate_track_cache_tids(points)
 
     suppressed, bad_windows, relocate = _track_override_context(trip)
-    chosen = _select_chosen_track(trip, points, suppressed, bad_windows,
+    bad_tsts = bad_windows.covered(p.get("tst") for p in points)
+    chosen = _select_chosen_track(trip, points, suppressed, bad_tsts,
                                   relocate)
-    cleaned = _clean_track_points(trip, chosen, suppressed, bad_windows,
+    cleaned = _clean_track_points(trip, chosen, suppressed, bad_tsts,
                                   relocate)
     if not cleaned:
         return empty
@@ -5677,7 +6772,7 @@ def _build_trip_derived(trip):
     # hasn't arrived yet, so an in-progress trip doesn't draw itself home
     # before it gets there. Anchors are a refinement, not a requirement: a
     # gap with none in it still connects, straight and possibly long.
-    tz_name = (_tz_for_coord(home[0], home[1])
+    tz_name = (_tz_at(home[0], home[1])
                if home and home[0] is not None and home[1] is not None
                else None)
     stops = _trip_route_stops(trip, home, tz_name)
@@ -6071,8 +7166,8 @@ STOP_HOME_BOUNDARY_LOCK_S = 3600  # sustained-away duration that confirms
 
 
 def _haversine_m(lat1, lng1, lat2, lng2):
-    """Great-circle distance between two coords in meters."""
-    import math
+    """Great-circle distance between two coords in meters (geodist has the
+    array form)."""
     R = 6371000.0
     a1 = math.radians(lat1)
     a2 = math.radians(lat2)
@@ -6105,34 +7200,18 @@ def _load_trip_track_for_detection(trip_id):
     admin-overrides drop, so detection sees only the chosen tid's pings
     for each day — matches what the polyline shows and avoids stop
     suggestions seeded by the wrong phone."""
-    trip = next((t for t in parse_trips() if t["id"] == trip_id), None)
+    trip = get_trip(trip_id)
     if not trip or not trip.get("start") or not trip.get("end"):
         return []
 
     points = _read_track_cache(trip_id)
     if points is None:
         token = os.environ.get("TIMELINE_API_TOKEN")
-        tid = os.environ.get("TIMELINE_TID")
-        alt_tid = os.environ.get("TIMELINE_TID_ALT")
-        if not token or not tid:
+        tids = _timeline_tids()
+        if not token or not tids["primary"]:
             return []
         try:
-            start_dt = datetime.fromisoformat(trip["start"]) - timedelta(days=1)
-            end_dt = datetime.fromisoformat(trip["end"]) + timedelta(days=2)
-            from_ts = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            to_ts = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            primary_pts = _fetch_timeline_points(tid, token, from_ts, to_ts)
-            for p in primary_pts:
-                p["tid"] = "primary"
-            alt_pts = []
-            if alt_tid:
-                alt_pts = _fetch_timeline_points(alt_tid, token, from_ts, to_ts)
-                for p in alt_pts:
-                    p["tid"] = "alt"
-            points = primary_pts + alt_pts
-            points.sort(key=lambda p: p["tst"])
-            _enrich_with_timezone(points)
-            _write_track_cache(trip_id, points)
+            points = _sync_trip_points(trip_id, trip, token, tids)
         except Exception:
             return []
     else:
@@ -6157,10 +7236,10 @@ def _load_trip_track_for_detection(trip_id):
             p["lon"] = ov[1]
         cleaned.append(p)
     points = cleaned
-    bad_windows = _bad_track_window_tsts(trip)
+    bad_windows = timewindows.WindowIndex(_bad_track_window_tsts(trip))
     if bad_windows:
-        points = [p for p in points
-                  if not _in_bad_track_window(p.get("tst"), bad_windows)]
+        bad_tsts = bad_windows.covered(p.get("tst") for p in points)
+        points = [p for p in points if p.get("tst") not in bad_tsts]
 
     # Per-day tid selection. `_select_track_per_day` already returns
     # only chosen-tid pings within [start, end] — pad days are dropped,
@@ -6268,22 +7347,22 @@ def _detect_stops(points,
             else:
                 prev_p = deduped[-1] if deduped else None
                 next_p = pts[j + 1] if j + 1 < len(pts) else None
-                best = group[0]
-                best_d = float("inf")
-                for p in group:
-                    d = float("inf")
-                    if prev_p is not None:
-                        d = min(d, _haversine_m(p["lat"], p["lon"],
-                                                prev_p["lat"], prev_p["lon"]))
-                    if next_p is not None:
-                        d = min(d, _haversine_m(p["lat"], p["lon"],
-                                                next_p["lat"], next_p["lon"]))
-                    if d < best_d:
-                        best_d = d
-                        best = p
+                nbrs = [q for q in (prev_p, next_p) if q is not None]
+                if nbrs:
+                    # Every duplicate against both neighbors in one call;
+                    # argmin takes the first of equals, as the loop did.
+                    d = geodist.distance_matrix_m(
+                        [p["lat"] for p in group], [p["lon"] for p in group],
+                        [q["lat"] for q in nbrs], [q["lon"] for q in nbrs])
+                    best = group[int(d.min(axis=1).argmin())]
+                else:
+                    best = group[0]
                 deduped.append(best)
             i = j + 1
         pts = deduped
+    # The cluster walk below stays on the scalar `_haversine_m`: each join
+    # moves the running centroid the next ping is measured against, so
+    # there's no batch of distances to hand a vector kernel.
     stops = []
     cur = None
 
@@ -6459,18 +7538,20 @@ def _find_home_boundary_tsts(points, home,
     # into a run, compute its centroid, and tag the whole run AT_HOME
     # only if the centroid passes the at-home test. Pings outside
     # home_radius_m are NOT_AT_HOME by default.
+    lats = [p["lat"] for p in pts]
+    lngs = [p["lon"] for p in pts]
+    near_home = (geodist.distances_m(lats, lngs, home_lat, home_lng)
+                 <= home_radius_m).tolist()
     at_home = [False] * n
     i = 0
     while i < n:
-        if _haversine_m(pts[i]["lat"], pts[i]["lon"],
-                        home_lat, home_lng) > home_radius_m:
+        if not near_home[i]:
             i += 1
             continue
         j = i
         sum_lat = 0.0
         sum_lng = 0.0
-        while j < n and _haversine_m(pts[j]["lat"], pts[j]["lon"],
-                                     home_lat, home_lng) <= home_radius_m:
+        while j < n and near_home[j]:
             sum_lat += pts[j]["lat"]
             sum_lng += pts[j]["lon"]
             j += 1
@@ -6510,17 +7591,17 @@ def _find_home_boundary_tsts(points, home,
     # `anchors` is empty/None, so callers that don't care are unaffected.
     anchor_list = [(a[0], a[1]) for a in (anchors or [])
                    if a and a[0] is not None and a[1] is not None]
+    # Each ping's distance to its nearest anchor, once, rather than every
+    # ping against every anchor again for each streak that asks.
+    nearest_anchor_m = (
+        geodist.distance_matrix_m(lats, lngs, [a[0] for a in anchor_list],
+                                  [a[1] for a in anchor_list]).min(axis=1)
+        if anchor_list else None)
 
     def _streak_min_anchor_m(se):
-        if not anchor_list:
+        if nearest_anchor_m is None:
             return float("inf")
-        best = float("inf")
-        for k in range(se[0], se[1] + 1):
-            for a_lat, a_lng in anchor_list:
-                d = _haversine_m(pts[k]["lat"], pts[k]["lon"], a_lat, a_lng)
-                if d < best:
-                    best = d
-        return best
+        return float(nearest_anchor_m[se[0]:se[1] + 1].min())
 
     def _dur(se):
         return pts[se[1]]["tst"] - pts[se[0]]["tst"]
@@ -6583,7 +7664,7 @@ def _bad_track_window_tsts(trip, home=None):
     if home is None:
         home, _ = _map_config()
     home_tz_name = (
-        _tz_for_coord(home[0], home[1])
+        _tz_at(home[0], home[1])
         if home and home[0] is not None and home[1] is not None
         else None
     )
@@ -6650,7 +7731,7 @@ def _tid_window_tsts(trip, home=None):
     if home is None:
         home, _ = _map_config()
     home_tz_name = (
-        _tz_for_coord(home[0], home[1])
+        _tz_at(home[0], home[1])
         if home and home[0] is not None and home[1] is not None
         else None
     )
@@ -6710,11 +7791,12 @@ def _apply_tid_choice(all_points, tid_choices, tid_windows, drop_pad_days):
     the same chosen pings. With an empty `tid_windows` and matching
     `drop_pad_days`, this reproduces the prior per-day-only selection."""
     chosen = []
-    for p in all_points:
-        d = _local_date_of_ping(p)
+    forced = timewindows.WindowIndex(tid_windows).values(
+        p.get("tst") for p in all_points)
+    for p, d, win_tid in zip(all_points, localdates.local_dates(all_points),
+                             forced):
         if d is None:
             continue
-        win_tid = _tid_for_window(p.get("tst"), tid_windows)
         if win_tid is not None:
             wanted = win_tid
         else:
@@ -6746,11 +7828,8 @@ def _local_date_of_ping(p):
     """Return the local-date (YYYY-MM-DD) of a single ping, using its
     `tz` field stamped by `_enrich_with_timezone`. Falls back to UTC
     if the field is missing or zoneinfo is unavailable. Returns None
-    if the ping has no `tst`.
-
-    Shared by `_filter_points_to_trip_window` (date-range gate) and
-    `_select_track_per_day` (per-day bucketing) so both agree on which
-    day a midnight-adjacent ping belongs to."""
+    if the ping has no `tst`. (`localdates.local_dates` does a whole
+    track.)"""
     tst = p.get("tst")
     if tst is None:
         return None
@@ -6804,12 +7883,8 @@ def _filter_points_to_trip_window(points, trip_start, trip_end):
     API fetch by ~1 day on each side for timezone slop; this tightens
     back to the trip's real window so pre-/post-trip home stops don't
     become suggestions."""
-    out = []
-    for p in points:
-        d = _local_date_of_ping(p)
-        if d is not None and trip_start <= d <= trip_end:
-            out.append(p)
-    return out
+    return [p for p, d in zip(points, localdates.local_dates(points))
+            if d is not None and trip_start <= d <= trip_end]
 
 
 def _select_track_per_day(primary_points, alt_points, anchors, home,
@@ -6866,8 +7941,7 @@ def _select_track_per_day(primary_points, alt_points, anchors, home,
 
     def _bucket(pts):
         out = {}
-        for p in pts:
-            d = _local_date_of_ping(p)
+        for p, d in zip(pts, localdates.local_dates(pts)):
             if d is None:
                 continue
             out.setdefault(d, []).append(p)
@@ -6884,6 +7958,8 @@ def _select_track_per_day(primary_points, alt_points, anchors, home,
 
     anchor_list = [(a[0], a[1]) for a in (anchors or [])
                    if a is not None and a[0] is not None and a[1] is not None]
+    anchor_lats = [a[0] for a in anchor_list]
+    anchor_lngs = [a[1] for a in anchor_list]
     home_lat = home[0] if home and home[0] is not None else None
     home_lng = home[1] if home and home[1] is not None else None
     overrides = tid_overrides or {}
@@ -6894,29 +7970,23 @@ def _select_track_per_day(primary_points, alt_points, anchors, home,
         discriminator: a phone that diverged from the trip after a
         shared morning encounter will hit fewer subsequent anchors
         than the phone that stayed on the trip."""
-        n = 0
-        for a_lat, a_lng in anchor_list:
-            for p in pts:
-                lat, lon = p.get("lat"), p.get("lon")
-                if lat is None or lon is None:
-                    continue
-                if _haversine_m(lat, lon, a_lat, a_lng) <= near_radius_m:
-                    n += 1
-                    break
-        return n
+        if not anchor_list:
+            return 0
+        lats, lngs = geodist.ping_coords(pts)
+        if not len(lats):
+            return 0
+        near = geodist.distance_matrix_m(lats, lngs, anchor_lats,
+                                         anchor_lngs) <= near_radius_m
+        return int(near.any(axis=0).sum())
 
     def _max_dist_from_home(pts):
         if home_lat is None or home_lng is None:
             return 0.0
-        best = 0.0
-        for p in pts:
-            lat, lon = p.get("lat"), p.get("lon")
-            if lat is None or lon is None:
-                continue
-            d = _haversine_m(lat, lon, home_lat, home_lng)
-            if d > best:
-                best = d
-        return best
+        lats, lngs = geodist.ping_coords(pts)
+        if not len(lats):
+            return 0.0
+        return max(0.0, float(
+            geodist.distances_m(lats, lngs, home_lat, home_lng).max()))
 
     tid_choices = {}
     chosen = []
@@ -7113,11 +8183,17 @@ def _drop_stops_at_known_locations(stops, trip, family_locations, home=None,
     # override is a minute off), not "this cluster passed through
     # home". A real stop near home should NOT be dropped just because
     # a single ping wandered close to the home centroid.
-    def _any_ping_within(c, a_lat, a_lng, radius_m):
-        for p_lat, p_lng in c.get("coords") or [(c["center_lat"], c["center_lng"])]:
-            if _haversine_m(p_lat, p_lng, a_lat, a_lng) < radius_m:
-                return True
-        return False
+    def _any_ping_within(c, anchors, radius_m):
+        """True if any of the cluster's pings is within radius_m of any of
+        `anchors` — every ping against every anchor in one kernel call."""
+        if not anchors:
+            return False
+        coords = c.get("coords") or [(c["center_lat"], c["center_lng"])]
+        d = geodist.distance_matrix_m([ll[0] for ll in coords],
+                                      [ll[1] for ll in coords],
+                                      [a[0] for a in anchors],
+                                      [a[1] for a in anchors])
+        return bool((d < radius_m).any())
 
     out = []
     for c in stops:
@@ -7125,19 +8201,13 @@ def _drop_stops_at_known_locations(stops, trip, family_locations, home=None,
             if _haversine_m(c["center_lat"], c["center_lng"],
                             home_lat, home_lng) < home_radius_m:
                 continue
-        too_close = False
-        for a_lat, a_lng in date_agnostic_anchors:
-            if _any_ping_within(c, a_lat, a_lng, near_radius_m):
-                too_close = True
-                break
+        too_close = _any_ping_within(c, date_agnostic_anchors, near_radius_m)
         if not too_close and dated_anchors:
             c_start, c_end = _cluster_date_range(c)
-            for a_lat, a_lng, a_start, a_end in dated_anchors:
-                if a_end < c_start or a_start > c_end:
-                    continue
-                if _any_ping_within(c, a_lat, a_lng, near_radius_m):
-                    too_close = True
-                    break
+            too_close = _any_ping_within(
+                c, [a for a in dated_anchors
+                    if not (a[3] < c_start or a[2] > c_end)],
+                near_radius_m)
         if not too_close:
             out.append(c)
     return out
@@ -7300,7 +8370,7 @@ def api_tid_choices(trip_id):
     denied = _require_admin()
     if denied:
         return denied
-    trip = next((t for t in parse_trips() if t["id"] == trip_id), None)
+    trip = get_trip(trip_id)
     if not trip:
         return jsonify({"error": "trip not found"}), 404
     if not trip.get("start") or not trip.get("end"):
@@ -7321,7 +8391,8 @@ def api_tid_choices(trip_id):
     # the UI's "auto" preview can diverge from the polyline's choice.
     suppressed = set(get_suppressed_pings(trip_id))
     _relocate = _relocation_lookup(get_relocated_pings(trip_id))
-    bad_windows = _bad_track_window_tsts(trip)
+    bad_tsts = timewindows.WindowIndex(_bad_track_window_tsts(trip)).covered(
+        p.get("tst") for p in cached)
 
     def _clean(want_tid):
         out = []
@@ -7329,9 +8400,7 @@ def api_tid_choices(trip_id):
             if p.get("tid") != want_tid:
                 continue
             tst = p.get("tst")
-            if tst is None or tst in suppressed:
-                continue
-            if _in_bad_track_window(tst, bad_windows):
+            if tst is None or tst in suppressed or tst in bad_tsts:
                 continue
             ov = _relocate(p)
             if ov is not None:
@@ -7352,8 +8421,7 @@ def api_tid_choices(trip_id):
     # Per-tid per-day raw counts (informational; lets the UI tell the
     # admin "alt has 0 pings today, forcing alt will leave a gap").
     counts = {}
-    for p in cached:
-        d = _local_date_of_ping(p)
+    for p, d in zip(cached, localdates.local_dates(cached)):
         if d is None:
             continue
         bucket = counts.setdefault(d, {"primary": 0, "alt": 0})
@@ -7391,7 +8459,7 @@ def api_detect_stops(trip_id):
     denied = _require_admin()
     if denied:
         return denied
-    trip = next((t for t in parse_trips() if t["id"] == trip_id), None)
+    trip = get_trip(trip_id)
     if not trip:
         return jsonify({"error": "trip not found"}), 404
     enrich_trip_locations(trip)
@@ -7430,7 +8498,7 @@ def api_detect_stops(trip_id):
         points, home, anchors=_anchors_for_trip(trip))
     home_tz_name = None
     if home and home[0] is not None and home[1] is not None:
-        home_tz_name = _tz_for_coord(home[0], home[1])
+        home_tz_name = _tz_at(home[0], home[1])
     manual_start = (trip.get("home_start_time") or "").strip()
     manual_end = (trip.get("home_end_time") or "").strip()
     if manual_start:
@@ -7674,6 +8742,48 @@ if __name__ == '__main__':
         print(f"Built routes for {len(routes)} of {len(all_trips)} trip(s), "
               f"{vertices} vertices, in {time.time() - t0:.1f}s "
               f"-> {TRIP_ROUTES_FILE}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "backfill-exif":
+        # Same walk the app starts in the background on an index miss, run
+        # to completion — e.g. after restoring photo_uploads/ on a new host.
+        t0 = time.time()
+        n = exif_index.backfill(EXIF_INDEX_DB, UPLOAD_DIR, _allowed_file)
+        print(f"Indexed EXIF for {n} photo(s) in {time.time() - t0:.1f}s "
+              f"-> {EXIF_INDEX_DB}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "build-tz-raster":
+        # Sample the timezone raster (TZ_RASTER_FILE) over everywhere the
+        # trips have been. Needs timezonefinder, here, once; the workers
+        # then load it only for points near a zone line. Re-run after a
+        # trip somewhere new, or pass --bbox to cover a place ahead of time.
+        parser = argparse.ArgumentParser(
+            prog="ekko_trips_app.py build-tz-raster",
+            description="Build the timezone raster the workers map.")
+        parser.add_argument('--bbox', action='append', default=[],
+                            metavar="S,W,N,E",
+                            help="Also cover this box (degrees; repeatable).")
+        parser.add_argument('--margin', type=int, default=1,
+                            help="Rings of 1° tiles around each place "
+                                 "(default: 1).")
+        args = parser.parse_args(sys.argv[2:])
+        _tz_for_coord(None, None)
+        if not _tz_finder:
+            print("timezonefinder is not installed.")
+            sys.exit(1)
+        t0 = time.time()
+        tiles = tzraster.tiles_around(_tz_raster_coords(), args.margin)
+        for box in args.bbox:
+            south, west, north, east = (float(x) for x in box.split(","))
+            tiles |= {(a, b)
+                      for a in range(math.floor(south), math.ceil(north))
+                      for b in range(math.floor(west), math.ceil(east))}
+
+        def progress(done, total):
+            print(f"\r{done}/{total} tiles", end="", flush=True)
+
+        header = tzraster.build(TZ_RASTER_FILE, tiles, _tz_for_coord,
+                                _tz_finder_version(), progress=progress)
+        print(f"\rSampled {len(tiles)} tile(s), {len(header['zones'])} "
+              f"zone(s), in {time.time() - t0:.1f}s -> {TZ_RASTER_FILE} "
+              f"({os.path.getsize(TZ_RASTER_FILE) / 1024:.0f} KB)")
     else:
         # Pass --http to skip TLS (HTTPS is on by default so mobile devices
         # on the LAN can use Geolocation, which requires a secure origin).
@@ -0,0 +1,132 @@
+"""Persistent EXIF timestamp index (trip_data/exif_index.db).
+
+Trip detail shows every photo's "taken" time and buckets multi-night stays by
+it, and reading that means a Pillow open of the original — a multi-MB file —
+per photo. The app kept the answers only in per-process dicts, so every
+worker paid for every photo again after each deploy or restart. This keeps
+them on disk instead, shared by every worker:
+
+  exif (key TEXT PRIMARY KEY, mtime_ns, size, raw TEXT)
+
+`key` is the photo's path relative to the library root (so a trip_data/
+synced from another host still matches), and a row only counts when the
+file's (mtime_ns, size) still match — a replaced file is simply a miss.
+`raw` is the first EXIF timestamp found (DateTimeOriginal, then
+DateTimeDigitized, then DateTime) exactly as stored, "YYYY:MM:DD HH:MM:SS",
+or "" when the photo has none; callers format or parse it as they need, so
+one read serves both the display string and the bucketing datetime.
+
+Populated as photos are uploaded, on any read that misses, and by
+`backfill()` — a walk of the whole library the app runs in a background
+thread (and `python ekko_trips_app.py backfill-exif` runs by hand).
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exif (
+    key      TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    raw      TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# SQLite's default host-parameter limit is 999 on older builds.
+_CHUNK = 500
+
+# Directories under the library root that never hold originals.
+_SKIP_DIRS = (".thumbs", ".views", ".trash")
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def read_raw(filepath):
+    """The photo's EXIF timestamp string, or "" if it has none (or can't be
+    read). Opens the file lazily: Pillow parses only the header for this."""
+    try:
+        from PIL import Image
+        from PIL.ExifTags import Base as ExifBase
+        with Image.open(filepath) as img:
+            exif = img.getexif()
+        for tag in (ExifBase.DateTimeOriginal, ExifBase.DateTimeDigitized,
+                    ExifBase.DateTime):
+            val = exif.get(tag)
+            if val:
+                return str(val)
+    except Exception:
+        pass
+    return ""
+
+
+def lookup(path, stamped):
+    """{key: raw} for each `(key, mtime_ns, size)` in `stamped` whose row
+    is current. Missing or stale keys are absent from the result."""
+    if not stamped or not os.path.exists(path):
+        return {}
+    want = {k: (m, s) for k, m, s in stamped}
+    keys = list(want)
+    out = {}
+    with closing(_connect(path)) as conn:
+        for i in range(0, len(keys), _CHUNK):
+            chunk = keys[i:i + _CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for key, mtime_ns, size, raw in conn.execute(
+                    f"SELECT key, mtime_ns, size, raw FROM exif "
+                    f"WHERE key IN ({marks})", chunk):
+                if want[key] == (mtime_ns, size):
+                    out[key] = raw
+    return out
+
+
+def record(path, rows):
+    """Upsert `(key, mtime_ns, size, raw)` rows."""
+    if not rows:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with closing(_connect(path)) as conn, conn:
+        conn.executemany("INSERT OR REPLACE INTO exif VALUES (?, ?, ?, ?)",
+                         rows)
+
+
+def backfill(path, root, allowed, batch=50, should_stop=None):
+    """Index every photo under `root` (those `allowed(filename)` accepts)
+    that's missing or stale. Writes every `batch` photos so a long first run
+    is useful before it finishes. `should_stop()` is polled between batches.
+    Returns the number of photos read."""
+    pending, done = [], 0
+
+    def flush():
+        nonlocal done
+        have = lookup(path, pending)
+        rows = [(k, m, s, read_raw(os.path.join(root, k)))
+                for k, m, s in pending if k not in have]
+        record(path, rows)
+        done += len(rows)
+        pending.clear()
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in _SKIP_DIRS
+                             and not d.startswith("."))
+        for fname in sorted(filenames):
+            if not allowed(fname):
+                continue
+            full = os.path.join(dirpath, fname)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            pending.append((os.path.relpath(full, root), st.st_mtime_ns,
+                            st.st_size))
+            if len(pending) >= batch:
+                flush()
+                if should_stop is not None and should_stop():
+                    return done
+    flush()
+    return done
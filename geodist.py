@@ -0,0 +1,56 @@
+"""Vectorized great-circle distances for the GPS-track pipeline.
+
+The track code asks the same question thousands of times per request — how
+far is each ping from home, from each stay and event anchor — and answered
+it one `_haversine_m` call at a time, a pure-Python function with five trig
+calls. These kernels take whole arrays of pings (and of anchors) and answer
+in one NumPy expression.
+
+They evaluate `ekko_trips_app._haversine_m`'s formula term for term, so a
+threshold test lands the same way.
+
+Coordinates go in as anything np.asarray accepts; distances come out in
+metres as float64 arrays.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def _haversine(lat1, lng1, lat2, lng2):
+    a1 = np.radians(lat1)
+    a2 = np.radians(lat2)
+    da = np.radians(lat2 - lat1)
+    do = np.radians(lng2 - lng1)
+    h = np.sin(da / 2) ** 2 + np.cos(a1) * np.cos(a2) * np.sin(do / 2) ** 2
+    # h can round a hair past 1 for antipodal points; asin would give NaN.
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+def distances_m(lats, lngs, lat, lng):
+    """Distance from each of the points (`lats[i]`, `lngs[i]`) to the one
+    point (`lat`, `lng`). Shape (n,)."""
+    return _haversine(np.asarray(lats, dtype=float),
+                      np.asarray(lngs, dtype=float), float(lat), float(lng))
+
+
+def distance_matrix_m(lats, lngs, a_lats, a_lngs):
+    """Distance from every point to every anchor: element [i, j] is point i
+    to anchor j. Shape (n, m) — callers reduce along an axis."""
+    lats = np.asarray(lats, dtype=float)[:, None]
+    lngs = np.asarray(lngs, dtype=float)[:, None]
+    a_lats = np.asarray(a_lats, dtype=float)[None, :]
+    a_lngs = np.asarray(a_lngs, dtype=float)[None, :]
+    return _haversine(lats, lngs, a_lats, a_lngs)
+
+
+def ping_coords(points):
+    """(lats, lngs) arrays for the pings in `points` that have both a `lat`
+    and a `lon` — the ones the scalar loops didn't skip."""
+    pairs = [(p["lat"], p["lon"]) for p in points
+             if p.get("lat") is not None and p.get("lon") is not None]
+    if not pairs:
+        return np.empty(0), np.empty(0)
+    arr = np.asarray(pairs, dtype=float)
+    return arr[:, 0], arr[:, 1]
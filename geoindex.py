@@ -0,0 +1,174 @@
+"""Spatial index over a fixed set of points — radius, bounding-box and
+k-nearest queries without a distance to every point.
+
+Built for the campground database (~12.9k entries; see
+`ekko_trips_app._campground_index`, rebuilt when campgrounds.json changes),
+but indifferent to what the points are: it's built over a list of
+(lat, lng) pairs and answers with positions into that list, so a caller maps
+hits back to its own rows.
+
+Points are bucketed into H3 cells (`RES`), and each cell keeps its members'
+centroid plus the distance from it to its farthest member. That radius comes
+from the members themselves, not from H3's nominal cell size, so it is exact
+however irregular the cell — and so is every query:
+
+  within    every cell whose bound can reach the circle is opened, and only
+            its members get an exact haversine (geodist)
+  nearest   the nearest-bound cells that hold k points give an upper bound
+            on the k-th distance; only cells within it are opened
+  bbox      a binary search on the latitude-sorted points, then a longitude
+            test on that band (antimeridian-spanning boxes included)
+
+Without the `h3` package (it's pinned in ekko_trips_requirements.txt, and
+timezonefinder needs it anyway) cells fall back to a plain half-degree
+lat/lng grid; the answers are the same, only the bucketing differs.
+"""
+
+import numpy as np
+
+import geodist
+
+try:
+    import h3
+except ImportError:  # pragma: no cover - plain-grid fallback
+    h3 = None
+
+# H3 resolution 3: ~12k km² cells, a dozen or so campgrounds apiece in the
+# dense East — coarse enough that a 400-mile radius opens hundreds of cells,
+# not tens of thousands, and fine enough that a few-mile one opens a handful.
+RES = 3
+_GRID_DEG = 0.5
+
+
+def _cell_keys(lats, lngs):
+    if h3 is not None:
+        return [h3.latlng_to_cell(a, b, RES) for a, b in zip(lats, lngs)]
+    return list(zip(np.floor(lats / _GRID_DEG).astype(int).tolist(),
+                    np.floor(lngs / _GRID_DEG).astype(int).tolist()))
+
+
+class GeoIndex:
+    """Index over `coords`, a sequence of (lat, lng) pairs. A pair with a None
+    (or a non-finite value) is left out: no query ever returns its position.
+
+    Queries return NumPy arrays of positions into `coords` (and distances in
+    metres where they're measured)."""
+
+    def __init__(self, coords):
+        pos, lats, lngs = [], [], []
+        for i, ll in enumerate(coords):
+            if ll is None or ll[0] is None or ll[1] is None:
+                continue
+            try:
+                a, b = float(ll[0]), float(ll[1])
+            except (TypeError, ValueError):
+                continue
+            if np.isfinite(a) and np.isfinite(b):
+                pos.append(i)
+                lats.append(a)
+                lngs.append(b)
+        pos = np.asarray(pos, np.int64)
+        lats = np.asarray(lats, np.float64)
+        lngs = np.asarray(lngs, np.float64)
+
+        # Members grouped by cell: cell c owns [start[c], start[c + 1]).
+        keys = _cell_keys(lats, lngs)
+        codes = {}
+        cell_of = np.fromiter((codes.setdefault(k, len(codes)) for k in keys),
+                              np.int64, len(keys))
+        order = np.argsort(cell_of, kind="stable")
+        self._pos = pos[order]
+        self._lat = lats[order]
+        self._lng = lngs[order]
+        counts = np.bincount(cell_of, minlength=len(codes))
+        self._start = np.concatenate(([0], np.cumsum(counts)))
+        n_cells = len(codes)
+        self._cell_lat = np.empty(n_cells)
+        self._cell_lng = np.empty(n_cells)
+        self._cell_rad = np.empty(n_cells)
+        for c in range(n_cells):
+            s, e = self._start[c], self._start[c + 1]
+            clat = self._lat[s:e].mean()
+            clng = self._lng[s:e].mean()
+            self._cell_lat[c] = clat
+            self._cell_lng[c] = clng
+            self._cell_rad[c] = geodist.distances_m(
+                self._lat[s:e], self._lng[s:e], clat, clng).max()
+
+        # Latitude order for bbox queries.
+        by_lat = np.argsort(lats, kind="stable")
+        self._bl_lat = lats[by_lat]
+        self._bl_lng = lngs[by_lat]
+        self._bl_pos = pos[by_lat]
+
+    def __len__(self):
+        return len(self._pos)
+
+    def _members(self, cells):
+        """Row numbers (into the cell-sorted arrays) of every member of
+        `cells`, cell by cell — built without a Python loop."""
+        starts = self._start[cells]
+        counts = self._start[cells + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, np.int64)
+        offsets = np.cumsum(counts) - counts
+        return np.repeat(starts - offsets, counts) + np.arange(total)
+
+    def within(self, lat, lng, radius_m):
+        """(positions, distances) of every point within `radius_m` metres of
+        (lat, lng), nearest first."""
+        if not len(self._pos):
+            return np.empty(0, np.int64), np.empty(0)
+        d_cell = geodist.distances_m(self._cell_lat, self._cell_lng, lat, lng)
+        rows = self._members(np.flatnonzero(d_cell - self._cell_rad
+                                            <= radius_m))
+        d = geodist.distances_m(self._lat[rows], self._lng[rows], lat, lng)
+        keep = d <= radius_m
+        rows, d = rows[keep], d[keep]
+        order = np.argsort(d, kind="stable")
+        return self._pos[rows[order]], d[order]
+
+    def nearest(self, lat, lng, k, max_m=None):
+        """(positions, distances) of the `k` points nearest (lat, lng),
+        nearest first — fewer if the index is smaller or `max_m` cuts it
+        short."""
+        if k <= 0 or not len(self._pos):
+            return np.empty(0, np.int64), np.empty(0)
+        d_cell = geodist.distances_m(self._cell_lat, self._cell_lng, lat, lng)
+        bound = np.maximum(d_cell - self._cell_rad, 0.0)
+        limit = np.inf if max_m is None else max_m
+        cells = np.flatnonzero(bound <= limit)
+        cells = cells[np.argsort(bound[cells], kind="stable")]
+        # Two passes, each one vectorized call. First the nearest-bound cells
+        # just big enough to hold k points: their k-th nearest member is an
+        # upper bound on the true k-th distance. Then every cell whose bound
+        # is within that — nothing outside can make the cut.
+        counts = self._start[cells + 1] - self._start[cells]
+        enough = int(np.searchsorted(np.cumsum(counts), k)) + 1
+        rows = self._members(cells[:enough])
+        d = geodist.distances_m(self._lat[rows], self._lng[rows], lat, lng)
+        if len(d) >= k:
+            kth = np.partition(d, k - 1)[k - 1]
+            more = cells[enough:][bound[cells[enough:]] <= kth]
+            if len(more):
+                extra = self._members(more)
+                rows = np.concatenate((rows, extra))
+                d = np.concatenate((d, geodist.distances_m(
+                    self._lat[extra], self._lng[extra], lat, lng)))
+        keep = d <= limit
+        rows, d = rows[keep], d[keep]
+        order = np.argsort(d, kind="stable")[:k]
+        return self._pos[rows[order]], d[order]
+
+    def bbox(self, south, west, north, east):
+        """Positions of the points inside the box, edges inclusive, in
+        latitude order. A box with west > east spans the antimeridian."""
+        i = np.searchsorted(self._bl_lat, south, side="left")
+        j = np.searchsorted(self._bl_lat, north, side="right")
+        lng = self._bl_lng[i:j]
+        if west <= east:
+            mask = (lng >= west) & (lng <= east)
+        else:
+            mask = (lng >= west) | (lng <= east)
+        return self._bl_pos[i:j][mask]
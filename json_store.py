@@ -0,0 +1,187 @@
+"""Atomic, lock-protected writes for the JSON files under trip_data/.
+
+The app runs as several WSGI worker processes, and every metadata edit —
+a caption, a reorder, a favorite star, an upload's ownership record — is a
+read-modify-write of one whole JSON file. Done the naive way (load, mutate,
+`open(path, "w")`, dump) two things go wrong:
+
+  * lost updates: two workers load the same version, each applies its own
+    edit, and whichever dumps second silently discards the other's;
+  * torn files: `open("w")` truncates first, so a reader (or a crash)
+    landing mid-dump sees an empty or half-written file — and for
+    captions.json that reads as "every caption is gone".
+
+This module is the one write path for those files:
+
+  `write(path, data)`    dump to a temp file in the same directory, fsync,
+                         os.replace() over the target, fsync the directory.
+                         Readers see the old file or the new one, never a
+                         mix, and a crash leaves the old one intact.
+                         (`write_bytes` is the same for binary caches.)
+  `lock(path)`           exclusive fcntl.flock() on a `<path>.lock` sidecar,
+                         held across a whole read-modify-write. The sidecar
+                         (rather than the data file) because os.replace()
+                         swaps the data file's inode out from under any lock
+                         held on it. Re-entrant within a thread, so a locked
+                         helper can call another locked helper on the same
+                         file.
+  `update(path)`         the two combined: a context manager yielding the
+                         loaded data for in-place mutation, written back on
+                         exit only if it actually changed.
+
+Plain reads stay lock-free — atomic replacement is what makes them safe.
+
+fcntl is POSIX-only; without it (a Windows dev box) the lock degrades to an
+in-process one, which is all a single dev server needs.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev machines
+    fcntl = None
+
+
+# Same-process serialization. flock() already excludes other threads here
+# (each acquisition opens its own file description), but a thread-level
+# lock is what makes `lock()` re-entrant and covers the no-fcntl fallback.
+_THREAD_LOCKS = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+_HELD = threading.local()
+
+
+def _thread_lock(path):
+    with _THREAD_LOCKS_GUARD:
+        lk = _THREAD_LOCKS.get(path)
+        if lk is None:
+            lk = _THREAD_LOCKS[path] = threading.RLock()
+        return lk
+
+
+def load(path, default=dict):
+    """Parsed contents of `path`, or `default()` when it doesn't exist."""
+    if not os.path.exists(path):
+        return default()
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_bytes(path, data):
+    """Atomically replace `path` with `data` — the same temp-file, fsync and
+    os.replace() sequence as `write`, for caches under trip_data/ that
+    aren't JSON."""
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, prefix="." + os.path.basename(path) + ".",
+                               suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600; keep the target's existing mode (or the
+        # usual umask-derived one) so backups and the PA web UI can still
+        # read what we wrote.
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    # Make the rename itself durable. Not every filesystem lets a directory
+    # be opened for fsync; the data is already safe either way.
+    try:
+        dfd = os.open(d, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dfd)
+    except OSError:
+        pass
+    finally:
+        os.close(dfd)
+
+
+def _write_text(path, text):
+    write_bytes(path, text.encode("utf-8"))
+
+
+def write(path, data, **dump_kwargs):
+    """Atomically replace `path` with `data` serialized by json.dump(**dump_kwargs)."""
+    _write_text(path, json.dumps(data, **dump_kwargs))
+
+
+@contextmanager
+def lock(path, blocking=True):
+    """Hold the exclusive write lock for `path` (see module docstring).
+
+    Yields True once held. With blocking=False it doesn't wait: if another
+    process (or thread) holds the lock it yields False instead, and the
+    body should skip its work."""
+    path = os.path.abspath(path)
+    depth = getattr(_HELD, "depth", None)
+    if depth is None:
+        depth = _HELD.depth = {}
+    tlock = _thread_lock(path)
+    if not tlock.acquire(blocking):
+        yield False
+        return
+    try:
+        if depth.get(path):
+            depth[path] += 1
+            try:
+                yield True
+            finally:
+                depth[path] -= 1
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".lock", "a") as lf:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_EX
+                                | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+            depth[path] = 1
+            try:
+                yield True
+            finally:
+                depth[path] = 0
+                if fcntl is not None:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+    finally:
+        tlock.release()
+
+
+@contextmanager
+def update(path, default=dict, **dump_kwargs):
+    """Locked read-modify-write of one JSON file.
+
+        with json_store.update(CAPTIONS_FILE, indent=2) as captions:
+            captions[key] = text
+
+    The body mutates the yielded object in place; on a clean exit it's
+    written back atomically if its serialization differs from what was
+    loaded (so no-op edits don't touch the file's mtime, which several
+    caches key on). An exception in the body writes nothing."""
+    with lock(path):
+        data = load(path, default)
+        before = json.dumps(data, **dump_kwargs)
+        yield data
+        after = json.dumps(data, **dump_kwargs)
+        if after != before:
+            _write_text(path, after)
@@ -0,0 +1,126 @@
+"""Local calendar dates for whole arrays of GPS pings.
+
+Every per-day pass over a trip's track — tid selection, the tid-choice
+filter, the trip-window gate — needs each ping's local date in its own
+`tz`. `ekko_trips_app._local_date_of_ping` answers that one ping at a time:
+two ZoneInfo lookups and an aware-datetime conversion per ping, several
+passes per request over ~10k pings.
+
+Here each zone is resolved once per span of timestamps into its UTC-offset
+transition table (`_offset_table`, cached), and a whole batch is bucketed
+with a searchsorted into that table and one floor division. The result is
+per-ping epoch day numbers (`day_numbers`) or the ISO strings the callers
+key their dicts by (`local_dates`), the latter formatted once per distinct
+day rather than once per ping.
+
+Same UTC fallback as `_local_date_of_ping` for a missing or unknown zone.
+"""
+
+import functools
+from datetime import date, datetime
+
+import numpy as np
+
+try:
+    from zoneinfo import ZoneInfo
+except Exception:  # pragma: no cover - py<3.9 hosts fall back to UTC
+    ZoneInfo = None
+
+DAY_S = 86400
+# Returned in day_numbers() for pings with no `tst`.
+NO_DAY = np.iinfo(np.int64).min
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Sampling step when scanning a span for offset changes. Real zones change
+# offset at most a few times a year, never twice within one day, so a daily
+# scan can't step over a transition pair; each change found is then
+# bisected to the exact second.
+_SCAN_S = DAY_S
+
+
+def _zone(tz_name):
+    if not tz_name or tz_name == "UTC" or ZoneInfo is None:
+        return None
+    try:
+        return ZoneInfo(tz_name)
+    except Exception:
+        return None
+
+
+def _offset_at(zone, t):
+    return int(datetime.fromtimestamp(t, zone).utcoffset().total_seconds())
+
+
+@functools.lru_cache(maxsize=256)
+def _offset_table(tz_name, lo_day, hi_day):
+    """(transitions, offsets) for `tz_name` over epoch days
+    [lo_day, hi_day]: offsets[i] applies from transitions[i - 1] (the first
+    second of the new offset) up to transitions[i]; offsets[0] from the
+    start of the span. An unknown zone is UTC throughout."""
+    zone = _zone(tz_name)
+    if zone is None:
+        return np.empty(0, np.int64), np.zeros(1, np.int64)
+    lo, hi = lo_day * DAY_S, (hi_day + 1) * DAY_S
+    transitions = []
+    offsets = [_offset_at(zone, lo)]
+    t = lo
+    while t < hi:
+        nxt = min(t + _SCAN_S, hi)
+        off = _offset_at(zone, nxt)
+        if off != offsets[-1]:
+            a, b = t, nxt  # offset(a) is the old one, offset(b) the new
+            while b - a > 1:
+                mid = (a + b) // 2
+                if _offset_at(zone, mid) == offsets[-1]:
+                    a = mid
+                else:
+                    b = mid
+            transitions.append(b)
+            offsets.append(off)
+        t = nxt
+    return np.asarray(transitions, np.int64), np.asarray(offsets, np.int64)
+
+
+def day_numbers(points, default_tz=None):
+    """Local epoch-day number (days since 1970-01-01 on the ping's own
+    clock) for each of `points`, as an int64 array aligned with them; NO_DAY
+    where a ping has no `tst`. A ping without a `tz` uses `default_tz`,
+    else UTC."""
+    n = len(points)
+    days = np.full(n, NO_DAY, np.int64)
+    by_zone = {}
+    for i, p in enumerate(points):
+        tst = p.get("tst")
+        if tst is not None:
+            idx, tsts = by_zone.setdefault(p.get("tz") or default_tz or "UTC",
+                                           ([], []))
+            idx.append(i)
+            tsts.append(tst)
+    for tz_name, (idx, tsts) in by_zone.items():
+        # float64 holds any epoch second exactly and keeps fractional
+        # timestamps on the day they fall in.
+        t = np.asarray(tsts, np.float64)
+        lo_day = int(t.min() // DAY_S)
+        hi_day = int(t.max() // DAY_S)
+        transitions, offsets = _offset_table(tz_name, lo_day, hi_day)
+        off = offsets[np.searchsorted(transitions, t, side="right")]
+        days[idx] = np.floor_divide(t + off, DAY_S).astype(np.int64)
+    return days
+
+
+def iso(day):
+    """'YYYY-MM-DD' for an epoch day number."""
+    return date.fromordinal(_EPOCH_ORDINAL + int(day)).isoformat()
+
+
+def local_dates(points, default_tz=None):
+    """Each ping's local date as 'YYYY-MM-DD' (None without a `tst`) — a
+    list aligned with `points`. See day_numbers."""
+    days = day_numbers(points, default_tz)
+    if not len(days):
+        return []
+    uniq, inverse = np.unique(days, return_inverse=True)
+    labels = [None if d == NO_DAY else iso(d) for d in uniq.tolist()]
+    return [labels[k] for k in inverse.tolist()]
+
@@ -0,0 +1,256 @@
+"""Slippy-map tile lookups over a fixed set of points — which points fall in
+tile z/x/y, and which clusters of them a zoomed-out tile shows.
+
+Tiles are the standard Web-Mercator z/x/y scheme Leaflet's tile layers use
+(x grows east, y grows south, 2^z × 2^z tiles at zoom z). Each point gets a
+Morton (Z-order) code over its integer pixel position at `MAX_ZOOM`: the
+x and y bits interleaved, so every tile at every zoom is one contiguous run
+of codes. With the points sorted by code, a tile is two binary searches and
+a slice — no per-point test, at any zoom.
+
+`ClusterIndex` is the zoomed-out half: a supercluster-style hierarchy, one
+level per zoom, built bottom-up by greedy radius clustering (each level
+clusters the one below it, so every cluster is a subtree). Numbering the
+leaves in depth-first order makes every cluster a contiguous run of them —
+so a cluster's size, or its centroid, under any filter is a difference of
+two prefix sums over a mask, and filtering never needs a rebuild.
+
+Both are built over a list of (lat, lng) pairs, like geoindex.GeoIndex, and
+answer with positions into that list; the caller maps them back to rows.
+"""
+
+import numpy as np
+
+# Deepest zoom a code resolves. 24 bits per axis: both fit one int64, and a
+# zoom-24 tile is a couple of metres — far below any campground spacing.
+MAX_ZOOM = 24
+# Mercator's latitude limit: the square world map ends here.
+_MAX_LAT = 85.05112878
+
+# ClusterIndex's radius in screen pixels (256 px tiles): at each zoom a cluster
+# takes in everything within this of the point it starts from — about the
+# spacing at which the bubbles stop crowding each other.
+CLUSTER_RADIUS_PX = 40
+
+
+def _spread(v):
+    """Spread the low 24 bits of each value out to the even bit positions."""
+    v = v & 0xFFFFFF
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    v = (v | (v << 1)) & 0x5555555555555555
+    return v
+
+
+def _morton(xi, yi):
+    return (_spread(xi) << 1) | _spread(yi)
+
+
+def mercator(lats, lngs):
+    """Web-Mercator (x, y) in [0, 1) for arrays of lat/lng, y growing south."""
+    lat = np.radians(np.clip(lats, -_MAX_LAT, _MAX_LAT))
+    x = (np.asarray(lngs, np.float64) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return x, y
+
+
+def unmercator(x, y):
+    """Inverse of `mercator`: (lats, lngs) for arrays of Web-Mercator x, y."""
+    lngs = np.asarray(x, np.float64) * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * np.asarray(y)))))
+    return lats, lngs
+
+
+def _usable(coords):
+    """(positions, lats, lngs) of the pairs in `coords` that have two finite
+    numbers; the rest are left out."""
+    pos, lats, lngs = [], [], []
+    for i, ll in enumerate(coords):
+        if ll is None or ll[0] is None or ll[1] is None:
+            continue
+        try:
+            a, b = float(ll[0]), float(ll[1])
+        except (TypeError, ValueError):
+            continue
+        if np.isfinite(a) and np.isfinite(b):
+            pos.append(i)
+            lats.append(a)
+            lngs.append(b)
+    return (np.asarray(pos, np.int64), np.asarray(lats, np.float64),
+            np.asarray(lngs, np.float64))
+
+
+class TileIndex:
+    """Index over `coords`, a sequence of (lat, lng) pairs. A pair with a None
+    (or a non-finite value) is left out, as in geoindex.GeoIndex."""
+
+    def __init__(self, coords):
+        pos, lats, lngs = _usable(coords)
+        x, y = mercator(lats, lngs)
+        side = 1 << MAX_ZOOM
+        xi = np.clip((x * side).astype(np.int64), 0, side - 1)
+        yi = np.clip((y * side).astype(np.int64), 0, side - 1)
+        codes = _morton(xi, yi)
+        order = np.argsort(codes, kind="stable")
+        self._codes = codes[order]
+        self._pos = pos[order]
+
+    def __len__(self):
+        return len(self._pos)
+
+    def _range(self, z, x, y):
+        shift = 2 * (MAX_ZOOM - z)
+        prefix = int(_morton(np.int64(x), np.int64(y)))
+        i = np.searchsorted(self._codes, prefix << shift, side="left")
+        j = np.searchsorted(self._codes, (prefix + 1) << shift, side="left")
+        return i, j
+
+    def tile(self, z, x, y):
+        """Positions of the points in tile z/x/y, in Morton order (so nearby
+        points come out near each other)."""
+        i, j = self._range(z, x, y)
+        return self._pos[i:j]
+
+
+class _Level:
+    """One zoom of a ClusterIndex: its nodes' leaf ranges and expansion zooms,
+    and a TileIndex over their centroids."""
+
+    def __init__(self, ids, lo, hi, made, node_x, node_y):
+        ids = np.asarray(ids, np.int64)
+        self.lo = lo[ids]
+        self.hi = hi[ids]
+        self.expand = made[ids] + 1
+        lats, lngs = unmercator(node_x[ids], node_y[ids])
+        self.tiles = TileIndex(list(zip(lats.tolist(), lngs.tolist())))
+
+
+class ClusterIndex:
+    """Hierarchical clusters of `coords` for zooms 0 through `max_zoom`.
+
+    Built supercluster's way: the points are the level below `max_zoom`;
+    each zoom, working down, walks the level below in order and makes each
+    node not yet taken the seed of a cluster of every untaken node within
+    `CLUSTER_RADIUS_PX` of it, placed at their weighted centroid (in Mercator
+    space). A node with nothing in reach passes down unchanged."""
+
+    def __init__(self, coords, max_zoom):
+        self.max_zoom = max_zoom
+        pos, lats, lngs = _usable(coords)
+        n = len(pos)
+        x, y = mercator(lats, lngs)
+        # Node tables, leaves first: node i < n is point i.
+        node_x, node_y = x.tolist(), y.tolist()
+        weight = [1] * n
+        children = [()] * n
+        made = [max_zoom + 1] * n   # the zoom a node first appears at
+        level_ids = {}
+        current = list(range(n))
+        for z in range(max_zoom, -1, -1):
+            r = CLUSTER_RADIUS_PX / (256.0 * (1 << z))
+            r2 = r * r
+            grid = {}
+            for nid in current:
+                grid.setdefault((int(node_x[nid] // r), int(node_y[nid] // r)),
+                                []).append(nid)
+            taken = set()
+            below = []
+            for nid in current:
+                if nid in taken:
+                    continue
+                taken.add(nid)
+                cx, cy = node_x[nid], node_y[nid]
+                gx, gy = int(cx // r), int(cy // r)
+                members = [nid]
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        for m in grid.get((gx + dx, gy + dy), ()):
+                            if m in taken:
+                                continue
+                            ex, ey = node_x[m] - cx, node_y[m] - cy
+                            if ex * ex + ey * ey <= r2:
+                                taken.add(m)
+                                members.append(m)
+                if len(members) == 1:
+                    below.append(nid)
+                    continue
+                w = sum(weight[m] for m in members)
+                node_x.append(sum(node_x[m] * weight[m] for m in members) / w)
+                node_y.append(sum(node_y[m] * weight[m] for m in members) / w)
+                weight.append(w)
+                children.append(tuple(members))
+                made.append(z)
+                below.append(len(node_x) - 1)
+            level_ids[z] = below
+            current = below
+
+        # Depth-first leaf numbering: node k covers leaves [lo[k], hi[k]).
+        total = len(node_x)
+        lo = np.zeros(total, np.int64)
+        hi = np.zeros(total, np.int64)
+        order = []
+        for root in level_ids.get(0, ()):
+            stack = [(root, False)]
+            while stack:
+                nid, done = stack.pop()
+                if done:
+                    hi[nid] = len(order)
+                    continue
+                lo[nid] = len(order)
+                if nid < n:
+                    order.append(nid)
+                    hi[nid] = len(order)
+                    continue
+                stack.append((nid, True))
+                stack.extend((c, False) for c in reversed(children[nid]))
+        order = np.asarray(order, np.int64)
+        self._leaf_pos = pos[order]
+        self._leaf_x = x[order]
+        self._leaf_y = y[order]
+        self._unfiltered = self._prefix(None)
+        node_x = np.asarray(node_x)
+        node_y = np.asarray(node_y)
+        made = np.asarray(made, np.int64)
+        self._levels = {z: _Level(ids, lo, hi, made, node_x, node_y)
+                        for z, ids in level_ids.items()}
+
+    def __len__(self):
+        return len(self._leaf_pos)
+
+    def _prefix(self, keep):
+        """Prefix sums over the leaves — count, x, y — of those `keep` allows."""
+        k = (np.ones(len(self._leaf_pos)) if keep is None
+             else keep[self._leaf_pos].astype(np.float64))
+        return tuple(np.concatenate(([0.0], np.cumsum(v)))
+                     for v in (k, k * self._leaf_x, k * self._leaf_y))
+
+    def tile(self, z, x, y, keep=None):
+        """Zoom-`z` clusters whose centroid falls in tile z/x/y (z at most
+        `max_zoom`).
+
+        `keep`, if given, is a boolean mask over the original `coords`
+        positions: only the points it allows are counted, a cluster left with
+        none is dropped, and one left with a single point comes back as that
+        point. Returns `(singles, lat, lng, count, expand)`: positions of
+        the lone points, then each remaining cluster's centroid (of its
+        counted members), size, and the zoom at which it splits up."""
+        level = self._levels.get(z)
+        if level is None:
+            empty = np.empty(0)
+            return (np.empty(0, np.int64), empty, empty,
+                    np.empty(0, np.int64), np.empty(0, np.int64))
+        nodes = level.tiles.tile(z, x, y)
+        lo, hi = level.lo[nodes], level.hi[nodes]
+        c, sx, sy = (self._unfiltered if keep is None
+                     else self._prefix(keep))
+        count = np.rint(c[hi] - c[lo]).astype(np.int64)
+        # The one kept leaf of a single: the first whose prefix passes lo's.
+        one = count == 1
+        leaf = np.searchsorted(c, c[lo[one]] + 1, side="left") - 1
+        singles = self._leaf_pos[leaf]
+        multi = count >= 2
+        lo, hi, n = lo[multi], hi[multi], count[multi]
+        lat, lng = unmercator((sx[hi] - sx[lo]) / n, (sy[hi] - sy[lo]) / n)
+        return singles, lat, lng, n, level.expand[nodes][multi]
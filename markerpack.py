@@ -0,0 +1,206 @@
+"""Columnar binary encoding for the campground map's marker rows.
+
+`/api/campgrounds/markers` hands the browser every campground's slim row as
+a JSON list of dicts: ~12.9k copies of the same eight keys, a "lat,lng"
+string per row, and the same handful of waterfront / climate / ownership /
+state strings over and over. `pack` turns the same rows into one column per
+field, each the narrowest typed array that holds it:
+
+  int      a field that is an int on every row (ids, visit counts) — stored
+           as deltas from the row before when that narrows the type
+  dict     anything else (names, states, the legend enums): a table of the
+           field's distinct values, and per row an index into it
+  coords   the "lat,lng" field: fixed-point integers (`COORD_SCALE` per
+           degree), delta-encoded, one array per axis
+
+The browser reads each column as a typed-array view straight over the
+response buffer (templates/campground_map.html, `unpackMarkers`); only the
+header — the tables and the column layout — goes through JSON.parse.
+
+Lossless for what the map sees. A coords row decodes to the shortest
+decimal string for its fixed-point value — what both Python's repr and
+JavaScript's String give — so a location already written that way comes back
+byte for byte, and any other spelling (trailing zeros, a space after the
+comma) rides along verbatim in the column's `exact` list. A field that is
+None decodes as missing, which is how the map reads None anyway.
+
+Layout: b"EKM1", the header's length as a little-endian uint32, the header
+(UTF-8 JSON, space-padded to a multiple of 4 bytes), then each column's
+array at the byte `offset` the header gives it, little-endian, 4-byte
+aligned so a typed array can view it in place. `unpack` is the reference
+decoder; tests/test_markerpack.py holds the two ends to each other.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"EKM1"
+MIMETYPE = "application/x-ekko-markers"
+# Fixed-point units per degree: 1e-6° is ~11 cm, finer than any location in
+# the database is written to.
+COORD_SCALE = 1_000_000
+
+# Narrowest first; the name is what the header (and the JS decoder) uses.
+_INT_TYPES = (("u8", np.uint8), ("i8", np.int8), ("u16", np.uint16),
+              ("i16", np.int16), ("u32", np.uint32), ("i32", np.int32))
+_DTYPES = dict(_INT_TYPES)
+
+
+def _narrowest(values):
+    """(name, dtype) of the smallest integer type that holds all `values`, or
+    None if not even int32 does."""
+    lo = int(values.min()) if len(values) else 0
+    hi = int(values.max()) if len(values) else 0
+    for name, dtype in _INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return name, dtype
+    return None
+
+
+def _deltas(values):
+    return np.diff(values, prepend=np.int64(0))
+
+
+def _js_number(v):
+    """How JavaScript's String() writes the float `v`, or None when it might
+    not match Python's (exponent notation differs between the two)."""
+    r = repr(v)
+    if "e" in r:
+        return None
+    if r.endswith(".0"):
+        r = r[:-2]
+    return "0" if r == "-0" else r
+
+
+def _coord_column(values):
+    """Fixed-point (lat, lng) arrays for a coords field, and `[row, text]` for
+    each row whose text the decoder wouldn't reproduce (None text: the row
+    has no such field)."""
+    n = len(values)
+    lat = np.zeros(n, np.int64)
+    lng = np.zeros(n, np.int64)
+    exact = []
+    prev = (0, 0)
+    for i, text in enumerate(values):
+        q = None
+        if isinstance(text, str):
+            try:
+                a, b = (float(p) for p in text.split(","))
+            except ValueError:
+                a = b = float("nan")
+            # On the globe, so every delta fits an int32.
+            if abs(a) <= 90 and abs(b) <= 180:
+                q = (round(a * COORD_SCALE), round(b * COORD_SCALE))
+        if q is None:
+            # Nothing to place: repeat the previous point (a zero delta).
+            exact.append([i, text])
+            q = prev
+        else:
+            a, b = (_js_number(v / COORD_SCALE) for v in q)
+            if a is None or b is None or f"{a},{b}" != text:
+                exact.append([i, text])
+        lat[i], lng[i] = q
+        prev = q
+    return lat, lng, exact
+
+
+def pack(rows, fields, coords=None):
+    """Encode `rows` (dicts) as the columns `fields`, in order. `coords`
+    names the field, if any, holding "lat,lng" strings. Returns bytes."""
+    n = len(rows)
+    columns = []
+    arrays = []
+    for field in fields:
+        values = [r.get(field) for r in rows]
+        if field == coords:
+            lat, lng, exact = _coord_column(values)
+            lat, lng = _deltas(lat), _deltas(lng)
+            name, dtype = _narrowest(np.concatenate((lat, lng)))
+            columns.append({"field": field, "kind": "coords", "type": name,
+                            "scale": COORD_SCALE, "exact": exact})
+            arrays.append(np.concatenate((lat, lng)).astype(dtype))
+            continue
+        if n and all(type(v) is int and -2**62 < v < 2**62 for v in values):
+            ints = np.asarray(values, np.int64)
+            # Plain values, or deltas if those fit a narrower type.
+            fits = [(t, delta, arr) for delta, arr in
+                    ((False, ints), (True, _deltas(ints)))
+                    for t in [_narrowest(arr)] if t is not None]
+            if fits:
+                (name, dtype), delta, arr = min(
+                    fits, key=lambda f: np.dtype(f[0][1]).itemsize)
+                columns.append({"field": field, "kind": "int", "type": name,
+                                "delta": delta})
+                arrays.append(arr.astype(dtype))
+                continue
+        # Keyed by type too: 1, 1.0 and True are one dict key otherwise.
+        table = {}
+        idx = np.fromiter((table.setdefault((type(v), v), len(table))
+                           for v in values), np.int64, n)
+        name, dtype = _narrowest(idx)
+        columns.append({"field": field, "kind": "dict", "type": name,
+                        "table": [v for _, v in table]})
+        arrays.append(idx.astype(dtype))
+
+    def head(offset):
+        for col, arr in zip(columns, arrays):
+            col["offset"] = offset
+            offset += -(-arr.nbytes // 4) * 4
+        text = json.dumps({"count": n, "columns": columns},
+                          separators=(",", ":")).encode("utf-8")
+        return text + b" " * (-len(text) % 4)
+
+    # The offsets are inside the header, so its length depends on them.
+    # Re-lay until it stops growing — a pass or two.
+    header = b""
+    while True:
+        again = head(8 + len(header))
+        if len(again) == len(header):
+            break
+        header = again
+    header = again
+    out = [MAGIC, struct.pack("<I", len(header)), header]
+    for arr in arrays:
+        data = arr.astype(arr.dtype.newbyteorder("<")).tobytes()
+        out.append(data + b"\0" * (-len(data) % 4))
+    return b"".join(out)
+
+
+def unpack(buf):
+    """Decode `pack`'s output back to a list of row dicts."""
+    if buf[:4] != MAGIC:
+        raise ValueError("not a packed marker buffer")
+    (size,) = struct.unpack_from("<I", buf, 4)
+    meta = json.loads(buf[8:8 + size].decode("utf-8"))
+    n = meta["count"]
+    rows = [{} for _ in range(n)]
+    for col in meta["columns"]:
+        dtype = np.dtype(_DTYPES[col["type"]]).newbyteorder("<")
+        field = col["field"]
+        if col["kind"] == "coords":
+            arr = np.frombuffer(buf, dtype, 2 * n, col["offset"])
+            lat = np.cumsum(arr[:n], dtype=np.int64).tolist()
+            lng = np.cumsum(arr[n:], dtype=np.int64).tolist()
+            scale = col["scale"]
+            exact = dict(col["exact"])
+            for i, row in enumerate(rows):
+                text = exact.get(i, row)
+                if text is row:
+                    text = (f"{_js_number(lat[i] / scale)},"
+                            f"{_js_number(lng[i] / scale)}")
+                if text is not None:
+                    row[field] = text
+            continue
+        arr = np.frombuffer(buf, dtype, n, col["offset"]).astype(np.int64)
+        if col["kind"] == "int":
+            values = (np.cumsum(arr) if col["delta"] else arr).tolist()
+        else:
+            table = col["table"]
+            values = [table[i] for i in arr.tolist()]
+        for row, v in zip(rows, values):
+            if v is not None:
+                row[field] = v
+    return rows
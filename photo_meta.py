@@ -0,0 +1,469 @@
+"""Per-photo metadata: captions, uploaders, favorites, people counts and the
+per-grid display order.
+
+These used to be five independent JSON files under trip_data/, each keyed by
+the photo's storage subpath ("{trip_id}/{stay_idx}/{filename}" or
+"{trip_id}/events/{event_idx}/{filename}"; photo_order is keyed by the grid,
+the same string minus the filename):
+
+  captions.json          {key: caption text}
+  photo_uploaders.json   {key: username}
+  photo_favorites.json   {key: true}          (absent = not starred)
+  photo_people.json      {key: face count}    (absent = not yet scanned)
+  photo_order.json       {grid: [filename, ...]}
+
+and every photo operation touched several of them: a move renamed the key in
+four files and rewrote two order lists, a stay re-sort rewrote all five, the
+pool build read all of them whole. This module is the one place that knows
+where the metadata lives, with two engines behind the same functions:
+
+  JSON     the five files above, each edit a locked read-modify-write
+           through json_store. The default.
+  SQLite   trip_data/photo_meta.db: one `photo_meta` row per photo key (a
+           column per field) and one `photo_order` row per grid, so a move,
+           a trash purge or a whole-grid delete is one transaction and a
+           stay's metadata is one primary-key range scan.
+
+Like trips.db (trip_store.py) it's opt-in: the database's presence is the
+switch. `python photo_meta.py migrate-sqlite` builds it from the JSON files;
+`python photo_meta.py export-json` writes them back out, which backup.sh
+does before bundling so backups stay in the JSON format either way.
+
+Every function speaks the JSON files' shapes (favorites as True, people as
+an int), so callers can't tell which engine is active.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+import json_store
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+TRIP_DATA_DIR = os.path.join(_DIR, "trip_data")
+CAPTIONS_JSON = os.path.join(TRIP_DATA_DIR, "captions.json")
+ORDER_JSON = os.path.join(TRIP_DATA_DIR, "photo_order.json")
+UPLOADERS_JSON = os.path.join(TRIP_DATA_DIR, "photo_uploaders.json")
+FAVORITES_JSON = os.path.join(TRIP_DATA_DIR, "photo_favorites.json")
+PEOPLE_JSON = os.path.join(TRIP_DATA_DIR, "photo_people.json")
+DB = os.path.join(TRIP_DATA_DIR, "photo_meta.db")
+
+# Per-photo fields, in the order the table's columns hold them. "order" is
+# the sixth kind of metadata but is keyed per grid, not per photo.
+FIELDS = ("captions", "uploaders", "favorites", "people")
+_COLUMNS = {"captions": "caption", "uploaders": "uploader",
+            "favorites": "favorite", "people": "people"}
+
+# The app's JSON format (see its _JSON_DUMP_KWARGS): literal unicode keeps
+# a caption edit from re-escaping every other caption in the file.
+_DUMP = {"indent": 2, "ensure_ascii": False}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS photo_meta (
+    key      TEXT PRIMARY KEY,
+    caption  TEXT,
+    uploader TEXT,
+    favorite INTEGER,
+    people   INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS photo_order (
+    grid      TEXT PRIMARY KEY,
+    filenames TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_ALL_NULL = " AND ".join(f"{c} IS NULL" for c in _COLUMNS.values())
+
+
+def _json_path(field):
+    return {"captions": CAPTIONS_JSON, "uploaders": UPLOADERS_JSON,
+            "favorites": FAVORITES_JSON, "people": PEOPLE_JSON,
+            "order": ORDER_JSON}[field]
+
+
+def sqlite_active():
+    return os.path.exists(DB)
+
+
+def data_paths():
+    """The file(s) holding the metadata right now — for mtime-keyed caches."""
+    if sqlite_active():
+        return (DB,)
+    return tuple(_json_path(f) for f in FIELDS + ("order",))
+
+
+def _connect(path=None):
+    """Same connection policy as trip_store._connect: rollback journal (so
+    the file's mtime moves on every commit) and a 10 s busy timeout."""
+    conn = sqlite3.connect(path or DB, timeout=10)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _prefix_range(prefix):
+    # Primary-key range standing in for LIKE 'prefix%' (which can't use the
+    # index and would treat _ and % in filenames as wildcards). U+10FFFF
+    # sorts after every real character under SQLite's bytewise collation.
+    return prefix, prefix + "\U0010ffff"
+
+
+def _to_sql(field, value):
+    if value is None:
+        return None
+    if field == "favorites":
+        return 1 if value else None
+    return value
+
+
+def _from_sql(field, value):
+    return True if field == "favorites" else value
+
+
+def _prune(conn, keys):
+    """Drop rows the edit left with no metadata at all, so the table stays
+    the size of what's recorded (the JSON files delete keys the same way)."""
+    conn.executemany(f"DELETE FROM photo_meta WHERE key = ? AND {_ALL_NULL}",
+                     [(k,) for k in keys])
+
+
+def _set_columns(conn, key, values):
+    """Upsert some fields of one photo's row; None clears a field."""
+    cols = [_COLUMNS[f] for f in values]
+    params = [_to_sql(f, v) for f, v in values.items()]
+    conn.execute(
+        f"INSERT INTO photo_meta (key, {', '.join(cols)}) "
+        f"VALUES (?{', ?' * len(cols)}) ON CONFLICT(key) DO UPDATE SET "
+        + ", ".join(f"{c} = excluded.{c}" for c in cols),
+        [key] + params)
+
+
+# ── Reads ──────────────────────────────────────────────────────────────────
+
+def load_all(prefix=None):
+    """{"captions", "uploaders", "favorites", "people", "order"} → the same
+    dicts the JSON files hold, optionally only the keys under `prefix`
+    (e.g. "12/" for one trip). One pass over each table under SQLite."""
+    out = {f: {} for f in FIELDS + ("order",)}
+    if not sqlite_active():
+        for field in out:
+            data = json_store.load(_json_path(field))
+            if prefix is not None:
+                data = {k: v for k, v in data.items() if k.startswith(prefix)}
+            out[field] = data
+        return out
+    where, params = "", ()
+    if prefix is not None:
+        where, params = " WHERE {col} >= ? AND {col} < ?", _prefix_range(prefix)
+    with closing(_connect()) as conn:
+        cols = ", ".join(_COLUMNS[f] for f in FIELDS)
+        for row in conn.execute(
+                f"SELECT key, {cols} FROM photo_meta"
+                + where.format(col="key"), params):
+            for field, value in zip(FIELDS, row[1:]):
+                if value is not None:
+                    out[field][row[0]] = _from_sql(field, value)
+        for grid, filenames in conn.execute(
+                "SELECT grid, filenames FROM photo_order"
+                + where.format(col="grid"), params):
+            out["order"][grid] = json.loads(filenames)
+    return out
+
+
+def get(field, key):
+    """One photo's value for one field (None when unset)."""
+    if not sqlite_active():
+        return json_store.load(_json_path(field)).get(key)
+    with closing(_connect()) as conn:
+        row = conn.execute(f"SELECT {_COLUMNS[field]} FROM photo_meta "
+                           f"WHERE key = ?", (key,)).fetchone()
+    if row is None or row[0] is None:
+        return None
+    return _from_sql(field, row[0])
+
+
+# ── Per-photo writes ───────────────────────────────────────────────────────
+
+def set_many(field, values):
+    """Set one field for several photos: {key: value}; a None value clears
+    it. Returns True if anything actually changed."""
+    if not values:
+        return False
+    if not sqlite_active():
+        with json_store.update(_json_path(field), **_DUMP) as data:
+            before = dict(data)
+            for key, value in values.items():
+                if value is None or (field == "favorites" and not value):
+                    data.pop(key, None)
+                else:
+                    data[key] = True if field == "favorites" else value
+            return data != before
+    col = _COLUMNS[field]
+    with closing(_connect()) as conn, conn:
+        changed = False
+        for key, value in values.items():
+            row = conn.execute(f"SELECT {col} FROM photo_meta WHERE key = ?",
+                               (key,)).fetchone()
+            new = _to_sql(field, value)
+            if (row[0] if row else None) == new:
+                continue
+            changed = True
+            _set_columns(conn, key, {field: value})
+        _prune(conn, values)
+        return changed
+
+
+def set_value(field, key, value):
+    """Set (or with None, clear) one field of one photo. Returns True if it
+    changed."""
+    return set_many(field, {key: value})
+
+
+def merge_people(updates, removed=()):
+    """Apply a detect_people.py run — new face counts, and records whose
+    photo is gone — and return the whole {key: count} map afterwards."""
+    values = {k: None for k in removed}
+    values.update(updates)
+    set_many("people", values)
+    return load_all()["people"]
+
+
+# ── Grid order ─────────────────────────────────────────────────────────────
+
+def set_order(grid, filenames):
+    """Replace one grid's explicit display order (None removes it)."""
+    if not sqlite_active():
+        with json_store.update(ORDER_JSON, **_DUMP) as order:
+            if filenames is None:
+                order.pop(grid, None)
+            else:
+                order[grid] = list(filenames)
+        return
+    with closing(_connect()) as conn, conn:
+        if filenames is None:
+            conn.execute("DELETE FROM photo_order WHERE grid = ?", (grid,))
+        else:
+            conn.execute("INSERT OR REPLACE INTO photo_order VALUES (?, ?)",
+                         (grid, json.dumps(list(filenames), ensure_ascii=False)))
+
+
+# ── Whole-photo operations ─────────────────────────────────────────────────
+# Each of these used to be one full-file rewrite per metadata file. The
+# JSON engine still does that (each under its own lock); the SQLite one does
+# the lot in a single transaction.
+
+def remove_photos(grid, filenames):
+    """Scrub every record of some photos in one grid — caption, uploader,
+    favorite, people count, and their places in the grid order. Returns True
+    if a favorite or people record went (what the photo pool carries)."""
+    keys = [f"{grid}/{f}" for f in filenames]
+    if not keys:
+        return False
+    gone = set(filenames)
+    if not sqlite_active():
+        pool_changed = False
+        for field in FIELDS:
+            with json_store.update(_json_path(field), **_DUMP) as data:
+                hit = [data.pop(k) for k in keys if k in data]
+            pool_changed |= bool(hit) and field in ("favorites", "people")
+        with json_store.update(ORDER_JSON, **_DUMP) as order:
+            if grid in order:
+                order[grid] = [f for f in order[grid] if f not in gone]
+        return pool_changed
+    with closing(_connect()) as conn, conn:
+        marks = ",".join("?" * len(keys))
+        pool_changed = conn.execute(
+            f"SELECT 1 FROM photo_meta WHERE key IN ({marks}) AND "
+            f"(favorite IS NOT NULL OR people IS NOT NULL) LIMIT 1",
+            keys).fetchone() is not None
+        conn.execute(f"DELETE FROM photo_meta WHERE key IN ({marks})", keys)
+        _filter_order(conn, grid, lambda f: f not in gone)
+    return pool_changed
+
+
+def remove_grid(grid):
+    """Scrub everything recorded for one stay's/event's photos (the grid's
+    order and every per-photo record under it). Returns True if a favorite
+    or people record went."""
+    prefix = grid + "/"
+    if not sqlite_active():
+        pool_changed = False
+        for field in FIELDS:
+            with json_store.update(_json_path(field), **_DUMP) as data:
+                doomed = [k for k in data if k.startswith(prefix)]
+                for k in doomed:
+                    del data[k]
+            pool_changed |= bool(doomed) and field in ("favorites", "people")
+        set_order(grid, None)
+        return pool_changed
+    lo, hi = _prefix_range(prefix)
+    with closing(_connect()) as conn, conn:
+        pool_changed = conn.execute(
+            "SELECT 1 FROM photo_meta WHERE key >= ? AND key < ? AND "
+            "(favorite IS NOT NULL OR people IS NOT NULL) LIMIT 1",
+            (lo, hi)).fetchone() is not None
+        conn.execute("DELETE FROM photo_meta WHERE key >= ? AND key < ?",
+                     (lo, hi))
+        conn.execute("DELETE FROM photo_order WHERE grid = ?", (grid,))
+    return pool_changed
+
+
+def move_photo(src_grid, filename, dst_grid, dst_filename):
+    """Carry one photo's records from `src_grid/filename` to
+    `dst_grid/dst_filename`, dropping it from the source grid's order and
+    appending it to the destination's. An empty caption isn't carried."""
+    old_key = f"{src_grid}/{filename}"
+    new_key = f"{dst_grid}/{dst_filename}"
+    if not sqlite_active():
+        for field in FIELDS:
+            with json_store.update(_json_path(field), **_DUMP) as data:
+                value = data.pop(old_key, None)
+                if value or (value is not None and field != "captions"):
+                    data[new_key] = value
+        with json_store.update(ORDER_JSON, **_DUMP) as order:
+            if src_grid in order:
+                order[src_grid] = [f for f in order[src_grid] if f != filename]
+            order.setdefault(dst_grid, []).append(dst_filename)
+        return
+    cols = ", ".join(_COLUMNS[f] for f in FIELDS)
+    with closing(_connect()) as conn, conn:
+        row = conn.execute(f"SELECT {cols} FROM photo_meta WHERE key = ?",
+                           (old_key,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM photo_meta WHERE key = ?", (old_key,))
+            values = dict(zip(FIELDS, row))
+            if not values["captions"]:
+                values["captions"] = None
+            conn.execute(f"INSERT OR REPLACE INTO photo_meta (key, {cols}) "
+                         f"VALUES (?, ?, ?, ?, ?)",
+                         [new_key] + [values[f] for f in FIELDS])
+            _prune(conn, [new_key])
+        _filter_order(conn, src_grid, lambda f: f != filename)
+        row = conn.execute("SELECT filenames FROM photo_order WHERE grid = ?",
+                           (dst_grid,)).fetchone()
+        names = json.loads(row[0]) if row else []
+        names.append(dst_filename)
+        conn.execute("INSERT OR REPLACE INTO photo_order VALUES (?, ?)",
+                     (dst_grid, json.dumps(names, ensure_ascii=False)))
+
+
+def _filter_order(conn, grid, keep):
+    row = conn.execute("SELECT filenames FROM photo_order WHERE grid = ?",
+                       (grid,)).fetchone()
+    if row is None:
+        return
+    names = json.loads(row[0])
+    kept = [f for f in names if keep(f)]
+    if kept != names:
+        conn.execute("UPDATE photo_order SET filenames = ? WHERE grid = ?",
+                      (json.dumps(kept, ensure_ascii=False), grid))
+
+
+def _remapped(key, prefix_slash, mapping):
+    """`key` with its index segment after `prefix_slash` renumbered through
+    `mapping`, or None when it isn't one of the keys being remapped."""
+    if not key.startswith(prefix_slash):
+        return None
+    parts = key[len(prefix_slash):].split("/", 1)
+    try:
+        idx = int(parts[0])
+    except ValueError:
+        return None
+    if idx not in mapping:
+        return None
+    suffix = ("/" + parts[1]) if len(parts) > 1 else ""
+    return f"{prefix_slash}{mapping[idx]}{suffix}"
+
+
+def remap_indices(key_prefix, mapping):
+    """Renumber the stay/event index in every key matching
+    `key_prefix/{idx}[/...]` — after a sort moved the photo directories
+    (see trips._remap_indices_after_sort). `mapping` is {old_idx: new_idx}."""
+    prefix_slash = key_prefix + "/"
+    if not sqlite_active():
+        for field in FIELDS + ("order",):
+            path = _json_path(field)
+            if not os.path.exists(path):
+                continue
+            with json_store.update(path, **_DUMP) as data:
+                new_data = {}
+                for key, value in data.items():
+                    new_data[_remapped(key, prefix_slash, mapping) or key] = value
+                data.clear()
+                data.update(new_data)
+        return
+    lo, hi = _prefix_range(prefix_slash)
+    with closing(_connect()) as conn, conn:
+        # Read every affected row, delete them all, then re-insert under the
+        # new keys — renaming in place could collide with a key that's about
+        # to move out of the way (a swap of two stays).
+        for table, key_col in (("photo_meta", "key"), ("photo_order", "grid")):
+            rows = conn.execute(
+                f"SELECT * FROM {table} WHERE {key_col} >= ? AND {key_col} < ?",
+                (lo, hi)).fetchall()
+            moved = [(new,) + tuple(row[1:]) for row in rows
+                     for new in [_remapped(row[0], prefix_slash, mapping)]
+                     if new is not None]
+            if not moved:
+                continue
+            conn.executemany(f"DELETE FROM {table} WHERE {key_col} = ?",
+                             [(row[0],) for row in rows
+                              if _remapped(row[0], prefix_slash, mapping)])
+            marks = ", ".join("?" * len(moved[0]))
+            conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({marks})",
+                             moved)
+
+
+# ── Migration ──────────────────────────────────────────────────────────────
+
+def migrate_from_json(db_path=None):
+    """One-shot import of the five JSON files into a fresh photo_meta.db;
+    returns the number of photo keys. Built in a temp file and renamed into
+    place, so the engine only switches over once the store is complete."""
+    db_path = db_path or DB
+    data = {f: json_store.load(_json_path(f)) for f in FIELDS + ("order",)}
+    keys = sorted({k for f in FIELDS for k in data[f]})
+    tmp = db_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    with closing(_connect(tmp)) as conn, conn:
+        conn.executemany(
+            "INSERT INTO photo_meta VALUES (?, ?, ?, ?, ?)",
+            [[k] + [_to_sql(f, data[f].get(k)) for f in FIELDS] for k in keys])
+        _prune(conn, keys)
+        conn.executemany(
+            "INSERT INTO photo_order VALUES (?, ?)",
+            [(g, json.dumps(names, ensure_ascii=False))
+             for g, names in data["order"].items()])
+    os.replace(tmp, db_path)
+    return len(keys)
+
+
+def export_json():
+    """Write the SQLite store back out as the five JSON files; returns the
+    number of photo keys."""
+    data = load_all()
+    for field, values in data.items():
+        json_store.write(_json_path(field), values, **_DUMP)
+    return len({k for f in FIELDS for k in data[f]})
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if cmd == "migrate-sqlite":
+        # Same contract as `trips.py migrate-sqlite`: once photo_meta.db
+        # exists it's authoritative and the JSON files may be older.
+        if sqlite_active() and "--force" not in sys.argv[2:]:
+            print(f"{DB} already exists; pass --force to rebuild it from the "
+                  f"JSON files.")
+            sys.exit(1)
+        print(f"Migrated {migrate_from_json()} photo records to {DB}")
+    elif cmd == "export-json":
+        if not sqlite_active():
+            print(f"No {DB}; the JSON files are already authoritative.")
+            sys.exit(0)
+        print(f"Exported {export_json()} photo records to {TRIP_DATA_DIR}")
+    else:
+        print("usage: python photo_meta.py migrate-sqlite [--force] | export-json")
+        sys.exit(2)
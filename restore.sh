@@ -8,6 +8,10 @@
 #      so a bad restore is always reversible.
 #   3. Extracts the bundle over the repo (paths are repo-root-relative).
 #   4. Validates every restored *.json parses, and fails loudly if not.
+#   5. With the optional SQLite trip store active (trip_data/trips.db),
+#      re-imports the restored trips.json into it — the store is what the
+#      app reads, so a restore that only replaced the JSON would do nothing.
+#      Likewise the photo-metadata store (trip_data/photo_meta.db).
 #
 # Usage:
 #   ./restore.sh backup/ekko-backup-20260711-101500.tar.gz
@@ -64,7 +68,10 @@ if [[ "$ASSUME_YES" -ne 1 ]]; then
   [[ "$reply" =~ ^[Yy]$ ]] || { echo "Aborted."; exit 0; }
 fi
 
-# 1) Snapshot current state so the restore is reversible.
+# 1) Snapshot current state so the restore is reversible. Under the SQLite
+#    store, trips.json is refreshed from it first so the snapshot is current.
+[[ -f trip_data/trips.db ]] && python3 trips.py export-json
+[[ -f trip_data/photo_meta.db ]] && python3 photo_meta.py export-json
 TS="$(date +%Y%m%d-%H%M%S)"
 mkdir -p "$REPO/backup"
 SAFETY="$REPO/backup/pre-restore-${TS}.tar.gz"
@@ -107,4 +114,12 @@ if [[ "$BAD" -ne 0 ]]; then
   exit 1
 fi
 
+# 5) Load the restored trips into the SQLite store, if that's the active one.
+if [[ -f trip_data/trips.db ]]; then
+  python3 trips.py migrate-sqlite --force
+fi
+if [[ -f trip_data/photo_meta.db ]]; then
+  python3 photo_meta.py migrate-sqlite --force
+fi
+
 echo "Restore complete — all JSON validated. Restart the app to pick it up."
@@ -253,16 +253,40 @@ function cacheable(res) {
   return res && res.status === 200 && res.type === 'basic' && !res.redirected;
 }
 
+// /thumb/ and /view/ answer one URL with AVIF, WebP or JPEG depending on the
+// request's Accept (and say so with Vary: Accept). Keying the photo cache on
+// the bare URL would let an entry stored for one Accept be matched — or, under
+// Vary, silently missed — for another, so negotiated derivatives are keyed on
+// the URL plus the format the server will pick, mirroring its rule: the first
+// of AVIF/WebP named outright, else JPEG. The `as` param is only a cache key;
+// the network request is always the page's own. Originals (/photo/) aren't
+// negotiated and stay keyed on their URL. Entries stored under bare URLs by
+// earlier versions of this file are never matched again and age out through
+// the PHOTO_CACHE_MAX trim like any other.
+function photoCacheKey(req, url) {
+  if (!url.pathname.startsWith('/thumb/') && !url.pathname.startsWith('/view/')) {
+    return req;
+  }
+  const accept = req.headers.get('Accept') || '';
+  const fmt = /image\/avif/.test(accept) ? 'avif'
+    : /image\/webp/.test(accept) ? 'webp' : 'jpeg';
+  const key = new URL(url);
+  key.searchParams.set('as', fmt);
+  return new Request(key.href);
+}
+
 // Photos/derivatives. The lookup names PHOTO_CACHE rather than using the
 // cacheName-less caches.match(), which queries every cache in turn — including
 // the 3000-entry tile cache, for a photo that could only ever be in this one.
+// ignoreVary: the key already carries the format the Accept header chose.
 async function cacheFirst(req, evt) {
+  const key = photoCacheKey(req, new URL(req.url));
   const cache = await caches.open(PHOTO_CACHE);
-  const cached = await cache.match(req);
+  const cached = await cache.match(key, { ignoreVary: true });
   if (cached) return cached;
   const res = await fetch(req);
   if (cacheable(res)) {
-    storeInBackground(PHOTO_CACHE, req, res.clone(), PHOTO_CACHE_MAX, evt);
+    storeInBackground(PHOTO_CACHE, key, res.clone(), PHOTO_CACHE_MAX, evt);
   }
   return res;
 }
@@ -166,7 +166,8 @@ if [ $DO_DATA -eq 1 ]; then
   # a family entry added or edited in that same UI is gitignored, so it rides
   # here instead — which is why family.json lives under trip_data/.
   pull trip_data trip_data \
-    --exclude 'secret_key' --exclude 'dev_cert.*' --exclude '__pycache__/'
+    --exclude 'secret_key' --exclude 'dev_cert.*' --exclude '__pycache__/' \
+    --exclude '*.lock'
 fi
 
 if [ $DO_PHOTOS -eq 1 ]; then
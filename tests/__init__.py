@@ -0,0 +1,11 @@
+"""Test package.
+
+Importing ekko_trips_app persists a generated session secret to
+trip_data/secret_key unless FLASK_SECRET_KEY is set; set a throwaway one
+before any test imports the app, so running the suite never writes a key
+into the tree.
+"""
+
+import os
+
+os.environ.setdefault("FLASK_SECRET_KEY", "test-only-secret-key")
@@ -0,0 +1,150 @@
+"""Benchmark /api/campgrounds/near's lookup (`_campgrounds_near`) against a
+plain scan of every campground.
+
+Not a unit test. Runs a few thousand queries at random points over the
+lower 48, at a spread of radii and limits, and prints p50 / p99 / max
+latency for:
+
+  index       _campgrounds_near: the spatial index plus row projection
+  scan        the same answer from a vectorized haversine to every row
+  request     the full endpoint through Flask's test client (routing,
+              auth, JSON) — what a browser actually waits on
+
+Read-only. Uses the real campgrounds.json when present, else synthesizes
+~12.9k campground rows spread like the real ones (denser in the East).
+
+Usage (from project root):
+
+    python -m tests.bench_campgrounds_near [--queries N]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ekko_trips_app as app_mod  # noqa: E402
+import geodist  # noqa: E402
+
+RADII_MI = (5, 25, 100, 400)
+LIMITS = (10, 50, 200)
+
+
+def _synthesize(n):
+    rnd = random.Random(1)
+    rows = []
+    for i in range(n):
+        if rnd.random() < 0.6:
+            lat, lng = rnd.uniform(33, 47), rnd.uniform(-92, -68)
+        else:
+            lat, lng = rnd.uniform(25, 49), rnd.uniform(-124, -92)
+        rows.append({"id": i + 1, "name": f"Campground {i}", "state": "VA",
+                     "location": f"{lat:.6f},{lng:.6f}",
+                     "waterfront": "not waterfront", "climate": "mild",
+                     "ownership": "state", "visit_count": 0})
+    return rows
+
+
+def _scan(rows, lats, lngs, lat, lng, radius_mi, limit):
+    d = geodist.distances_m(lats, lngs, lat, lng)
+    hit = np.flatnonzero(d <= radius_mi * 1609.344)
+    hit = hit[np.argsort(d[hit], kind="stable")][:limit]
+    return [dict({k: rows[i][k] for k in app_mod._MAP_MARKER_FIELDS
+                  if k in rows[i]}, dist_mi=round(d[i] / 1609.344, 2))
+            for i in hit.tolist()]
+
+
+def _pct(ms):
+    ms = sorted(ms)
+    return (statistics.median(ms), ms[int(len(ms) * 0.99) - 1], ms[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--queries", type=int, default=3000)
+    args = ap.parse_args()
+
+    patches = []
+    if os.path.isfile(app_mod.CAMPGROUNDS_JSON):
+        rows = app_mod._load_campgrounds()
+        label = "campgrounds.json"
+    else:
+        rows = _synthesize(12_900)
+        label = "synthetic"
+        patches.append(mock.patch.object(app_mod, "_load_campgrounds",
+                                         return_value=rows))
+    tmp = tempfile.mkdtemp(prefix="bench-near-")
+    patches += [
+        mock.patch.object(app_mod, "ACCESS_LOG_FILE",
+                          os.path.join(tmp, "access_log.jsonl")),
+        mock.patch.object(app_mod, "_load_users", return_value={
+            "bench": app_mod.User("bench", "")}),
+    ]
+    for p in patches:
+        p.start()
+
+    t0 = time.perf_counter()
+    _, index = app_mod._campground_index()
+    build_ms = (time.perf_counter() - t0) * 1000
+    coords = [app_mod._parse_latlng(r.get("location")) for r in rows]
+    lats = np.array([c[0] if c else np.nan for c in coords])
+    lngs = np.array([c[1] if c else np.nan for c in coords])
+    print(f"{label}: {len(rows)} rows, {len(index)} indexed, "
+          f"index built in {build_ms:.0f} ms\n")
+
+    rnd = random.Random(2)
+    queries = [(rnd.uniform(25, 49), rnd.uniform(-124, -67),
+                rnd.choice(RADII_MI), rnd.choice(LIMITS))
+               for _ in range(args.queries)]
+    client = app_mod.app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "bench"
+
+    for lat, lng, radius, limit in queries:
+        got = app_mod._campgrounds_near(lat, lng, radius, limit)
+        want = _scan(rows, lats, lngs, lat, lng, radius, limit)
+        if [r["id"] for r in got] != [r["id"] for r in want]:
+            sys.exit(f"mismatch at {lat},{lng} r={radius} limit={limit}")
+
+    # Each mode in its own pass, so one doesn't evict the other's caches.
+    modes = {
+        "index": lambda q: app_mod._campgrounds_near(*q),
+        "scan": lambda q: _scan(rows, lats, lngs, *q),
+        "request": lambda q: client.get(
+            f"/api/campgrounds/near?lat={q[0]}&lng={q[1]}"
+            f"&radius={q[2]}&limit={q[3]}"),
+    }
+    timings = {}
+    for mode, fn in modes.items():
+        ms = timings[mode] = []
+        for q in queries:
+            t = time.perf_counter()
+            fn(q)
+            ms.append((time.perf_counter() - t) * 1000)
+
+    print(f"{'mode':<9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode, ms in timings.items():
+        p50, p99, worst = _pct(ms)
+        print(f"{mode:<9} {p50:>8.3f} {p99:>8.3f} {worst:>8.3f}")
+    print("\nindex p99 by radius:")
+    for radius in RADII_MI:
+        ms = [t for t, q in zip(timings["index"], queries) if q[2] == radius]
+        print(f"  {radius:>4} mi  {_pct(ms)[1]:.3f} ms")
+
+    for p in patches:
+        p.stop()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
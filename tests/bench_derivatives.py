@@ -0,0 +1,165 @@
+"""Benchmark the photo derivative engine (derivatives.py) against the
+pipelines it replaced.
+
+Not a unit test. Renders the 1600px view and 480px thumb for a sample of
+photos three ways, each in a fresh process so peak RSS is its own:
+
+  per-size    a full decode of the original for each size (the lazy
+              /thumb/ + /view/ path before uploads rendered eagerly)
+  one-decode  one full decode, view cut from it, thumb from the view
+  draft       derivatives.render: one decode at a reduced JPEG scale
+
+and prints ms/photo and peak RSS for each. Read-only: the originals are
+symlinked into a temp dir, so the library's own .thumbs/ and .views/ are
+never touched (and never make a run look warm).
+
+Usage (from project root):
+
+    python -m tests.bench_derivatives [--limit N] [<photo_dir> ...]
+
+With no dirs it samples originals from photo_uploads/, and if that's empty
+it synthesizes 12-megapixel JPEGs to run on.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import derivatives  # noqa: E402
+
+SPECS = ((".views", 1600, 82), (".thumbs", 480, 80))
+EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def _per_size(orig_path):
+    from PIL import Image, ImageOps
+    for dirname, max_px, quality in SPECS:
+        img = ImageOps.exif_transpose(Image.open(orig_path))
+        img.thumbnail((max_px, max_px))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        tpath = derivatives.path(orig_path, dirname)
+        os.makedirs(os.path.dirname(tpath), exist_ok=True)
+        img.save(tpath, "JPEG", quality=quality, optimize=True)
+
+
+def _one_decode(orig_path):
+    from PIL import Image, ImageOps
+    with Image.open(orig_path) as src:
+        img = ImageOps.exif_transpose(src)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    for dirname, max_px, quality in SPECS:
+        img.thumbnail((max_px, max_px))
+        tpath = derivatives.path(orig_path, dirname)
+        os.makedirs(os.path.dirname(tpath), exist_ok=True)
+        img.save(tpath, "JPEG", quality=quality, optimize=True)
+
+
+def _draft(orig_path):
+    derivatives.render(orig_path, SPECS)
+
+
+MODES = {"per-size": _per_size, "one-decode": _one_decode, "draft": _draft}
+
+
+def _peak_rss_kb():
+    """This process's peak RSS. VmHWM rather than ru_maxrss on Linux: the
+    latter survives exec, so a spawned child would report its parent's peak
+    (here, the synthesized originals) instead of its own."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb // 1024 if sys.platform == "darwin" else kb
+
+
+def _run_mode(mode, photos, out):
+    """Child process: render every photo, report (ms/photo, peak KB, KB over
+    the post-import baseline)."""
+    from PIL import Image  # noqa: F401  (imported before the baseline)
+    base = _peak_rss_kb()
+    work = tempfile.mkdtemp(prefix=f"bench-{mode}-")
+    links = []
+    for i, p in enumerate(photos):
+        link = os.path.join(work, f"{i}_{os.path.basename(p)}")
+        os.symlink(os.path.abspath(p), link)
+        links.append(link)
+    fn = MODES[mode]
+    t0 = time.perf_counter()
+    for link in links:
+        fn(link)
+    ms = (time.perf_counter() - t0) * 1000 / max(1, len(links))
+    peak = _peak_rss_kb()
+    shutil.rmtree(work, ignore_errors=True)
+    out.put((ms, peak, peak - base))
+
+
+def _sample(dirs, limit):
+    photos = []
+    for d in dirs:
+        for dirpath, dirnames, filenames in os.walk(d):
+            dirnames[:] = sorted(n for n in dirnames if not n.startswith("."))
+            for f in sorted(filenames):
+                if f.lower().endswith(EXTS):
+                    photos.append(os.path.join(dirpath, f))
+                    if len(photos) >= limit:
+                        return photos
+    return photos
+
+
+def _synthesize(n, dest):
+    from PIL import Image
+    print(f"No photos found; synthesizing {n} 4032x3024 JPEGs in {dest}")
+    paths = []
+    for i in range(n):
+        noise = Image.effect_noise((4032, 3024), 40 + i)
+        grad = Image.radial_gradient("L").resize((4032, 3024))
+        img = Image.merge("RGB", (noise, grad, Image.blend(noise, grad, 0.5)))
+        p = os.path.join(dest, f"synthetic_{i}.jpg")
+        img.save(p, "JPEG", quality=90)
+        paths.append(p)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("dirs", nargs="*")
+    ap.add_argument("--limit", type=int, default=40)
+    args = ap.parse_args()
+
+    photos = _sample(args.dirs or [os.path.join(ROOT, "photo_uploads")],
+                     args.limit)
+    scratch = None
+    if not photos:
+        scratch = tempfile.mkdtemp()
+        photos = _synthesize(min(args.limit, 8), scratch)
+    print(f"{len(photos)} photo(s)\n")
+    print(f"{'mode':<12} {'ms/photo':>9} {'peak RSS':>10} {'Δ RSS':>10}")
+    ctx = multiprocessing.get_context("spawn")
+    for mode in MODES:
+        out = ctx.Queue()
+        proc = ctx.Process(target=_run_mode, args=(mode, photos, out))
+        proc.start()
+        ms, peak, delta = out.get()
+        proc.join()
+        print(f"{mode:<12} {ms:>9.1f} {peak / 1024:>8.1f}MB "
+              f"{delta / 1024:>8.1f}MB")
+    if scratch:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
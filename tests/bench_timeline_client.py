@@ -0,0 +1,115 @@
+"""Benchmark fetching a trip's pings from the timeline API: the old
+`_fetch_timeline_points` loop (a fresh urlopen per 10k-ping page, primary
+then alt tid one after the other) against the pooled, concurrent
+TimelineClient it now goes through.
+
+Not a unit test. Serves a synthetic trip — two tids, a ping a minute for
+--days days — from tests/timeline_stub.py on localhost, with --latency
+seconds added to every request to stand in for the round trip to
+PythonAnywhere, and times a full fetch of both tids each way:
+
+  sequential   the old loop, per tid, one tid after the other
+  client       TimelineClient.fetch_many over both tids, ranges longer
+               than its split_secs cut into sub-ranges fetched at once
+
+and checks both got the same pings. Localhost has no TLS handshake to
+save, so the keep-alive pool's share of the win is understated here.
+
+Usage (from project root):
+
+    python -m tests.bench_timeline_client [--days N] [--latency S] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import timeline_client  # noqa: E402
+from tests.timeline_stub import StubTimeline  # noqa: E402
+
+T0 = 1_720_000_000
+
+
+def _old_fetch(url, tid, token, from_ts, to_ts):
+    """The loop `_fetch_timeline_points` ran before the client."""
+    points = []
+    cursor = from_ts
+    for _ in range(20):
+        qs = urlencode({"tid": tid, "from": cursor, "to": to_ts,
+                        "limit": 10000})
+        req = urllib.request.Request(f"{url}?{qs}", headers={
+            "Authorization": f"Bearer {token}"})
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            page = json.loads(resp.read())
+        if not page:
+            break
+        points.extend(page)
+        if len(page) < 10000:
+            break
+        cursor = page[-1]["tst"] + 1
+    return points
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--days", type=int, default=14)
+    ap.add_argument("--latency", type=float, default=0.15)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    n = args.days * 1440
+    stub = StubTimeline({
+        tid: [{"lat": 40 + i * 1e-5, "lon": -100, "tst": T0 + i * 60 + k}
+              for i in range(n)]
+        for k, tid in enumerate(("phone-a", "phone-b"))},
+        latency=args.latency).start()
+    try:
+        from_ts, to_ts = T0, T0 + args.days * 86400
+        jobs = [("phone-a", from_ts, to_ts), ("phone-b", from_ts, to_ts)]
+
+        stub.requests.clear()
+        old, before = _timed(lambda: [_old_fetch(stub.url, tid, "t", a, b)
+                                      for tid, a, b in jobs], args.repeat)
+        old_reqs = len(stub.requests) // args.repeat
+
+        client = timeline_client.TimelineClient(stub.url, "t")
+        try:
+            stub.requests.clear()
+            stub.ports.clear()
+            new, after = _timed(lambda: client.fetch_many(jobs), args.repeat)
+            new_reqs = len(stub.requests) // args.repeat
+            conns = len(stub.ports)
+        finally:
+            client.close()
+
+        print(f"{args.days} days x 2 tids = {2 * n} pings, "
+              f"{args.latency * 1000:.0f} ms per request\n")
+        print(f"{'mode':<11} {'requests':>8} {'ms':>9}")
+        print(f"{'sequential':<11} {old_reqs:>8} {before * 1000:>9.1f}")
+        print(f"{'client':<11} {new_reqs:>8} {after * 1000:>9.1f}")
+        print(f"\nspeedup {before / after:.1f}x, client used {conns} "
+              f"connection(s) over {args.repeat} run(s), "
+              f"same pings: {old == new}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Benchmark the columnar track cache (track_store.py) against the gzipped
+JSON it replaced.
+
+Not a unit test. Takes the largest dual-tid trip in trip_data/track_cache/
+(or a trip id given on the command line), writes it out in both formats to a
+temp dir, and times three ways of loading it, each in a fresh process so
+peak RSS is its own:
+
+  json.gz     gunzip + json.loads — the old _read_track_cache
+  columns     map the .track file into NumPy arrays (_read_track_columns)
+  dicts       the same, then to_points() — the new _read_track_cache
+
+Read-only: the real cache files are never rewritten. With no cached tracks
+at all it synthesizes a 120k-ping dual-tid trip to run on.
+
+Usage (from project root):
+
+    python -m tests.bench_track_cache [--repeat N] [<trip_id>]
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tests.bench_derivatives import _peak_rss_kb  # noqa: E402
+import track_store  # noqa: E402
+
+CACHE_DIR = os.path.join(ROOT, "trip_data", "track_cache")
+
+
+def _load_any(path):
+    if path.endswith(".track"):
+        return track_store.load(path).to_points()
+    with open(path, "rb") as f:
+        raw = f.read()
+    if raw[:2] == b"\x1f\x8b":
+        raw = gzip.decompress(raw)
+    return json.loads(raw)
+
+
+def _pick(trip_id):
+    """(label, points) for the requested trip, else the largest cached trip
+    with pings from both tids, else the largest cached trip."""
+    paths = sorted(glob.glob(os.path.join(CACHE_DIR, "*.track")) +
+                   glob.glob(os.path.join(CACHE_DIR, "*.json*")))
+    if trip_id is not None:
+        paths = [p for p in paths
+                 if os.path.basename(p).split(".")[0] == str(trip_id)]
+    best = None
+    for p in paths:
+        try:
+            pts = _load_any(p)
+        except Exception:
+            continue
+        dual = len({q.get("tid") for q in pts}) > 1
+        score = (dual, len(pts))
+        if best is None or score > best[0]:
+            best = (score, os.path.basename(p), pts)
+    if best:
+        return best[1], best[2]
+    return "synthetic", _synthesize(120_000)
+
+
+def _synthesize(n):
+    rnd = random.Random(1)
+    pts, lat, lon, tst = [], 44.0, -71.0, 1_719_000_000
+    for i in range(n):
+        lat += rnd.uniform(-0.001, 0.0012)
+        lon += rnd.uniform(-0.0012, 0.001)
+        tst += rnd.randint(5, 60)
+        pts.append({"lat": round(lat, 7), "lon": round(lon, 7), "tst": tst,
+                    "tid": "alt" if i % 3 == 0 else "primary",
+                    "tz": "America/New_York" if lon > -75 else "America/Chicago"})
+    return pts
+
+
+def _run_mode(mode, paths, repeat, out):
+    """Child process: load the trip `repeat` times, report (median ms,
+    peak KB, KB over the post-import baseline)."""
+    import numpy  # noqa: F401  (imported before the baseline)
+    base = _peak_rss_kb()
+    times, keep = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        if mode == "json.gz":
+            with open(paths["json.gz"], "rb") as f:
+                keep = json.loads(gzip.decompress(f.read()))
+        elif mode == "columns":
+            keep = track_store.load(paths["track"])
+            keep.lat.sum(), keep.tst.max()  # touch the pages a reader would
+        else:
+            keep = track_store.load(paths["track"]).to_points()
+        times.append((time.perf_counter() - t0) * 1000)
+    peak = _peak_rss_kb()
+    out.put((statistics.median(times), peak, peak - base))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("trip_id", nargs="?", type=int)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    label, points = _pick(args.trip_id)
+    work = tempfile.mkdtemp(prefix="bench-track-")
+    try:
+        paths = {"json.gz": os.path.join(work, "t.json.gz"),
+                 "track": os.path.join(work, "t.track")}
+        with open(paths["json.gz"], "wb") as f:
+            f.write(gzip.compress(json.dumps(points).encode("utf-8")))
+        if not track_store.write(paths["track"], points):
+            sys.exit(f"{label}: pings don't fit the columnar format")
+        tids = sorted({str(p.get("tid")) for p in points})
+        print(f"{label}: {len(points)} pings, tids {', '.join(tids)}")
+        print(f"  json.gz {os.path.getsize(paths['json.gz']) / 1024:.0f} KB, "
+              f".track {os.path.getsize(paths['track']) / 1024:.0f} KB\n")
+        print(f"{'mode':<9} {'load ms':>9} {'peak RSS':>10} {'Δ RSS':>10}")
+        ctx = multiprocessing.get_context("spawn")
+        for mode in ("json.gz", "columns", "dicts"):
+            out = ctx.Queue()
+            proc = ctx.Process(target=_run_mode,
+                               args=(mode, paths, args.repeat, out))
+            proc.start()
+            ms, peak, delta = out.get()
+            proc.join()
+            print(f"{mode:<9} {ms:>9.1f} {peak / 1024:>8.1f}MB "
+                  f"{delta / 1024:>8.1f}MB")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark timezone stamping of a track: one `_tz_for_coord` call per ping
+(the old `_enrich_with_timezone`) against the tzcells grid it now goes
+through.
+
+Not a unit test. Takes the largest cached trip in trip_data/track_cache/
+(or a trip id given on the command line), strips every ping's `tz`, and
+stamps it three ways:
+
+  per-ping   `_tz_for_coord` for every ping — before
+  cold grid  a CellResolver with no saved cells: samples as it goes
+  warm grid  a CellResolver loaded from the cells the cold pass saved —
+             what every request after the first (and after a restart) sees
+
+and reports pings/second for each, plus how many pings the grid stamped
+differently from the per-ping finder (should be 0). Read-only: cells are
+saved to a temp file, never to trip_data/tz_cells.json. With no cached
+tracks at all it synthesizes a 120k-ping trip to run on.
+
+Usage (from project root):
+
+    python -m tests.bench_tz_enrich [--repeat N] [<trip_id>]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tests.bench_track_cache import _pick  # noqa: E402
+import ekko_trips_app as app_mod  # noqa: E402
+import tzcells  # noqa: E402
+
+
+def _per_ping(points):
+    return [app_mod._tz_for_coord(p.get("lat"), p.get("lon")) or "UTC"
+            for p in points]
+
+
+def _grid(resolver, points):
+    return [resolver.tz(p.get("lat"), p.get("lon")) or "UTC" for p in points]
+
+
+def _rate(n, seconds):
+    return f"{n / seconds:>12,.0f}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("trip_id", nargs="?", type=int)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if app_mod._tz_cell_resolver() is None:
+        sys.exit("timezonefinder is not installed")
+    label, points = _pick(args.trip_id)
+    for p in points:
+        p.pop("tz", None)
+    n = len(points)
+    print(f"{label}: {n} pings\n")
+
+    work = tempfile.mkdtemp(prefix="bench-tz-")
+    try:
+        path = os.path.join(work, "tz_cells.json")
+        version = app_mod._tz_cells["version"]
+
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            want = _per_ping(points)
+            times.append(time.perf_counter() - t0)
+        before = statistics.median(times)
+
+        cold = tzcells.CellResolver(app_mod._tz_for_coord)
+        t0 = time.perf_counter()
+        got = _grid(cold, points)
+        cold_s = time.perf_counter() - t0
+        tzcells.save(path, version, cold.take_new())
+        cells = tzcells.load(path, version)
+        border = sum(tz is tzcells.BORDER for tz in cells.values())
+
+        times = []
+        for _ in range(args.repeat):
+            warm = tzcells.CellResolver(app_mod._tz_for_coord, cells)
+            t0 = time.perf_counter()
+            got_warm = _grid(warm, points)
+            times.append(time.perf_counter() - t0)
+        after = statistics.median(times)
+
+        wrong = sum(a != b for a, b in zip(want, got)) + \
+            sum(a != b for a, b in zip(want, got_warm))
+        print(f"{len(cells)} cells ({border} on a border), "
+              f"{os.path.getsize(path) / 1024:.1f} KB saved\n")
+        print(f"{'mode':<10} {'pings/s':>12} {'ms':>9}")
+        print(f"{'per-ping':<10} {_rate(n, before)} {before * 1000:>9.1f}")
+        print(f"{'cold grid':<10} {_rate(n, cold_s)} {cold_s * 1000:>9.1f}")
+        print(f"{'warm grid':<10} {_rate(n, after)} {after * 1000:>9.1f}")
+        print(f"\nwarm speedup {before / after:.1f}x, "
+              f"{wrong} pings stamped differently")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Tests for the tiled campground map — maptiles.TileIndex against a
+brute-force tile assignment, maptiles.ClusterIndex's levels under filters,
+and /api/campgrounds/tile, /api/campgrounds/markers and the (now row-less)
+map page through Flask's test client.
+
+Stubs `_load_campgrounds` with synthetic rows and logs in a test user through
+the session, so no campgrounds.json or users.json is needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_campground_tiles -v
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+import maptiles  # noqa: E402
+
+
+def _brute_tiles(lats, lngs, z):
+    x, y = maptiles.mercator(np.asarray(lats), np.asarray(lngs))
+    n = 1 << z
+    return (np.minimum((x * n).astype(int), n - 1),
+            np.minimum((y * n).astype(int), n - 1))
+
+
+class TileIndexTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = random.Random(0)
+        cls.pts = [(rnd.uniform(25, 49), rnd.uniform(-124, -67))
+                   for _ in range(3000)]
+        cls.pts += [(38.9 + rnd.gauss(0, 0.02), -77.4 + rnd.gauss(0, 0.02))
+                    for _ in range(300)]
+        cls.idx = maptiles.TileIndex(cls.pts)
+        cls.lats = [p[0] for p in cls.pts]
+        cls.lngs = [p[1] for p in cls.pts]
+
+    def test_tile_matches_brute_force(self):
+        for z in (0, 2, 5, 8, 12, 16):
+            tx, ty = _brute_tiles(self.lats, self.lngs, z)
+            for x, y in set(zip(tx[::37].tolist(), ty[::37].tolist())):
+                want = np.flatnonzero((tx == x) & (ty == y)).tolist()
+                self.assertEqual(sorted(self.idx.tile(z, x, y).tolist()),
+                                 want, (z, x, y))
+
+    def test_skips_missing_coords_and_empty(self):
+        idx = maptiles.TileIndex([None, (10.0, 20.0), ("x", 1.0)])
+        self.assertEqual(len(idx), 1)
+        self.assertEqual(idx.tile(0, 0, 0).tolist(), [1])
+        empty = maptiles.TileIndex([])
+        self.assertEqual(len(empty.tile(3, 1, 1)), 0)
+
+
+class ClusterIndexTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rnd = random.Random(2)
+        cls.pts = [(rnd.uniform(25, 49), rnd.uniform(-124, -67))
+                   for _ in range(2000)]
+        cls.pts += [(38.9 + rnd.gauss(0, 0.05), -77.4 + rnd.gauss(0, 0.05))
+                    for _ in range(500)]
+        cls.max_zoom = 5   # every tile of every level is walked
+        cls.idx = maptiles.ClusterIndex(cls.pts, cls.max_zoom)
+
+    def _level(self, z, keep=None):
+        """Every feature of zoom z, gathered tile by tile."""
+        singles, clusters = [], []
+        for x in range(1 << z):
+            for y in range(1 << z):
+                s, lat, lng, count, expand = self.idx.tile(z, x, y, keep=keep)
+                singles += s.tolist()
+                clusters += list(zip(lat.tolist(), lng.tolist(),
+                                     count.tolist(), expand.tolist()))
+        return singles, clusters
+
+    def test_each_level_counts_every_point_once(self):
+        keep = np.zeros(len(self.pts), bool)
+        keep[::3] = True
+        for z in range(self.max_zoom + 1):
+            for mask in (None, keep):
+                singles, clusters = self._level(z, mask)
+                want = len(self.pts) if mask is None else int(mask.sum())
+                self.assertEqual(len(singles) + sum(c[2] for c in clusters),
+                                 want, (z, mask is None))
+                self.assertEqual(len(set(singles)), len(singles))
+                if mask is not None:
+                    self.assertTrue(all(mask[i] for i in singles))
+                self.assertTrue(all(c[2] >= 2 and c[3] > z for c in clusters))
+
+    def test_zooming_out_merges(self):
+        sizes = [len(self._level(z)[1]) + len(self._level(z)[0])
+                 for z in range(self.max_zoom + 1)]
+        self.assertEqual(sizes[0], 1)
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertLess(sizes[-1], len(self.pts))
+
+    def test_filtered_centroid_is_the_kept_members_mean(self):
+        # Keep only the dense cluster's points: at zoom 0 they're one cluster,
+        # and its centroid is theirs alone.
+        keep = np.zeros(len(self.pts), bool)
+        keep[2000:] = True
+        singles, clusters = self._level(0, keep)
+        self.assertEqual(singles, [])
+        (lat, lng, count, _), = clusters
+        self.assertEqual(count, 500)
+        x, y = maptiles.mercator(np.array([p[0] for p in self.pts[2000:]]),
+                                 np.array([p[1] for p in self.pts[2000:]]))
+        want_lat, want_lng = maptiles.unmercator(x.mean(), y.mean())
+        self.assertAlmostEqual(lat, float(want_lat), places=6)
+        self.assertAlmostEqual(lng, float(want_lng), places=6)
+
+    def test_single_survivor_comes_back_as_its_point(self):
+        keep = np.zeros(len(self.pts), bool)
+        keep[2100] = True
+        for z in range(self.max_zoom + 1):
+            singles, clusters = self._level(z, keep)
+            self.assertEqual((singles, clusters), ([2100], []))
+
+    def test_deeper_than_max_zoom_and_empty(self):
+        self.assertEqual(len(self.idx.tile(self.max_zoom + 1, 0, 0)[0]), 0)
+        empty = maptiles.ClusterIndex([None], 3)
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(len(empty.tile(0, 0, 0)[0]), 0)
+
+
+def _rows():
+    rnd = random.Random(1)
+    rows = []
+    for i in range(400):
+        lat, lng = 38.9 + rnd.gauss(0, 0.3), -77.4 + rnd.gauss(0, 0.3)
+        rows.append({"id": i + 1, "name": f"Camp {i}", "state": "VA",
+                     "location": f"{lat:.5f},{lng:.5f}",
+                     "waterfront": "lakefront" if i % 3 == 0
+                     else "not waterfront",
+                     "climate": "mild", "ownership": "state" if i % 2
+                     else "", "visit_count": 0, "note": "popup only"})
+    rows.append({"id": 999, "name": "Far West", "state": "OR",
+                 "location": "44.0,-121.0", "waterfront": "riverfront",
+                 "climate": "cool", "ownership": "federal", "visit_count": 0})
+    return rows
+
+
+class TileEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.rows = _rows()
+        patches = [
+            mock.patch.object(app_mod, "_load_campgrounds",
+                              return_value=self.rows),
+            mock.patch.dict(app_mod._campground_tiles_cache,
+                            {"rows": None, "state": None}),
+            mock.patch.object(app_mod, "ACCESS_LOG_FILE",
+                              os.path.join(tmp.name, "access_log.jsonl")),
+            mock.patch.object(app_mod, "_load_users", return_value={
+                "viewer": app_mod.User("viewer", ""),
+                "tripsonly": app_mod.User("tripsonly", "",
+                                          can_view_campgrounds=False)}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = app_mod.app.test_client()
+        self._login("viewer")
+
+    def _login(self, user):
+        with self.client.session_transaction() as sess:
+            sess["_user_id"] = user
+
+    def _tile_of(self, row, z):
+        lat, lng = app_mod._parse_latlng(row["location"])
+        tx, ty = _brute_tiles([lat], [lng], z)
+        return int(tx[0]), int(ty[0])
+
+    def test_marker_tile_has_slim_rows(self):
+        z = app_mod.CAMPGROUND_TILE_MARKER_ZOOM
+        x, y = self._tile_of(self.rows[-1], z)
+        resp = self.client.get(f"/api/campgrounds/tile/{z}/{x}/{y}")
+        self.assertEqual(resp.status_code, 200)
+        body = resp.get_json()
+        self.assertEqual([r["id"] for r in body["markers"]], [999])
+        self.assertEqual(body["clusters"], [])
+        self.assertNotIn("note", body["markers"][0])
+
+    def test_cluster_tile_counts_follow_the_filter(self):
+        z = 4
+        x, y = self._tile_of(self.rows[0], z)
+        url = f"/api/campgrounds/tile/{z}/{x}/{y}"
+
+        def total(query=""):
+            body = self.client.get(url + query).get_json()
+            return len(body["markers"]) + sum(c[2] for c in body["clusters"])
+
+        self.assertEqual(total(), 400)
+        self.assertEqual(total("?mode=waterfront&hide=not%20waterfront"), 134)
+        # An empty hide_own is the "unspecified" ownership.
+        self.assertEqual(total("?mode=waterfront&hide_own="), 200)
+        self.assertEqual(total("?mode=waterfront&hide=lakefront&hide_own="),
+                         133)
+
+    def test_unknown_filter_values_are_dropped_and_masks_capped(self):
+        url = "/api/campgrounds/tile/4/4/6?mode=waterfront"
+        etag = self.client.get(url).headers["ETag"]
+        junk = self.client.get(url + "&hide=nope&hide_own=nobody")
+        self.assertEqual(junk.headers["ETag"], etag)
+        masks = app_mod._campground_tiles()["masks"]
+        self.assertEqual(masks, {})
+        with mock.patch.object(app_mod, "_CAMPGROUND_TILE_MASK_CAP", 2):
+            for q in ("&hide=lakefront", "&hide=riverfront", "&hide_own="):
+                self.client.get(url + q)
+        self.assertEqual(len(masks), 1)
+
+    def test_etag_and_bad_tiles(self):
+        url = "/api/campgrounds/tile/3/2/3"
+        etag = self.client.get(url).headers["ETag"]
+        resp = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertNotEqual(
+            self.client.get(url + "?hide=lakefront").headers["ETag"], etag)
+        for bad in ("3/8/0", "3/0/8", "25/0/0"):
+            self.assertEqual(
+                self.client.get("/api/campgrounds/tile/" + bad).status_code,
+                404, bad)
+
+    def test_markers_endpoint_and_access(self):
+        rows = self.client.get("/api/campgrounds/markers").get_json()
+        self.assertEqual(len(rows), len(self.rows))
+        self.assertEqual(set(rows[0]), set(app_mod._MAP_MARKER_FIELDS))
+        self._login("tripsonly")
+        self.assertEqual(
+            self.client.get("/api/campgrounds/markers").status_code, 403)
+        self.assertEqual(
+            self.client.get("/api/campgrounds/tile/0/0/0").status_code, 403)
+
+    def test_map_page_ships_no_rows(self):
+        with mock.patch.object(app_mod, "_map_config",
+                               return_value=((38.9, -77.4), [])), \
+                mock.patch.object(app_mod, "_load_roadside", return_value=[]), \
+                mock.patch.object(app_mod, "parse_trips", return_value=[]):
+            html = self.client.get("/campgrounds/map?focus=999").get_data(
+                as_text=True)
+        self.assertIn("const CG_FACETS = ", html)
+        self.assertNotIn("Camp 17", html)
+        self.assertIn('"Far West"', html)   # the ?focus= row only
+        self.assertIn("Loading 401 campgrounds", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Tests for /api/campgrounds/near — nearest-first campground lookup served
+off the spatial index.
+
+Stubs `_load_campgrounds` with a handful of synthetic rows and logs in a
+test user through the session, so no campgrounds.json or users.json is
+needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_campgrounds_near -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+
+ROWS = [
+    {"id": 1, "name": "Near", "state": "VA", "location": "38.95,-77.37",
+     "climate": "mild", "delta_temp": 0.5, "trips": [], "note": "x"},
+    {"id": 2, "name": "Mid", "state": "VA", "location": "39.20,-77.37"},
+    {"id": 3, "name": "Far", "state": "ME", "location": "44.30,-68.30"},
+    {"id": 4, "name": "No coords", "state": "VA", "location": ""},
+    {"id": 5, "name": "Jersey", "state": "NJ", "location": "41.00,-74.00"},
+]
+
+
+class CampgroundsNearTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patches = [
+            mock.patch.object(app_mod, "_load_campgrounds", return_value=ROWS),
+            mock.patch.dict(app_mod._campground_index_cache,
+                            {"rows": None, "locations": None,
+                             "index": None}),
+            mock.patch.object(app_mod, "ACCESS_LOG_FILE",
+                              os.path.join(tmp.name, "access_log.jsonl")),
+            mock.patch.object(app_mod, "_load_users", return_value={
+                "viewer": app_mod.User("viewer", ""),
+                "tripsonly": app_mod.User("tripsonly", "",
+                                          can_view_campgrounds=False)}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = app_mod.app.test_client()
+        self._login("viewer")
+
+    def _login(self, user):
+        with self.client.session_transaction() as sess:
+            sess["_user_id"] = user
+
+    def test_nearest_first_within_radius(self):
+        resp = self.client.get("/api/campgrounds/near?lat=38.93&lng=-77.37"
+                               "&radius=30")
+        self.assertEqual(resp.status_code, 200)
+        rows = resp.get_json()
+        self.assertEqual([r["id"] for r in rows], [1, 2])
+        self.assertLess(rows[0]["dist_mi"], rows[1]["dist_mi"])
+        self.assertAlmostEqual(rows[1]["dist_mi"], 18.6, delta=0.2)
+        # Slim marker shape: no popup or derived fields.
+        self.assertNotIn("note", rows[0])
+        self.assertNotIn("delta_temp", rows[0])
+        self.assertEqual(rows[0]["climate"], "mild")
+
+    def test_limit_and_wide_radius(self):
+        rows = self.client.get("/api/campgrounds/near?lat=38.93&lng=-77.37"
+                               "&radius=1000&limit=1").get_json()
+        self.assertEqual([r["id"] for r in rows], [1])
+        # Maine is ~600 miles out, past the 500-mile ceiling.
+        rows = self.client.get("/api/campgrounds/near?lat=38.93&lng=-77.37"
+                               "&radius=1000").get_json()
+        self.assertEqual([r["id"] for r in rows], [1, 2, 5])
+
+    def test_index_follows_the_rows_it_is_handed(self):
+        _, first = app_mod._campground_index()
+        # Same entries, rebuilt derived fields (a trip edit): index reused.
+        same = [dict(r) for r in ROWS]
+        self.assertIs(app_mod._campground_index(same)[1], first)
+        # campgrounds.json rewritten, whatever its mtime says: rebuilt.
+        moved = [dict(r) for r in ROWS[1:]]
+        rows, index = app_mod._campground_index(moved)
+        self.assertIs(rows, moved)
+        self.assertIsNot(index, first)
+        pos, _ = index.nearest(39.20, -77.37, 1)
+        self.assertEqual(moved[pos[0]]["id"], 2)
+
+    def test_bad_params(self):
+        for q in ("", "lat=38.9", "lat=x&lng=1", "lat=95&lng=0"):
+            resp = self.client.get("/api/campgrounds/near?" + q)
+            self.assertEqual(resp.status_code, 400, q)
+        resp = self.client.get("/api/campgrounds/near?lat=38.93&lng=-77.37"
+                               "&radius=nan&limit=abc")
+        self.assertEqual([r["id"] for r in resp.get_json()], [1, 2])
+
+    def test_trips_only_user_is_refused(self):
+        self._login("tripsonly")
+        resp = self.client.get("/api/campgrounds/near?lat=38.93&lng=-77.37")
+        self.assertEqual(resp.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
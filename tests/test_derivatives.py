@@ -0,0 +1,224 @@
+"""Unit tests for photo derivatives (derivatives.py) and the app's
+upload-time render queue (_queue_derivatives).
+
+Writes small JPEGs with Pillow into a temp dir, so no real photos are
+needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_derivatives -v
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import derivatives
+import ekko_trips_app as app_mod
+
+SPECS = app_mod.DERIVATIVE_SPECS
+
+
+def _die_in_worker(*args):
+    """Stands in for derivatives.render: kills a pool worker outright (as
+    the OOM killer would), renders normally anywhere else."""
+    import multiprocessing
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return _real_render(*args)
+
+
+_real_render = derivatives.render
+
+
+def _jpeg(path, size=(2400, 1200), orientation=None):
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new("RGB", size, (40, 90, 160)).save(path, exif=exif)
+
+
+class RenderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.orig = os.path.join(self.tmp.name, "a.jpg")
+        _jpeg(self.orig)
+
+    def test_one_decode_for_both_sizes(self):
+        with mock.patch.object(Image, "open", wraps=Image.open) as opened:
+            out = derivatives.render(self.orig, SPECS)
+        self.assertEqual(opened.call_count, 1)
+        with Image.open(out[app_mod.VIEW_DIRNAME, "jpeg"]) as v:
+            self.assertEqual(v.size, (1600, 800))
+        with Image.open(out[app_mod.THUMB_DIRNAME, "jpeg"]) as t:
+            self.assertEqual(t.size, (480, 240))
+        self.assertEqual(out[app_mod.THUMB_DIRNAME, "jpeg"],
+                         app_mod._derivative_path(self.orig,
+                                                  app_mod.THUMB_DIRNAME))
+
+    def test_every_format_from_one_decode(self):
+        formats = [f for f in ("avif", "webp", "jpeg")
+                   if derivatives.available(f)]
+        with mock.patch.object(Image, "open", wraps=Image.open) as opened:
+            out = derivatives.render(self.orig, SPECS, formats)
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(out), 2 * len(formats))
+        for (dirname, fmt), p in out.items():
+            self.assertTrue(p.endswith(derivatives.FORMATS[fmt][0]), p)
+            with Image.open(p) as img:
+                self.assertEqual(img.format, derivatives.FORMATS[fmt][1])
+
+    def test_fresh_derivatives_skip_the_original(self):
+        derivatives.render(self.orig, SPECS)
+        with mock.patch.object(Image, "open") as opened:
+            out = derivatives.render(self.orig, SPECS)
+        opened.assert_not_called()
+        self.assertTrue(all(out.values()))
+
+    def test_only_the_stale_size_is_rerendered(self):
+        derivatives.render(self.orig, SPECS)
+        os.remove(derivatives.path(self.orig, app_mod.THUMB_DIRNAME))
+        view = derivatives.path(self.orig, app_mod.VIEW_DIRNAME)
+        before = os.stat(view).st_mtime_ns
+        app_mod._ensure_thumb(self.orig)
+        self.assertTrue(os.path.exists(
+            derivatives.path(self.orig, app_mod.THUMB_DIRNAME)))
+        self.assertEqual(os.stat(view).st_mtime_ns, before)
+
+    def test_exif_rotation_is_baked_in(self):
+        _jpeg(self.orig, orientation=6)   # "rotate 90° CW to display"
+        out = derivatives.render(self.orig, SPECS)
+        with Image.open(out[app_mod.VIEW_DIRNAME, "jpeg"]) as v:
+            self.assertEqual(v.size, (800, 1600))
+
+    def test_jpeg_decodes_at_reduced_scale(self):
+        _jpeg(self.orig, size=(4032, 3024))
+        with Image.open(self.orig) as img:
+            derivatives._draft(img, app_mod.VIEW_MAX_PX)
+            self.assertEqual(img.size, (2016, 1512))
+        png = os.path.join(self.tmp.name, "b.png")
+        Image.new("RGB", (4032, 3024)).save(png)
+        with Image.open(png) as img:
+            derivatives._draft(img, app_mod.VIEW_MAX_PX)
+            self.assertEqual(img.size, (4032, 3024))
+        out = derivatives.render(self.orig, SPECS)
+        with Image.open(out[app_mod.VIEW_DIRNAME, "jpeg"]) as v:
+            self.assertEqual(v.size, (1600, 1200))
+
+    def test_unreadable_original(self):
+        with open(self.orig, "wb") as f:
+            f.write(b"not a jpeg")
+        self.assertEqual(app_mod._ensure_view(self.orig, "webp"), (None, None))
+
+
+class NegotiationTests(unittest.TestCase):
+
+    BROWSER = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.orig = os.path.join(self.tmp.name, "a.jpg")
+        _jpeg(self.orig)
+
+    def _serve(self, accept, modern=("avif", "webp")):
+        headers = {"Accept": accept} if accept is not None else {}
+        with mock.patch.object(app_mod, "MODERN_DERIVATIVE_FORMATS", modern), \
+                app_mod.app.test_request_context("/view/x", headers=headers):
+            resp = app_mod._send_derivative(self.orig, app_mod._ensure_view)
+            resp.direct_passthrough = False
+            return resp
+
+    def test_picks_the_first_format_named_outright(self):
+        cases = [(self.BROWSER, "image/avif"),
+                 ("image/webp,image/*,*/*;q=0.8", "image/webp"),
+                 ("image/*,*/*;q=0.8", "image/jpeg"),
+                 ("image/avif;q=0,image/webp", "image/webp"),
+                 (None, "image/jpeg")]
+        for accept, mimetype in cases:
+            if not derivatives.available(mimetype.split("/")[1]):
+                continue
+            resp = self._serve(accept)
+            self.assertEqual(resp.mimetype, mimetype, accept)
+            self.assertIn("Accept", resp.vary)
+
+    def test_disabled_format_is_not_served(self):
+        resp = self._serve(self.BROWSER, modern=("webp",))
+        self.assertEqual(resp.mimetype, "image/webp")
+
+    def test_original_fallback_still_varies(self):
+        with open(self.orig, "wb") as f:
+            f.write(b"not a jpeg")
+        resp = self._serve(self.BROWSER)
+        self.assertIn("Accept", resp.vary)
+        self.assertEqual(resp.get_data(), b"not a jpeg")
+
+
+class QueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.origs = []
+        for n in range(3):
+            p = os.path.join(self.tmp.name, f"{n}.jpg")
+            _jpeg(p, size=(900, 600))
+            self.origs.append(p)
+
+    def _drain(self):
+        deadline = time.time() + 60
+        while app_mod._derivative_queue_depth() != (0, 0):
+            self.assertLess(time.time(), deadline, "queue never drained")
+            time.sleep(0.05)
+
+    def _check_warm(self):
+        for p in self.origs:
+            for dirname, _, _ in SPECS:
+                for fmt in app_mod.DERIVATIVE_FORMATS:
+                    self.assertTrue(derivatives.is_fresh(p, dirname, fmt),
+                                    (p, dirname, fmt))
+
+    def test_pool_warms_uploads(self):
+        app_mod._queue_derivatives(self.origs)
+        self._drain()
+        self._check_warm()
+
+    def test_inline_fallback_warms_uploads(self):
+        with mock.patch.object(app_mod, "_derivative_executor",
+                               return_value=None):
+            app_mod._queue_derivatives(self.origs)
+            self._drain()
+        self._check_warm()
+
+    def test_dead_worker_falls_back_inline_and_drops_the_pool(self):
+        with mock.patch.object(derivatives, "render", _die_in_worker), \
+                mock.patch.object(app_mod, "_derivative_pool", None):
+            pool = app_mod._derivative_executor()
+            if pool is None:
+                self.skipTest("no process pool on this host")
+            with app_mod._derivative_lock:
+                app_mod._derivative_in_flight += len(self.origs)
+            app_mod._render_derivative_batch(list(self.origs))
+            self.assertIsNone(app_mod._derivative_pool)
+        self.assertEqual(app_mod._derivative_queue_depth(), (0, 0))
+        self._check_warm()
+
+    def test_disabled_queue_does_nothing(self):
+        with mock.patch.object(app_mod, "DERIVATIVE_QUEUE_ENABLED", False):
+            app_mod._queue_derivatives(self.origs)
+        self.assertEqual(app_mod._derivative_queue_depth(), (0, 0))
+        self.assertFalse(derivatives.is_fresh(self.origs[0],
+                                              app_mod.THUMB_DIRNAME))
+
+
+if __name__ == "__main__":
+    unittest.main()
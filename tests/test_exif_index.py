@@ -0,0 +1,105 @@
+"""Unit tests for the persistent EXIF timestamp index (exif_index.py) and
+the app's readers on top of it (_photo_date_taken, _photo_datetime_taken).
+
+Writes a couple of tiny JPEGs with Pillow into a temp library, so no real
+photos are needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_exif_index -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from PIL.ExifTags import Base as ExifBase
+
+import ekko_trips_app as app_mod
+import exif_index
+
+
+def _jpeg(path, taken=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    exif = Image.Exif()
+    if taken:
+        exif[ExifBase.DateTime] = taken
+    Image.new("RGB", (8, 8)).save(path, exif=exif)
+
+
+class ExifIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, "photo_uploads")
+        self.db = os.path.join(self.tmp.name, "exif_index.db")
+        self.dated = os.path.join(self.root, "1", "0", "a.jpg")
+        self.undated = os.path.join(self.root, "1", "events", "0", "b.jpg")
+        _jpeg(self.dated, "2024:06:01 18:30:05")
+        _jpeg(self.undated)
+        os.makedirs(os.path.join(self.root, "1", "0", ".thumbs"))
+        _jpeg(os.path.join(self.root, "1", "0", ".thumbs", "a.jpg"),
+              "1999:01:01 00:00:00")
+        for p in (mock.patch.object(app_mod, "UPLOAD_DIR", self.root),
+                  mock.patch.object(app_mod, "EXIF_INDEX_DB", self.db),
+                  mock.patch.object(app_mod, "_start_exif_backfill"),
+                  mock.patch.dict(app_mod._EXIF_RAW_CACHE, clear=True)):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _stamp(self, path):
+        st = os.stat(path)
+        return (os.path.relpath(path, self.root), st.st_mtime_ns, st.st_size)
+
+    def test_backfill_indexes_originals_only(self):
+        n = exif_index.backfill(self.db, self.root, app_mod._allowed_file)
+        self.assertEqual(n, 2)
+        got = exif_index.lookup(self.db, [self._stamp(self.dated),
+                                          self._stamp(self.undated)])
+        self.assertEqual(got, {os.path.join("1", "0", "a.jpg"):
+                               "2024:06:01 18:30:05",
+                               os.path.join("1", "events", "0", "b.jpg"): ""})
+        # A second walk finds nothing left to read.
+        self.assertEqual(
+            exif_index.backfill(self.db, self.root, app_mod._allowed_file), 0)
+
+    def test_replaced_file_is_a_miss(self):
+        exif_index.backfill(self.db, self.root, app_mod._allowed_file)
+        _jpeg(self.dated, "2025:07:04 09:00:00")
+        os.utime(self.dated, ns=(1, 1))
+        self.assertEqual(exif_index.lookup(self.db, [self._stamp(self.dated)]),
+                         {})
+
+    def test_readers_share_one_read_and_persist_it(self):
+        with mock.patch.object(exif_index, "read_raw",
+                               wraps=exif_index.read_raw) as read:
+            self.assertEqual(app_mod._photo_date_taken(self.dated),
+                             "2024-06-01 18:30:05")
+            self.assertEqual(app_mod._photo_datetime_taken(self.dated),
+                             datetime(2024, 6, 1, 18, 30, 5))
+            self.assertEqual(app_mod._photo_date_taken(self.undated), "")
+            self.assertIsNone(app_mod._photo_datetime_taken(self.undated))
+        self.assertEqual(read.call_count, 2)
+
+        # A fresh process (empty in-memory cache) is served from the index.
+        app_mod._EXIF_RAW_CACHE.clear()
+        with mock.patch.object(exif_index, "read_raw") as read:
+            self.assertEqual(app_mod._photo_date_taken(self.dated),
+                             "2024-06-01 18:30:05")
+        read.assert_not_called()
+
+    def test_missing_file(self):
+        gone = os.path.join(self.root, "nope.jpg")
+        self.assertEqual(app_mod._photo_date_taken(gone), "")
+        self.assertIsNone(app_mod._photo_datetime_taken(gone))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+"""Parity tests for geodist.py — the NumPy haversine kernels the track
+pipeline uses in place of per-ping `_haversine_m` loops.
+
+`_haversine_m` stays the reference. Three layers:
+
+  - the kernels themselves against the scalar, on random and edge-case
+    coordinates (poles, antimeridian, identical and antipodal points)
+  - the whole of tests/test_select_track_per_day.py re-run with geodist
+    swapped for a scalar reference implementation, so those hand-built
+    cases pin both paths
+  - randomized trips through _select_track_per_day,
+    _find_home_boundary_tsts, _detect_stops and
+    _drop_stops_at_known_locations, results compared between the real
+    kernels and the reference
+
+Run from the project root:
+
+    python -m unittest tests.test_geodist -v
+"""
+
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app  # noqa: E402
+import geodist  # noqa: E402
+from tests import test_select_track_per_day  # noqa: E402
+
+
+class _ScalarGeodist:
+    """geodist's interface, computed one `_haversine_m` call at a time."""
+
+    @staticmethod
+    def distances_m(lats, lngs, lat, lng):
+        return np.array([app._haversine_m(a, b, lat, lng)
+                         for a, b in zip(lats, lngs)], dtype=float)
+
+    @staticmethod
+    def distance_matrix_m(lats, lngs, a_lats, a_lngs):
+        return np.array([[app._haversine_m(a, b, c, d)
+                          for c, d in zip(a_lats, a_lngs)]
+                         for a, b in zip(lats, lngs)],
+                        dtype=float).reshape(len(lats), len(a_lats))
+
+    ping_coords = staticmethod(geodist.ping_coords)
+
+
+def _scalar_kernels():
+    return mock.patch.object(app, "geodist", _ScalarGeodist)
+
+
+class TestKernels(unittest.TestCase):
+
+    EDGES = [(0.0, 0.0), (90.0, 0.0), (-90.0, 0.0), (0.0, 180.0),
+             (0.0, -180.0), (38.9296, -77.3672), (-38.9296, 102.6328),
+             (45.0, 179.9999), (45.0, -179.9999)]
+
+    def test_distances_match_scalar(self):
+        rnd = random.Random(7)
+        pts = self.EDGES + [(rnd.uniform(-90, 90), rnd.uniform(-180, 180))
+                            for _ in range(300)]
+        lats = [p[0] for p in pts]
+        lngs = [p[1] for p in pts]
+        for lat, lng in self.EDGES + pts[-20:]:
+            got = geodist.distances_m(lats, lngs, lat, lng)
+            want = [app._haversine_m(a, b, lat, lng) for a, b in pts]
+            np.testing.assert_allclose(got, want, rtol=1e-12, atol=1e-6)
+
+    def test_matrix_shape_and_values(self):
+        rnd = random.Random(8)
+        pts = [(rnd.uniform(35, 45), rnd.uniform(-80, -70)) for _ in range(40)]
+        anchors = [(rnd.uniform(35, 45), rnd.uniform(-80, -70))
+                   for _ in range(7)]
+        d = geodist.distance_matrix_m([p[0] for p in pts],
+                                      [p[1] for p in pts],
+                                      [a[0] for a in anchors],
+                                      [a[1] for a in anchors])
+        self.assertEqual(d.shape, (40, 7))
+        for i, p in enumerate(pts):
+            for j, a in enumerate(anchors):
+                self.assertAlmostEqual(d[i, j], app._haversine_m(*p, *a),
+                                       delta=1e-6)
+
+    def test_empty_inputs(self):
+        self.assertEqual(geodist.distances_m([], [], 1.0, 2.0).shape, (0,))
+        self.assertEqual(geodist.distance_matrix_m([], [], [1.0], [2.0]).shape,
+                         (0, 1))
+        self.assertEqual(geodist.distance_matrix_m([1.0], [2.0], [], []).shape,
+                         (1, 0))
+
+    def test_ping_coords_skips_missing(self):
+        lats, lngs = geodist.ping_coords([
+            {"lat": 1.0, "lon": 2.0}, {"lat": None, "lon": 3.0},
+            {"lon": 4.0}, {"lat": 5, "lon": 6}])
+        self.assertEqual(lats.tolist(), [1.0, 5.0])
+        self.assertEqual(lngs.tolist(), [2.0, 6.0])
+        lats, lngs = geodist.ping_coords([])
+        self.assertEqual((len(lats), len(lngs)), (0, 0))
+
+
+class TestSelectTrackPerDayScalarKernels(
+        test_select_track_per_day.TestSelectTrackPerDay):
+    """Every case in test_select_track_per_day, on the reference kernels."""
+
+    def run(self, result=None):
+        with _scalar_kernels():
+            return super().run(result)
+
+
+def _wander(rnd, start, n, t0, step_deg=0.004, dwell_every=25):
+    """A random drive from `start`: mostly moving, pausing now and then for
+    a few pings' dwell so the stop detector has clusters to find."""
+    lat, lon = start
+    tst = t0
+    out = []
+    i = 0
+    while i < n:
+        if i and i % dwell_every == 0:
+            for _ in range(rnd.randint(3, 8)):
+                tst += rnd.randint(120, 600)
+                out.append({"lat": lat + rnd.uniform(-2e-4, 2e-4),
+                            "lon": lon + rnd.uniform(-2e-4, 2e-4),
+                            "tst": tst, "tz": "America/New_York"})
+                i += 1
+        lat += rnd.uniform(-step_deg, step_deg)
+        lon += rnd.uniform(-step_deg, step_deg)
+        tst += rnd.randint(20, 90)
+        out.append({"lat": lat, "lon": lon, "tst": tst,
+                    "tz": "America/New_York"})
+        i += 1
+    return out
+
+
+class TestPipelineParity(unittest.TestCase):
+    """Randomized trips through each ported function: real kernels and the
+    scalar reference must make the same choices."""
+
+    HOME = (38.9296, -77.3672)
+    T0 = 1_723_000_000  # early Aug 2024
+
+    def _both(self, fn, *args, **kwargs):
+        real = fn(*args, **kwargs)
+        with _scalar_kernels():
+            ref = fn(*args, **kwargs)
+        return real, ref
+
+    def test_select_track_per_day(self):
+        for seed in range(6):
+            rnd = random.Random(seed)
+            primary = _wander(rnd, self.HOME, 400, self.T0, step_deg=0.02)
+            alt = _wander(rnd, (39.3, -77.7), 300, self.T0 + 500,
+                          step_deg=0.02)
+            anchors = [(p["lat"], p["lon"])
+                       for p in rnd.sample(primary + alt, 5)]
+            anchors.append((None, None))
+            real, ref = self._both(app._select_track_per_day, primary, alt,
+                                   anchors, self.HOME, "2024-08-06",
+                                   "2024-08-10")
+            self.assertEqual(real, ref, f"seed {seed}")
+
+    def test_find_home_boundary_tsts(self):
+        for seed in range(6):
+            rnd = random.Random(100 + seed)
+            # Leave home, wander, come back.
+            out = _wander(rnd, self.HOME, 200, self.T0, step_deg=0.01)
+            back = _wander(rnd, (out[-1]["lat"], out[-1]["lon"]), 50,
+                           out[-1]["tst"])
+            home_again = [{"lat": self.HOME[0] + rnd.uniform(-1e-4, 1e-4),
+                           "lon": self.HOME[1] + rnd.uniform(-1e-4, 1e-4),
+                           "tst": back[-1]["tst"] + 600 * (k + 1)}
+                          for k in range(20)]
+            lead = [{"lat": self.HOME[0], "lon": self.HOME[1],
+                     "tst": self.T0 - 600 * (20 - k)} for k in range(20)]
+            pts = lead + out + back + home_again
+            anchors = [(p["lat"], p["lon"]) for p in rnd.sample(out, 3)]
+            for a in (None, anchors):
+                real, ref = self._both(app._find_home_boundary_tsts, pts,
+                                       self.HOME, anchors=a)
+                self.assertEqual(real, ref, f"seed {seed}")
+
+    def test_detect_and_drop_stops(self):
+        for seed in range(6):
+            rnd = random.Random(200 + seed)
+            pts = _wander(rnd, self.HOME, 600, self.T0)
+            # Duplicate-timestamp groups exercise the dedup path.
+            for k in rnd.sample(range(1, len(pts) - 1), 15):
+                dup = dict(pts[k], lat=pts[k]["lat"] + rnd.uniform(-0.01, 0.01))
+                pts.insert(k, dup)
+            real, ref = self._both(app._detect_stops, pts)
+            self.assertEqual(real, ref, f"seed {seed}")
+            if not real:
+                continue
+            picks = rnd.sample(real, min(3, len(real)))
+            trip = {
+                "stays": [{"lat": c["center_lat"] + 1e-3,
+                           "lng": c["center_lng"],
+                           "start": "2024-08-06", "end": "2024-08-08"}
+                          for c in picks[:1]],
+                "events": [{"lat": c["center_lat"], "lng": c["center_lng"],
+                            "date": "2024-08-07"} for c in picks[1:2]],
+            }
+            fams = [{"lat": c["center_lat"], "lng": c["center_lng"] + 2e-3}
+                    for c in picks[2:]]
+            real_kept, ref_kept = self._both(
+                app._drop_stops_at_known_locations, real, trip, fams,
+                home=self.HOME)
+            self.assertEqual(real_kept, ref_kept, f"seed {seed}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""Unit tests for geoindex.GeoIndex — radius, k-nearest and bounding-box
+queries checked against a brute-force scan — and for the weather finder's
+indexed distance cut matching its plain scan.
+
+Synthetic points only; no campgrounds.json or network needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_geoindex -v
+"""
+
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geodist  # noqa: E402
+import geoindex  # noqa: E402
+import weather_finder  # noqa: E402
+
+
+def _points(n, seed=0):
+    rnd = random.Random(seed)
+    pts = [(rnd.uniform(25, 49), rnd.uniform(-124, -67)) for _ in range(n)]
+    # A dense cluster, so some cells are crowded and some sparse.
+    pts += [(38.9 + rnd.gauss(0, 0.05), -77.4 + rnd.gauss(0, 0.05))
+            for _ in range(n // 4)]
+    return pts
+
+
+class GeoIndexTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pts = _points(4000)
+        cls.idx = geoindex.GeoIndex(cls.pts)
+        cls.lats = np.array([p[0] for p in cls.pts])
+        cls.lngs = np.array([p[1] for p in cls.pts])
+
+    def _brute(self, lat, lng):
+        return geodist.distances_m(self.lats, self.lngs, lat, lng)
+
+    def test_within_matches_scan(self):
+        rnd = random.Random(1)
+        for _ in range(40):
+            lat, lng = rnd.uniform(24, 50), rnd.uniform(-125, -66)
+            for r in (500.0, 8_000.0, 80_000.0, 650_000.0):
+                pos, d = self.idx.within(lat, lng, r)
+                want = np.flatnonzero(self._brute(lat, lng) <= r)
+                self.assertEqual(sorted(pos.tolist()), want.tolist())
+                self.assertTrue(np.all(np.diff(d) >= 0))
+                np.testing.assert_allclose(d, self._brute(lat, lng)[pos])
+
+    def test_nearest_matches_scan(self):
+        rnd = random.Random(2)
+        for _ in range(40):
+            lat, lng = rnd.uniform(24, 50), rnd.uniform(-125, -66)
+            brute = np.sort(self._brute(lat, lng))
+            for k in (1, 5, 50):
+                pos, d = self.idx.nearest(lat, lng, k)
+                np.testing.assert_allclose(d, brute[:k])
+            pos, d = self.idx.nearest(lat, lng, 50, max_m=30_000)
+            np.testing.assert_allclose(d, brute[:50][brute[:50] <= 30_000])
+
+    def test_nearest_far_away_and_oversized_k(self):
+        pos, d = self.idx.nearest(-45.0, 170.0, 3)
+        np.testing.assert_allclose(d, np.sort(self._brute(-45.0, 170.0))[:3])
+        pos, _ = self.idx.nearest(40.0, -100.0, len(self.pts) + 10)
+        self.assertEqual(sorted(pos.tolist()), list(range(len(self.pts))))
+
+    def test_bbox_matches_scan(self):
+        rnd = random.Random(3)
+        for _ in range(40):
+            s, w = rnd.uniform(24, 48), rnd.uniform(-125, -70)
+            n, e = s + rnd.uniform(0, 3), w + rnd.uniform(0, 5)
+            got = self.idx.bbox(s, w, n, e)
+            want = np.flatnonzero((self.lats >= s) & (self.lats <= n)
+                                  & (self.lngs >= w) & (self.lngs <= e))
+            self.assertEqual(sorted(got.tolist()), want.tolist())
+
+    def test_antimeridian_and_skipped_coords(self):
+        pts = [(10.0, 179.9), (10.0, -179.9), (10.0, 0.0), None,
+               (None, 5.0), ("x", 1.0), (float("nan"), 2.0)]
+        idx = geoindex.GeoIndex(pts)
+        self.assertEqual(len(idx), 3)
+        self.assertEqual(sorted(idx.bbox(9, 179, 11, -179).tolist()), [0, 1])
+        pos, d = idx.within(10.0, 180.0, 20_000)
+        self.assertEqual(sorted(pos.tolist()), [0, 1])
+        pos, _ = idx.nearest(10.0, 1.0, 10)
+        self.assertEqual(pos.tolist()[0], 2)
+        self.assertEqual(len(pos), 3)
+
+    def test_empty(self):
+        idx = geoindex.GeoIndex([])
+        self.assertEqual(len(idx.within(0, 0, 1e6)[0]), 0)
+        self.assertEqual(len(idx.nearest(0, 0, 3)[0]), 0)
+        self.assertEqual(len(idx.bbox(-1, -1, 1, 1)), 0)
+
+    def test_plain_grid_fallback_gives_same_answers(self):
+        with mock.patch.object(geoindex, "h3", None):
+            grid = geoindex.GeoIndex(self.pts)
+        for lat, lng, r in ((38.9, -77.4, 20_000.0), (40.0, -100.0, 400_000.0)):
+            self.assertEqual(sorted(grid.within(lat, lng, r)[0].tolist()),
+                             sorted(self.idx.within(lat, lng, r)[0].tolist()))
+            np.testing.assert_allclose(grid.nearest(lat, lng, 7)[1],
+                                       self.idx.nearest(lat, lng, 7)[1])
+
+
+def _latlng(loc):
+    """weather_finder's own parse of a "lat,lng" location."""
+    try:
+        lat, lng = (float(x) for x in loc.split(","))
+    except (ValueError, AttributeError):
+        return None
+    return lat, lng
+
+
+class WeatherFinderIndexTests(unittest.TestCase):
+    """find_matching_days with and without `index` must ask about the same
+    points and report the same counts."""
+
+    def _run(self, rows, index, **kw):
+        asked = []
+
+        def fake_fetch(points, **_):
+            asked.append(list(points))
+            return [None] * len(points)
+
+        with mock.patch.object(weather_finder, "fetch_daily_forecasts",
+                               fake_fetch), \
+                mock.patch.object(weather_finder, "_cache_get",
+                                  return_value=None):
+            result = weather_finder.find_matching_days(
+                rows, (38.93, -77.37), index=index, **kw)
+        return asked, result
+
+    def test_same_eligible_set(self):
+        rnd = random.Random(4)
+        rows = [{"name": f"cg{i}", "location": f"{lat},{lng}",
+                 "waterfront": rnd.choice(["lakefront", "not waterfront"])}
+                for i, (lat, lng) in enumerate(_points(3000, seed=4))]
+        rows.append({"name": "no location"})
+        rows.append({"name": "bad", "location": "x,y"})
+        index = geoindex.GeoIndex([
+            _latlng(r.get("location")) for r in rows])
+        for kw in ({"max_miles": 50.0}, {"max_miles": 400.0},
+                   {"max_miles": 250.0, "waterfront_only": True}):
+            plain = self._run(rows, None, **kw)
+            indexed = self._run(rows, index, **kw)
+            self.assertEqual(plain, indexed, kw)
+            self.assertGreater(plain[1]["eligible"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Stress tests for json_store's atomic, lock-protected JSON writes.
+
+Several processes (and threads) hammer one file with read-modify-write
+updates at once — the multi-worker WSGI shape that used to lose caption and
+favorite edits — and the test checks that every update landed and that a
+concurrent reader never saw a torn file.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_json_store -v
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_store
+
+WORKERS = 4
+EDITS_PER_WORKER = 60
+
+
+def _hammer(path, worker, edits):
+    for i in range(edits):
+        with json_store.update(path, indent=2, ensure_ascii=False) as data:
+            data[f"{worker}/{i}"] = "café " * 20
+            data["count"] = data.get("count", 0) + 1
+
+
+def _read_until(path, stop, errors):
+    while not stop.is_set():
+        try:
+            with open(path, encoding="utf-8") as f:
+                json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            errors.append(e)
+
+
+class JsonStoreStressTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "captions.json")
+
+    def _check(self, writers):
+        data = json_store.load(self.path)
+        self.assertEqual(data["count"], writers * EDITS_PER_WORKER)
+        self.assertEqual(len(data), writers * EDITS_PER_WORKER + 1)
+        leftovers = [n for n in os.listdir(self.tmp.name) if n.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+    def test_concurrent_processes_lose_nothing(self):
+        ctx = multiprocessing.get_context("fork")
+        stop, errors = threading.Event(), []
+        reader = threading.Thread(target=_read_until,
+                                  args=(self.path, stop, errors))
+        reader.start()
+        procs = [ctx.Process(target=_hammer,
+                             args=(self.path, w, EDITS_PER_WORKER))
+                 for w in range(WORKERS)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+        stop.set()
+        reader.join()
+        self.assertEqual([p.exitcode for p in procs], [0] * WORKERS)
+        self.assertEqual(errors, [])
+        self._check(WORKERS)
+
+    def test_concurrent_threads_lose_nothing(self):
+        threads = [threading.Thread(target=_hammer,
+                                    args=(self.path, w, EDITS_PER_WORKER))
+                   for w in range(WORKERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self._check(WORKERS)
+
+    def test_lock_is_reentrant(self):
+        with json_store.lock(self.path):
+            with json_store.update(self.path) as data:
+                data["a"] = 1
+        self.assertEqual(json_store.load(self.path), {"a": 1})
+
+    def test_failed_update_writes_nothing(self):
+        json_store.write(self.path, {"a": 1})
+        with self.assertRaises(RuntimeError):
+            with json_store.update(self.path) as data:
+                data["a"] = 2
+                raise RuntimeError
+        self.assertEqual(json_store.load(self.path), {"a": 1})
+
+    def test_noop_update_leaves_file_alone(self):
+        json_store.write(self.path, {"a": 1})
+        before = os.stat(self.path).st_mtime_ns
+        with json_store.update(self.path) as data:
+            data["a"] = 1
+        self.assertEqual(os.stat(self.path).st_mtime_ns, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Parity tests for localdates.py — the batched local-date bucketing the
+per-day track passes use in place of `_local_date_of_ping`.
+
+The scalar stays the reference; every case compares the two ping for ping:
+DST spring-forward and fall-back nights, half-hour and southern-hemisphere
+zones, missing / "UTC" / unknown tz names, pings without a tst, and the
+`default_tz` substitution the drive-day split relies on.
+
+Run from the project root:
+
+    python -m unittest tests.test_localdates -v
+"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import localdates  # noqa: E402
+from ekko_trips_app import _local_date_of_ping  # noqa: E402
+
+
+def _utc(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+ZONES = ["America/New_York", "America/Los_Angeles", "America/Phoenix",
+         "America/St_Johns", "Australia/Adelaide", "Asia/Kolkata",
+         "Europe/London", "Pacific/Chatham"]
+
+
+class TestLocalDates(unittest.TestCase):
+
+    def assertMatchesScalar(self, pts, default_tz=None):
+        want = [_local_date_of_ping(p if p.get("tz") or not default_tz
+                                    else dict(p, tz=default_tz))
+                for p in pts]
+        self.assertEqual(localdates.local_dates(pts, default_tz), want)
+
+    def test_random_pings_across_zones_and_years(self):
+        rnd = random.Random(3)
+        lo, hi = _utc(2019, 1, 1), _utc(2026, 1, 1)
+        pts = [{"tst": rnd.randint(lo, hi), "tz": rnd.choice(ZONES)}
+               for _ in range(3000)]
+        self.assertMatchesScalar(pts)
+
+    def test_every_minute_around_dst_transitions(self):
+        # 2024 US spring-forward (Mar 10) and fall-back (Nov 3), with
+        # midnight local landing on either side of the shifted hour.
+        for start in (_utc(2024, 3, 10, 0), _utc(2024, 11, 3, 0),
+                      _utc(2024, 3, 31, 0), _utc(2024, 10, 6, 0)):
+            pts = [{"tst": start + 60 * k, "tz": tz}
+                   for tz in ZONES for k in range(0, 36 * 60, 7)]
+            self.assertMatchesScalar(pts)
+
+    def test_midnight_edges_exact(self):
+        # 00:00:00 and 23:59:59 local on a DST-change day.
+        midnight_edt = _utc(2024, 3, 11, 4)  # 00:00 EDT, Mar 11
+        pts = [{"tst": midnight_edt + d, "tz": "America/New_York"}
+               for d in (-1, 0, 1)]
+        self.assertEqual(localdates.local_dates(pts),
+                         ["2024-03-10", "2024-03-11", "2024-03-11"])
+        self.assertMatchesScalar(pts)
+
+    def test_fallbacks(self):
+        t = _utc(2024, 8, 7, 2)  # Aug 6 evening in the Americas
+        pts = [{"tst": t}, {"tst": t, "tz": None}, {"tst": t, "tz": ""},
+               {"tst": t, "tz": "UTC"}, {"tst": t, "tz": "Not/AZone"},
+               {"tst": None, "tz": "America/New_York"}, {"lat": 1.0},
+               {"tst": t, "tz": "America/Denver"}]
+        got = localdates.local_dates(pts)
+        self.assertEqual(got, ["2024-08-07"] * 5 + [None, None,
+                                                     "2024-08-06"])
+        self.assertMatchesScalar(pts)
+
+    def test_default_tz_fills_untagged_pings_only(self):
+        t = _utc(2024, 8, 7, 2)
+        pts = [{"tst": t}, {"tst": t, "tz": "UTC"},
+               {"tst": t, "tz": "Asia/Tokyo"}]
+        self.assertEqual(localdates.local_dates(pts, "America/New_York"),
+                         ["2024-08-06", "2024-08-07", "2024-08-07"])
+        self.assertMatchesScalar(pts, "America/New_York")
+
+    def test_fractional_and_pre_epoch_timestamps(self):
+        pts = [{"tst": _utc(2024, 8, 7, 3, 59, 59) + 0.75,
+                "tz": "America/New_York"},
+               {"tst": -86400 * 3 + 5, "tz": "America/New_York"}]
+        self.assertMatchesScalar(pts)
+
+    def test_empty(self):
+        self.assertEqual(localdates.local_dates([]), [])
+        self.assertEqual(len(localdates.day_numbers([])), 0)
+
+    def test_day_numbers(self):
+        days = localdates.day_numbers([{"tst": 86400 * 2 + 5}, {}])
+        self.assertEqual(days[0], 2)
+        self.assertEqual(days[1], localdates.NO_DAY)
+        self.assertEqual(localdates.iso(days[0]), "1970-01-03")
+
+
+if __name__ == "__main__":
+    unittest.main()
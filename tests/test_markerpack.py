@@ -0,0 +1,146 @@
+"""Tests for markerpack — the columnar binary form of the campground map's
+marker rows — and /api/campgrounds/markers/packed, which serves it.
+
+`unpack` is the reference decoder the map's `unpackMarkers` mirrors, so
+round trips through it stand in for the browser's.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_markerpack -v
+"""
+
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+import markerpack  # noqa: E402
+
+FIELDS = app_mod._MAP_MARKER_FIELDS
+
+
+def _rows(n=500):
+    rnd = random.Random(3)
+    rows = []
+    for i in range(n):
+        lat, lng = rnd.uniform(25, 49), rnd.uniform(-124, -67)
+        rows.append({"id": 100 + 2 * i, "name": f"Camp {rnd.randint(0, 50)}",
+                     "state": rnd.choice(["VA", "MD", "OR"]),
+                     "location": f"{round(lat, 6)!r},{round(lng, 6)!r}",
+                     "waterfront": rnd.choice(["lakefront", "not waterfront"]),
+                     "climate": "mild",
+                     "ownership": rnd.choice(["state", "federal", ""]),
+                     "visit_count": rnd.choice([0, 0, 1, 4])})
+    return rows
+
+
+def _meta(buf):
+    (size,) = struct.unpack_from("<I", buf, 4)
+    return {c["field"]: c
+            for c in json.loads(buf[8:8 + size].decode())["columns"]}
+
+
+class PackTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        rows = _rows()
+        buf = markerpack.pack(rows, FIELDS, coords="location")
+        self.assertEqual(markerpack.unpack(buf), rows)
+
+    def test_columns_are_narrow(self):
+        rows = _rows()
+        meta = _meta(markerpack.pack(rows, FIELDS, coords="location"))
+        # Ids step by 2: deltas fit a byte where the ids themselves don't.
+        self.assertEqual((meta["id"]["type"], meta["id"]["delta"]),
+                         ("u8", True))
+        self.assertEqual(meta["visit_count"]["type"], "u8")
+        self.assertEqual(meta["state"]["kind"], "dict")
+        self.assertEqual(sorted(meta["state"]["table"]), ["MD", "OR", "VA"])
+        self.assertEqual(meta["location"]["exact"], [])
+        self.assertLess(len(markerpack.pack(rows, FIELDS, coords="location")),
+                        len(json.dumps(rows, separators=(",", ":"))) / 3)
+
+    def test_odd_values_survive(self):
+        rows = [
+            {"id": 1, "name": "Trailing zero", "location": "38.900000,-77.4"},
+            {"id": 2, "name": "Spaced", "location": "38.9, -77.4"},
+            {"id": 3, "name": "Whole", "location": "40,-105"},
+            {"id": 4, "name": "Tiny", "location": "0.00001,0"},
+            {"id": 5, "name": "Garbage", "location": "n/a"},
+            {"id": 6, "name": "Off the globe", "location": "95,0"},
+            {"id": 7, "location": "-33.5,151.25", "visit_count": 3},
+            {"id": 8, "name": None, "ownership": True, "visit_count": 1.0},
+        ]
+        buf = markerpack.pack(rows, FIELDS, coords="location")
+        want = [{k: v for k, v in r.items() if v is not None} for r in rows]
+        self.assertEqual(markerpack.unpack(buf), want)
+        self.assertIs(markerpack.unpack(buf)[7]["ownership"], True)
+        # Only the spellings fixed-point can't reproduce, and the row that
+        # has no location, go verbatim.
+        self.assertEqual(_meta(buf)["location"]["exact"],
+                         [[0, "38.900000,-77.4"], [1, "38.9, -77.4"],
+                          [3, "0.00001,0"], [4, "n/a"], [5, "95,0"],
+                          [7, None]])
+
+    def test_empty_and_bad_magic(self):
+        self.assertEqual(markerpack.unpack(markerpack.pack([], FIELDS)), [])
+        with self.assertRaises(ValueError):
+            markerpack.unpack(b"JSON" + bytes(8))
+
+
+class PackedEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.rows = _rows(50)
+        patches = [
+            mock.patch.object(app_mod, "_load_campgrounds",
+                              return_value=self.rows),
+            mock.patch.dict(app_mod._campground_tiles_cache,
+                            {"rows": None, "state": None}),
+            mock.patch.object(app_mod, "ACCESS_LOG_FILE",
+                              os.path.join(tmp.name, "access_log.jsonl")),
+            mock.patch.object(app_mod, "_load_users", return_value={
+                "viewer": app_mod.User("viewer", ""),
+                "tripsonly": app_mod.User("tripsonly", "",
+                                          can_view_campgrounds=False)}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = app_mod.app.test_client()
+        self._login("viewer")
+
+    def _login(self, user):
+        with self.client.session_transaction() as sess:
+            sess["_user_id"] = user
+
+    def test_matches_the_json_rows(self):
+        resp = self.client.get("/api/campgrounds/markers/packed")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, markerpack.MIMETYPE)
+        self.assertEqual(markerpack.unpack(resp.get_data()),
+                         self.client.get("/api/campgrounds/markers").get_json())
+
+    def test_etag_and_access(self):
+        url = "/api/campgrounds/markers/packed"
+        etag = self.client.get(url).headers["ETag"]
+        self.assertNotEqual(
+            etag, self.client.get("/api/campgrounds/markers").headers["ETag"])
+        self.assertEqual(
+            self.client.get(url, headers={"If-None-Match": etag}).status_code,
+            304)
+        self._login("tripsonly")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""Tests for the compressed page cache (`_cached_response`) — repeat hits
+skip the build, edits and roles re-key it, the LRU keeps to its byte budget
+— through /api/campgrounds/all and the campground map page.
+
+Points CAMPGROUNDS_JSON / FAMILY_JSON at temp files and logs test users in
+through the session, so no real data or users.json is needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_page_cache -v
+"""
+
+import gzip
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+
+
+class PageCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cg_path = os.path.join(tmp.name, "campgrounds.json")
+        fam_path = os.path.join(tmp.name, "family.json")
+        self._write([{"id": i, "name": f"Camp {i}", "location": "38.9,-77.4",
+                      "waterfront_evidence": "x" * 50} for i in range(300)])
+        with open(fam_path, "w") as f:
+            json.dump([], f)
+        patches = [
+            mock.patch.object(app_mod, "CAMPGROUNDS_JSON", self.cg_path),
+            mock.patch.object(app_mod, "FAMILY_JSON", fam_path),
+            mock.patch.dict(app_mod._page_cache),
+            mock.patch.dict(app_mod._page_cache_state, {"bytes": 0}),
+            mock.patch.object(app_mod, "ACCESS_LOG_FILE",
+                              os.path.join(tmp.name, "access_log.jsonl")),
+            mock.patch.object(app_mod, "_load_users", return_value={
+                "admin": app_mod.User("admin", "", is_admin=True),
+                "viewer": app_mod.User("viewer", "")}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        app_mod._page_cache.clear()
+        self.client = app_mod.app.test_client()
+        self._login("admin")
+
+    def _write(self, entries):
+        with open(self.cg_path, "w") as f:
+            json.dump(entries, f)
+
+    def _login(self, user):
+        with self.client.session_transaction() as sess:
+            sess["_user_id"] = user
+
+    def _get_all(self, encoding="gzip"):
+        return self.client.get("/api/campgrounds/all",
+                               headers={"Accept-Encoding": encoding})
+
+    def test_repeat_hits_skip_the_build(self):
+        with mock.patch.object(app_mod, "_campground_all_body",
+                               wraps=app_mod._campground_all_body) as build:
+            first = self._get_all()
+            second = self._get_all()
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(second.headers["Content-Encoding"], "gzip")
+        self.assertEqual(first.get_data(), second.get_data())
+        rows = json.loads(gzip.decompress(second.get_data()))
+        self.assertEqual(len(rows), 300)
+        self.assertNotIn("waterfront_evidence", rows[0])
+
+    def test_client_without_gzip_gets_plain_bytes(self):
+        self._get_all()
+        resp = self._get_all(encoding="identity")
+        self.assertNotIn("Content-Encoding", resp.headers)
+        self.assertEqual(len(resp.get_json()), 300)
+
+    def test_edit_rebuilds(self):
+        self._get_all()
+        self._write([{"id": 1, "name": "Only"}])
+        st = os.stat(self.cg_path)
+        os.utime(self.cg_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        rows = json.loads(gzip.decompress(self._get_all().get_data()))
+        self.assertEqual([r["name"] for r in rows], ["Only"])
+
+    def test_refusals_are_not_cached(self):
+        self._login("viewer")
+        self.assertEqual(self._get_all().status_code, 403)
+        self.assertEqual(len(app_mod._page_cache), 0)
+
+    def test_roles_render_separately(self):
+        tiles = {"facets": {"total": 0, "modes": {}}, "fit": None,
+                 "fit_trimmed": None, "markers": []}
+        with mock.patch.object(app_mod, "_campground_tiles",
+                               return_value=tiles), \
+                mock.patch.object(app_mod, "_map_config",
+                                  return_value=((38.9, -77.4), [])), \
+                mock.patch.object(app_mod, "_load_roadside", return_value=[]), \
+                mock.patch.object(app_mod, "parse_trips", return_value=[]), \
+                mock.patch.object(app_mod, "_render_campgrounds_map",
+                                  wraps=app_mod._render_campgrounds_map) as build:
+            for user in ("viewer", "viewer", "admin", "viewer"):
+                self._login(user)
+                resp = self.client.get("/campgrounds/map",
+                                       headers={"Accept-Encoding": "gzip"})
+                self.assertEqual(resp.status_code, 200)
+                self.assertIn("ETag", resp.headers)
+            self.assertEqual(build.call_count, 2)
+            etag = resp.headers["ETag"]
+            resp = self.client.get("/campgrounds/map",
+                                   headers={"If-None-Match": etag})
+            self.assertEqual(resp.status_code, 304)
+
+    def test_lru_keeps_to_budget(self):
+        with mock.patch.object(app_mod, "_PAGE_CACHE_BUDGET", 1000):
+            for i in range(6):
+                app_mod._page_cache_put(i, {"gzip": b"x" * 200, "br": None})
+            self.assertEqual(list(app_mod._page_cache), [1, 2, 3, 4, 5])
+            self.assertEqual(app_mod._page_cache_state["bytes"], 1000)
+            # Too big to be worth a quarter of the budget: not kept at all.
+            app_mod._page_cache_put("big", {"gzip": b"x" * 400, "br": None})
+            self.assertNotIn("big", app_mod._page_cache)
+
+    @unittest.skipIf(app_mod.brotli is None, "brotli not installed")
+    def test_brotli_when_accepted(self):
+        self._get_all()
+        resp = self._get_all(encoding="gzip, br")
+        self.assertEqual(resp.headers["Content-Encoding"], "br")
+        rows = json.loads(app_mod.brotli.decompress(resp.get_data()))
+        self.assertEqual(len(rows), 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Parity tests for photo_meta's two engines (the five JSON files vs.
+photo_meta.db).
+
+Runs the same sequence of edits against a JSON-backed tree and a
+SQLite-backed one migrated from identical files, and checks both end up
+holding the same metadata.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_photo_meta -v
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import photo_meta
+
+SEED = {
+    "captions.json": {"1/0/a.jpg": "Campfire — night one", "1/0/b.jpg": "",
+                      "1/1/c.jpg": "Lake", "1/events/0/d.jpg": "Fair",
+                      "2/0/e.jpg": "Beach"},
+    "photo_uploaders.json": {"1/0/a.jpg": "pat", "1/1/c.jpg": "sam"},
+    "photo_favorites.json": {"1/0/b.jpg": True, "2/0/e.jpg": True},
+    "photo_people.json": {"1/0/a.jpg": 2, "1/0/b.jpg": 0, "1/1/c.jpg": 1},
+    "photo_order.json": {"1/0": ["b.jpg", "a.jpg"], "1/1": ["c.jpg"],
+                         "2/0": ["e.jpg"]},
+}
+
+
+def _edit_everything():
+    photo_meta.set_value("captions", "1/1/c.jpg", "Lake at dusk")
+    photo_meta.set_many("uploaders", {"1/1/new.jpg": "pat", "1/1/c.jpg": None})
+    photo_meta.set_value("favorites", "1/0/a.jpg", True)
+    photo_meta.set_value("favorites", "2/0/e.jpg", None)
+    photo_meta.set_order("1/1", ["new.jpg", "c.jpg"])
+    photo_meta.move_photo("1/0", "b.jpg", "1/1", "b.jpg")
+    # Swap stays 0 and 1 of trip 1, as a date edit re-sorting them would.
+    photo_meta.remap_indices("1", {0: 1, 1: 0})
+    photo_meta.remove_photos("1/0", ["c.jpg"])
+    photo_meta.merge_people({"1/0/new.jpg": 3}, removed=["1/1/a.jpg"])
+    photo_meta.remove_grid("2/0")
+
+
+class PhotoMetaParityTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _tree(self, name, sqlite):
+        base = os.path.join(self.tmp.name, name)
+        os.makedirs(base)
+        for fname, data in SEED.items():
+            with open(os.path.join(base, fname), "w") as f:
+                json.dump(data, f)
+        patches = [mock.patch.object(photo_meta, attr, os.path.join(base, f))
+                   for attr, f in (("CAPTIONS_JSON", "captions.json"),
+                                   ("ORDER_JSON", "photo_order.json"),
+                                   ("UPLOADERS_JSON", "photo_uploaders.json"),
+                                   ("FAVORITES_JSON", "photo_favorites.json"),
+                                   ("PEOPLE_JSON", "photo_people.json"),
+                                   ("DB", "photo_meta.db"))]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        if sqlite:
+            photo_meta.migrate_from_json()
+        return patches
+
+    def _run(self, name, sqlite):
+        patches = self._tree(name, sqlite)
+        self.assertEqual(photo_meta.sqlite_active(), sqlite)
+        _edit_everything()
+        result = photo_meta.load_all()
+        for p in patches:
+            p.stop()
+        return result
+
+    def test_migration_round_trips(self):
+        self._tree("rt", sqlite=True)
+        meta = photo_meta.load_all()
+        # An empty caption is a recorded value; both engines keep it.
+        self.assertEqual(meta["captions"], SEED["captions.json"])
+        self.assertEqual(meta["people"], SEED["photo_people.json"])
+        self.assertEqual(meta["order"], SEED["photo_order.json"])
+        self.assertEqual(photo_meta.load_all(prefix="1/0/")["people"],
+                         {"1/0/a.jpg": 2, "1/0/b.jpg": 0})
+
+    def test_edit_parity(self):
+        expected = self._run("json", sqlite=False)
+        got = self._run("sqlite", sqlite=True)
+        self.assertEqual(got, expected)
+        # Spot-check the end state, not just agreement.
+        self.assertEqual(expected["order"],
+                         {"1/0": ["new.jpg", "b.jpg"], "1/1": ["a.jpg"]})
+        self.assertEqual(expected["favorites"],
+                         {"1/0/b.jpg": True, "1/1/a.jpg": True})
+        self.assertNotIn("1/0/b.jpg", expected["captions"])
+        self.assertEqual(expected["people"],
+                         {"1/0/b.jpg": 0, "1/0/new.jpg": 3})
+
+    def test_export_matches_store(self):
+        self._tree("export", sqlite=True)
+        _edit_everything()
+        meta = photo_meta.load_all()
+        photo_meta.export_json()
+        with open(photo_meta.CAPTIONS_JSON) as f:
+            self.assertEqual(json.load(f), meta["captions"])
+        with open(photo_meta.ORDER_JSON) as f:
+            self.assertEqual(json.load(f), meta["order"])
+
+    def test_noop_reports_unchanged(self):
+        for name, sqlite in (("noop-json", False), ("noop-db", True)):
+            patches = self._tree(name, sqlite)
+            self.assertFalse(photo_meta.set_value("favorites", "2/0/e.jpg", True))
+            self.assertTrue(photo_meta.set_value("favorites", "2/0/e.jpg", None))
+            for p in patches:
+                p.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
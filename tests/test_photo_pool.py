@@ -0,0 +1,106 @@
+"""Unit tests for the incremental photo pool (_collect_photo_pool): photo
+directories are re-listed only when their signature moves, metadata edits
+reach the pool without a listing pass, and an unchanged library hands back
+the very same pool object.
+
+Points UPLOAD_DIR and photo_meta at a temp tree and stubs the trip list, so
+no real photos or trip data are needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_photo_pool -v
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod
+import photo_meta
+
+TRIPS = [{"id": 1, "home_only": False, "stays": [{}, {}], "events": [{}]}]
+
+
+def _age(path):
+    """Backdate a directory past the racy window, as if written long ago."""
+    old = time.time() - 60
+    os.utime(path, (old, old))
+
+
+class PhotoPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = self.tmp.name
+        self.uploads = os.path.join(root, "photo_uploads")
+        self.stay0 = os.path.join(self.uploads, "1", "0")
+        self.event0 = os.path.join(self.uploads, "1", "events", "0")
+        for d, names in ((self.stay0, ["a.jpg", "b.jpg", "notes.txt"]),
+                         (self.event0, ["c.jpg"])):
+            os.makedirs(d)
+            for n in names:
+                open(os.path.join(d, n), "w").close()
+            _age(d)
+        patches = [
+            mock.patch.object(app_mod, "UPLOAD_DIR", self.uploads),
+            mock.patch.object(app_mod, "parse_trips", return_value=TRIPS),
+            mock.patch.object(app_mod, "trips_data_path",
+                              return_value=os.path.join(root, "trips.json")),
+            mock.patch.object(photo_meta, "DB", os.path.join(root, "meta.db")),
+        ]
+        for attr in ("CAPTIONS_JSON", "ORDER_JSON", "UPLOADERS_JSON",
+                     "FAVORITES_JSON", "PEOPLE_JSON"):
+            patches.append(mock.patch.object(
+                photo_meta, attr, os.path.join(root, attr.lower() + ".json")))
+        patches.append(mock.patch.dict(app_mod._PHOTO_POOL_CACHE, {
+            "pool": None, "layout_key": None, "layout": None,
+            "meta_sig": None, "meta": None, "grids": {}}))
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_builds_every_grid(self):
+        pool = app_mod._collect_photo_pool()
+        self.assertEqual([p["key"] for p in pool],
+                         ["1/0/a.jpg", "1/0/b.jpg", "1/events/0/c.jpg"])
+        self.assertEqual(pool[2]["card"], "event-0")
+
+    def test_unchanged_library_is_not_relisted(self):
+        first = app_mod._collect_photo_pool()
+        with mock.patch.object(app_mod.os, "listdir",
+                               wraps=os.listdir) as listdir:
+            again = app_mod._collect_photo_pool()
+        self.assertIs(again, first)
+        listdir.assert_not_called()
+
+    def test_only_the_changed_directory_is_relisted(self):
+        app_mod._collect_photo_pool()
+        open(os.path.join(self.stay0, "new.jpg"), "w").close()
+        with mock.patch.object(app_mod.os, "listdir",
+                               wraps=os.listdir) as listdir:
+            pool = app_mod._collect_photo_pool()
+        listdir.assert_called_once_with(self.stay0)
+        self.assertIn("1/0/new.jpg", [p["key"] for p in pool])
+
+    def test_metadata_edit_needs_no_listing(self):
+        app_mod._collect_photo_pool()
+        photo_meta.set_value("captions", "1/events/0/c.jpg", "Fair")
+        photo_meta.set_order("1/0", ["b.jpg"])
+        with mock.patch.object(app_mod.os, "listdir",
+                               wraps=os.listdir) as listdir:
+            pool = app_mod._collect_photo_pool()
+        listdir.assert_not_called()
+        by_key = {p["key"]: p for p in pool}
+        self.assertEqual(by_key["1/events/0/c.jpg"]["caption"], "Fair")
+        self.assertTrue(by_key["1/0/b.jpg"]["curated"])
+        self.assertEqual(by_key["1/0/b.jpg"]["photo_seq"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
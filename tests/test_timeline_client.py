@@ -0,0 +1,167 @@
+"""Tests for timeline_client — the pooled, concurrent, retrying client the
+app fetches timeline pings through.
+
+Runs the client against tests/timeline_stub.py, a local HTTP/1.1 server
+standing in for the timeline API, so the connections, keep-alive and
+concurrency are real. The old one-urlopen-per-page loop is the reference:
+whatever the client fetches, it must return the same pings in the same
+order.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_timeline_client -v
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timeline_client  # noqa: E402
+from tests.timeline_stub import StubTimeline  # noqa: E402
+
+DAY = 86400
+T0 = 1_720_000_000
+
+
+def _pings(tid, n, step, start=T0):
+    return [{"lat": 40 + i * 1e-4, "lon": -100, "tst": start + i * step,
+             "tid": tid} for i in range(n)]
+
+
+def _reference(stub, tid, from_ts, to_ts, limit):
+    """The old loop's result, computed from the stub's pings directly."""
+    lo, hi = timeline_client.to_tst(from_ts), timeline_client.to_tst(to_ts)
+    out, cursor = [], lo
+    for _ in range(timeline_client.MAX_PAGES):
+        page = [p for p in stub.pings[tid] if cursor <= p["tst"] <= hi][:limit]
+        out += page
+        if len(page) < limit:
+            break
+        cursor = page[-1]["tst"] + 1
+    return out
+
+
+class TimelineClientTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubTimeline({"phone-a": _pings("phone-a", 900, 600),
+                                  "phone-b": _pings("phone-b", 900, 600,
+                                                    T0 + 7)}).start()
+        self.addCleanup(self.stub.stop)
+        self.client = timeline_client.TimelineClient(
+            self.stub.url, "t", backoff=0.01, split_secs=None)
+        self.addCleanup(self.client.close)
+        patch = mock.patch.object(timeline_client, "PAGE_LIMIT", 100)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_pages_like_the_old_loop(self):
+        got = self.client.fetch("phone-a", T0 + 50, T0 + 400 * 600)
+        self.assertEqual(got, _reference(self.stub, "phone-a", T0 + 50,
+                                         T0 + 400 * 600, 100))
+        self.assertEqual(len(got), 400)
+        self.assertEqual(len(self.stub.requests), 5)  # 4 full pages + 1 short
+        self.assertEqual([r[1] for r in self.stub.requests[1:]],
+                         [str(got[k * 100 - 1]["tst"] + 1)
+                          for k in range(1, 5)])
+
+    def test_pages_share_one_connection(self):
+        self.client.fetch("phone-a", T0, T0 + 900 * 600)
+        self.client.fetch("phone-b", T0, T0 + 900 * 600)
+        self.assertEqual(len(self.stub.requests), 20)
+        self.assertEqual(len(self.stub.ports), 1)
+
+    def test_tids_fetched_at_once_and_kept_in_order(self):
+        self.stub.latency = 0.05
+        jobs = [("phone-a", T0, T0 + 50 * 600), ("phone-b", T0, T0 + 50 * 600),
+                ("phone-c", T0, T0 + 50 * 600)]
+        got = self.client.fetch_many(jobs)
+        self.assertEqual(got, [_reference(self.stub, "phone-a", T0,
+                                          T0 + 50 * 600, 100),
+                               _reference(self.stub, "phone-b", T0,
+                                          T0 + 50 * 600, 100), []])
+        self.assertEqual(self.stub.peak, 3)
+
+    def test_long_range_split_without_gaps_or_doubles(self):
+        self.client.split_secs = DAY
+        # A ping on each sub-range boundary, which the API's inclusive `to`
+        # hands to both pieces.
+        self.stub.pings["phone-a"] = sorted(
+            self.stub.pings["phone-a"]
+            + [{"lat": 1, "lon": 1, "tst": T0 + 50 + k * DAY, "tid": "x"}
+               for k in range(1, 6)], key=lambda p: p["tst"])
+        from_ts = "2024-07-03T09:47:30Z"
+        to_ts = "2024-07-09T00:00:00Z"
+        got = self.client.fetch("phone-a", from_ts, to_ts)
+        self.assertEqual(got, _reference(self.stub, "phone-a", from_ts,
+                                         to_ts, 10**9))
+        # The sub-ranges go out concurrently, so in no fixed order.
+        froms = {r[1] for r in self.stub.requests}
+        self.assertGreater(len(froms), 5)
+        self.assertIn(from_ts, froms)
+        self.assertIn(to_ts, [r[2] for r in self.stub.requests])
+
+    def test_short_range_not_split(self):
+        self.client.split_secs = DAY
+        self.client.fetch("phone-a", T0, T0 + 50 * 600)
+        self.assertEqual(self.stub.requests, [("phone-a", str(T0),
+                                               str(T0 + 50 * 600))])
+
+    def test_retries_server_errors_with_backoff(self):
+        self.stub.fail_next = [503, 502]
+        with mock.patch.object(timeline_client.time, "sleep") as sleep:
+            got = self.client.fetch("phone-a", T0, T0 + 10 * 600)
+        self.assertEqual(len(got), 11)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list],
+                         [0.01, 0.02])
+
+    def test_gives_up_after_the_retries(self):
+        self.stub.fail_next = [500] * 4
+        with self.assertRaisesRegex(timeline_client.TimelineError, "500"):
+            self.client.fetch("phone-a", T0, T0 + 600)
+        self.assertEqual(self.stub.fail_next, [])
+
+    def test_client_errors_are_not_retried(self):
+        bad = timeline_client.TimelineClient(self.stub.url, "wrong",
+                                             backoff=0.01)
+        self.addCleanup(bad.close)
+        with mock.patch.object(timeline_client.time, "sleep") as sleep, \
+                self.assertRaisesRegex(timeline_client.TimelineError, "401"):
+            bad.fetch("phone-a", T0, T0 + 600)
+        sleep.assert_not_called()
+
+    def test_reconnects_after_the_server_drops_idle_connections(self):
+        self.client.fetch("phone-a", T0, T0 + 600)
+        self.stub.stop()
+        restarted = StubTimeline(self.stub.pings).start()
+        self.addCleanup(restarted.stop)
+        # The pooled connection still points at the stopped server; new
+        # ones go to the restarted one.
+        self.client._host = restarted.url.split("/")[2]
+        with mock.patch.object(timeline_client.time, "sleep") as sleep:
+            got = self.client.fetch("phone-a", T0, T0 + 600)
+        self.assertEqual(len(got), 2)
+        sleep.assert_not_called()
+
+    def test_unreachable(self):
+        self.stub.stop()
+        client = timeline_client.TimelineClient(self.stub.url, "t", retries=1,
+                                                backoff=0.01, timeout=1)
+        self.addCleanup(client.close)
+        with self.assertRaisesRegex(timeline_client.TimelineError,
+                                    "unreachable"):
+            client.fetch("phone-a", T0, T0 + 600)
+
+
+class ToTstTests(unittest.TestCase):
+
+    def test_both_forms(self):
+        self.assertEqual(timeline_client.to_tst(T0), T0)
+        self.assertEqual(timeline_client.to_tst("1970-01-02T00:00:00Z"), DAY)
+
+
+if __name__ == "__main__":
+    unittest.main()
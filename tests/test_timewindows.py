@@ -0,0 +1,103 @@
+"""Parity tests for timewindows.WindowIndex — the bad-track / tid window
+lookups the track passes use in place of `_in_bad_track_window` and
+`_tid_for_window`.
+
+The scalars stay the reference; every case compares the two timestamp for
+timestamp, on window edges, just inside and outside them, across
+overlapping and nested windows, and for pings without a tst.
+
+Run from the project root:
+
+    python -m unittest tests.test_timewindows -v
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timewindows  # noqa: E402
+from ekko_trips_app import (_apply_tid_choice, _in_bad_track_window,  # noqa: E402
+                            _tid_for_window)
+
+
+def _probes(windows):
+    """Every edge, its neighbours, and the spans between."""
+    out = [None]
+    for w in windows:
+        for x in w[:2]:
+            out += [x - 1, x, x + 1]
+    out += [min(out[1:], default=0) - 100, max(out[1:], default=0) + 100]
+    return out
+
+
+class TestWindowIndex(unittest.TestCase):
+
+    def assertMatchesScalar(self, windows):
+        idx = timewindows.WindowIndex(windows)
+        probes = _probes(windows)
+        if windows and len(windows[0]) == 3:
+            want = [_tid_for_window(t, windows) for t in probes]
+            self.assertEqual([idx.value(t) for t in probes], want)
+            self.assertEqual(idx.values(probes), want)
+        else:
+            want = [_in_bad_track_window(t, windows) for t in probes]
+            self.assertEqual([t in idx for t in probes], want)
+            self.assertEqual(idx.covered(probes),
+                             {t for t, w in zip(probes, want) if w})
+
+    def test_disjoint(self):
+        self.assertMatchesScalar([(100, 200), (300, 400)])
+
+    def test_overlapping_and_nested(self):
+        self.assertMatchesScalar([(100, 300), (200, 400), (250, 260)])
+        self.assertMatchesScalar([(100, 100), (100, 200), (200, 200)])
+
+    def test_last_window_wins(self):
+        windows = [(100, 400, "alt"), (200, 300, "primary"),
+                   (250, 500, "alt"), (300, 300, "primary")]
+        self.assertMatchesScalar(windows)
+        idx = timewindows.WindowIndex(windows)
+        self.assertEqual(idx.values([150, 220, 260, 300, 301, 501]),
+                         ["alt", "primary", "alt", "primary", "alt", None])
+
+    def test_random_windows(self):
+        rnd = random.Random(4)
+        for _ in range(200):
+            windows = []
+            for _ in range(rnd.randint(1, 8)):
+                s = rnd.randint(0, 50)
+                e = s + rnd.randint(0, 20)
+                windows.append((s, e, rnd.choice(["primary", "alt"])))
+            self.assertMatchesScalar(windows)
+            self.assertMatchesScalar([w[:2] for w in windows])
+
+    def test_empty(self):
+        idx = timewindows.WindowIndex([])
+        self.assertFalse(idx)
+        self.assertNotIn(5, idx)
+        self.assertEqual(idx.values([1, None]), [None, None])
+        self.assertEqual(idx.covered([1, 2]), set())
+
+
+class TestApplyTidChoice(unittest.TestCase):
+
+    def test_window_forces_tid(self):
+        # 2024-06-01 12:00 UTC and on, one ping a minute from each phone.
+        base = 1717243200
+        pts = [{"tst": base + 60 * i, "tid": tid, "tz": "UTC"}
+               for i in range(30) for tid in ("primary", "alt")]
+        windows = [(base + 600, base + 900, "alt")]
+        got = _apply_tid_choice(pts, {"2024-06-01": "primary"}, windows,
+                                drop_pad_days=True)
+        want = [p for p in pts
+                if p["tid"] == (_tid_for_window(p["tst"], windows)
+                                or "primary")]
+        self.assertEqual(got, want)
+        self.assertEqual(sum(p["tid"] == "alt" for p in got), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""Tests for the persisted track responses behind api_trip_track — the
+pre-gzipped, signature-named response bodies served for finished trips.
+
+Drives the real endpoint through Flask's test client with the track cache
+and response dirs pointed at a temp dir and the trip lookups stubbed, so no
+real trip data, campgrounds.json or timeline API is needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_track_response_cache -v
+"""
+
+import copy
+import gzip
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+
+TRIP_ID = 7
+T0 = 1_723_000_000  # 2024-08-06 (America/New_York)
+POINTS = [{"lat": 38.93 + i * 0.01, "lon": -77.37 - i * 0.01,
+           "tst": T0 + i * 600, "tid": "primary", "tz": "America/New_York"}
+          for i in range(30)]
+
+
+class TrackResponseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cache_dir = os.path.join(self.tmp.name, "track_cache")
+        self.resp_dir = os.path.join(self.tmp.name, "track_responses")
+        os.makedirs(cache_dir)
+        os.makedirs(self.resp_dir)
+        self.raw = {"id": TRIP_ID, "trip_note": "", "stays": [], "events": [],
+                    "start": "2024-08-06", "end": "2024-08-07"}
+        self.builds = 0
+        real_select = app_mod._select_chosen_track
+
+        def counting_select(*args, **kwargs):
+            self.builds += 1
+            return real_select(*args, **kwargs)
+
+        patches = [
+            mock.patch.object(app_mod, "TRACK_CACHE_DIR", cache_dir),
+            mock.patch.object(app_mod, "TRACK_RESPONSE_DIR", self.resp_dir),
+            mock.patch.object(app_mod, "get_trip",
+                              side_effect=lambda tid: copy.deepcopy(self.raw)),
+            mock.patch.object(app_mod, "raw_trip_record",
+                              side_effect=lambda tid: copy.deepcopy(self.raw)),
+            mock.patch.object(app_mod, "get_suppressed_pings",
+                              side_effect=lambda tid: list(
+                                  self.raw.get("suppressed_pings", []))),
+            mock.patch.object(app_mod, "get_relocated_pings",
+                              return_value=[]),
+            mock.patch.object(app_mod, "enrich_trip_locations"),
+            mock.patch.object(app_mod, "_map_config",
+                              return_value=((None, None), [])),
+            mock.patch.object(app_mod, "_select_chosen_track",
+                              side_effect=counting_select),
+            mock.patch.object(app_mod, "ACCESS_LOG_FILE",
+                              os.path.join(self.tmp.name, "access_log.jsonl")),
+            mock.patch.object(app_mod, "_load_users", return_value={
+                "viewer": app_mod.User("viewer", "")}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        app_mod._write_track_cache(TRIP_ID, copy.deepcopy(POINTS))
+        self.client = app_mod.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess["_user_id"] = "viewer"
+
+    def _get(self, admin=False, **headers):
+        url = f"/api/trips/{TRIP_ID}/track" + ("?admin=1" if admin else "")
+        return self.client.get(url, headers=headers)
+
+    def _stored(self):
+        return sorted(os.listdir(self.resp_dir))
+
+    def test_second_hit_is_served_from_disk(self):
+        first = self._get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(len(self._stored()), 1)
+        second = self._get()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(second.get_json(), first.get_json())
+        self.assertEqual(len(second.get_json()["points"]), len(POINTS))
+
+    def test_gzip_client_gets_stored_bytes(self):
+        plain = self._get().get_json()
+        resp = self._get(**{"Accept-Encoding": "gzip, br"})
+        self.assertEqual(resp.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", resp.headers["Vary"])
+        resp.direct_passthrough = False
+        self.assertEqual(json.loads(gzip.decompress(resp.get_data())), plain)
+
+    def test_matching_etag_is_304(self):
+        etag = self._get().headers["ETag"]
+        resp = self._get(**{"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.get_data(), b"")
+        self.assertEqual(resp.headers["ETag"], etag)
+
+    def test_override_edit_supersedes_entry(self):
+        first = self._get()
+        self.raw["suppressed_pings"] = [POINTS[3]["tst"]]
+        second = self._get(**{"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(len(second.get_json()["points"]), len(POINTS) - 1)
+        self.assertEqual(len(self._stored()), 1)
+        self.assertEqual(self.builds, 2)
+
+    def test_deploy_of_a_helper_module_supersedes_entry(self):
+        first = self._get()
+        real = app_mod._file_mtime_ns
+        for module in (app_mod.geodist, app_mod.localdates,
+                       app_mod.timewindows):
+            bumped = {module.__file__}
+            with mock.patch.object(
+                    app_mod, "_file_mtime_ns",
+                    side_effect=lambda p: real(p) + (p in bumped)):
+                resp = self._get(**{"If-None-Match": first.headers["ETag"]})
+            self.assertEqual(resp.status_code, 200, module.__name__)
+        self.assertEqual(self.builds, 4)
+
+    def test_admin_flag_is_its_own_entry(self):
+        public = self._get()
+        admin = self._get(admin=True)
+        self.assertNotEqual(public.headers["ETag"], admin.headers["ETag"])
+        self.assertEqual(len(self._stored()), 2)
+
+    def test_track_rewrite_and_delete(self):
+        etag = self._get().headers["ETag"]
+        app_mod._write_track_cache(TRIP_ID, copy.deepcopy(POINTS[:10]))
+        resp = self._get()
+        self.assertNotEqual(resp.headers["ETag"], etag)
+        self.assertEqual(len(resp.get_json()["points"]), 10)
+        app_mod._delete_track_cache(TRIP_ID)
+        self.assertEqual(self._stored(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""Unit tests for the columnar track cache (track_store.py) and the app's
+track-cache I/O on top of it (_read_track_cache, _write_track_cache,
+_read_track_columns), including the transparent migration from the older
+gzipped-JSON files.
+
+Points TRACK_CACHE_DIR at a temp dir, so no real trip data is needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_track_store -v
+"""
+
+import gzip
+import json
+import mmap
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod
+import track_store
+
+PINGS = [
+    {"lat": 44.123456789, "lon": -71.5, "tst": 1719000000, "tid": "primary",
+     "tz": "America/New_York"},
+    {"lat": 44.2, "lon": -71.4, "tst": 1719000060, "tid": "alt",
+     "tz": "America/New_York"},
+    {"lat": 45, "lon": -72, "tst": 1719000120, "tid": "primary",
+     "tz": "America/Montreal"},
+    # Legacy shapes: untagged, and not yet tz-enriched.
+    {"lat": 45.1, "lon": -72.1, "tst": 1719000180},
+    {"lat": 45.2, "lon": -72.2, "tst": 1719000180, "tz": "UTC"},
+]
+
+
+class TrackStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "1.track")
+
+    def test_round_trip_is_exact(self):
+        self.assertTrue(track_store.write(self.path, PINGS))
+        t = track_store.load(self.path)
+        self.assertEqual(len(t), len(PINGS))
+        self.assertEqual(t.to_points(), PINGS)
+        self.assertEqual(json.dumps(t.to_points()[0]), json.dumps(PINGS[0]))
+        self.assertEqual(track_store.load(self.path).to_points(), PINGS)
+
+    def test_columns_are_mapped_read_only(self):
+        track_store.write(self.path, PINGS)
+        t = track_store.load(self.path)
+        self.assertIsInstance(t.lat.base.obj, mmap.mmap)
+        self.assertFalse(t.tst.flags.writeable)
+        self.assertEqual(t.tst.dtype.str, "<i8")
+        self.assertEqual(t.tids[t.tid[1]], "alt")
+        self.assertEqual(t.tid[3], track_store.ABSENT_TID)
+        self.assertEqual(t.tz[3], track_store.ABSENT_TZ)
+
+    def test_meta_rides_in_the_header(self):
+        meta = {"last": {"primary": 1719000120}, "tids": {"alt": None}}
+        track_store.write(self.path, PINGS, meta=meta)
+        t = track_store.load(self.path)
+        self.assertEqual(t.meta, meta)
+        self.assertEqual(t.to_points(), PINGS)
+        track_store.write(self.path, PINGS)
+        self.assertIsNone(track_store.load(self.path).meta)
+
+    def test_empty_track(self):
+        self.assertTrue(track_store.write(self.path, []))
+        self.assertEqual(track_store.load(self.path).to_points(), [])
+
+    def test_refuses_pings_it_cannot_hold(self):
+        for odd in ({"lat": None, "lon": 1.0, "tst": 1},
+                    {"lat": 1.0, "lon": 1.0, "tst": 1.5},
+                    {"lat": True, "lon": 1.0, "tst": 1},
+                    {"lat": 1.0, "lon": 1.0, "tst": 1, "tid": None},
+                    {"lat": 1.0, "lon": 1.0, "tst": 1, "acc": 12}):
+            self.assertFalse(track_store.write(self.path, PINGS + [odd]), odd)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_not_this_format(self):
+        with open(self.path, "wb") as f:
+            f.write(gzip.compress(b"[]"))
+        self.assertIsNone(track_store.load(self.path))
+        self.assertIsNone(track_store.load(self.path + ".missing"))
+
+
+class TrackCacheIOTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        p = mock.patch.object(app_mod, "TRACK_CACHE_DIR", self.tmp.name)
+        p.start()
+        self.addCleanup(p.stop)
+        self.col, self.gz, self.plain = app_mod._track_cache_paths(7)
+
+    def test_write_prefers_columnar(self):
+        with open(self.gz, "wb") as f:
+            f.write(gzip.compress(b"[]"))
+        app_mod._write_track_cache(7, PINGS)
+        self.assertTrue(os.path.exists(self.col))
+        self.assertFalse(os.path.exists(self.gz))
+        self.assertEqual(app_mod._read_track_cache(7), PINGS)
+
+    def test_rewrite_keeps_sync_state(self):
+        app_mod._write_track_cache(7, PINGS, {"v": 1})
+        app_mod._write_track_cache(7, PINGS[:2])
+        self.assertEqual(track_store.load(self.col).meta, {"v": 1})
+        app_mod._write_track_cache(7, PINGS, {"v": 2})
+        self.assertEqual(track_store.load(self.col).meta, {"v": 2})
+
+    def test_unfit_points_stay_json(self):
+        app_mod._write_track_cache(7, PINGS)
+        odd = PINGS + [{"lat": 1.0, "lon": 2.0, "tst": 3, "acc": 5}]
+        app_mod._write_track_cache(7, odd)
+        self.assertFalse(os.path.exists(self.col))
+        self.assertEqual(app_mod._read_track_cache(7), odd)
+        self.assertTrue(os.path.exists(self.gz))
+
+    def test_json_cache_migrates_on_read(self):
+        for legacy in (self.gz, self.plain):
+            raw = json.dumps(PINGS).encode()
+            with open(legacy, "wb") as f:
+                f.write(gzip.compress(raw) if legacy == self.gz else raw)
+            self.assertEqual(app_mod._read_track_cache(7), PINGS)
+            self.assertFalse(os.path.exists(legacy))
+            self.assertEqual(app_mod._read_track_columns(7).to_points(), PINGS)
+            os.remove(self.col)
+
+    def test_columns_convert_json_first(self):
+        with open(self.gz, "wb") as f:
+            f.write(gzip.compress(json.dumps(PINGS).encode()))
+        t = app_mod._read_track_columns(7)
+        self.assertEqual(t.tst.tolist(), [p["tst"] for p in PINGS])
+        self.assertTrue(app_mod._track_cache_exists(7))
+        app_mod._delete_track_cache(7)
+        self.assertFalse(app_mod._track_cache_exists(7))
+        self.assertIsNone(app_mod._read_track_cache(7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+"""Tests for the incremental timeline sync behind api_trip_track
+(`_sync_trip_points`): an in-progress trip's track is fetched whole once,
+then only past each tid's last ping, with a periodic full fetch for
+backlogs a phone uploads late.
+
+Drives the real endpoint with the timeline API replaced by an in-memory
+fake, the track cache pointed at a temp dir and the trip lookups stubbed,
+so no network, token or real trip data is needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_track_sync -v
+"""
+
+import copy
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+import track_store  # noqa: E402
+
+TRIP_ID = 9
+NOW = int(time.time())
+
+
+class FakeTimeline:
+    """The timeline API's /locations for a few tids: pings filed by `tst`,
+    `from` as an ISO timestamp or a unix `tst` like the real one."""
+
+    def __init__(self):
+        self.pings = {"phone-a": [], "phone-b": []}
+        self.calls = []
+        self.fail = False
+
+    def log(self, tid, tst, lat=38.9, lon=-77.4):
+        self.pings[tid].append({"lat": lat, "lon": lon, "tst": tst})
+
+    def fetch(self, jobs, token):
+        """Stands in for `_fetch_timeline_points`: one list per job."""
+        return [self._one(*job) for job in jobs]
+
+    def _one(self, tid, from_ts, to_ts):
+        self.calls.append((tid, from_ts))
+        if self.fail:
+            raise OSError("timeline unreachable")
+
+        def as_tst(v):
+            if isinstance(v, int):
+                return v
+            return int(datetime.strptime(v, "%Y-%m-%dT%H:%M:%SZ")
+                       .replace(tzinfo=timezone.utc).timestamp())
+        lo, hi = as_tst(from_ts), as_tst(to_ts)
+        return sorted((copy.deepcopy(p) for p in self.pings[tid]
+                       if lo <= p["tst"] <= hi), key=lambda p: p["tst"])
+
+
+class TrackSyncTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache_dir = os.path.join(tmp.name, "track_cache")
+        os.makedirs(cache_dir)
+        today = date.today()
+        self.raw = {"id": TRIP_ID, "stays": [], "events": [],
+                    "start": (today - timedelta(days=2)).isoformat(),
+                    "end": today.isoformat()}
+        self.api = FakeTimeline()
+        for i in range(40):
+            self.api.log("phone-a", NOW - 20000 + i * 300)
+            self.api.log("phone-b", NOW - 20000 + i * 300 + 7)
+        self.stamped = []
+
+        def stamp(points):
+            self.stamped.append(len(points))
+            for p in points:
+                p.setdefault("tz", "America/New_York")
+            return bool(points)
+
+        patches = [
+            mock.patch.dict(os.environ, {"TIMELINE_API_TOKEN": "t",
+                                         "TIMELINE_TID": "phone-a",
+                                         "TIMELINE_TID_ALT": "phone-b"}),
+            mock.patch.object(app_mod, "_fetch_timeline_points",
+                              side_effect=self.api.fetch),
+            mock.patch.object(app_mod, "_enrich_with_timezone",
+                              side_effect=stamp),
+            mock.patch.object(app_mod, "TRACK_CACHE_DIR", cache_dir),
+            mock.patch.object(app_mod, "get_trip",
+                              side_effect=lambda tid: copy.deepcopy(self.raw)),
+            mock.patch.object(app_mod, "get_suppressed_pings", return_value=[]),
+            mock.patch.object(app_mod, "get_relocated_pings", return_value=[]),
+            mock.patch.object(app_mod, "enrich_trip_locations"),
+            mock.patch.object(app_mod, "_map_config",
+                              return_value=((None, None), [])),
+            mock.patch.object(app_mod, "ACCESS_LOG_FILE",
+                              os.path.join(tmp.name, "access_log.jsonl")),
+            mock.patch.object(app_mod, "_load_users", return_value={
+                "viewer": app_mod.User("viewer", "")}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = app_mod.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess["_user_id"] = "viewer"
+
+    def _get(self):
+        """Hit the endpoint; the number of pings in the cache after. (The
+        response holds only the per-day chosen tid's.)"""
+        resp = self.client.get(f"/api/trips/{TRIP_ID}/track?admin=1")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.get_json()["points"])
+        return len(self._cache())
+
+    def _cache(self):
+        return track_store.load(app_mod._track_cache_paths(TRIP_ID)[0])
+
+    def _full_fetch(self):
+        """What a from-scratch fetch makes of the API's pings right now."""
+        with mock.patch.object(app_mod, "TRACK_FULL_SYNC_SECS", 0):
+            return app_mod._sync_trip_points(
+                TRIP_ID, copy.deepcopy(self.raw), "t", app_mod._timeline_tids())
+
+    def test_first_fetch_is_full_and_records_sync_state(self):
+        self.assertEqual(self._get(), 80)
+        from_ts = app_mod._trip_fetch_window(self.raw)[0]
+        self.assertEqual(self.api.calls, [("phone-a", from_ts),
+                                          ("phone-b", from_ts)])
+        meta = self._cache().meta
+        self.assertEqual(meta["tids"], {"primary": "phone-a", "alt": "phone-b"})
+        self.assertEqual(meta["last"], {"primary": NOW - 20000 + 39 * 300,
+                                        "alt": NOW - 20000 + 39 * 300 + 7})
+
+    def test_refresh_fetches_only_new_pings(self):
+        self._get()
+        last_a = NOW - 20000 + 39 * 300
+        for k in range(1, 4):
+            self.api.log("phone-a", last_a + k * 60)
+        self.api.log("phone-b", last_a + 60)  # same tst as one of phone-a's
+        self.api.calls.clear()
+        self.stamped.clear()
+        self.assertEqual(self._get(), 84)
+        self.assertEqual(self.api.calls, [("phone-a", last_a + 1),
+                                          ("phone-b", last_a + 8)])
+        self.assertEqual(self.stamped, [4])
+        cached = self._cache()
+        self.assertEqual(cached.meta["last"],
+                         {"primary": last_a + 180, "alt": last_a + 60})
+        # Same pings, same order, as fetching it all again.
+        self.assertEqual(cached.to_points(), self._full_fetch())
+
+    def test_nothing_new_writes_nothing(self):
+        self._get()
+        path = app_mod._track_cache_paths(TRIP_ID)[0]
+        before = os.stat(path).st_mtime_ns
+        with mock.patch.object(app_mod, "_write_track_cache") as write:
+            self.assertEqual(self._get(), 80)
+        write.assert_not_called()
+        self.assertEqual(os.stat(path).st_mtime_ns, before)
+
+    def test_late_backlog_arrives_with_the_next_full_fetch(self):
+        self._get()
+        self.api.log("phone-a", NOW - 20000 + 150)  # uploaded late
+        self.assertEqual(self._get(), 80)
+        with mock.patch.object(app_mod, "TRACK_FULL_SYNC_SECS", 0):
+            self.assertEqual(self._get(), 81)
+        self.assertEqual(self._cache().to_points(), self._full_fetch())
+
+    def test_edited_window_or_tid_refetches_everything(self):
+        self._get()
+        from_ts = app_mod._trip_fetch_window(self.raw)[0]
+        self.raw["end"] = (date.today() + timedelta(days=1)).isoformat()
+        self.api.calls.clear()
+        self._get()
+        self.assertEqual([c[1] for c in self.api.calls], [from_ts, from_ts])
+        self.api.calls.clear()
+        with mock.patch.dict(os.environ, {"TIMELINE_TID_ALT": ""}):
+            self.assertEqual(self._get(), 40)
+        self.assertEqual(self.api.calls, [("phone-a", from_ts)])
+
+    def test_unreachable_api_serves_the_cache(self):
+        self._get()
+        self.api.fail = True
+        self.assertEqual(self._get(), 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Unit tests for the trip snapshot behind parse_trips() / get_trip() and
+the start-date ordering index behind trip_order() in trips.py.
+
+Points trips.TRIPS_JSON at a temp file and stubs the location lookup, so
+no real trip data or campgrounds.json is needed.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_trip_snapshot -v
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trips
+
+
+def _stay(start, end, place, nights=1):
+    return {"start": start, "end": end, "nights": nights,
+            "custom_place": place, "locale": "", "state": "VA",
+            "site": "", "campers": "", "notes": ""}
+
+
+RAW = [
+    {"id": 1, "trip_note": "", "events": [],
+     "stays": [_stay("2024-06-01", "2024-06-03", "Big Meadows", 2)]},
+    {"id": 2, "trip_note": "Beach", "events": [],
+     "stays": [_stay("2023-08-10", "2023-08-11", "Assateague")]},
+]
+
+
+class TripSnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "trips.json")
+        with open(path, "w") as f:
+            json.dump(RAW, f)
+        patches = [
+            mock.patch.object(trips, "TRIPS_JSON", path),
+            mock.patch.object(trips, "_load_locations_by_id", return_value={}),
+            mock.patch.object(trips, "_home_place_names", return_value=None),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        trips._invalidate_trips_snapshot()
+        self.addCleanup(trips._invalidate_trips_snapshot)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_sorted_and_numbered(self):
+        got = trips.parse_trips()
+        self.assertEqual([t["id"] for t in got], [2, 1])
+        self.assertEqual([t["number"] for t in got], [1, 2])
+
+    def test_built_once_while_unchanged(self):
+        with mock.patch.object(trips, "_load_trips_json",
+                               wraps=trips._load_trips_json) as load:
+            trips.parse_trips()
+            trips.parse_trips()
+            trips.get_trip(1)
+            trips.trip_order()
+        self.assertEqual(load.call_count, 1)
+
+    def test_callers_cannot_mutate_snapshot(self):
+        first = trips.parse_trips()
+        first[0]["summary"] = "clobbered"
+        first[0]["stays"][0]["lat"] = 1.0
+        first[0]["timeline"][0]["photos"] = ["x.jpg"]
+        trip = trips.get_trip(2)
+        trip["stays"].append({})
+
+        again = trips.get_trip(2)
+        self.assertEqual(again["summary"], "Beach")
+        self.assertNotIn("lat", again["stays"][0])
+        self.assertNotIn("photos", again["timeline"][0])
+        self.assertEqual(len(again["stays"]), 1)
+
+    def test_get_trip_matches_parse_trips(self):
+        by_id = {t["id"]: t for t in trips.parse_trips()}
+        self.assertEqual(trips.get_trip(1), by_id[1])
+        self.assertIsNone(trips.get_trip(99))
+
+    def test_save_rebuilds(self):
+        raw = trips.raw_trip_records()
+        raw[0]["trip_note"] = "Renamed"
+        trips._save_trips(raw)
+        self.assertEqual(trips.get_trip(1)["summary"], "Renamed")
+
+    def test_cold_get_trip_builds_one_trip(self):
+        with mock.patch.object(trips, "_load_trips_json") as load, \
+                mock.patch.object(trips, "_make_trip",
+                                  wraps=trips._make_trip) as make:
+            trip = trips.get_trip(1)
+        load.assert_not_called()
+        self.assertEqual(make.call_count, 1)
+        self.assertEqual(trip, {t["id"]: t for t in trips.parse_trips()}[1])
+
+    def test_order_index_matches_full_build(self):
+        raw = RAW + [
+            {"id": 3, "trip_note": "", "events": [],
+             "stays": [_stay("2023-08-10", "2023-08-12", "Home Sweet Home")]},
+            {"id": 4, "trip_note": "", "stays": [],
+             "events": [{"date": "2022-05-01", "name": "Fair"}]},
+        ]
+        trips._save_trips(raw)
+        with mock.patch.object(trips, "_home_place_names",
+                               return_value={"home sweet home"}):
+            full = [(t["id"], t["number"], t["home_only"])
+                    for t in trips.parse_trips()]
+            index = [(r["id"], r["number"], r["home_only"])
+                     for r in trips.trip_order()]
+        self.assertEqual(index, full)
+        self.assertEqual(full, [(4, 1, False), (2, 2, False),
+                                (3, None, True), (1, 3, False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
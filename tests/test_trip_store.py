@@ -0,0 +1,123 @@
+"""Parity tests for the optional SQLite trip store (trip_store.py).
+
+Runs the same sequence of trips.py CRUD calls against a trips.json-backed
+tree and a trips.db-backed one and checks both end up holding the same raw
+records. Photo directories don't exist in the temp tree, so the index remaps
+the stay/event sorts trigger are no-ops.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_trip_store -v
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trip_store
+import trips
+
+
+RAW = [
+    {"id": 1, "trip_note": "Shenandoah",
+     "home_start_time": "08:15",
+     "stays": [{"start": "2024-06-01", "end": "2024-06-03", "nights": 2,
+                "campground_id": None, "custom_place": "Big Meadows",
+                "locale": "", "state": "VA", "site": "A12", "campers": "",
+                "notes": ""}],
+     "events": [],
+     "suppressed_pings": [100, 200],
+     "relocated_pings": [{"tst": 300, "lat": 1.0, "lon": 2.0},
+                         {"tst": 300, "lat": 1.5, "lon": 2.5,
+                          "orig_lat": 9.0, "orig_lon": 9.5}],
+     "tid_overrides": {"2024-06-02": "alt"}},
+    {"id": 2, "trip_note": "", "stays": [],
+     "events": [{"date": "2023-05-01", "name": "Fair"}]},
+]
+
+
+def _edit_everything():
+    trips.update_trip(1, {"trip_note": "Skyline", "home_end_time": "17:00"})
+    trips.add_stay(1, {"start": "2024-05-30", "end": "2024-06-01",
+                       "nights": 2, "custom_place": "Loft Mountain"})
+    trips.update_stay(1, 1, {"notes": "rain"})
+    trips.add_event(1, {"date": "2024-06-02", "name": "Hike"})
+    trips.add_suppressed_pings(1, [150, 100])
+    trips.remove_suppressed_pings(1, [200])
+    trips.add_relocated_pings(1, [{"tst": 300, "lat": 5.0, "lon": 6.0,
+                                   "orig_lat": 9.0, "orig_lon": 9.5},
+                                  {"tst": 50, "lat": 7.0, "lon": 8.0}])
+    trips.remove_relocated_pings(1, items=[{"tst": 300}])
+    trips.set_tid_override(1, "2024-06-01", "primary")
+    trips.set_tid_override(1, "2024-06-02", None)
+    new = trips.create_trip("Blank")
+    trips.delete_trip(new["id"])
+    trips.delete_event(2, 0)
+
+
+class TripStoreParityTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for p in (mock.patch.object(trips, "_load_locations_by_id",
+                                    return_value={}),
+                  mock.patch.object(trips, "_home_place_names",
+                                    return_value=None)):
+            p.start()
+            self.addCleanup(p.stop)
+        self.addCleanup(trips._invalidate_trips_snapshot)
+
+    def _tree(self, name, sqlite):
+        base = os.path.join(self.tmp.name, name)
+        os.makedirs(base)
+        json_path = os.path.join(base, "trips.json")
+        db_path = os.path.join(base, "trips.db")
+        with open(json_path, "w") as f:
+            json.dump(RAW, f)
+        if sqlite:
+            trip_store.migrate_from_json(json_path, db_path)
+        return json_path, db_path
+
+    def _run(self, json_path, db_path):
+        with mock.patch.object(trips, "TRIPS_JSON", json_path), \
+                mock.patch.object(trips, "TRIPS_DB", db_path):
+            trips._invalidate_trips_snapshot()
+            _edit_everything()
+            return (trips.raw_trip_records(),
+                    [(t["id"], t["number"], t["summary"])
+                     for t in trips.parse_trips()])
+
+    def test_migration_round_trips(self):
+        json_path, db_path = self._tree("rt", sqlite=True)
+        self.assertEqual(trip_store.load_all(db_path), RAW)
+        out = os.path.join(self.tmp.name, "export.json")
+        trip_store.export_json(db_path, out)
+        with open(out) as f:
+            self.assertEqual(json.load(f), RAW)
+
+    def test_crud_parity(self):
+        expected = self._run(*self._tree("json", sqlite=False))
+        got = self._run(*self._tree("sqlite", sqlite=True))
+        self.assertEqual(got, expected)
+        self.assertEqual(expected[0][0]["relocated_pings"],
+                         [{"tst": 50, "lat": 7.0, "lon": 8.0}])
+
+    def test_sqlite_suppression_leaves_trips_json_alone(self):
+        json_path, db_path = self._tree("solo", sqlite=True)
+        before = os.stat(json_path).st_mtime_ns
+        with mock.patch.object(trips, "TRIPS_JSON", json_path), \
+                mock.patch.object(trips, "TRIPS_DB", db_path):
+            self.assertEqual(trips.add_suppressed_pings(1, [1]), [1, 100, 200])
+            self.assertIsNone(trips.add_suppressed_pings(99, [1]))
+            self.assertEqual(trips.trips_data_path(), db_path)
+        self.assertEqual(os.stat(json_path).st_mtime_ns, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
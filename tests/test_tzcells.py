@@ -0,0 +1,212 @@
+"""Tests for tzcells — the cell grid `_enrich_with_timezone` resolves pings
+through in place of one `_tz_for_coord` call each.
+
+`_tz_for_coord` stays the reference: the parity cases compare the two ping
+for ping along real US zone borders, river borders included. The rest use
+a made-up finder with a straight border, to count what the grid asks it.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_tzcells -v
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+import tzcells  # noqa: E402
+
+
+class _Finder:
+    """West of lng -100 is "West", east of it "East"; counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, lat, lng):
+        self.calls += 1
+        if lat is None or lng is None:
+            return None
+        return "West" if lng < -100 else "East"
+
+
+def _have_finder():
+    app_mod._tz_for_coord(None, None)
+    return bool(app_mod._tz_finder)
+
+
+class CellResolverTests(unittest.TestCase):
+
+    def test_uniform_cells_answer_from_the_grid(self):
+        finder = _Finder()
+        r = tzcells.CellResolver(finder)
+        self.assertEqual(r.tz(40.012, -90.013), "East")
+        sampled = finder.calls
+        for k in range(100):
+            self.assertEqual(r.tz(40.001 + k * 0.0004, -90.049), "East")
+        self.assertEqual(finder.calls, sampled)
+        self.assertEqual(len(r), 1)
+
+    def test_border_cells_ask_per_ping(self):
+        finder = _Finder()
+        r = tzcells.CellResolver(finder)
+        rnd = random.Random(2)
+        pts = [(rnd.uniform(39, 41), rnd.uniform(-100.3, -99.7))
+               for _ in range(2000)]
+        self.assertEqual([r.tz(*p) for p in pts],
+                         [finder(*p) for p in pts])
+        # Cells touching the line, and the ring of cells next to them.
+        border = {j for level, _, j in r._cells
+                  if level == 0 and r._cells[level, _, j] is tzcells.BORDER}
+        self.assertEqual(border, {-2002, -2001, -2000})
+        # ... and the halvings of those: only the finest still ask.
+        finest = {k for k, v in r._cells.items()
+                  if k[0] == tzcells.REFINE and v is tzcells.BORDER}
+        size = tzcells.CELL_DEG / 2 ** tzcells.REFINE
+        self.assertTrue(finest)
+        self.assertTrue(all(abs((j + 0.5) * size + 100) < 2 * size
+                            for _, _, j in finest))
+
+    def test_off_the_grid_goes_to_the_finder(self):
+        finder = _Finder()
+        r = tzcells.CellResolver(finder)
+        for lat, lng in ((None, -90), (40, None), (float("nan"), -90),
+                         (91, -90), (40, float("inf"))):
+            finder.calls = 0
+            self.assertEqual(r.tz(lat, lng), finder(lat, lng))
+            self.assertEqual(finder.calls, 2)
+        self.assertEqual(len(r), 0)
+
+    def test_a_none_sample_makes_a_border_cell(self):
+        def finder(lat, lng):
+            return None if lat > 40.06 else "East"
+        r = tzcells.CellResolver(finder)
+        self.assertEqual(r.tz(40.01, -90.01), "East")
+        self.assertIs(r._cells[(0, 800, -1801)], tzcells.BORDER)
+
+
+@unittest.skipUnless(_have_finder(), "timezonefinder not installed")
+class FinderParityTests(unittest.TestCase):
+
+    # (lat, lat, lng, lng) boxes a zone border runs through.
+    BOXES = [
+        (45.2, 45.8, -116.8, -116.2),   # Snake River: Oregon / Idaho
+        (30.2, 30.7, -85.2, -84.8),     # Apalachicola: Florida panhandle
+        (37.8, 38.3, -87.2, -86.4),     # Ohio River: Indiana / Kentucky
+        (36.0, 36.4, -110.8, -110.2),   # Hopi lands inside the Navajo Nation
+    ]
+
+    def test_matches_tz_for_coord(self):
+        r = tzcells.CellResolver(app_mod._tz_for_coord)
+        rnd = random.Random(7)
+        pts = [(45.509281967099255, -116.29708404891242),
+               (30.43957017684739, -84.99878732409488)]
+        for lat0, lat1, lng0, lng1 in self.BOXES:
+            pts += [(rnd.uniform(lat0, lat1), rnd.uniform(lng0, lng1))
+                    for _ in range(1500)]
+        self.assertEqual([r.tz(*p) for p in pts],
+                         [app_mod._tz_for_coord(*p) for p in pts])
+        self.assertGreater(len({r.tz(*p) for p in pts}), 3)
+
+
+class PersistenceTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "tz_cells.json")
+
+    def test_round_trip_and_merge(self):
+        finder = _Finder()
+        r = tzcells.CellResolver(finder)
+        r.tz(40.01, -90.01)
+        r.tz(40.01, -100.01)
+        sampled = dict(r._cells)
+        tzcells.save(self.path, "1.0", r.take_new())
+        self.assertEqual(r.take_new(), {})
+        tzcells.save(self.path, "1.0", {(2, 1, 2): "East"})
+        cells = tzcells.load(self.path, "1.0")
+        self.assertEqual(cells, {**sampled, (2, 1, 2): "East"})
+        self.assertEqual(cells[0, 800, -1801], "East")
+        self.assertIs(cells[0, 800, -2001], tzcells.BORDER)
+        finder.calls = 0
+        again = tzcells.CellResolver(finder, cells)
+        self.assertEqual(again.tz(40.02, -90.02), "East")
+        self.assertEqual(finder.calls, 0)
+
+    def test_other_version_or_grid_is_ignored(self):
+        tzcells.save(self.path, "1.0", {(0, 1, 2): "East"})
+        self.assertEqual(tzcells.load(self.path, "2.0"), {})
+        self.assertEqual(tzcells.load(self.path, "1.0", cell_deg=0.1), {})
+        self.assertEqual(tzcells.load(self.path, "1.0", refine=1), {})
+        tzcells.save(self.path, "2.0", {(0, 3, 4): "West"})
+        self.assertEqual(tzcells.load(self.path, "2.0"), {(0, 3, 4): "West"})
+        self.assertEqual(tzcells.load(self.path, "1.0"), {})
+
+    def test_missing_or_garbled_file(self):
+        self.assertEqual(tzcells.load(self.path, "1.0"), {})
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        self.assertEqual(tzcells.load(self.path, "1.0"), {})
+
+
+class EnrichTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "tz_cells.json")
+        self.finder = _Finder()
+        patches = [
+            mock.patch.object(app_mod, "TZ_CELLS_FILE", self.path),
+            mock.patch.dict(app_mod._tz_cells,
+                            {"resolver": None, "version": None}),
+            mock.patch.object(app_mod, "_tz_for_coord", self.finder),
+            mock.patch.object(app_mod, "_tz_finder", object()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _pings(self):
+        return [{"lat": 40 + i * 1e-4, "lon": -99.9 - i * 1e-4, "tst": i}
+                for i in range(300)] + [{"lat": None, "lon": None, "tst": 300}]
+
+    def test_stamps_and_persists(self):
+        pts = self._pings()
+        pts[5]["tz"] = "Pacific/Honolulu"
+        self.assertTrue(app_mod._enrich_with_timezone(pts))
+        self.assertEqual(pts[5]["tz"], "Pacific/Honolulu")
+        self.assertEqual(
+            [p["tz"] for i, p in enumerate(pts) if i != 5],
+            [self.finder(p["lat"], p["lon"]) or "UTC"
+             for i, p in enumerate(pts) if i != 5])
+        with open(self.path) as f:
+            self.assertTrue(json.load(f)["cells"])
+        self.assertFalse(app_mod._enrich_with_timezone(pts))
+
+        # A restart: a fresh resolver reads the saved cells back.
+        app_mod._tz_cells["resolver"] = None
+        self.finder.calls = 0
+        pts = [{"lat": 40.0101, "lon": -99.9201}]
+        app_mod._enrich_with_timezone(pts)
+        self.assertEqual(pts[0]["tz"], "East")
+        self.assertEqual(self.finder.calls, 1)  # only the loader's probe
+
+    def test_no_library_stamps_nothing(self):
+        with mock.patch.object(app_mod, "_tz_finder", False):
+            pts = self._pings()
+            self.assertFalse(app_mod._enrich_with_timezone(pts))
+        self.assertNotIn("tz", pts[0])
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+"""Tests for tzraster — the prebuilt, memory-mapped timezone grid — and the
+app's use of it ahead of TimezoneFinder.
+
+The raster is the tzcells grid sampled ahead of time, so wherever it
+answers it must answer what `CellResolver.tz` does (and, through it,
+`_tz_for_coord`). Most cases build one from a made-up finder with a
+straight border; one samples the real finder along the Snake River.
+
+Run from the project root with the venv active:
+
+    python -m unittest tests.test_tzraster -v
+"""
+
+import importlib.metadata
+import mmap
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ekko_trips_app as app_mod  # noqa: E402
+import tzcells  # noqa: E402
+import tzraster  # noqa: E402
+from tests.test_tzcells import _Finder, _have_finder  # noqa: E402
+
+FINEST = tzcells.CELL_DEG / 2 ** tzcells.REFINE
+
+
+class RasterTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp.name, "tz_raster.bin")
+        # Lng -100 runs down the middle of these tiles.
+        cls.tiles = {(40, -101), (40, -100), (41, -101), (41, -100)}
+        cls.header = tzraster.build(cls.path, cls.tiles, _Finder(), "1.0")
+        cls.raster = tzraster.load(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_answers_what_the_grid_does(self):
+        rnd = random.Random(3)
+        pts = [(rnd.uniform(40, 42), rnd.uniform(-101, -99)) for _ in range(5000)]
+        pts += [(40.5, -100.0), (40.5, -100.0 - 1e-9), (41.0, -100.5)]
+        grid = tzcells.CellResolver(_Finder())
+        ids = self.raster.zone_ids([p[0] for p in pts], [p[1] for p in pts])
+        asked = 0
+        for (lat, lng), k in zip(pts, ids.tolist()):
+            if k < 0:
+                asked += 1
+                # Only right up against the line.
+                self.assertLess(abs(lng + 100), 3 * FINEST)
+                continue
+            self.assertEqual(self.raster.zones[k], grid.tz(lat, lng))
+        self.assertLess(asked, len(pts) / 50)
+        self.assertEqual(sorted(self.raster.zones), ["East", "West"])
+        self.assertEqual(self.raster.version, "1.0")
+
+    def test_outside_the_tiles_or_no_coordinate(self):
+        for lat, lng in ((39.9, -100.5), (40.5, -98.9), (None, -100.5),
+                         (40.5, float("nan")), (95, 0)):
+            self.assertIsNone(self.raster.tz(lat, lng))
+        self.assertEqual(self.raster.tz(40.5, -100.5), "West")
+        self.assertEqual(self.raster.tz(41.9, -99.1), "East")
+
+    def test_small_and_mapped(self):
+        # 4 tiles of 20x20 int32 cells, plus the border blocks.
+        self.assertLess(os.path.getsize(self.path), 4 * 1600 + 120 * 128 + 1024)
+        self.assertIsInstance(self.raster._mm, mmap.mmap)
+        self.assertFalse(self.raster.tiles.flags.writeable)
+
+    def test_empty_or_garbled(self):
+        empty = os.path.join(self.tmp.name, "empty.bin")
+        tzraster.build(empty, set(), _Finder(), "1.0")
+        self.assertIsNone(tzraster.load(empty).tz(40.5, -100.5))
+        with open(empty, "wb") as f:
+            f.write(b"EKTRACK1" + bytes(16))
+        self.assertIsNone(tzraster.load(empty))
+        self.assertIsNone(tzraster.load(os.path.join(self.tmp.name, "nope")))
+
+    def test_tiles_around(self):
+        self.assertEqual(tzraster.tiles_around([(40.5, -100.5)], margin=0),
+                         {(40, -101)})
+        self.assertEqual(len(tzraster.tiles_around([(40.5, -100.5),
+                                                    (41.2, -99.7)])), 14)
+        self.assertEqual(tzraster.tiles_around([(None, 1), (89.5, 179.5)]),
+                         {(88, 178), (88, 179), (89, 178), (89, 179)})
+
+
+@unittest.skipUnless(_have_finder(), "timezonefinder not installed")
+class FinderParityTests(unittest.TestCase):
+
+    def test_snake_river_tile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tz_raster.bin")
+            tzraster.build(path, {(45, -117)}, app_mod._tz_for_coord, "x")
+            raster = tzraster.load(path)
+            rnd = random.Random(8)
+            pts = [(rnd.uniform(45, 46), rnd.uniform(-117, -116))
+                   for _ in range(4000)]
+            pts.append((45.509281967099255, -116.29708404891242))
+            ids = raster.zone_ids([p[0] for p in pts], [p[1] for p in pts])
+            answered = [(p, raster.zones[k])
+                        for p, k in zip(pts, ids.tolist()) if k >= 0]
+            self.assertGreater(len(answered), len(pts) * 0.8)
+            self.assertEqual([tz for _, tz in answered],
+                             [app_mod._tz_for_coord(*p) for p, _ in answered])
+            self.assertEqual(set(raster.zones),
+                             {"America/Boise", "America/Los_Angeles"})
+
+
+class AppRasterTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "tz_raster.bin")
+        # Stamped with the installed version, as build-tz-raster does.
+        self.version = app_mod._tz_finder_version()
+        tzraster.build(self.path, {(40, -101), (40, -100)}, _Finder(),
+                       self.version)
+        self.finder = _Finder()
+        patches = [
+            mock.patch.object(app_mod, "TZ_RASTER_FILE", self.path),
+            mock.patch.dict(app_mod._tz_raster_cache,
+                            {"mtime": None, "raster": None}),
+            mock.patch.object(app_mod, "TZ_CELLS_FILE",
+                              os.path.join(tmp.name, "tz_cells.json")),
+            mock.patch.dict(app_mod._tz_cells,
+                            {"resolver": None, "version": None}),
+            mock.patch.object(app_mod, "_tz_for_coord", self.finder),
+            mock.patch.object(app_mod, "_tz_finder", object()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_raster_pings_never_reach_the_finder(self):
+        pts = [{"lat": 40.2 + i * 1e-4, "lon": -100.6 + i * 1e-4}
+               for i in range(500)]
+        with mock.patch.object(app_mod, "_tz_cell_resolver") as resolver:
+            self.assertTrue(app_mod._enrich_with_timezone(pts))
+        resolver.assert_not_called()
+        self.assertEqual(self.finder.calls, 0)
+        self.assertEqual({p["tz"] for p in pts}, {"West"})
+
+    def test_the_rest_fall_through(self):
+        pts = [{"lat": 40.5, "lon": -100.5}, {"lat": 40.5, "lon": -100.0},
+               {"lat": 45.5, "lon": -90.0}, {"lat": None, "lon": None}]
+        self.assertTrue(app_mod._enrich_with_timezone(pts))
+        self.assertEqual([p["tz"] for p in pts],
+                         ["West", "East", "East", "UTC"])
+        self.assertGreater(self.finder.calls, 0)
+
+    def test_no_library_keeps_what_the_raster_stamped(self):
+        # A raster built elsewhere, on a host without timezonefinder: its
+        # version can't be checked, and it's still used.
+        tzraster.build(self.path, {(40, -101), (40, -100)}, _Finder(), "1.0")
+        self._touch()
+        pts = [{"lat": 40.5, "lon": -100.5}, {"lat": 45.5, "lon": -90.0}]
+        missing = importlib.metadata.PackageNotFoundError("timezonefinder")
+        with mock.patch.object(app_mod, "_tz_finder", False), \
+                mock.patch("importlib.metadata.version", side_effect=missing):
+            self.assertEqual(app_mod._tz_finder_version(), "unknown")
+            self.assertTrue(app_mod._enrich_with_timezone(pts))
+        self.assertEqual(pts[0]["tz"], "West")
+        self.assertNotIn("tz", pts[1])
+
+    def test_tz_at_and_rebuilds(self):
+        self.assertEqual(app_mod._tz_at(40.5, -100.5), "West")
+        self.assertEqual(self.finder.calls, 0)
+        self.assertEqual(app_mod._tz_at(45.5, -90.0), "East")
+        self.assertEqual(self.finder.calls, 1)
+        tzraster.build(self.path, {(45, -91)}, _Finder(), self.version)
+        self._touch()
+        self.assertIsNone(app_mod._tz_raster().tz(40.5, -100.5))
+        self.assertEqual(app_mod._tz_raster().tz(45.5, -90.5), "East")
+
+    def _touch(self):
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def test_raster_from_another_finder_version_is_ignored(self):
+        self.assertIsNotNone(app_mod._tz_raster())
+        with mock.patch.object(app_mod, "_tz_finder_version",
+                               return_value="2.0"):
+            self._touch()
+            self.assertIsNone(app_mod._tz_raster())
+            self.assertEqual(app_mod._tz_at(40.5, -100.5), "West")
+        self.assertEqual(self.finder.calls, 1)
+
+    def test_coverage_from_home_trips_and_tracks(self):
+        track = mock.Mock(n=3, lat=np.array([44.2, 44.9, 46.1]),
+                          lon=np.array([-71.5, -71.2, -70.1]))
+        trip = {"id": 7, "stays": [{"lat": 38.5, "lng": -77.2}],
+                "events": [{"lat": None, "lng": None}]}
+        with mock.patch.object(app_mod, "_map_config",
+                               return_value=([38.9, -77.4], [])), \
+                mock.patch.object(app_mod, "parse_trips", return_value=[trip]), \
+                mock.patch.object(app_mod, "enrich_trip_locations"), \
+                mock.patch.object(app_mod, "_read_track_columns",
+                                  return_value=track):
+            coords = app_mod._tz_raster_coords()
+        self.assertEqual(tzraster.tiles_around(coords, margin=0),
+                         {(38, -78), (44, -72), (46, -71)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""A local stand-in for the timeline API's /locations endpoint, for
+tests/test_timeline_client.py and tests/bench_timeline_client.py.
+
+Serves pings from memory over real HTTP/1.1 (keep-alive), with `from`/`to`
+as unix `tst` or "%Y-%m-%dT%H:%M:%SZ" and `to` inclusive, like the real
+one. Can add latency to every request and fail the next few with a given
+status, and counts what it saw: requests, distinct connections, the most
+requests in flight at once.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import timeline_client
+
+PATH = "/api/v1/locations"
+
+
+class StubTimeline:
+    """Start with `start()`; `url` is then the endpoint to point a client
+    at. `pings` maps tid -> list of ping dicts, sorted by `tst`."""
+
+    def __init__(self, pings=None, latency=0.0):
+        self.pings = pings or {}
+        self.latency = latency
+        self.fail_next = []           # statuses to answer the next requests with
+        self.requests = []            # (tid, from, to) per request served
+        self.ports = set()            # client ports: one per connection
+        self.peak = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub._serve(self)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,),
+                         daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}{PATH}"
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _serve(self, handler):
+        with self._lock:
+            self.ports.add(handler.client_address[1])
+            self._in_flight += 1
+            self.peak = max(self.peak, self._in_flight)
+            status = self.fail_next.pop(0) if self.fail_next else 200
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            parts = urlsplit(handler.path)
+            q = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            if parts.path != PATH:
+                status = 404
+            if status == 200:
+                if handler.headers.get("Authorization") != "Bearer t":
+                    status = 401
+            if status != 200:
+                body = json.dumps({"error": status}).encode()
+            else:
+                tid = q["tid"]
+                lo = timeline_client.to_tst(_num(q["from"]))
+                hi = timeline_client.to_tst(_num(q["to"]))
+                limit = int(q.get("limit", 10000))
+                with self._lock:
+                    self.requests.append((tid, q["from"], q["to"]))
+                page = [p for p in self.pings.get(tid, ())
+                        if lo <= p["tst"] <= hi][:limit]
+                body = json.dumps(page).encode()
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def _num(v):
+    return int(v) if v.lstrip("-").isdigit() else v
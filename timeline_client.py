@@ -0,0 +1,204 @@
+"""Client for the timeline API's /locations endpoint: pooled keep-alive
+connections, concurrent fetches, retries with backoff.
+
+`_fetch_timeline_points` used to open a fresh `urllib.request.urlopen` —
+a new TCP and TLS handshake to PythonAnywhere — for every 10k-ping page,
+and a track fetch asked for the primary tid and then the alt tid strictly
+one after the other, so a refresh waited out every round trip in series.
+And one dropped connection or 5xx from a busy host failed the whole
+request.
+
+`TimelineClient` keeps up to `pool_size` HTTP/1.1 connections to the host
+open between requests and between page fetches, and fans work out over a
+thread pool of the same size:
+
+  fetch(tid, from, to)           one tid over one range, paging by `tst`
+                                 cursor exactly as the old loop did
+  fetch_many([(tid, from, to)])  several such fetches at once — the two
+                                 tids of a trip — results in input order
+  range longer than split_secs   cut into sub-ranges fetched at once and
+                                 joined in order; each sub-range keeps
+                                 only pings before the next one's start,
+                                 so a boundary ping is neither lost nor
+                                 doubled whether the API's `to` is
+                                 inclusive or not
+
+A connection error, a timeout, a 429 or a 5xx is retried up to `retries`
+times, waiting `backoff` × 2^attempt seconds (or the server's Retry-After)
+between tries, on another connection. Any other error status raises
+`TimelineError` straight away — a bad token doesn't get better.
+
+Threads and stdlib http.client only: the app has no async stack, and the
+fetches are all waiting on the network.
+"""
+
+import http.client
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+PAGE_LIMIT = 10000
+MAX_PAGES = 20  # per range: a hard ceiling against runaway paging
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_ISO = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class TimelineError(Exception):
+    """The API refused a request, or kept failing past the retries."""
+
+
+def to_tst(value):
+    """A range bound — unix seconds or the API's "%Y-%m-%dT%H:%M:%SZ" — as
+    unix seconds."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.strptime(value, _ISO)
+               .replace(tzinfo=timezone.utc).timestamp())
+
+
+def _iso(tst):
+    return datetime.fromtimestamp(tst, timezone.utc).strftime(_ISO)
+
+
+class TimelineClient:
+    """Fetches from `url` (the /locations endpoint) as bearer `token`."""
+
+    def __init__(self, url, token, pool_size=4, timeout=15, retries=3,
+                 backoff=0.5, split_secs=4 * 86400):
+        parts = urlsplit(url)
+        self._https = parts.scheme == "https"
+        self._host = parts.netloc
+        self._path = parts.path
+        self._headers = {"Authorization": f"Bearer {token}",
+                         "Connection": "keep-alive"}
+        self._timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.split_secs = split_secs
+        self._idle = queue.LifoQueue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="timeline")
+        self._pool_size = pool_size
+
+    # ── Connections ──
+    def _connect(self):
+        cls = (http.client.HTTPSConnection if self._https
+               else http.client.HTTPConnection)
+        return cls(self._host, timeout=self._timeout)
+
+    def _get_json(self, params):
+        """GET the endpoint with `params` and return the parsed body,
+        retrying as described above."""
+        target = f"{self._path}?{urlencode(params)}"
+        attempt = 0
+        while True:
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._connect(), False
+            wait = None
+            try:
+                conn.request("GET", target, headers=self._headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if reused:
+                    # The server dropped an idle keep-alive connection;
+                    # that isn't the API failing, so it costs no attempt.
+                    continue
+                error = e
+            else:
+                if resp.will_close or self._idle.qsize() >= self._pool_size:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+                if resp.status == 200:
+                    return json.loads(body)
+                error = TimelineError(f"timeline API {resp.status}: "
+                                      f"{body[:200]!r}")
+                if resp.status not in _RETRY_STATUSES:
+                    raise error
+                try:
+                    wait = float(resp.getheader("Retry-After") or "")
+                except ValueError:
+                    pass
+            if attempt == self.retries:
+                break
+            time.sleep(wait if wait is not None
+                       else self.backoff * 2 ** attempt)
+            attempt += 1
+        if isinstance(error, TimelineError):
+            raise error
+        raise TimelineError(f"timeline API unreachable: {error}") from error
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # ── Fetching ──
+    def _fetch_range(self, tid, from_ts, to_ts):
+        """Page through one range for one tid."""
+        points = []
+        cursor = from_ts
+        for _ in range(MAX_PAGES):
+            page = self._get_json({"tid": tid, "from": cursor, "to": to_ts,
+                                   "limit": PAGE_LIMIT})
+            if not page:
+                break
+            points.extend(page)
+            if len(page) < PAGE_LIMIT:
+                break
+            cursor = page[-1]["tst"] + 1
+        return points
+
+    def _pieces(self, tid, from_ts, to_ts):
+        """(tid, from, to, cut) sub-ranges covering the range; `cut` is the
+        next piece's start (None for the last), before which a piece's
+        pings must fall."""
+        lo, hi = to_tst(from_ts), to_tst(to_ts)
+        if not self.split_secs or hi - lo <= self.split_secs:
+            return [(tid, from_ts, to_ts, None)]
+        bounds = list(range(lo, hi, self.split_secs)) + [hi]
+        out = []
+        for a, b in zip(bounds, bounds[1:]):
+            last = b == hi
+            out.append((tid, from_ts if a == lo else _iso(a),
+                        to_ts if last else _iso(b), None if last else b))
+        return out
+
+    def _run_piece(self, piece):
+        tid, from_ts, to_ts, cut = piece
+        points = self._fetch_range(tid, from_ts, to_ts)
+        if cut is not None:
+            points = [p for p in points if p["tst"] < cut]
+        return points
+
+    def fetch_many(self, jobs):
+        """[(tid, from, to), ...] -> the pings of each, in `jobs` order, all
+        fetched concurrently. Raises the first failure."""
+        pieces = [self._pieces(*job) for job in jobs]
+        flat = [p for ps in pieces for p in ps]
+        if len(flat) == 1:
+            results = [self._run_piece(flat[0])]
+        else:
+            results = list(self._executor.map(self._run_piece, flat))
+        out, k = [], 0
+        for ps in pieces:
+            joined = []
+            for r in results[k:k + len(ps)]:
+                joined.extend(r)
+            out.append(joined)
+            k += len(ps)
+        return out
+
+    def fetch(self, tid, from_ts, to_ts):
+        """All pings for `tid` from `from_ts` to `to_ts`, in API order."""
+        return self.fetch_many([(tid, from_ts, to_ts)])[0]
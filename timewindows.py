@@ -0,0 +1,93 @@
+"""Which admin-drawn time window, if any, each ping of a track falls in.
+
+A trip's `bad_track_windows` and `tid_windows` are closed [start, end]
+ranges of unix timestamps (`ekko_trips_app._bad_track_window_tsts`,
+`_tid_window_tsts`). The track pipeline asks "is this ping in one?" of every
+ping, in several passes per request — and `_in_bad_track_window` /
+`_tid_for_window` answer by walking every window, once per ping per pass.
+
+`WindowIndex` cuts the timeline at every window's start and end. Between
+two neighbouring cuts, and on each cut itself, the answer is the same for
+every timestamp — and it's worked out once, at build time, by the same rule
+the scalar helpers use: any window for a plain membership test, the last
+matching window in list order where windows carry a value (a later
+hand-edited tid window overrides an earlier one). A lookup is then one
+binary search; `windows_of` does a whole track in one searchsorted.
+"""
+
+import bisect
+
+import numpy as np
+
+
+class WindowIndex:
+    """Index over `windows`: `(start, end)` or `(start, end, value)` tuples,
+    ends inclusive. A window without a value has the value True."""
+
+    def __init__(self, windows):
+        wins = [(w[0], w[1], w[2] if len(w) > 2 else True) for w in windows]
+        self._values = [v for _, _, v in wins]
+        edges = sorted({x for s, e, _ in wins for x in (s, e)})
+
+        def last(covers):
+            found = -1
+            for i, (s, e, _) in enumerate(wins):
+                if covers(s, e):
+                    found = i
+            return found
+
+        # on_edge[k]: the window that owns cut k itself. below[k]: the one
+        # that owns the open span just below cut k — a window covers all of
+        # it exactly when it covers both cuts around it — and below[-1] the
+        # span past the last cut, which nothing does.
+        on_edge = [last(lambda s, e: s <= x <= e) for x in edges]
+        below = [-1] + [last(lambda s, e: s <= lo and hi <= e)
+                        for lo, hi in zip(edges, edges[1:])] + [-1]
+        self._edges = edges
+        self._edge_arr = np.asarray(edges, np.float64)
+        self._on_edge = np.asarray(on_edge, np.int64)
+        self._below = np.asarray(below, np.int64)
+
+    def __len__(self):
+        return len(self._values)
+
+    def _window(self, tst):
+        k = bisect.bisect_left(self._edges, tst)
+        if k < len(self._edges) and self._edges[k] == tst:
+            return int(self._on_edge[k])
+        return int(self._below[k])
+
+    def value(self, tst):
+        """The value of the window `tst` falls in, or None (also for a None
+        `tst`)."""
+        if tst is None or not self._edges:
+            return None
+        i = self._window(tst)
+        return self._values[i] if i >= 0 else None
+
+    def __contains__(self, tst):
+        return self.value(tst) is not None
+
+    def windows_of(self, tsts):
+        """Position in `windows` of the window each of `tsts` falls in, -1
+        for none (and for a None), as one int64 array."""
+        t = np.array([np.nan if x is None else x for x in tsts], np.float64)
+        if not self._edges:
+            return np.full(len(t), -1, np.int64)
+        k = np.searchsorted(self._edge_arr, t, side="left")
+        at = np.minimum(k, len(self._edges) - 1)
+        hit = (k < len(self._edges)) & (self._edge_arr[at] == t)
+        return np.where(hit, self._on_edge[at], self._below[k])
+
+    def values(self, tsts):
+        """`value` of each of `tsts`, as a list."""
+        vals = self._values
+        return [vals[i] if i >= 0 else None
+                for i in self.windows_of(tsts).tolist()]
+
+    def covered(self, tsts):
+        """The set of `tsts` that fall in some window — one pass over a
+        track, then a plain membership test for every later one."""
+        tsts = list(tsts)
+        return {t for t, i in zip(tsts, self.windows_of(tsts).tolist())
+                if i >= 0}
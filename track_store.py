@@ -0,0 +1,219 @@
+"""Columnar, memory-mapped track cache files (trip_data/track_cache/<id>.track).
+
+The gzipped JSON cache (`<id>.json.gz`) had to be gunzipped and parsed in
+full — every ping a dict of five boxed fields — each time the track endpoint
+or the overview-map builder touched a trip. A busy dual-tid trip is ~100k
+pings, so that was tens of MB of short-lived objects per read, per worker.
+This format stores the same pings as packed columns that are mapped, not
+read, so opening a trip costs a header parse and the page cache is shared by
+every worker:
+
+  lat, lon   float64
+  tst        int64
+  tid        uint8   index into the header's tid table, ABSENT if the ping
+                     had no "tid" key (legacy untagged caches)
+  tz         uint16  index into the header's tz string table, ABSENT if the
+                     ping had no "tz" key (not yet enriched)
+
+Layout: the 8-byte MAGIC, a little-endian uint32 header length, a JSON header
+(`n`, the two string tables, each column's dtype and byte offset, and an
+optional `meta` the caller keeps with the pings — the app's timeline sync
+state), then
+the columns, each 8-byte aligned. Files are written through
+json_store.write_bytes (temp file, fsync, rename), so a reader never maps a
+half-written one.
+
+Only pings of exactly that shape fit: a float-or-int lat/lon, an int tst and
+optional string tid/tz. `write()` returns False for anything else (an extra
+key from a future API field, a null coordinate), and the caller keeps that
+trip as JSON — the format is a cache of the common case, never a lossy one.
+
+Needs NumPy; without it `available()` is False and the app stays on JSON.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+import json_store
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - hosts without numpy stay on JSON
+    np = None
+
+MAGIC = b"EKTRACK1"
+_LEN = struct.Struct("<I")
+_ALIGN = 8
+
+# Sentinel code for "the ping had no such key", distinct from every table
+# index so a missing tid/tz round-trips as missing rather than as None.
+ABSENT_TID = 0xFF
+ABSENT_TZ = 0xFFFF
+
+_FIELDS = {"lat", "lon", "tst", "tid", "tz"}
+_COLUMNS = (("lat", "<f8"), ("lon", "<f8"), ("tst", "<i8"),
+            ("tid", "<u1"), ("tz", "<u2"))
+
+
+def available():
+    return np is not None
+
+
+class Track:
+    """One trip's pings as read-only column arrays backed by the file's
+    mapping (`lat`, `lon`, `tst`, `tid` and `tz` codes), plus the `tids`
+    and `tzs` tables the codes index and the `meta` the writer stored
+    alongside (None if it stored none)."""
+
+    __slots__ = ("n", "lat", "lon", "tst", "tid", "tz", "tids", "tzs", "meta",
+                 "_mm")
+
+    def __len__(self):
+        return self.n
+
+    def to_points(self):
+        """The pings as the list of dicts the JSON cache held — key for key,
+        value for value. Each column is converted with one tolist() rather
+        than per-element indexing, which is most of the cost."""
+        tids, tzs = self.tids, self.tzs
+        out = []
+        append = out.append
+        for lat, lon, tst, tid, tz in zip(self.lat.tolist(), self.lon.tolist(),
+                                          self.tst.tolist(), self.tid.tolist(),
+                                          self.tz.tolist()):
+            p = {"lat": lat, "lon": lon, "tst": tst}
+            if tid != ABSENT_TID:
+                p["tid"] = tids[tid]
+            if tz != ABSENT_TZ:
+                p["tz"] = tzs[tz]
+            append(p)
+        return out
+
+
+def _fits(p):
+    if not isinstance(p, dict) or not p.keys() <= _FIELDS:
+        return False
+    for k in ("lat", "lon"):
+        v = p.get(k)
+        if type(v) not in (float, int):
+            return False
+    if type(p.get("tst")) is not int:
+        return False
+    for k in ("tid", "tz"):
+        if k in p and not isinstance(p[k], str):
+            return False
+    return True
+
+
+def _encode(points):
+    """Column arrays and string tables for `points`, or None if any ping
+    doesn't fit the format."""
+    tids, tzs = {}, {}
+    n = len(points)
+    lat = np.empty(n, "<f8")
+    lon = np.empty(n, "<f8")
+    tst = np.empty(n, "<i8")
+    tid = np.empty(n, "<u1")
+    tz = np.empty(n, "<u2")
+    for i, p in enumerate(points):
+        if not _fits(p):
+            return None
+        lat[i] = p["lat"]
+        lon[i] = p["lon"]
+        v = p["tst"]
+        if not -2**63 <= v < 2**63:
+            return None
+        tst[i] = v
+        if "tid" in p:
+            code = tids.setdefault(p["tid"], len(tids))
+            if code >= ABSENT_TID:
+                return None
+            tid[i] = code
+        else:
+            tid[i] = ABSENT_TID
+        if "tz" in p:
+            code = tzs.setdefault(p["tz"], len(tzs))
+            if code >= ABSENT_TZ:
+                return None
+            tz[i] = code
+        else:
+            tz[i] = ABSENT_TZ
+    return ({"lat": lat, "lon": lon, "tst": tst, "tid": tid, "tz": tz},
+            list(tids), list(tzs))
+
+
+def _pad(n):
+    return -n % _ALIGN
+
+
+def write(path, points, meta=None):
+    """Write `points` (the cache's list of ping dicts) to `path` atomically,
+    with `meta` (anything JSON-serializable) kept in the header for the
+    caller. Returns False, writing nothing, if NumPy is missing or any ping
+    doesn't fit the format."""
+    if np is None:
+        return False
+    encoded = _encode(points)
+    if encoded is None:
+        return False
+    cols, tids, tzs = encoded
+    # Offsets depend on the header's length, which depends on the offsets;
+    # lay the columns out relative to the data start, then fix up once.
+    rel, pos = [], 0
+    for name, dtype in _COLUMNS:
+        rel.append([name, dtype, pos])
+        pos += cols[name].nbytes + _pad(cols[name].nbytes)
+    header = {"n": len(points), "tids": tids, "tzs": tzs, "columns": rel}
+    if meta is not None:
+        header["meta"] = meta
+    blob = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # Room for the offsets to grow by a few digits when they're shifted.
+    blob += b" " * 64
+    start = len(MAGIC) + _LEN.size + len(blob)
+    start += _pad(start)
+    header["columns"] = [[name, dtype, start + off] for name, dtype, off in rel]
+    final = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    final = final.ljust(start - len(MAGIC) - _LEN.size)
+
+    parts = [MAGIC, _LEN.pack(len(final)), final]
+    for name, _ in _COLUMNS:
+        data = cols[name].tobytes()
+        parts += [data, b"\0" * _pad(len(data))]
+    json_store.write_bytes(path, b"".join(parts))
+    return True
+
+
+def load(path):
+    """Map `path` and return its Track, or None if it's missing, isn't this
+    format, or NumPy is unavailable. The arrays are read-only views of the
+    mapping; it stays open for as long as any of them is referenced."""
+    if np is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC) + _LEN.size:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if mm[:len(MAGIC)] != MAGIC:
+            return None
+        (hlen,) = _LEN.unpack_from(mm, len(MAGIC))
+        hstart = len(MAGIC) + _LEN.size
+        header = json.loads(bytes(mm[hstart:hstart + hlen]))
+        t = Track()
+        t.n = int(header["n"])
+        t.tids = list(header["tids"])
+        t.tzs = list(header["tzs"])
+        t.meta = header.get("meta")
+        for name, dtype, off in header["columns"]:
+            setattr(t, name, np.frombuffer(mm, dtype=dtype, count=t.n,
+                                           offset=off))
+        t._mm = mm
+        return t
+    except (ValueError, KeyError, TypeError, struct.error):
+        return None
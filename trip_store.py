@@ -0,0 +1,353 @@
+"""Optional SQLite storage engine for trips (trip_data/trips.db).
+
+trips.json is one JSON array rewritten whole by every edit — a one-ping
+suppression re-serializes the entire library with `indent=2`, and a crash
+mid-write truncates it. This module keeps the same raw records in SQLite
+instead, so an edit touches only the rows it changes, inside a transaction:
+
+  trips             one row per trip; `data` is the JSON object of its
+                    trip-level fields (trip_note, home_*_time,
+                    bad_track_windows, tid_windows, ...)
+  stays, events     one row per stay / event, `pos` = its index in the trip
+                    (the index photo directories and metadata keys use),
+                    `data` = the record exactly as trips.json held it
+  suppressed_pings  (trip_id, tst)
+  relocated_pings   (trip_id, tst, lat, lon, orig_lat, orig_lon)
+  tid_overrides     (trip_id, day, tid)
+
+The admin-override lists get real tables because they're the ones that grow
+and the ones edited a handful of pings at a time; stays and events stay JSON
+blobs because trips.py treats them as open-ended dicts (legacy CSV fields,
+fields added by later features) and a column per key would have to chase
+that.
+
+It's opt-in: trips.py uses it exactly when trips.db exists, which is what
+`python trips.py migrate-sqlite` creates. `python trips.py export-json`
+writes trips.json back out of it — backup.sh does that before bundling, so
+backups and restore.sh keep working on the JSON format either way.
+
+Everything here speaks in the same raw trip dicts `trips._load_raw_trips()`
+returns, so trips.py's public functions don't change shape with the engine.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trips (
+    id   INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stays (
+    trip_id INTEGER NOT NULL REFERENCES trips(id) ON DELETE CASCADE,
+    pos     INTEGER NOT NULL,
+    data    TEXT NOT NULL,
+    PRIMARY KEY (trip_id, pos)
+);
+CREATE TABLE IF NOT EXISTS events (
+    trip_id INTEGER NOT NULL REFERENCES trips(id) ON DELETE CASCADE,
+    pos     INTEGER NOT NULL,
+    data    TEXT NOT NULL,
+    PRIMARY KEY (trip_id, pos)
+);
+CREATE TABLE IF NOT EXISTS suppressed_pings (
+    trip_id INTEGER NOT NULL REFERENCES trips(id) ON DELETE CASCADE,
+    tst     INTEGER NOT NULL,
+    PRIMARY KEY (trip_id, tst)
+);
+CREATE TABLE IF NOT EXISTS relocated_pings (
+    trip_id  INTEGER NOT NULL REFERENCES trips(id) ON DELETE CASCADE,
+    tst      INTEGER NOT NULL,
+    lat      REAL NOT NULL,
+    lon      REAL NOT NULL,
+    orig_lat REAL,
+    orig_lon REAL
+);
+CREATE INDEX IF NOT EXISTS relocated_pings_trip
+    ON relocated_pings (trip_id, tst);
+CREATE TABLE IF NOT EXISTS tid_overrides (
+    trip_id INTEGER NOT NULL REFERENCES trips(id) ON DELETE CASCADE,
+    day     TEXT NOT NULL,
+    tid     TEXT NOT NULL,
+    PRIMARY KEY (trip_id, day)
+);
+"""
+
+# Keys that live in their own tables rather than in `trips.data`.
+_ROW_KEYS = ("id", "stays", "events", "suppressed_pings", "relocated_pings",
+             "tid_overrides")
+
+# Same order `trips.add_relocated_pings` sorts by: tst, legacy (no-origin)
+# entries before keyed ones, then the origin coords.
+_RELOCATED_ORDER = ("ORDER BY tst, orig_lat IS NOT NULL, "
+                    "COALESCE(orig_lat, 0), COALESCE(orig_lon, 0), rowid")
+
+
+def _connect(path):
+    """Open `path` with foreign keys on. The default rollback journal is kept
+    (not WAL) on purpose: every commit then rewrites the main file, so its
+    mtime moves — and the mtime is what every trip cache in trips.py and the
+    app keys on. A 10 s busy timeout rides out another worker's write."""
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+# ── Whole-library reads and writes ─────────────────────────────────────────
+
+def load_all(path):
+    """Every raw trip record, in id order."""
+    with closing(_connect(path)) as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM trips ORDER BY id")]
+        return [_load(conn, tid) for tid in ids]
+
+
+def replace_all(path, records):
+    """Make the store hold exactly `records` (the whole-list write
+    `trips._save_trips` does), in one transaction."""
+    with closing(_connect(path)) as conn, conn:
+        conn.executescript(_SCHEMA)
+        conn.execute("DELETE FROM trips")
+        for rec in records:
+            _insert(conn, rec)
+
+
+def migrate_from_json(json_path, db_path):
+    """One-shot import of trips.json into a fresh trips.db; returns the trip
+    count. Builds into a temp file and renames it into place, so the store
+    only appears — and trips.py only switches to it — once it's complete."""
+    with open(json_path) as f:
+        records = json.load(f)
+    tmp = db_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    replace_all(tmp, records)
+    os.replace(tmp, db_path)
+    return len(records)
+
+
+def export_json(db_path, json_path):
+    """Write the store back out as a trips.json-format file (same layout and
+    indent as `trips._save_trips`); returns the trip count."""
+    records = load_all(db_path)
+    tmp = json_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(records, f, indent=2)
+    os.replace(tmp, json_path)
+    return len(records)
+
+
+# ── Per-trip reads and writes ──────────────────────────────────────────────
+
+def load_trip(path, trip_id):
+    """One raw trip record, or None."""
+    with closing(_connect(path)) as conn:
+        return _load(conn, trip_id)
+
+
+def save_trip(path, rec):
+    """Insert or update one trip's own fields, stays and events.
+
+    The override tables are left alone: they have their own single-row
+    writers below, and a stay edit writing back a stale copy of them would
+    drop a suppression another request made in between."""
+    with closing(_connect(path)) as conn, conn:
+        tid = rec["id"]
+        conn.execute("INSERT INTO trips (id, data) VALUES (?, ?) "
+                     "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                     (tid, _dumps(_trip_fields(rec))))
+        conn.execute("DELETE FROM stays WHERE trip_id = ?", (tid,))
+        conn.execute("DELETE FROM events WHERE trip_id = ?", (tid,))
+        _insert_children(conn, rec)
+
+
+def delete_trip(path, trip_id):
+    """Delete a trip and everything hanging off it; True if it existed."""
+    with closing(_connect(path)) as conn, conn:
+        return conn.execute("DELETE FROM trips WHERE id = ?",
+                            (trip_id,)).rowcount > 0
+
+
+def next_trip_id(path):
+    with closing(_connect(path)) as conn:
+        return (conn.execute("SELECT MAX(id) FROM trips").fetchone()[0] or 0) + 1
+
+
+# ── Admin overrides ────────────────────────────────────────────────────────
+# Each returns None when the trip doesn't exist, mirroring trips.py.
+
+def get_suppressed_pings(path, trip_id):
+    with closing(_connect(path)) as conn:
+        return _suppressed(conn, trip_id)
+
+
+def add_suppressed_pings(path, trip_id, tsts):
+    with closing(_connect(path)) as conn, conn:
+        if not _exists(conn, trip_id):
+            return None
+        conn.executemany("INSERT OR IGNORE INTO suppressed_pings VALUES (?, ?)",
+                         [(trip_id, int(t)) for t in tsts])
+        return _suppressed(conn, trip_id)
+
+
+def remove_suppressed_pings(path, trip_id, tsts):
+    with closing(_connect(path)) as conn, conn:
+        if not _exists(conn, trip_id):
+            return None
+        conn.executemany("DELETE FROM suppressed_pings "
+                         "WHERE trip_id = ? AND tst = ?",
+                         [(trip_id, int(t)) for t in tsts])
+        return _suppressed(conn, trip_id)
+
+
+def get_relocated_pings(path, trip_id):
+    with closing(_connect(path)) as conn:
+        return _relocated(conn, trip_id)
+
+
+def upsert_relocated_pings(path, trip_id, entries):
+    """Insert each entry, replacing any existing one with the same
+    (tst, orig_lat, orig_lon) identity — `IS` so legacy NULL origins match."""
+    with closing(_connect(path)) as conn, conn:
+        if not _exists(conn, trip_id):
+            return None
+        for e in entries:
+            conn.execute("DELETE FROM relocated_pings WHERE trip_id = ? "
+                         "AND tst = ? AND orig_lat IS ? AND orig_lon IS ?",
+                         (trip_id, e["tst"], e.get("orig_lat"),
+                          e.get("orig_lon")))
+            _insert_relocated(conn, trip_id, e)
+        return _relocated(conn, trip_id)
+
+
+def delete_relocated_pings(path, trip_id, broad_tsts=(), precise_keys=()):
+    """Drop every entry at a `broad_tsts` timestamp, and the keyed entries
+    matching `precise_keys` ((tst, orig_lat, orig_lon) triples)."""
+    with closing(_connect(path)) as conn, conn:
+        if not _exists(conn, trip_id):
+            return None
+        conn.executemany("DELETE FROM relocated_pings "
+                         "WHERE trip_id = ? AND tst = ?",
+                         [(trip_id, t) for t in broad_tsts])
+        conn.executemany("DELETE FROM relocated_pings WHERE trip_id = ? "
+                         "AND tst = ? AND orig_lat = ? AND orig_lon = ?",
+                         [(trip_id,) + tuple(k) for k in precise_keys])
+        return _relocated(conn, trip_id)
+
+
+def get_tid_overrides(path, trip_id):
+    with closing(_connect(path)) as conn:
+        return _tid_overrides(conn, trip_id)
+
+
+def set_tid_override(path, trip_id, day, value):
+    with closing(_connect(path)) as conn, conn:
+        if not _exists(conn, trip_id):
+            return None
+        if value is None:
+            conn.execute("DELETE FROM tid_overrides "
+                         "WHERE trip_id = ? AND day = ?", (trip_id, day))
+        else:
+            conn.execute("INSERT OR REPLACE INTO tid_overrides "
+                         "VALUES (?, ?, ?)", (trip_id, day, value))
+        return _tid_overrides(conn, trip_id)
+
+
+# ── Internals ──────────────────────────────────────────────────────────────
+
+def _exists(conn, trip_id):
+    return conn.execute("SELECT 1 FROM trips WHERE id = ?",
+                        (trip_id,)).fetchone() is not None
+
+
+def _trip_fields(rec):
+    return {k: v for k, v in rec.items() if k not in _ROW_KEYS}
+
+
+def _insert(conn, rec):
+    tid = rec["id"]
+    conn.execute("INSERT INTO trips (id, data) VALUES (?, ?)",
+                 (tid, _dumps(_trip_fields(rec))))
+    _insert_children(conn, rec)
+    conn.executemany("INSERT OR IGNORE INTO suppressed_pings VALUES (?, ?)",
+                     [(tid, int(t)) for t in rec.get("suppressed_pings", [])])
+    for e in rec.get("relocated_pings", []):
+        _insert_relocated(conn, tid, e)
+    conn.executemany("INSERT INTO tid_overrides VALUES (?, ?, ?)",
+                     [(tid, d, v)
+                      for d, v in (rec.get("tid_overrides") or {}).items()])
+
+
+def _insert_children(conn, rec):
+    tid = rec["id"]
+    conn.executemany("INSERT INTO stays VALUES (?, ?, ?)",
+                     [(tid, i, _dumps(s))
+                      for i, s in enumerate(rec.get("stays", []))])
+    conn.executemany("INSERT INTO events VALUES (?, ?, ?)",
+                     [(tid, i, _dumps(e))
+                      for i, e in enumerate(rec.get("events", []))])
+
+
+def _insert_relocated(conn, trip_id, e):
+    conn.execute("INSERT INTO relocated_pings "
+                 "(trip_id, tst, lat, lon, orig_lat, orig_lon) "
+                 "VALUES (?, ?, ?, ?, ?, ?)",
+                 (trip_id, int(e["tst"]), float(e["lat"]), float(e["lon"]),
+                  e.get("orig_lat"), e.get("orig_lon")))
+
+
+def _load(conn, trip_id):
+    row = conn.execute("SELECT data FROM trips WHERE id = ?",
+                       (trip_id,)).fetchone()
+    if row is None:
+        return None
+    fields = json.loads(row[0])
+    rec = {"id": trip_id}
+    rec["trip_note"] = fields.pop("trip_note", "")
+    rec["stays"] = [json.loads(d) for (d,) in conn.execute(
+        "SELECT data FROM stays WHERE trip_id = ? ORDER BY pos", (trip_id,))]
+    rec["events"] = [json.loads(d) for (d,) in conn.execute(
+        "SELECT data FROM events WHERE trip_id = ? ORDER BY pos", (trip_id,))]
+    rec.update(fields)
+    # Absent rather than empty, exactly as trips.py leaves trips.json.
+    suppressed = _suppressed(conn, trip_id)
+    if suppressed:
+        rec["suppressed_pings"] = suppressed
+    relocated = _relocated(conn, trip_id)
+    if relocated:
+        rec["relocated_pings"] = relocated
+    overrides = _tid_overrides(conn, trip_id)
+    if overrides:
+        rec["tid_overrides"] = overrides
+    return rec
+
+
+def _suppressed(conn, trip_id):
+    return [t for (t,) in conn.execute(
+        "SELECT tst FROM suppressed_pings WHERE trip_id = ? ORDER BY tst",
+        (trip_id,))]
+
+
+def _relocated(conn, trip_id):
+    out = []
+    for tst, lat, lon, olat, olon in conn.execute(
+            "SELECT tst, lat, lon, orig_lat, orig_lon FROM relocated_pings "
+            "WHERE trip_id = ? " + _RELOCATED_ORDER, (trip_id,)):
+        e = {"tst": tst, "lat": lat, "lon": lon}
+        if olat is not None and olon is not None:
+            e["orig_lat"] = olat
+            e["orig_lon"] = olon
+        out.append(e)
+    return out
+
+
+def _tid_overrides(conn, trip_id):
+    return {day: tid for day, tid in conn.execute(
+        "SELECT day, tid FROM tid_overrides WHERE trip_id = ? ORDER BY day",
+        (trip_id,))}
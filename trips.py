@@ -1,6 +1,11 @@
-"""Parse trip data from JSON (preferred) or CSV (legacy fallback)."""
+"""Parse trip data from JSON (preferred) or CSV (legacy fallback).
+
+The JSON records can instead live in an optional SQLite store (trip_store.py,
+trip_data/trips.db); everything here reads and writes through the persistence
+helpers, so callers can't tell which engine is active."""
 
 import csv
+import functools
 import json
 import os
 import re
@@ -8,8 +13,16 @@ import shutil
 import sys
 from datetime import date, datetime, timedelta
 
+import json_store
+import photo_meta
+import trip_store
+
 _DIR = os.path.dirname(os.path.abspath(__file__))
 TRIPS_JSON = os.path.join(_DIR, "trip_data", "trips.json")
+# Optional SQLite engine (see trip_store.py). Its presence is the switch:
+# `python trips.py migrate-sqlite` creates it, and from then on it — not
+# trips.json — is the authoritative store.
+TRIPS_DB = os.path.join(_DIR, "trip_data", "trips.db")
 
 
 # ── Public API ────────────────────────────────────────────────────────────
@@ -18,23 +31,152 @@ def parse_trips(csv_path=os.path.join(_DIR, "EKKO_Trips.csv")):
     """Return a list of enriched trip dicts.
 
     Prefers trip_data/trips.json when it exists; falls back to CSV parsing.
+
+    The JSON path is served from the shared snapshot (see `_trips_snapshot`):
+    the list and every trip in it are per-call copies, so callers may bolt on
+    whatever they like — `enrich_trip_locations`' lat/lng, trip_detail's
+    timeline photos — without it leaking into the next request.
     """
-    if os.path.exists(TRIPS_JSON):
-        return _load_trips_json()
+    if _have_trip_data():
+        trips, _by_id = _trips_snapshot()
+        return [_copy_trip(t) for t in trips]
     stays = _parse_stays(csv_path)
     return _group_into_trips(stays)
 
 
-# ── JSON persistence ──────────────────────────────────────────────────────
+def get_trip(trip_id):
+    """One trip by id (a private copy, like `parse_trips()`'s), or None.
+
+    Served from the snapshot's id index when the snapshot is current. When it
+    isn't — the first hit after any edit, in whichever worker takes it — only
+    the requested trip is built, with its number read off the start-date
+    ordering index (`trip_order`), so per-trip endpoints scale with one trip
+    rather than the library."""
+    if not _have_trip_data():
+        return next((t for t in parse_trips() if t["id"] == trip_id), None)
+    if _TRIPS_SNAPSHOT["trips"] is not None \
+            and _TRIPS_SNAPSHOT["key"] == _trips_snapshot_key():
+        trip = _TRIPS_SNAPSHOT["by_id"].get(trip_id)
+        return _copy_trip(trip) if trip is not None else None
+    rec = _load_raw_trip(trip_id)
+    if rec is None:
+        return None
+    trip = _build_trip(rec, _load_locations_by_id())
+    row = next((r for r in _trip_order_rows() if r["id"] == trip_id), None)
+    trip["number"] = row["number"] if row else None
+    return trip
+
+
+def trip_order():
+    """`[{id, start, number, home_only}, ...]` for every trip, in
+    `parse_trips()` order (ascending by start).
+
+    The start-date ordering index: derived from the raw records without
+    running `_make_trip`, so it's what resolves a lone trip's number in
+    `get_trip` and what prev/next navigation walks. Cached on the same mtimes
+    as the snapshot; rows are shared — treat them as read-only."""
+    if not _have_trip_data():
+        return [_order_row(t["id"], t["start"], t["home_only"])
+                for t in parse_trips()]
+    return _trip_order_rows()
+
+
+def _trip_order_rows():
+    """`trip_order()`'s cached rows, rebuilt from the raw records."""
+    key = _trips_snapshot_key()
+    if _TRIP_ORDER_CACHE["rows"] is None or _TRIP_ORDER_CACHE["key"] != key:
+        raw = _load_raw_trips()
+        rows = [_order_row(t["id"],
+                           _trip_span(t["stays"], t.get("events", []))[0],
+                           _raw_home_only(t["stays"]))
+                for t in raw]
+        _number_trips(rows)
+        _TRIP_ORDER_CACHE.update(key=key, rows=rows)
+    return _TRIP_ORDER_CACHE["rows"]
+
+
+# ── Persistence ───────────────────────────────────────────────────────────
+# Raw records live in trips.json, or in trips.db once it has been migrated
+# (see trip_store.py). Everything below this section goes through these
+# helpers, so the engine is invisible above them; the per-trip ones are what
+# let the SQLite engine write one trip's rows instead of the whole library.
+
+def _sqlite_active():
+    return os.path.exists(TRIPS_DB)
+
+
+def _have_trip_data():
+    return _sqlite_active() or os.path.exists(TRIPS_JSON)
+
+
+def trips_data_path():
+    """The file that holds the trips right now — trips.db when the SQLite
+    engine is active, else trips.json. Its mtime moves on every trip edit,
+    which makes it the thing for a cache to key on."""
+    return TRIPS_DB if _sqlite_active() else TRIPS_JSON
+
 
 def _load_raw_trips():
-    """Load the raw trip list from trips.json (no computed fields)."""
+    """Load the raw trip list (no computed fields)."""
+    if _sqlite_active():
+        return trip_store.load_all(TRIPS_DB)
     if os.path.exists(TRIPS_JSON):
         with open(TRIPS_JSON) as f:
             return json.load(f)
     return []
 
 
+def _load_raw_trip(trip_id):
+    """One raw trip record, or None."""
+    if _sqlite_active():
+        return trip_store.load_trip(TRIPS_DB, trip_id)
+    return next((t for t in _load_raw_trips() if t["id"] == trip_id), None)
+
+
+def _save_raw_trip(rec):
+    """Insert or replace one raw trip record (matched on id).
+
+    Under SQLite this writes only the trip's own fields, stays and events;
+    the override lists have their own writers (see `trip_store.save_trip`)."""
+    if _sqlite_active():
+        trip_store.save_trip(TRIPS_DB, rec)
+        _invalidate_trips_snapshot()
+        return
+    with json_store.lock(TRIPS_JSON):
+        raw = _load_raw_trips()
+        for i, t in enumerate(raw):
+            if t["id"] == rec["id"]:
+                raw[i] = rec
+                break
+        else:
+            raw.append(rec)
+        _save_trips(raw)
+
+
+def _store_write(fn, trip_id, *args):
+    """Run one of trip_store's single-row override writers against the
+    SQLite store and drop the snapshot (tid_overrides is a built-trip
+    field). Returns whatever the writer does — None for a missing trip."""
+    result = fn(TRIPS_DB, trip_id, *args)
+    _invalidate_trips_snapshot()
+    return result
+
+
+def _delete_raw_trip(trip_id):
+    """Delete one raw trip record. Returns True if it existed."""
+    if _sqlite_active():
+        found = trip_store.delete_trip(TRIPS_DB, trip_id)
+        _invalidate_trips_snapshot()
+        return found
+    with json_store.lock(TRIPS_JSON):
+        raw = _load_raw_trips()
+        keep = [t for t in raw if t["id"] != trip_id]
+        if len(keep) < len(raw):
+            _save_trips(keep)
+            return True
+    return False
+
+
 def raw_trip_records():
     """The raw trip list straight off disk (no computed/display fields).
 
@@ -45,25 +187,53 @@ def raw_trip_records():
     return _load_raw_trips()
 
 
+def raw_trip_record(trip_id):
+    """One trip's raw record straight off disk, or None — the single-trip
+    `raw_trip_records()`, for callers fingerprinting one trip's overrides
+    without loading the library."""
+    return _load_raw_trip(trip_id)
+
+
 def _save_trips(data):
-    """Write the raw trip list to trips.json."""
-    os.makedirs(os.path.dirname(TRIPS_JSON), exist_ok=True)
-    with open(TRIPS_JSON, "w") as f:
-        json.dump(data, f, indent=2)
+    """Write the whole raw trip list to the active store."""
+    if _sqlite_active():
+        trip_store.replace_all(TRIPS_DB, data)
+    else:
+        # Temp file + os.replace, so a reader in another worker (or a crash)
+        # never meets a truncated trips.json.
+        json_store.write(TRIPS_JSON, data, indent=2)
+    # The mtime key would catch this on the next read anyway; dropping the
+    # snapshot here just means a write and a read landing inside one mtime
+    # tick (coarse-timestamp filesystems) can't serve the pre-write trips.
+    _invalidate_trips_snapshot()
 
 
 def _load_trips_json():
     """Load trips from JSON and compute derived fields."""
     raw = _load_raw_trips()
     locations = _load_locations_by_id()
-    trips = [_make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                        t.get("events", []), locations,
-                        home_start_time=t.get("home_start_time", ""),
-                        home_end_time=t.get("home_end_time", ""),
-                        bad_track_windows=t.get("bad_track_windows"),
-                        tid_overrides=t.get("tid_overrides"),
-                        tid_windows=t.get("tid_windows"))
-             for t in raw]
+    trips = [_build_trip(t, locations) for t in raw]
+    _number_trips(trips)
+    return trips
+
+
+def _build_trip(t, locations):
+    """`_make_trip` over one raw trips.json record (number not yet set)."""
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t.get("events", []), locations,
+                      home_start_time=t.get("home_start_time", ""),
+                      home_end_time=t.get("home_end_time", ""),
+                      bad_track_windows=t.get("bad_track_windows"),
+                      tid_overrides=t.get("tid_overrides"),
+                      tid_windows=t.get("tid_windows"))
+
+
+def _number_trips(trips):
+    """Sort in place by start and number the non-home-only trips 1..n.
+
+    Shared by the full build and the ordering index so the two can't
+    disagree on a trip's number (the sort is stable, so equal starts keep
+    trips.json order in both)."""
     trips.sort(key=lambda t: t["start"])
     n = 0
     for t in trips:
@@ -72,7 +242,96 @@ def _load_trips_json():
         else:
             n += 1
             t["number"] = n
-    return trips
+
+
+# ── Trip snapshot ─────────────────────────────────────────────────────────
+# `_load_trips_json` rebuilds every trip through `_make_trip` (visit runs,
+# the split timeline, camper sets), and the app calls `parse_trips()` from
+# nearly every route — a trip-detail hit was paying for the whole library's
+# rebuild to find one trip. The built list is kept here, keyed on the mtime of
+# every file `_make_trip` reads: the trip store (`trips_data_path`), the two
+# location files (place and family-visit names) and home.json (`home_only`,
+# via `is_home_stay`). Each WSGI worker holds its own copy and notices another
+# worker's write through the mtimes, exactly like `_LOCATIONS_CACHE`.
+#
+# The snapshot itself is never handed out — callers mutate what they get
+# (`enrich_trip_locations`, trip_detail's timeline photos), so they get
+# `_copy_trip` copies instead.
+_TRIPS_SNAPSHOT = {"key": None, "trips": None, "by_id": None}
+_TRIP_ORDER_CACHE = {"key": None, "rows": None}
+
+
+def _trips_snapshot_key():
+    path = trips_data_path()
+    return (path, _mtime_or_zero(path),
+            _mtime_or_zero(os.path.join(_DIR, "campgrounds.json")),
+            _mtime_or_zero(FAMILY_JSON),
+            _mtime_or_zero(HOME_JSON))
+
+
+def _trips_snapshot():
+    """`(trips, by_id)` — the shared, built trip list and its id index.
+    Read-only: copy (`_copy_trip`) anything that leaves this module."""
+    key = _trips_snapshot_key()
+    if _TRIPS_SNAPSHOT["trips"] is None or _TRIPS_SNAPSHOT["key"] != key:
+        trips = _load_trips_json()
+        _TRIPS_SNAPSHOT.update(key=key, trips=trips,
+                               by_id={t["id"]: t for t in trips})
+    return _TRIPS_SNAPSHOT["trips"], _TRIPS_SNAPSHOT["by_id"]
+
+
+def _invalidate_trips_snapshot():
+    _TRIPS_SNAPSHOT.update(key=None, trips=None, by_id=None)
+    _TRIP_ORDER_CACHE.update(key=None, rows=None)
+
+
+def _order_row(trip_id, start, home_only):
+    return {"id": trip_id, "start": start, "number": None,
+            "home_only": home_only}
+
+
+def _raw_home_only(stays):
+    """`_make_trip`'s `home_only` for raw stays. A raw stay's display `place`
+    isn't materialized yet, but only free-text stays can be home and those
+    materialize `place` from `custom_place`, so that's what gets checked."""
+    return bool(stays) and all(
+        is_home_stay({"campground_id": s.get("campground_id"),
+                      "place": s.get("custom_place", "") or ""})
+        for s in stays)
+
+
+def _copy_trip(trip):
+    """A copy of a built trip that's safe to mutate the way callers do.
+
+    Two levels deep, not `deepcopy`: the trip dict, each of its lists/dicts,
+    and each dict inside those lists (stays, events, timeline items) — which
+    is every place a caller writes. Leaf values are strings and numbers, so
+    sharing them is free; a full deepcopy of the library measured slower than
+    the rebuild it was meant to save."""
+    out = {}
+    for k, v in trip.items():
+        if isinstance(v, list):
+            v = [dict(x) if isinstance(x, dict) else x for x in v]
+        elif isinstance(v, dict):
+            v = dict(v)
+        out[k] = v
+    return out
+
+
+def _trip_edit(fn):
+    """Run a trip CRUD function under the trips write lock.
+
+    Every edit is a load-mutate-save of one trip record, and the app runs as
+    several worker processes: without the lock, two edits to the same trip
+    (a stay note saved while pings are being suppressed) both load the old
+    record and the second save discards the first. The lock lives on
+    trips.json's sidecar whichever engine is active — SQLite makes each
+    write atomic, but the read-modify-write around it is still ours."""
+    @functools.wraps(fn)
+    def locked(*args, **kwargs):
+        with json_store.lock(TRIPS_JSON):
+            return fn(*args, **kwargs)
+    return locked
 
 
 def _next_trip_id(raw_trips):
@@ -81,6 +340,7 @@ def _next_trip_id(raw_trips):
     return max(t["id"] for t in raw_trips) + 1
 
 
+@_trip_edit
 def migrate_csv_to_json(csv_path=os.path.join(_DIR, "EKKO_Trips.csv")):
     """One-time migration: parse CSV and write trip_data/trips.json."""
     stays = _parse_stays(csv_path)
@@ -112,48 +372,46 @@ def migrate_csv_to_json(csv_path=os.path.join(_DIR, "EKKO_Trips.csv")):
 
 # ── CRUD operations ───────────────────────────────────────────────────────
 
+@_trip_edit
 def create_trip(trip_note=""):
     """Create a new trip. Returns the new trip dict (with computed fields)."""
-    raw = _load_raw_trips()
-    new_id = _next_trip_id(raw)
-    raw.append({"id": new_id, "trip_note": trip_note, "stays": [], "events": []})
-    _save_trips(raw)
+    if _sqlite_active():
+        new_id = trip_store.next_trip_id(TRIPS_DB)
+    else:
+        new_id = _next_trip_id(_load_raw_trips())
+    _save_raw_trip({"id": new_id, "trip_note": trip_note, "stays": [],
+                    "events": []})
     return _make_trip(new_id, [], trip_note)
 
 
+@_trip_edit
 def update_trip(trip_id, fields):
     """Update trip-level fields (trip_note, home_start_time, home_end_time).
     Returns updated trip or None."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            if "trip_note" in fields:
-                t["trip_note"] = fields["trip_note"]
-            for key in ("home_start_time", "home_end_time"):
-                if key in fields:
-                    val = (fields[key] or "").strip()
-                    if val:
-                        t[key] = val
-                    else:
-                        t.pop(key, None)
-            _save_trips(raw)
-            return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                              t.get("events", []),
-                              home_start_time=t.get("home_start_time", ""),
-                              home_end_time=t.get("home_end_time", ""),
-                              bad_track_windows=t.get("bad_track_windows"))
-    return None
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    if "trip_note" in fields:
+        t["trip_note"] = fields["trip_note"]
+    for key in ("home_start_time", "home_end_time"):
+        if key in fields:
+            val = (fields[key] or "").strip()
+            if val:
+                t[key] = val
+            else:
+                t.pop(key, None)
+    _save_raw_trip(t)
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t.get("events", []),
+                      home_start_time=t.get("home_start_time", ""),
+                      home_end_time=t.get("home_end_time", ""),
+                      bad_track_windows=t.get("bad_track_windows"))
 
 
+@_trip_edit
 def delete_trip(trip_id):
     """Delete a trip. Returns True if found and deleted."""
-    raw = _load_raw_trips()
-    before = len(raw)
-    raw = [t for t in raw if t["id"] != trip_id]
-    if len(raw) < before:
-        _save_trips(raw)
-        return True
-    return False
+    return _delete_raw_trip(trip_id)
 
 
 def campground_references(location_id):
@@ -181,106 +439,105 @@ def campground_references(location_id):
     return hits
 
 
+@_trip_edit
 def add_stay(trip_id, stay_data):
     """Add a stay to a trip. Stays are sorted by start date. Returns updated trip or None."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            default_start = t["stays"][0]["start"] if t["stays"] else date.today().isoformat()
-            default_end = (date.fromisoformat(default_start) + timedelta(days=1)).isoformat()
-            start = stay_data.get("start", default_start)
-            end = stay_data.get("end", default_end)
-            # Ensure start is always before end
-            if end <= start:
-                end = (date.fromisoformat(start) + timedelta(days=1)).isoformat()
-            stay = {
-                "start": start,
-                "end": end,
-                "nights": int(stay_data.get("nights", 1)),
-                "campground_id": stay_data.get("campground_id"),
-                "custom_place": stay_data.get("custom_place", ""),
-                "locale": stay_data.get("locale", ""),
-                "state": stay_data.get("state", ""),
-                "site": stay_data.get("site", ""),
-                "campsite_location": (stay_data.get("campsite_location") or "").strip(),
-                "campers": stay_data.get("campers", ""),
-                "notes": stay_data.get("notes", ""),
-            }
-            t["stays"].append(stay)
-            old_order = list(t["stays"])
-            t["stays"].sort(key=lambda s: s["start"])
-            _remap_indices_after_sort(trip_id, old_order, t["stays"], "stay")
-            _save_trips(raw)
-            return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                              t.get("events", []),
-                              home_start_time=t.get("home_start_time", ""),
-                              home_end_time=t.get("home_end_time", ""),
-                              bad_track_windows=t.get("bad_track_windows"))
-    return None
-
-
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    default_start = t["stays"][0]["start"] if t["stays"] else date.today().isoformat()
+    default_end = (date.fromisoformat(default_start) + timedelta(days=1)).isoformat()
+    start = stay_data.get("start", default_start)
+    end = stay_data.get("end", default_end)
+    # Ensure start is always before end
+    if end <= start:
+        end = (date.fromisoformat(start) + timedelta(days=1)).isoformat()
+    stay = {
+        "start": start,
+        "end": end,
+        "nights": int(stay_data.get("nights", 1)),
+        "campground_id": stay_data.get("campground_id"),
+        "custom_place": stay_data.get("custom_place", ""),
+        "locale": stay_data.get("locale", ""),
+        "state": stay_data.get("state", ""),
+        "site": stay_data.get("site", ""),
+        "campsite_location": (stay_data.get("campsite_location") or "").strip(),
+        "campers": stay_data.get("campers", ""),
+        "notes": stay_data.get("notes", ""),
+    }
+    t["stays"].append(stay)
+    old_order = list(t["stays"])
+    t["stays"].sort(key=lambda s: s["start"])
+    _remap_indices_after_sort(trip_id, old_order, t["stays"], "stay")
+    _save_raw_trip(t)
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t.get("events", []),
+                      home_start_time=t.get("home_start_time", ""),
+                      home_end_time=t.get("home_end_time", ""),
+                      bad_track_windows=t.get("bad_track_windows"))
+
+
+@_trip_edit
 def update_stay(trip_id, stay_idx, fields):
     """Update fields on a specific stay. Returns updated trip or None."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            if stay_idx < 0 or stay_idx >= len(t["stays"]):
-                return None
-            stay = t["stays"][stay_idx]
-            for key in ("start", "end", "campground_id", "custom_place",
-                        "locale", "state", "site", "campers", "notes"):
-                if key in fields:
-                    stay[key] = fields[key]
-            if "campsite_location" in fields:
-                val = (fields["campsite_location"] or "").strip()
-                if val:
-                    stay["campsite_location"] = val
-                else:
-                    stay.pop("campsite_location", None)
-            if "nights" in fields:
-                stay["nights"] = int(fields["nights"])
-            # Ensure start is always before end
-            if stay["end"] <= stay["start"]:
-                stay["end"] = (date.fromisoformat(stay["start"]) + timedelta(days=1)).isoformat()
-            old_order = list(t["stays"])
-            t["stays"].sort(key=lambda s: s["start"])
-            _remap_indices_after_sort(trip_id, old_order, t["stays"], "stay")
-            _save_trips(raw)
-            return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                              t.get("events", []),
-                              home_start_time=t.get("home_start_time", ""),
-                              home_end_time=t.get("home_end_time", ""),
-                              bad_track_windows=t.get("bad_track_windows"))
-    return None
-
-
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    if stay_idx < 0 or stay_idx >= len(t["stays"]):
+        return None
+    stay = t["stays"][stay_idx]
+    for key in ("start", "end", "campground_id", "custom_place",
+                "locale", "state", "site", "campers", "notes"):
+        if key in fields:
+            stay[key] = fields[key]
+    if "campsite_location" in fields:
+        val = (fields["campsite_location"] or "").strip()
+        if val:
+            stay["campsite_location"] = val
+        else:
+            stay.pop("campsite_location", None)
+    if "nights" in fields:
+        stay["nights"] = int(fields["nights"])
+    # Ensure start is always before end
+    if stay["end"] <= stay["start"]:
+        stay["end"] = (date.fromisoformat(stay["start"]) + timedelta(days=1)).isoformat()
+    old_order = list(t["stays"])
+    t["stays"].sort(key=lambda s: s["start"])
+    _remap_indices_after_sort(trip_id, old_order, t["stays"], "stay")
+    _save_raw_trip(t)
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t.get("events", []),
+                      home_start_time=t.get("home_start_time", ""),
+                      home_end_time=t.get("home_end_time", ""),
+                      bad_track_windows=t.get("bad_track_windows"))
+
+
+@_trip_edit
 def delete_stay(trip_id, stay_idx):
     """Delete a stay from a trip. Handles photo directory renaming.
     Returns updated trip, or None if trip not found, or 'empty' if last stay deleted (trip removed)."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            if stay_idx < 0 or stay_idx >= len(t["stays"]):
-                return None
-            t["stays"].pop(stay_idx)
-
-            # Rename photo directories to keep indices aligned
-            upload_base = os.path.join(_DIR, "static", "uploads", str(trip_id))
-            if os.path.isdir(upload_base):
-                _shift_photo_dirs(upload_base, stay_idx, len(t["stays"]))
-
-            if not t["stays"] and not t.get("events"):
-                raw = [tr for tr in raw if tr["id"] != trip_id]
-                _save_trips(raw)
-                return "empty"
-
-            _save_trips(raw)
-            return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                              t.get("events", []),
-                              home_start_time=t.get("home_start_time", ""),
-                              home_end_time=t.get("home_end_time", ""),
-                              bad_track_windows=t.get("bad_track_windows"))
-    return None
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    if stay_idx < 0 or stay_idx >= len(t["stays"]):
+        return None
+    t["stays"].pop(stay_idx)
+
+    # Rename photo directories to keep indices aligned
+    upload_base = os.path.join(_DIR, "static", "uploads", str(trip_id))
+    if os.path.isdir(upload_base):
+        _shift_photo_dirs(upload_base, stay_idx, len(t["stays"]))
+
+    if not t["stays"] and not t.get("events"):
+        _delete_raw_trip(trip_id)
+        return "empty"
+
+    _save_raw_trip(t)
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t.get("events", []),
+                      home_start_time=t.get("home_start_time", ""),
+                      home_end_time=t.get("home_end_time", ""),
+                      bad_track_windows=t.get("bad_track_windows"))
 
 
 def _shift_photo_dirs(upload_base, deleted_idx, remaining_count):
@@ -337,149 +594,109 @@ def _remap_indices_after_sort(trip_id, old_items, new_items, kind):
         os.rename(tmp_dir, new_dir)
 
     # Phase 3: remap caption, photo_order, per-photo uploader, favorite and
-    # people keys (all five share the "{trip_id}/{idx}/..." key shape). Any
-    # new per-photo metadata file belongs in this list too — miss it and the
-    # metadata silently detaches from its photo the next time a date edit
-    # reorders the stays.
-    captions_file = os.path.join(_DIR, "trip_data", "captions.json")
-    order_file = os.path.join(_DIR, "trip_data", "photo_order.json")
-    uploaders_file = os.path.join(_DIR, "trip_data", "photo_uploaders.json")
-    favorites_file = os.path.join(_DIR, "trip_data", "photo_favorites.json")
-    people_file = os.path.join(_DIR, "trip_data", "photo_people.json")
-    _remap_json_keys(captions_file, key_prefix, mapping)
-    _remap_json_keys(order_file, key_prefix, mapping)
-    _remap_json_keys(uploaders_file, key_prefix, mapping)
-    _remap_json_keys(favorites_file, key_prefix, mapping)
-    _remap_json_keys(people_file, key_prefix, mapping)
-
-
-def _remap_json_keys(filepath, key_prefix, mapping):
-    """Remap numeric index in JSON keys matching key_prefix/{idx}[/...]."""
-    if not os.path.exists(filepath):
-        return
-    with open(filepath, "r") as f:
-        data = json.load(f)
-
-    prefix_slash = key_prefix + "/"
-    new_data = {}
-    for key, value in data.items():
-        if not key.startswith(prefix_slash):
-            new_data[key] = value
-            continue
-        rest = key[len(prefix_slash):]
-        parts = rest.split("/", 1)
-        try:
-            idx = int(parts[0])
-        except ValueError:
-            new_data[key] = value
-            continue
-        if idx in mapping:
-            suffix = ("/" + parts[1]) if len(parts) > 1 else ""
-            new_key = f"{prefix_slash}{mapping[idx]}{suffix}"
-            new_data[new_key] = value
-        else:
-            new_data[key] = value
-
-    with open(filepath, "w") as f:
-        json.dump(new_data, f, indent=2)
+    # people keys (all share the "{trip_id}/{idx}/..." key shape). Any new
+    # per-photo metadata belongs in photo_meta too — kept anywhere else, it
+    # silently detaches from its photo the next time a date edit reorders the
+    # stays.
+    photo_meta.remap_indices(key_prefix, mapping)
 
 
 # ── Event CRUD ────────────────────────────────────────────────────────────
 
+@_trip_edit
 def add_event(trip_id, event_data):
     """Add an event to a trip. Events are sorted by date. Returns updated trip or None."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            default_date = t["stays"][0]["start"] if t["stays"] else date.today().isoformat()
-            time = event_data.get("time", "")
-            end_time = event_data.get("end_time", "")
-            # end_time requires time
-            if end_time and not time:
-                end_time = ""
-            event = {
-                "date": event_data.get("date", default_date),
-                "time": time,
-                "end_time": end_time,
-                "name": event_data.get("name", "New Event"),
-                "description": event_data.get("description", ""),
-                "location": event_data.get("location", ""),
-                "locale": event_data.get("locale", ""),
-                "state": event_data.get("state", ""),
-                "waypoint": bool(event_data.get("waypoint", False)),
-                "family_id": event_data.get("family_id"),
-                # True for events/waypoints auto-created by GPS-track stop
-                # detection; admin clears it by editing/saving. The detection
-                # endpoint creates these in bulk; the admin reviews each
-                # before clearing the flag.
-                "needs_vetting": bool(event_data.get("needs_vetting", False)),
-            }
-            events = t.get("events", [])
-            events.append(event)
-            old_order = list(events)
-            events.sort(key=lambda e: (e["date"], e.get("time") or "12:00"))
-            _remap_indices_after_sort(trip_id, old_order, events, "event")
-            t["events"] = events
-            _save_trips(raw)
-            return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                              t["events"])
-    return None
-
-
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    default_date = t["stays"][0]["start"] if t["stays"] else date.today().isoformat()
+    time = event_data.get("time", "")
+    end_time = event_data.get("end_time", "")
+    # end_time requires time
+    if end_time and not time:
+        end_time = ""
+    event = {
+        "date": event_data.get("date", default_date),
+        "time": time,
+        "end_time": end_time,
+        "name": event_data.get("name", "New Event"),
+        "description": event_data.get("description", ""),
+        "location": event_data.get("location", ""),
+        "locale": event_data.get("locale", ""),
+        "state": event_data.get("state", ""),
+        "waypoint": bool(event_data.get("waypoint", False)),
+        "family_id": event_data.get("family_id"),
+        # True for events/waypoints auto-created by GPS-track stop
+        # detection; admin clears it by editing/saving. The detection
+        # endpoint creates these in bulk; the admin reviews each
+        # before clearing the flag.
+        "needs_vetting": bool(event_data.get("needs_vetting", False)),
+    }
+    events = t.get("events", [])
+    events.append(event)
+    old_order = list(events)
+    events.sort(key=lambda e: (e["date"], e.get("time") or "12:00"))
+    _remap_indices_after_sort(trip_id, old_order, events, "event")
+    t["events"] = events
+    _save_raw_trip(t)
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t["events"])
+
+
+@_trip_edit
 def update_event(trip_id, event_idx, fields):
     """Update fields on a specific event. Returns updated trip or None."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            events = t.get("events", [])
-            if event_idx < 0 or event_idx >= len(events):
-                return None
-            event = events[event_idx]
-            for key in ("date", "time", "end_time", "name", "description",
-                        "location", "locale", "state", "family_id"):
-                if key in fields:
-                    event[key] = fields[key]
-            if "waypoint" in fields:
-                event["waypoint"] = bool(fields["waypoint"])
-            if "needs_vetting" in fields:
-                # Saving an edited event clears the flag — the admin's act of
-                # opening/saving is how vetting happens. Bulk-detected stops
-                # are created with this set to True; subsequent edits flip it.
-                event["needs_vetting"] = bool(fields["needs_vetting"])
-            # end_time requires time
-            if event.get("end_time") and not event.get("time"):
-                event["end_time"] = ""
-            old_order = list(events)
-            events.sort(key=lambda e: (e["date"], e.get("time") or "12:00"))
-            _remap_indices_after_sort(trip_id, old_order, events, "event")
-            t["events"] = events
-            _save_trips(raw)
-            return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                              t["events"])
-    return None
-
-
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    events = t.get("events", [])
+    if event_idx < 0 or event_idx >= len(events):
+        return None
+    event = events[event_idx]
+    for key in ("date", "time", "end_time", "name", "description",
+                "location", "locale", "state", "family_id"):
+        if key in fields:
+            event[key] = fields[key]
+    if "waypoint" in fields:
+        event["waypoint"] = bool(fields["waypoint"])
+    if "needs_vetting" in fields:
+        # Saving an edited event clears the flag — the admin's act of
+        # opening/saving is how vetting happens. Bulk-detected stops
+        # are created with this set to True; subsequent edits flip it.
+        event["needs_vetting"] = bool(fields["needs_vetting"])
+    # end_time requires time
+    if event.get("end_time") and not event.get("time"):
+        event["end_time"] = ""
+    old_order = list(events)
+    events.sort(key=lambda e: (e["date"], e.get("time") or "12:00"))
+    _remap_indices_after_sort(trip_id, old_order, events, "event")
+    t["events"] = events
+    _save_raw_trip(t)
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t["events"])
+
+
+@_trip_edit
 def delete_event(trip_id, event_idx):
     """Delete an event from a trip. Returns updated trip or None."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            events = t.get("events", [])
-            if event_idx < 0 or event_idx >= len(events):
-                return None
-            events.pop(event_idx)
-
-            # Remove event photos and shift directories
-            upload_base = os.path.join(_DIR, "static", "uploads",
-                                       str(trip_id), "events")
-            if os.path.isdir(upload_base):
-                _shift_photo_dirs(upload_base, event_idx, len(events))
-
-            t["events"] = events
-            _save_trips(raw)
-            return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
-                              t["events"])
-    return None
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    events = t.get("events", [])
+    if event_idx < 0 or event_idx >= len(events):
+        return None
+    events.pop(event_idx)
+
+    # Remove event photos and shift directories
+    upload_base = os.path.join(_DIR, "static", "uploads",
+                               str(trip_id), "events")
+    if os.path.isdir(upload_base):
+        _shift_photo_dirs(upload_base, event_idx, len(events))
+
+    t["events"] = events
+    _save_raw_trip(t)
+    return _make_trip(t["id"], t["stays"], t.get("trip_note", ""),
+                      t["events"])
 
 
 # ── GPS-ping suppression ─────────────────────────────────────────────────
@@ -493,42 +710,47 @@ def delete_event(trip_id, event_idx):
 
 def get_suppressed_pings(trip_id):
     """Return the trip's suppressed-ping timestamp list (empty if none)."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            return list(t.get("suppressed_pings", []))
-    return []
+    if _sqlite_active():
+        return trip_store.get_suppressed_pings(TRIPS_DB, trip_id)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return []
+    return list(t.get("suppressed_pings", []))
 
 
+@_trip_edit
 def add_suppressed_pings(trip_id, tsts):
     """Add timestamps to a trip's suppressed list. Idempotent (set semantics).
     Returns the resulting list, or None if the trip doesn't exist."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            current = set(t.get("suppressed_pings", []))
-            current.update(int(x) for x in tsts)
-            t["suppressed_pings"] = sorted(current)
-            _save_trips(raw)
-            return t["suppressed_pings"]
-    return None
+    if _sqlite_active():
+        return _store_write(trip_store.add_suppressed_pings, trip_id, tsts)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    current = set(t.get("suppressed_pings", []))
+    current.update(int(x) for x in tsts)
+    t["suppressed_pings"] = sorted(current)
+    _save_raw_trip(t)
+    return t["suppressed_pings"]
 
 
+@_trip_edit
 def remove_suppressed_pings(trip_id, tsts):
     """Remove timestamps from a trip's suppressed list. Idempotent.
     Returns the resulting list, or None if the trip doesn't exist."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            current = set(t.get("suppressed_pings", []))
-            current.difference_update(int(x) for x in tsts)
-            if current:
-                t["suppressed_pings"] = sorted(current)
-            else:
-                t.pop("suppressed_pings", None)
-            _save_trips(raw)
-            return sorted(current)
-    return None
+    if _sqlite_active():
+        return _store_write(trip_store.remove_suppressed_pings, trip_id, tsts)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    current = set(t.get("suppressed_pings", []))
+    current.difference_update(int(x) for x in tsts)
+    if current:
+        t["suppressed_pings"] = sorted(current)
+    else:
+        t.pop("suppressed_pings", None)
+    _save_raw_trip(t)
+    return sorted(current)
 
 
 # ── GPS-ping relocation ──────────────────────────────────────────────────
@@ -550,11 +772,12 @@ def get_relocated_pings(trip_id):
     """Return the trip's relocated-ping list (each entry is
     {tst, lat, lon} for legacy entries or
     {tst, lat, lon, orig_lat, orig_lon} for newer ones)."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            return list(t.get("relocated_pings", []))
-    return []
+    if _sqlite_active():
+        return trip_store.get_relocated_pings(TRIPS_DB, trip_id)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return []
+    return list(t.get("relocated_pings", []))
 
 
 def _relocation_entry_key(item):
@@ -568,39 +791,45 @@ def _relocation_entry_key(item):
     return (tst, None, None)
 
 
+@_trip_edit
 def add_relocated_pings(trip_id, items):
     """Add or update relocations. `items` is an iterable of dicts with
     keys `tst`, `lat`, `lon`, and optionally `orig_lat`/`orig_lon`. If an
     entry's key (tst + originals) already exists, its target is replaced.
     Returns the resulting list, or None if the trip is missing."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            current = {_relocation_entry_key(it): it
-                       for it in t.get("relocated_pings", [])}
-            for it in items:
-                entry = {
-                    "tst": int(it["tst"]),
-                    "lat": float(it["lat"]),
-                    "lon": float(it["lon"]),
-                }
-                if it.get("orig_lat") is not None and it.get("orig_lon") is not None:
-                    entry["orig_lat"] = float(it["orig_lat"])
-                    entry["orig_lon"] = float(it["orig_lon"])
-                current[_relocation_entry_key(entry)] = entry
-            # Stable order: (tst, then any-orig-coord) so trips.json diffs
-            # stay readable. None-keyed legacy entries sort before keyed ones
-            # for any given tst.
-            t["relocated_pings"] = [
-                current[k] for k in sorted(
-                    current.keys(),
-                    key=lambda x: (x[0], x[1] is not None, x[1] or 0, x[2] or 0))
-            ]
-            _save_trips(raw)
-            return list(t["relocated_pings"])
-    return None
-
-
+    entries = []
+    for it in items:
+        entry = {
+            "tst": int(it["tst"]),
+            "lat": float(it["lat"]),
+            "lon": float(it["lon"]),
+        }
+        if it.get("orig_lat") is not None and it.get("orig_lon") is not None:
+            entry["orig_lat"] = float(it["orig_lat"])
+            entry["orig_lon"] = float(it["orig_lon"])
+        entries.append(entry)
+    if _sqlite_active():
+        return _store_write(trip_store.upsert_relocated_pings, trip_id, entries)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    current = {_relocation_entry_key(it): it
+               for it in t.get("relocated_pings", [])}
+    for entry in entries:
+        current[_relocation_entry_key(entry)] = entry
+    # Stable order: (tst, then any-orig-coord) so trips.json diffs
+    # stay readable. None-keyed legacy entries sort before keyed ones
+    # for any given tst.
+    t["relocated_pings"] = [
+        current[k] for k in sorted(
+            current.keys(),
+            key=lambda x: (x[0], x[1] is not None, x[1] or 0, x[2] or 0))
+    ]
+    _save_raw_trip(t)
+    return list(t["relocated_pings"])
+
+
+@_trip_edit
 def remove_relocated_pings(trip_id, tsts=None, items=None):
     """Remove relocations. Pass `tsts=[...]` to remove every entry with
     those `tst`s (legacy / coarse), or `items=[{tst, orig_lat, orig_lon},
@@ -608,39 +837,45 @@ def remove_relocated_pings(trip_id, tsts=None, items=None):
     relocation that shares the `tst` but has different originals).
 
     Idempotent. Returns the resulting list, or None if the trip is missing."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            existing = t.get("relocated_pings", [])
-            if items is not None:
-                precise_keys = set()  # (tst, orig_lat, orig_lon)
-                broad_tsts = set()    # tsts to drop wholesale (no orig given)
-                for it in items:
-                    tst = int(it["tst"])
-                    if it.get("orig_lat") is not None and it.get("orig_lon") is not None:
-                        precise_keys.add((tst, float(it["orig_lat"]), float(it["orig_lon"])))
-                    else:
-                        broad_tsts.add(tst)
-                def _keep(e):
-                    tst = int(e["tst"])
-                    if tst in broad_tsts:
-                        return False
-                    if e.get("orig_lat") is not None and e.get("orig_lon") is not None:
-                        return (tst, float(e["orig_lat"]), float(e["orig_lon"])) not in precise_keys
-                    return True  # legacy entry, only droppable via broad_tsts
-                keep = [e for e in existing if _keep(e)]
-            elif tsts is not None:
-                wanted = {int(x) for x in tsts}
-                keep = [it for it in existing if int(it["tst"]) not in wanted]
-            else:
-                return list(existing)
-            if keep:
-                t["relocated_pings"] = keep
+    precise_keys = set()  # (tst, orig_lat, orig_lon)
+    broad_tsts = set()    # tsts to drop wholesale (no orig given)
+    if items is not None:
+        for it in items:
+            tst = int(it["tst"])
+            if it.get("orig_lat") is not None and it.get("orig_lon") is not None:
+                precise_keys.add((tst, float(it["orig_lat"]), float(it["orig_lon"])))
             else:
-                t.pop("relocated_pings", None)
-            _save_trips(raw)
-            return keep
-    return None
+                broad_tsts.add(tst)
+    elif tsts is not None:
+        broad_tsts = {int(x) for x in tsts}
+    if _sqlite_active():
+        if items is None and tsts is None:
+            return get_relocated_pings(trip_id)
+        return _store_write(trip_store.delete_relocated_pings, trip_id,
+                            broad_tsts, precise_keys)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    existing = t.get("relocated_pings", [])
+    if items is not None:
+        def _keep(e):
+            tst = int(e["tst"])
+            if tst in broad_tsts:
+                return False
+            if e.get("orig_lat") is not None and e.get("orig_lon") is not None:
+                return (tst, float(e["orig_lat"]), float(e["orig_lon"])) not in precise_keys
+            return True  # legacy entry, only droppable via broad_tsts
+        keep = [e for e in existing if _keep(e)]
+    elif tsts is not None:
+        keep = [it for it in existing if int(it["tst"]) not in broad_tsts]
+    else:
+        return list(existing)
+    if keep:
+        t["relocated_pings"] = keep
+    else:
+        t.pop("relocated_pings", None)
+    _save_raw_trip(t)
+    return keep
 
 
 # ── Per-day tid overrides ────────────────────────────────────────────────
@@ -653,13 +888,15 @@ def remove_relocated_pings(trip_id, tsts=None, items=None):
 
 def get_tid_overrides(trip_id):
     """Return the trip's tid_overrides dict (empty if none)."""
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            return dict(t.get("tid_overrides", {}))
-    return {}
+    if _sqlite_active():
+        return trip_store.get_tid_overrides(TRIPS_DB, trip_id)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return {}
+    return dict(t.get("tid_overrides", {}))
 
 
+@_trip_edit
 def set_tid_override(trip_id, day, value):
     """Set or clear a single date's tid override.
 
@@ -669,21 +906,22 @@ def set_tid_override(trip_id, day, value):
     trip is missing."""
     if value is not None and value not in ("primary", "alt"):
         raise ValueError("tid override value must be 'primary', 'alt', or None")
-    raw = _load_raw_trips()
-    for t in raw:
-        if t["id"] == trip_id:
-            current = dict(t.get("tid_overrides", {}))
-            if value is None:
-                current.pop(day, None)
-            else:
-                current[day] = value
-            if current:
-                t["tid_overrides"] = current
-            else:
-                t.pop("tid_overrides", None)
-            _save_trips(raw)
-            return current
-    return None
+    if _sqlite_active():
+        return _store_write(trip_store.set_tid_override, trip_id, day, value)
+    t = _load_raw_trip(trip_id)
+    if t is None:
+        return None
+    current = dict(t.get("tid_overrides", {}))
+    if value is None:
+        current.pop(day, None)
+    else:
+        current[day] = value
+    if current:
+        t["tid_overrides"] = current
+    else:
+        t.pop("tid_overrides", None)
+    _save_raw_trip(t)
+    return current
 
 
 # ── CSV parsing (legacy) ─────────────────────────────────────────────────
@@ -915,6 +1153,16 @@ def is_day_trip(trip):
     return not trip.get("stays") and bool(trip.get("events"))
 
 
+def _trip_span(stays, events):
+    """`(start, end)` date strings of a trip — its campspots' when it has
+    any, else its events'; `("", "")` for an empty trip."""
+    if stays:
+        return stays[0]["start"], stays[-1]["end"]
+    if events:
+        return events[0]["date"], max(e["date"] for e in events)
+    return "", ""
+
+
 def _make_trip(trip_id, stays, trip_note="", events=None, locations=None,
                home_start_time="", home_end_time="",
                bad_track_windows=None, tid_overrides=None,
@@ -1075,14 +1323,7 @@ def _make_trip(trip_id, stays, trip_note="", events=None, locations=None,
                              _order=0, _time=e.get("time") or "12:00"))
     timeline.sort(key=lambda x: (x["sort_date"], x["_order"], x["_time"]))
 
-    if stays:
-        start = stays[0]["start"]
-        end = stays[-1]["end"]
-    elif events:
-        start = events[0]["date"]
-        end = max(e["date"] for e in events)
-    else:
-        start = end = ""
+    start, end = _trip_span(stays, events)
 
     return {
         "id": trip_id,
@@ -1242,6 +1483,24 @@ if __name__ == "__main__":
     if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
         count = migrate_csv_to_json()
         print(f"Migrated {count} trips to {TRIPS_JSON}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "migrate-sqlite":
+        # One-shot switch to the SQLite engine. Refuses to clobber an existing
+        # store unless --force: once trips.db exists it is authoritative, and
+        # trips.json may be older than it.
+        if _sqlite_active() and "--force" not in sys.argv[2:]:
+            print(f"{TRIPS_DB} already exists; pass --force to rebuild it "
+                  f"from {TRIPS_JSON}.")
+            sys.exit(1)
+        count = trip_store.migrate_from_json(TRIPS_JSON, TRIPS_DB)
+        print(f"Migrated {count} trips to {TRIPS_DB}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "export-json":
+        # trips.db → trips.json, for backup.sh and for switching back (export,
+        # then remove trips.db). A no-op without the SQLite engine.
+        if not _sqlite_active():
+            print(f"No {TRIPS_DB}; {TRIPS_JSON} is already authoritative.")
+            sys.exit(0)
+        count = trip_store.export_json(TRIPS_DB, TRIPS_JSON)
+        print(f"Exported {count} trips to {TRIPS_JSON}")
     else:
         trips = parse_trips()
         for t in trips:
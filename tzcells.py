@@ -0,0 +1,157 @@
+"""Timezone lookups for pings, memoized on a coarse coordinate grid.
+
+`ekko_trips_app._enrich_with_timezone` stamps an IANA `tz` on every ping
+that lacks one, and `_tz_for_coord` answers each with a TimezoneFinder
+point-in-polygon test (~5 µs). A freshly fetched in-progress trip is
+re-stamped in full on every request — tens of thousands of pings, nearly
+all of them a few metres from the one before and in the same zone.
+
+`CellResolver` splits the globe into `CELL_DEG` squares (~5.5 km north to
+south) and samples the exact finder on a lattice at half that spacing.
+The first ping to land in a cell looks at the lattice points over the cell
+and over the ring of cells around it — 7×7 points, nearly all already
+sampled by a neighbour, so a new cell costs about four fresh lookups. If
+every one names the same zone, the cell is that zone and every later ping
+in it is one dict lookup. If they disagree (a timezone border runs through
+or next to the cell) or any comes back None, it's a border cell, split
+into four half-size cells that are judged the same way — `REFINE` times,
+down to ~700 m. Only pings in a border cell at the finest level still go to
+the exact finder one by one, as before: those within a kilometre or two of
+a border. That matters more than it sounds — along a coastline or a river
+the polygons are detailed and one exact lookup can cost 30× an inland one.
+
+The ring is there for borders that wiggle: a river line can bulge into a
+cell between two of its own lattice points and back out without crossing
+either, and its corners alone would all agree. The border proper still
+runs through a neighbouring cell, whose samples do disagree. What could
+still slip through is a sliver of zone deeper than a cell whose whole
+outline threads between lattice points; tests/test_tzcells.py checks the
+grid against the exact finder ping for ping over US border country (river
+borders included) and finds none.
+
+Cells are persisted (`load` / `save`) so a restart doesn't resample them,
+keyed by the finder's data version and the cell size — new polygon data
+or a different grid throws the old cells away. `_tz_for_coord` stays the
+reference.
+"""
+
+import math
+
+import json_store
+
+# Edge of a top-level cell in degrees, and how many times a border cell is
+# halved. The lattice step at each level is half that level's cell edge.
+CELL_DEG = 0.05
+REFINE = 3
+
+# A cell whose samples disagreed: look at its quarters, or at the finest
+# level, ask the exact finder.
+BORDER = None
+
+
+class CellResolver:
+    """`tz(lat, lng)` through the grid, falling back to `exact(lat, lng)`
+    (an IANA name, or None) in the finest border cells and for points off
+    the grid. `cells` seeds the grid, as `load` returns it."""
+
+    def __init__(self, exact, cells=None, cell_deg=CELL_DEG, refine=REFINE):
+        self._exact = exact
+        self._refine = refine
+        # Per level: cell edge, and the lattice step in finest-step units.
+        self._sizes = [cell_deg / 2 ** level for level in range(refine + 1)]
+        self._strides = [2 ** (refine - level) for level in range(refine + 1)]
+        self._step = cell_deg / 2 ** (refine + 1)
+        self._cells = dict(cells or {})
+        self._samples = {}
+        self._new = {}
+
+    def __len__(self):
+        return len(self._cells)
+
+    def _sample(self, a, b):
+        """Exact zone at finest-lattice point (a, b), each asked once."""
+        key = (a, b)
+        try:
+            return self._samples[key]
+        except KeyError:
+            pass
+        lat = max(-90.0, min(90.0, a * self._step))
+        lng = max(-180.0, min(180.0, b * self._step))
+        tz = self._samples[key] = self._exact(lat, lng)
+        return tz
+
+    def cell(self, key):
+        """The zone covering all of cell `key` — (level, i, j) — and the
+        ring around it, or BORDER; sampled and remembered on first use."""
+        try:
+            return self._cells[key]
+        except KeyError:
+            pass
+        level, i, j = key
+        k = self._strides[level]
+        zones = {self._sample((2 * i + da) * k, (2 * j + db) * k)
+                 for da in range(-2, 5) for db in range(-2, 5)}
+        tz = zones.pop() if len(zones) == 1 else BORDER
+        self._cells[key] = self._new[key] = tz
+        return tz
+
+    def tz(self, lat, lng):
+        if lat is None or lng is None:
+            return self._exact(lat, lng)
+        try:
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                return self._exact(lat, lng)
+        except TypeError:
+            return self._exact(lat, lng)
+        for level, size in enumerate(self._sizes):
+            tz = self.cell((level, math.floor(lat / size),
+                             math.floor(lng / size)))
+            if tz is not BORDER:
+                return tz
+        return self._exact(lat, lng)
+
+    def take_new(self):
+        """Cells sampled since the last call (for `save`), and forget them."""
+        new, self._new = self._new, {}
+        return new
+
+
+def _version_key(version, cell_deg, refine):
+    return f"{version}|{cell_deg}|{refine}"
+
+
+def load(path, version, cell_deg=CELL_DEG, refine=REFINE):
+    """Cells saved at `path` for this finder `version` and grid, as a dict
+    for `CellResolver(cells=...)`; empty if there are none (or they were
+    sampled from other polygon data, or on another grid)."""
+    try:
+        data = json_store.load(path)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or \
+            data.get("version") != _version_key(version, cell_deg, refine):
+        return {}
+    cells = {}
+    for k, tz in (data.get("cells") or {}).items():
+        try:
+            level, i, j = k.split(",")
+            cells[(int(level), int(i), int(j))] = tz
+        except ValueError:
+            continue
+    return cells
+
+
+def save(path, version, new_cells, cell_deg=CELL_DEG, refine=REFINE):
+    """Merge `new_cells` into the file at `path` — other workers add their
+    own cells to the same file — starting it over if it holds another
+    version's."""
+    if not new_cells:
+        return
+    key = _version_key(version, cell_deg, refine)
+    with json_store.update(path, separators=(",", ":")) as data:
+        if data.get("version") != key:
+            data.clear()
+            data["version"] = key
+        cells = data.setdefault("cells", {})
+        for (level, i, j), tz in new_cells.items():
+            cells[f"{level},{i},{j}"] = tz
@@ -0,0 +1,252 @@
+"""Precomputed timezone raster (trip_data/tz_raster.bin): the tzcells grid
+for the regions our trips cover, frozen into one memory-mapped file.
+
+TimezoneFinder carries ~50 MB of polygon data, and every WSGI worker that
+ever stamps a ping or works out home's zone loads its own copy — the first
+track request after a boot stalls on it, and the memory stays for the life
+of the worker. The tzcells grid cuts the lookups but not the load: it
+still samples the finder to fill its cells.
+
+This file is that grid sampled ahead of time, offline
+(`python ekko_trips_app.py build-tz-raster`), over every 1° tile any trip
+has touched plus the tiles around them. Workers map it read-only, so its
+pages sit in the page cache once and are shared by all of them, and none
+of them loads the finder for a ping the raster answers.
+
+Each tile is `CELL_DEG` cells a side, one int32 per cell:
+
+  >= 0     the zone (index into the header's table) for the whole cell
+  < 0      -(block + 1): a border cell, whose finest-level quarters — an
+           8×8 block of uint16 — hold each sub-cell's zone, or ASK
+
+Values come from a `tzcells.CellResolver` over the same finder, walked down
+the levels exactly as `CellResolver.tz` does, so the raster answers what
+the grid would. ASK — a finest border cell, within a kilometre or two of a
+zone line — and anywhere outside the covered tiles go back to the caller,
+which asks the finder. tests/test_tzraster.py holds the raster to the grid
+and to `_tz_for_coord`, the reference.
+
+Layout, after track_store's: the 8-byte MAGIC, a little-endian uint32
+header length, a JSON header (grid geometry, the zone table, the finder
+version it was sampled from, each array's offset), then the arrays —
+the tile index over the covered bounding box, the tiles, the blocks —
+each 8-byte aligned. Written through json_store.write_bytes, so a worker
+never maps a half-built one.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+
+import numpy as np
+
+import json_store
+import tzcells
+
+MAGIC = b"EKTZRAS1"
+_LEN = struct.Struct("<I")
+_ALIGN = 8
+
+# A finest-level border cell: not answered here.
+ASK = 0xFFFF
+
+
+def _geometry(cell_deg, refine):
+    per_tile = round(1 / cell_deg)
+    if not math.isclose(per_tile * cell_deg, 1):
+        raise ValueError("cell_deg must divide a degree")
+    return per_tile, 2 ** refine
+
+
+def tiles_around(coords, margin=1):
+    """The 1° tiles — (floor lat, floor lng) — holding any of `coords`
+    ((lat, lng) pairs), and `margin` rings of tiles around each."""
+    tiles = set()
+    for lat, lng in coords:
+        if lat is None or lng is None:
+            continue
+        try:
+            ti, tj = math.floor(lat), math.floor(lng)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        for a in range(-margin, margin + 1):
+            for b in range(-margin, margin + 1):
+                if -90 <= ti + a < 90 and -180 <= tj + b < 180:
+                    tiles.add((ti + a, tj + b))
+    return tiles
+
+
+def build(path, tiles, exact, version, cell_deg=tzcells.CELL_DEG,
+          refine=tzcells.REFINE, progress=None):
+    """Sample `exact` (lat, lng -> zone or None) over `tiles` and write the
+    raster to `path`. `progress(done, total)` is called after each tile.
+    Returns the header."""
+    per_tile, fine = _geometry(cell_deg, refine)
+    tiles = sorted(tiles)
+    zone_ids = {}
+    tile_arrays, blocks = [], []
+
+    def zone_id(tz):
+        return zone_ids.setdefault(tz, len(zone_ids))
+
+    for done, (ti, tj) in enumerate(tiles, 1):
+        # A resolver per tile keeps the sample memo to one tile's worth;
+        # only the ring along the tile's edge gets sampled twice.
+        grid = tzcells.CellResolver(exact, cell_deg=cell_deg, refine=refine)
+        arr = np.empty((per_tile, per_tile), np.int32)
+        for a in range(per_tile):
+            for b in range(per_tile):
+                gi, gj = ti * per_tile + a, tj * per_tile + b
+                tz = grid.cell((0, gi, gj))
+                if tz is not tzcells.BORDER:
+                    arr[a, b] = zone_id(tz)
+                    continue
+                block = np.full((fine, fine), ASK, np.uint16)
+                for fa in range(fine):
+                    for fb in range(fine):
+                        fi, fj = gi * fine + fa, gj * fine + fb
+                        for level in range(1, refine + 1):
+                            shift = refine - level
+                            tz = grid.cell((level, fi >> shift, fj >> shift))
+                            if tz is not tzcells.BORDER:
+                                block[fa, fb] = zone_id(tz)
+                                break
+                arr[a, b] = -(len(blocks) + 1)
+                blocks.append(block)
+        tile_arrays.append(arr)
+        if progress:
+            progress(done, len(tiles))
+    if len(zone_ids) >= ASK:
+        raise ValueError("too many zones for the raster's uint16 blocks")
+
+    if tiles:
+        lat0 = min(t[0] for t in tiles)
+        lng0 = min(t[1] for t in tiles)
+        rows = max(t[0] for t in tiles) - lat0 + 1
+        cols = max(t[1] for t in tiles) - lng0 + 1
+    else:
+        lat0 = lng0 = rows = cols = 0
+    index = np.full((rows, cols), -1, np.int32)
+    for k, (ti, tj) in enumerate(tiles):
+        index[ti - lat0, tj - lng0] = k
+    arrays = [
+        ("index", index),
+        ("tiles", np.asarray(tile_arrays, np.int32).reshape(
+            len(tiles), per_tile, per_tile)),
+        ("blocks", np.asarray(blocks, np.uint16).reshape(
+            len(blocks), fine, fine)),
+    ]
+
+    def head(offset):
+        cols_meta = []
+        for name, arr in arrays:
+            offset += -offset % _ALIGN
+            cols_meta.append([name, arr.dtype.newbyteorder("<").str,
+                              list(arr.shape), offset])
+            offset += arr.nbytes
+        return json.dumps({
+            "version": version, "cell_deg": cell_deg, "refine": refine,
+            "lat0": lat0, "lng0": lng0,
+            "zones": sorted(zone_ids, key=zone_ids.get),
+            "arrays": cols_meta,
+        }, separators=(",", ":")).encode("utf-8")
+
+    # The offsets sit inside the header, so its length depends on them.
+    header = b""
+    while True:
+        again = head(len(MAGIC) + _LEN.size + len(header))
+        if len(again) == len(header):
+            break
+        header = again
+    header = again
+    out = [MAGIC, _LEN.pack(len(header)), header]
+    pos = len(MAGIC) + _LEN.size + len(header)
+    for _, arr in arrays:
+        out.append(b"\0" * (-pos % _ALIGN))
+        pos += -pos % _ALIGN
+        data = arr.astype(arr.dtype.newbyteorder("<")).tobytes()
+        out.append(data)
+        pos += len(data)
+    json_store.write_bytes(path, b"".join(out))
+    return json.loads(header)
+
+
+class TzRaster:
+    """A mapped raster file; see `load`."""
+
+    def tz(self, lat, lng):
+        """The zone at one point, or None if the raster can't say."""
+        k = int(self.zone_ids([lat], [lng])[0])
+        return self.zones[k] if k >= 0 else None
+
+    def zone_ids(self, lats, lngs):
+        """Index into `zones` for each point, as an int64 array; -1 where
+        the raster can't say (off the covered tiles, a finest border cell,
+        no coordinate)."""
+        lat = np.array([np.nan if v is None else v for v in lats], np.float64)
+        lng = np.array([np.nan if v is None else v for v in lngs], np.float64)
+        out = np.full(len(lat), -1, np.int64)
+        ok = (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+        if not ok.any() or not self.index.size:
+            return out
+        # The same cell arithmetic as CellResolver.tz: floor(coord / edge).
+        gi = np.zeros(len(lat), np.int64)
+        gj = np.zeros(len(lat), np.int64)
+        gi[ok] = np.floor(lat[ok] / self.cell_deg)
+        gj[ok] = np.floor(lng[ok] / self.cell_deg)
+        ti = gi // self.per_tile - self.lat0
+        tj = gj // self.per_tile - self.lng0
+        rows, cols = self.index.shape
+        ok &= (ti >= 0) & (ti < rows) & (tj >= 0) & (tj < cols)
+        tile = np.full(len(lat), -1, np.int64)
+        tile[ok] = self.index[ti[ok], tj[ok]]
+        ok &= tile >= 0
+        if not ok.any():
+            return out
+        vals = self.tiles[tile[ok], gi[ok] % self.per_tile,
+                          gj[ok] % self.per_tile].astype(np.int64)
+        border = vals < 0
+        if border.any():
+            size = self.cell_deg / self.fine
+            fi = np.floor(lat[ok][border] / size).astype(np.int64)
+            fj = np.floor(lng[ok][border] / size).astype(np.int64)
+            sub = self.blocks[-vals[border] - 1, fi % self.fine,
+                              fj % self.fine].astype(np.int64)
+            vals[border] = np.where(sub == ASK, -1, sub)
+        out[ok] = vals
+        return out
+
+
+def load(path):
+    """Map `path` and return its TzRaster, or None if it's missing or isn't
+    this format. The arrays are read-only views of the mapping."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < len(MAGIC) + _LEN.size:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if mm[:len(MAGIC)] != MAGIC:
+            return None
+        (hlen,) = _LEN.unpack_from(mm, len(MAGIC))
+        hstart = len(MAGIC) + _LEN.size
+        header = json.loads(bytes(mm[hstart:hstart + hlen]))
+        r = TzRaster()
+        r.header = header
+        r.version = header["version"]
+        r.zones = list(header["zones"])
+        r.cell_deg = float(header["cell_deg"])
+        r.per_tile, r.fine = _geometry(r.cell_deg, int(header["refine"]))
+        r.lat0, r.lng0 = int(header["lat0"]), int(header["lng0"])
+        for name, dtype, shape, off in header["arrays"]:
+            count = int(np.prod(shape))
+            setattr(r, name, np.frombuffer(mm, dtype=dtype, count=count,
+                                           offset=off).reshape(shape))
+        r._mm = mm
+        return r
+    except (ValueError, KeyError, TypeError, struct.error):
+        return None
@@ -57,7 +57,23 @@ def corridor_points(repo):
         except (TypeError, ValueError):
             pass
 
-    # 1. trip GPS tracks (dense — trace every route)
+    # 1. trip GPS tracks (dense — trace every route). Columnar `.track`
+    # caches are read with the app's own track_store (NumPy, which the USB
+    # runtime ships anyway); JSON caches from before that are read directly.
+    columnar = glob.glob(os.path.join(repo, "trip_data/track_cache/*.track"))
+    if columnar:
+        sys.path.insert(0, repo)
+        import track_store
+    for f in columnar:
+        try:
+            t = track_store.load(f)
+            if t is None:
+                print(f"  warning: can't read {f} (NumPy missing?)", file=sys.stderr)
+                continue
+            for lat, lng in zip(t.lat.tolist(), t.lon.tolist()):
+                add(lat, lng)
+        except Exception:
+            pass
     for f in glob.glob(os.path.join(repo, "trip_data/track_cache/*.json*")):
         try:
             raw = gzip.open(f).read() if f.endswith(".gz") else open(f, "rb").read()
@@ -104,6 +104,9 @@ _DAILY_VARS = ("temperature_2m_max", "temperature_2m_min",
                "precipitation_sum", "precipitation_probability_max")
 
 
+METERS_PER_MILE = 1609.344
+
+
 def haversine_miles(lat1, lng1, lat2, lng2):
     """Great-circle distance in statute miles."""
     r = 3958.7613
@@ -306,7 +309,8 @@ def find_matching_days(campgrounds, home, *, mode=MODE_RANGE,
                        waterfront_only=False,
                        sort="distance",
                        max_results=MAX_RESULTS, forecast_budget=FORECAST_BUDGET,
-                       forecast_days=FORECAST_DAYS, progress=None, **fetch_kw):
+                       forecast_days=FORECAST_DAYS, progress=None, index=None,
+                       **fetch_kw):
     """Find campgrounds whose forecast matches, grouped one entry per campground.
 
     `campgrounds` is any iterable of dicts carrying `name` and `location`
@@ -328,6 +332,13 @@ def find_matching_days(campgrounds, home, *, mode=MODE_RANGE,
     the provider bills per location, not per day, so a narrower window buys
     nothing upstream, while varying `forecast_days` would key the cache
     differently per window and throw away the sharing the cache exists for.
+
+    `index`, if given, is a spatial index over `campgrounds` (a list, then) —
+    anything with geoindex.GeoIndex's `within(lat, lng, radius_m)` returning
+    positions into it. The distance cut then opens only the cells near the
+    radius instead of measuring all ~12.9k campgrounds; the CLI, with no
+    index, keeps the plain scan. Either way the same campgrounds come out, in
+    the same order and with the same distances.
     """
     if mode not in MODES:
         raise ValueError(f"unknown mode {mode!r}")
@@ -342,6 +353,12 @@ def find_matching_days(campgrounds, home, *, mode=MODE_RANGE,
     # produce a hit (about 61% of the database is `not waterfront`, so a much
     # wider radius fits), and the MAX_RESULTS cap then yields 200 waterfront
     # campgrounds rather than the waterfront few out of the 200 nearest.
+    if index is not None:
+        # A hair past the radius: the index measures in metres on its own
+        # Earth radius, and the exact cut below is haversine_miles'.
+        pos, _ = index.within(home_lat, home_lng,
+                              max_miles * METERS_PER_MILE * 1.001)
+        campgrounds = [campgrounds[i] for i in sorted(pos.tolist())]
     eligible = []
     for cg in campgrounds:
         loc = cg.get("location")